@@ -4,10 +4,25 @@ class Component:
     Un componente contiene solo dati, non logica.
     """
     
+    # Contatore delle modifiche: lo scene graph riserializza solo i componenti cambiati
+    _versione = 0
+    
     def __init__(self):
         """Inizializza un nuovo componente"""
         self.entity = None  # Riferimento all'entità a cui appartiene
         
+    def __setattr__(self, name, value):
+        """Assegna l'attributo e segna il componente come modificato"""
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_versione', self._versione + 1)
+        
+    def segna_modificato(self):
+        """
+        Segna il componente come modificato dopo una modifica in place
+        (es. a una lista o a un dizionario) che l'assegnazione non rileva
+        """
+        object.__setattr__(self, '_versione', self._versione + 1)
+        
     def to_dict(self):
         """
         Converte il componente in un dizionario per la serializzazione.
@@ -33,9 +48,16 @@ class Component:
         return cls()
 
 
+# Attributi di PositionComponent che spostano l'entità negli indici spaziali
+_ATTRIBUTI_POSIZIONE = frozenset(("x", "y", "_map_name", "entity"))
+
+
 class PositionComponent(Component):
     """Componente che rappresenta la posizione di un'entità nel mondo di gioco"""
     
+    # Funzione richiamata quando cambiano coordinate, mappa o entità (impostata da world.indice_spaziale)
+    osservatore = None
+    
     def __init__(self, x=0, y=0, z=0, map_name=None):
         """
         Inizializza un nuovo componente posizione
@@ -73,6 +95,10 @@ class PositionComponent(Component):
         else:
             # Per tutti gli altri attributi, comportamento standard
             object.__setattr__(self, name, value)
+        object.__setattr__(self, '_versione', self._versione + 1)
+        # Mantiene aggiornati gli indici spaziali del mondo
+        if name in _ATTRIBUTI_POSIZIONE and PositionComponent.osservatore is not None:
+            PositionComponent.osservatore(self)
             
     @property
     def map_name(self):
@@ -339,6 +365,7 @@ class InventoryComponent(Component):
         """
         if len(self.items) < self.capacity:
             self.items.append(item)
+            self.segna_modificato()
             return True
         return False
         
@@ -354,6 +381,7 @@ class InventoryComponent(Component):
         """
         if item in self.items:
             self.items.remove(item)
+            self.segna_modificato()
             return True
         return False
         
@@ -597,6 +625,7 @@ class AnimationComponent(Component):
             "frames": frames,
             "frame_duration": frame_duration
         }
+        self.segna_modificato()
         
     def play(self, animation_name=None, reset=True):
         """
@@ -388,6 +388,7 @@ class RenderSystem(System):
             position = entity.get_component("position")
         
         # Aggiorna le particelle esistenti
+        avevano_particelle = bool(particle.particles)
         i = 0
         while i < len(particle.particles):
             p = particle.particles[i]
@@ -427,6 +428,10 @@ class RenderSystem(System):
                     }
                     
                     particle.particles.append(new_particle)
+        
+        # Le particelle sono modificate in place: l'assegnazione non lo rileva
+        if avevano_particelle or particle.particles:
+            particle.segna_modificato()
                     
         # Aggiungi le particelle alla coda di rendering
         for p in particle.particles:
@@ -535,8 +540,8 @@ class RenderSystem(System):
     
     def _random(self):
         """Restituisce un numero casuale tra 0 e 1"""
-        import random
-        return random.random()
+        from util.rng import generatore_di
+        return generatore_di(self.world, "render").random()
 
     def set_renderer(self, renderer):
         """
@@ -9,6 +9,7 @@ from .component import Component
 from .system import System
 from world.gestore_mappe import GestitoreMappe
 from entities.giocatore import Giocatore
+from util.rng import FlussiCasuali
 
 if TYPE_CHECKING:
     from states.base.enhanced_base_state import EnhancedBaseState
@@ -39,6 +40,12 @@ class World:
         self.current_fsm_state: Optional['EnhancedBaseState'] = None
         self.fsm_stack: List['EnhancedBaseState'] = []
         self.session_id: Optional[str] = None
+        
+        # Flussi casuali della sessione (seme e posizione salvati nello snapshot)
+        self.rng = FlussiCasuali()
+        
+        # Indici spaziali per mappa (costruiti alla prima ricerca da world.indice_spaziale)
+        self.indici_spaziali = None
 
     @property
     def giocatore(self):
@@ -196,6 +203,10 @@ class World:
             
         # Aggiorna l'indice dei tag dopo aver aggiunto l'entità e i suoi tag
         self._reindex_tags_for_entity(entity)
+        
+        indici = getattr(self, "indici_spaziali", None)
+        if indici is not None:
+            indici.aggiorna(entity)
 
         display_name_add = getattr(entity, 'nome', getattr(entity, 'name', entity.id))
         logger.debug(f"Entità '{display_name_add}' (ID: {entity.id}) aggiunta al mondo")
@@ -230,6 +241,10 @@ class World:
         # Rimuovi l'entità dalla mappa
         del self.entities[entity_id]
         
+        indici = getattr(self, "indici_spaziali", None)
+        if indici is not None:
+            indici.rimuovi(entity_id)
+        
         display_name_remove = getattr(entity, 'nome', getattr(entity, 'name', entity_id))
         logger.debug(f"Entità '{display_name_remove}' (ID: {entity_id}) rimossa dal mondo")
         return True
@@ -663,7 +678,8 @@ class World:
                 "entities": entities_data,
                 "events": events_data,
                 "pending_events": pending_events_data,
-                "temporary_states": temporary_states_data
+                "temporary_states": temporary_states_data,
+                "rng": self.rng.to_dict()
             }
         except Exception as e:
             logger.error(f"Errore generale nella serializzazione del mondo: {e}")
@@ -726,6 +742,8 @@ class World:
         """
         world = cls()
         world.session_id = data.get("session_id_persisted")
+        if isinstance(data, dict) and isinstance(data.get("rng"), dict):
+            world.rng = FlussiCasuali.from_dict(data["rng"])
         
         if not isinstance(data, dict):
             logger.error(f"Dati non validi per la deserializzazione: {type(data)}")
@@ -84,6 +84,9 @@ class EventType(Enum):
     COMBAT_ACTION = "combat_action"
     COMBAT_DAMAGE_DEALT = "combat_damage_dealt"
     COMBAT_ENTITY_DEFEATED = "combat_entity_defeated"
+    ENTITY_STATS_CHANGED = "entity_stats_changed"  # Livello, equipaggiamento o effetti temporanei modificati
+    ENTITY_HEALED = "entity_healed"  # HP aumentati (entity_id, amount, hp)
+    ENTITY_DIED = "entity_died"  # HP scesi a zero (entity_id)
 
     # Eventi di rete
     NETWORK_CONNECT = "NETWORK_CONNECT"
@@ -162,6 +165,12 @@ class EventType(Enum):
     SERVER_ERROR = "server_error"
     DEBUG_LOG = "debug_log"
     
+    # Eventi di modifica dei file (pubblicati da util/file_watcher.py)
+    DATA_FILE_CHANGED = "data_file_changed"
+    ASSET_FILE_CHANGED = "asset_file_changed"
+    MAP_FILE_CHANGED = "map_file_changed"
+    WATCHED_FILES_RESYNC = "watched_files_resync"  # Notifiche perse (coda inotify piena): ricaricare tutto
+    
     # Eventi di input utente (potrebbero essere più specifici)
     INPUT_RECEIVED = "input_received"
     
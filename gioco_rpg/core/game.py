@@ -592,7 +592,9 @@ class Game:
                                 mappa.npg[pos] = npg
                             except Exception as e:
                                 logger.error(f"Errore nel caricamento dell'NPG in posizione {pos_str}: {str(e)}")
-                        
+                        # Gli NPG sono stati scritti direttamente in mappa.npg
+                        mappa.ricostruisci_indice()
+
             # Imposta la mappa corrente
             mappa_corrente = data.get("mappa_corrente", "taverna")
             self.gestore_mappe.imposta_mappa_attuale(mappa_corrente)
@@ -1,20 +1,55 @@
 import json
+import threading
 import time
 import uuid
 from typing import Dict, List, Any, Optional
 
+# Campi che cambiano a ogni frame e non devono invalidare la deduplicazione
+_CAMPI_VOLATILI = ("render_id", "draw_call")
+
+# Limiti dell'adattamento del batching alla latenza del client
+MIN_FLUSH_INTERVAL = 1.0 / 60.0   # Non più di un messaggio per frame a 60 FPS
+MAX_FLUSH_INTERVAL = 0.25         # Il client non deve mai aspettare più di 250ms
+MIN_BATCH_SIZE = 64
+MAX_BATCH_SIZE = 1024
+
+class _StatoClient:
+    """
+    Stato del batching verso un singolo destinatario: ogni client ha la propria
+    latenza e ha ricevuto frame diversi, quindi diff e flush vanno calcolati a parte.
+    """
+    
+    def __init__(self):
+        self.previous_frame = {}     # chiave -> (evento, dati) dell'ultimo frame inviato al client
+        self.pending_upserts = {}    # modifiche non ancora inviate (coalescenza tra frame)
+        self.pending_removals = set()
+        self.last_flush_time = 0.0
+        self.flush_timer = None
+        # Parametri adattivi in base alla latenza (RTT) del client
+        self.rtt_ms = None
+        self.flush_interval = MIN_FLUSH_INTERVAL
+        self.max_batch_size = 256
+        
+    def annulla_timer(self):
+        """Annulla il flush programmato, se presente"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+
 class GraphicsRenderer:
     """
     Classe che fornisce un'interfaccia per il rendering grafico.
     Questa classe funge da ponte tra il sistema ECS e il frontend grafico.
     """
     
-    def __init__(self, socket_io=None):
+    def __init__(self, socket_io=None, batching=False):
         """
         Inizializza il renderer grafico
         
         Args:
             socket_io: Oggetto SocketIO per la comunicazione con il client
+            batching (bool): Se True le draw call di un frame vengono raccolte
+                e inviate come un unico messaggio 'render_frame' da present()
         """
         self.socket_io = socket_io
         self.camera = {
@@ -34,6 +69,15 @@ class GraphicsRenderer:
         # Aggiungiamo un buffer per gli eventi di rendering
         self.render_events = []
         
+        # Modalità batching: command buffer del frame e stato per ciascun client
+        self.batching = batching
+        self._frame_commands = {}     # chiave -> (evento, dati) del frame corrente
+        self._last_frame = {}         # ultimo frame completo, per i keyframe
+        self._clients = {}            # sid -> _StatoClient dei client registrati
+        # Destinatario unico (emit a tutti) finché nessun client si è registrato
+        self._broadcast = _StatoClient()
+        self._lock = threading.RLock()
+        
     def set_socket_io(self, socket_io):
         """
         Imposta l'oggetto SocketIO per la comunicazione con il client
@@ -53,11 +97,93 @@ class GraphicsRenderer:
         if camera_data:
             self.camera.update(camera_data)
         
+    def set_batching(self, enabled):
+        """
+        Attiva/disattiva la modalità batching dei frame
+        
+        Args:
+            enabled (bool): True per raccogliere le draw call in un unico messaggio per frame
+        """
+        with self._lock:
+            self.batching = bool(enabled)
+            self._frame_commands = {}
+            self._last_frame = {}
+            for _, stato in self._destinatari():
+                stato.annulla_timer()
+                stato.previous_frame = {}
+                stato.pending_upserts = {}
+                stato.pending_removals = set()
+        
+    def registra_client(self, sid):
+        """
+        Registra un client: da questo momento riceve diff calcolati sul proprio stato
+        
+        Args:
+            sid (str): SID del client
+        """
+        with self._lock:
+            return self._clients.setdefault(sid, _StatoClient())
+        
+    def rimuovi_client(self, sid):
+        """
+        Rimuove lo stato di un client disconnesso
+        
+        Args:
+            sid (str): SID del client
+        """
+        with self._lock:
+            stato = self._clients.pop(sid, None)
+            if stato is not None:
+                stato.annulla_timer()
+        
+    def _destinatari(self):
+        """Restituisce le coppie (destinatario, stato): i client registrati o il broadcast"""
+        if self._clients:
+            return list(self._clients.items())
+        return [(None, self._broadcast)]
+        
+    def update_rtt(self, rtt_ms, sid=None):
+        """
+        Aggiorna la stima della latenza di un client e adatta i parametri del suo batching.
+        
+        Con latenze alte conviene inviare meno messaggi più grandi: l'intervallo di
+        flush cresce con metà RTT e la dimensione massima del batch scala di conseguenza.
+        
+        Args:
+            rtt_ms (float): Round-trip time misurato in millisecondi
+            sid (str, optional): SID del client misurato (default: destinatario broadcast)
+        """
+        try:
+            rtt_ms = float(rtt_ms)
+        except (TypeError, ValueError):
+            return
+        if rtt_ms < 0:
+            return
+        
+        with self._lock:
+            stato = self._broadcast if sid is None else self._clients.get(sid)
+            if stato is None:
+                # Client non ancora registrato: non riceve frame
+                return
+            
+            # Media mobile esponenziale per non reagire a singoli picchi
+            stato.rtt_ms = rtt_ms if stato.rtt_ms is None else 0.8 * stato.rtt_ms + 0.2 * rtt_ms
+            
+            rtt_s = stato.rtt_ms / 1000.0
+            stato.flush_interval = min(MAX_FLUSH_INTERVAL, max(MIN_FLUSH_INTERVAL, rtt_s / 2))
+            frames_per_flush = max(1.0, stato.flush_interval / MIN_FLUSH_INTERVAL)
+            stato.max_batch_size = int(min(MAX_BATCH_SIZE, max(MIN_BATCH_SIZE, 64 * frames_per_flush)))
+        
     def clear_screen(self):
         """Pulisce lo schermo"""
         self.render_id = str(uuid.uuid4())
         self.draw_calls = 0
         
+        # In modalità batching il frame viene ricostruito da zero e inviato come diff
+        if self.batching:
+            self._frame_commands = {}
+            return
+        
         # Invia evento di pulizia schermo al client
         if self.socket_io:
             render_data = {
@@ -98,6 +224,10 @@ class GraphicsRenderer:
             # Entità fuori schermo, salta il rendering
             return
         
+        if self.batching:
+            self._record_command('render_entity', render_data)
+            return
+        
         # Invia comando di rendering al client
         if self.socket_io:
             self.socket_io.emit('render_entity', render_data)
@@ -138,6 +268,10 @@ class GraphicsRenderer:
             "draw_call": self.draw_calls
         }
         
+        if self.batching:
+            self._record_command('render_particles', render_data)
+            return
+        
         # Invia comando di rendering al client
         if self.socket_io:
             self.socket_io.emit('render_particles', render_data)
@@ -158,6 +292,10 @@ class GraphicsRenderer:
         render_data["render_id"] = self.render_id
         render_data["draw_call"] = self.draw_calls
         
+        if self.batching:
+            self._record_command('render_ui', render_data)
+            return
+        
         # Invia comando di rendering al client
         if self.socket_io:
             self.socket_io.emit('render_ui', render_data)
@@ -185,12 +323,184 @@ class GraphicsRenderer:
             "timestamp": current_time
         }
         
+        if self.batching:
+            with self._lock:
+                self._present_batched(render_data, current_time)
+            return
+        
         # Invia segnale di completamento frame al client
         if self.socket_io:
             self.socket_io.emit('render_complete', render_data)
             # Aggiungi anche all'elenco eventi
             self.push_render_event('render_complete', render_data)
     
+    def _record_command(self, event_type, render_data):
+        """
+        Registra una draw call nel command buffer del frame corrente
+        
+        Args:
+            event_type (str): Tipo di comando (render_entity, render_particles, render_ui)
+            render_data (dict): Dati del comando
+        """
+        object_id = render_data.get("id")
+        key = f"{event_type}:{object_id}" if object_id is not None else f"{event_type}:#{self.draw_calls}"
+        self._frame_commands[key] = (event_type, render_data)
+        
+    @staticmethod
+    def _stable_data(render_data):
+        """Restituisce i dati del comando senza i campi che cambiano a ogni frame"""
+        return {k: v for k, v in render_data.items() if k not in _CAMPI_VOLATILI}
+        
+    def _present_batched(self, frame_info, current_time):
+        """
+        Confronta il frame corrente con l'ultimo inviato a ciascun client, accumula le
+        differenze e le invia come un unico messaggio compatto quando scade
+        l'intervallo di flush del client.
+        
+        Args:
+            frame_info (dict): Dati di completamento del frame
+            current_time (float): Timestamp del frame
+        """
+        current = {key: (event_type, self._stable_data(data))
+                   for key, (event_type, data) in self._frame_commands.items()}
+        self._last_frame = current
+        self._frame_commands = {}
+        
+        for to, stato in self._destinatari():
+            for key, command in current.items():
+                if stato.previous_frame.get(key) != command:
+                    stato.pending_upserts[key] = command
+                    stato.pending_removals.discard(key)
+            for key in stato.previous_frame.keys() - current.keys():
+                stato.pending_upserts.pop(key, None)
+                stato.pending_removals.add(key)
+            stato.previous_frame = current
+            
+            attesa = stato.flush_interval - (current_time - stato.last_flush_time)
+            if attesa > 0:
+                self._programma_flush(to, stato, attesa, frame_info)
+            else:
+                self._flush_client(to, stato, frame_info, current_time)
+        
+    def _programma_flush(self, to, stato, attesa, frame_info):
+        """
+        Programma il flush di un client alla scadenza del suo intervallo, se ci sono
+        modifiche in attesa e non è già programmato
+        
+        Args:
+            to (str): SID del client (None per il broadcast)
+            stato (_StatoClient): Stato del client
+            attesa (float): Secondi mancanti alla scadenza
+            frame_info (dict): Dati di completamento dell'ultimo frame
+        """
+        if stato.flush_timer is not None or not (stato.pending_upserts or stato.pending_removals):
+            return
+        stato.flush_timer = threading.Timer(attesa, self._flush_a_scadenza, args=(to, stato, frame_info))
+        stato.flush_timer.daemon = True
+        stato.flush_timer.start()
+            
+    def _flush_a_scadenza(self, to, stato, frame_info):
+        """Callback del timer: invia al client le modifiche rimaste in attesa"""
+        with self._lock:
+            stato.flush_timer = None
+            if stato.pending_upserts or stato.pending_removals:
+                self._flush_client(to, stato, frame_info)
+        
+    def flush(self, frame_info=None, current_time=None):
+        """
+        Invia a ogni client le modifiche accumulate come messaggi 'render_frame',
+        suddividendole in blocchi di al massimo max_batch_size comandi.
+        
+        Args:
+            frame_info (dict, optional): Dati di completamento dell'ultimo frame
+            current_time (float, optional): Timestamp dell'invio
+        """
+        with self._lock:
+            for to, stato in self._destinatari():
+                self._flush_client(to, stato, frame_info, current_time)
+                
+    def _flush_client(self, to, stato, frame_info=None, current_time=None):
+        """
+        Invia a un client le modifiche accumulate per lui
+        
+        Args:
+            to (str): SID del client (None per il broadcast)
+            stato (_StatoClient): Stato del client
+            frame_info (dict, optional): Dati di completamento dell'ultimo frame
+            current_time (float, optional): Timestamp dell'invio
+        """
+        stato.annulla_timer()
+        stato.last_flush_time = current_time or time.time()
+        frame_info = frame_info or {"render_id": self.render_id, "frame": self.frame_count}
+        
+        upserts = [
+            {"key": key, "type": event_type, "data": data}
+            for key, (event_type, data) in stato.pending_upserts.items()
+        ]
+        removals = sorted(stato.pending_removals)
+        stato.pending_upserts = {}
+        stato.pending_removals = set()
+        unchanged = max(0, len(stato.previous_frame) - len(upserts))
+        self._emit_frame(frame_info, upserts, removals, unchanged, to=to, max_batch_size=stato.max_batch_size)
+        
+    def keyframe(self, to=None):
+        """
+        Invia l'ultimo frame completo, così che un client appena entrato possa
+        applicare i diff successivi senza aver ricevuto quelli precedenti.
+        Il client indicato viene registrato e riparte da questo frame.
+        
+        Args:
+            to (str, optional): SID del destinatario (default: tutti)
+        """
+        with self._lock:
+            destinatari = [(to, self.registra_client(to))] if to is not None else self._destinatari()
+            upserts = [
+                {"key": key, "type": event_type, "data": data}
+                for key, (event_type, data) in self._last_frame.items()
+            ]
+            frame_info = {"render_id": self.render_id, "frame": self.frame_count, "keyframe": True}
+            for _, stato in destinatari:
+                stato.annulla_timer()
+                stato.last_flush_time = time.time()
+                stato.previous_frame = self._last_frame
+                stato.pending_upserts = {}
+                stato.pending_removals = set()
+            if to is not None:
+                self._emit_frame(frame_info, upserts, [], 0, to=to, max_batch_size=destinatari[0][1].max_batch_size)
+            else:
+                self._emit_frame(frame_info, upserts, [], 0)
+        
+    def _emit_frame(self, frame_info, upserts, removals, unchanged, to=None, max_batch_size=None):
+        """
+        Emette uno o più messaggi 'render_frame' di al massimo max_batch_size comandi
+        
+        Args:
+            frame_info (dict): Dati comuni a tutti i blocchi
+            upserts (list): Comandi da aggiungere o aggiornare
+            removals (list): Chiavi da rimuovere (inviate con l'ultimo blocco)
+            unchanged (int): Numero di comandi invariati rispetto al frame precedente
+            to (str, optional): SID o room del destinatario
+            max_batch_size (int, optional): Dimensione massima di un blocco
+        """
+        max_batch_size = max_batch_size or self._broadcast.max_batch_size
+        chunks = [upserts[i:i + max_batch_size] for i in range(0, len(upserts), max_batch_size)] or [[]]
+        for index, chunk in enumerate(chunks):
+            last = index == len(chunks) - 1
+            message = dict(frame_info)
+            message.update({
+                "upsert": chunk,
+                "remove": removals if last else [],
+                "complete": last,
+                "unchanged": unchanged if last else 0
+            })
+            if self.socket_io:
+                if to is not None:
+                    self.socket_io.emit('render_frame', message, to=to)
+                else:
+                    self.socket_io.emit('render_frame', message)
+                # Aggiungi anche all'elenco eventi
+                self.push_render_event('render_frame', message)
+        
     def toggle_debug_mode(self):
         """Attiva/disattiva la modalità debug"""
         self.debug_mode = not self.debug_mode
@@ -322,19 +632,27 @@ class GraphicsRenderer:
         # Aggiungi anche all'elenco eventi
         self.push_render_event('render_tilemap', visible_tilemap)
         
-    def get_renderer_info(self):
+    def get_renderer_info(self, sid=None):
         """
         Restituisce informazioni sul renderer
         
+        Args:
+            sid (str, optional): SID del client di cui riportare i parametri del batching
+        
         Returns:
             dict: Informazioni sul renderer
         """
+        stato = self._clients.get(sid, self._broadcast)
         return {
             "camera": self.camera,
             "fps": round(self.fps, 1),
             "frame_count": self.frame_count,
             "draw_calls": self.draw_calls,
-            "debug_mode": self.debug_mode
+            "debug_mode": self.debug_mode,
+            "batching": self.batching,
+            "rtt_ms": round(stato.rtt_ms, 1) if stato.rtt_ms is not None else None,
+            "flush_interval": round(stato.flush_interval, 4),
+            "max_batch_size": stato.max_batch_size
         }
     
     def get_renderer_events(self):
@@ -0,0 +1,283 @@
+"""
+Scene graph retained per il rendering delle sessioni.
+
+Invece di ridisegnare l'intera scena ad ogni richiesta di rendering, ogni
+sessione mantiene un grafo dei nodi visibili (uno per entità renderable)
+già ordinato per categoria e layer. Ad ogni sincronizzazione con il mondo
+ECS vengono riserializzati solo i nodi sporchi, cioè quelli il cui
+componente o la cui posizione sono cambiati (vedi Component._versione), e
+al client vengono inviati solo i nodi aggiunti, modificati o rimossi.
+"""
+
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Ordine di disegno delle categorie di nodi
+CATEGORIA_MAPPA = "map"
+CATEGORIA_ENTITA = "entity"
+CATEGORIA_PARTICELLE = "particle"
+CATEGORIA_UI = "ui"
+ORDINE_CATEGORIE = {
+    CATEGORIA_MAPPA: 0,
+    CATEGORIA_ENTITA: 1,
+    CATEGORIA_PARTICELLE: 2,
+    CATEGORIA_UI: 3,
+}
+
+
+def _entita_con_componente(world, tipo_componente):
+    """Restituisce le entità del mondo che possiedono il componente indicato"""
+    if hasattr(world, "get_entities_with_component"):
+        return world.get_entities_with_component(tipo_componente)
+    return world.find_entities_with_component(tipo_componente)
+
+
+def _firma(entity, componente):
+    """
+    Restituisce la firma di un nodo: cambia quando cambiano il componente,
+    la posizione dell'entità o il componente stesso viene sostituito.
+
+    Args:
+        entity: Entità proprietaria del componente
+        componente: Componente renderable o particle
+
+    Returns:
+        tuple: Firma del nodo
+    """
+    posizione = entity.get_component("position")
+    return (
+        id(componente), getattr(componente, "_versione", None),
+        id(posizione), getattr(posizione, "_versione", None),
+    )
+
+
+def _dati_rendering(entity, componente):
+    """
+    Estrae i dati di rendering di un componente.
+
+    Usa to_render_data() se il componente lo fornisce, altrimenti
+    costruisce i dati da to_dict() e dalla posizione dell'entità.
+
+    Args:
+        entity: Entità proprietaria del componente
+        componente: Componente renderable o particle
+
+    Returns:
+        dict: Dati di rendering del nodo o None se non disponibili
+    """
+    if hasattr(componente, "to_render_data"):
+        return componente.to_render_data()
+    if not hasattr(componente, "to_dict"):
+        return None
+
+    dati = dict(componente.to_dict())
+    dati["id"] = entity.id
+    posizione = entity.get_component("position")
+    if posizione is not None:
+        dati["x"] = posizione.x
+        dati["y"] = posizione.y
+        dati["map_name"] = getattr(posizione, "map_name", None)
+    return dati
+
+
+class SceneGraph:
+    """
+    Scene graph retained di una singola sessione.
+
+    I nodi sono indicizzati per chiave (categoria + ID entità) e mantenuti in
+    una lista ordinata per (categoria, layer, chiave): quando un'entità cambia
+    layer viene riposizionato solo il suo nodo, senza riordinare la scena.
+    """
+
+    def __init__(self):
+        self.nodi = {}  # chiave -> {"key", "category", "layer", "data"}
+        self._firme = {}  # chiave -> firma del nodo all'ultima serializzazione
+        self._ordine = []  # chiavi di ordinamento (categoria, layer, chiave) ordinate
+        self.versione = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _chiave_ordinamento(nodo):
+        return (ORDINE_CATEGORIE[nodo["category"]], nodo["layer"], nodo["key"])
+
+    def _inserisci(self, nodo):
+        self.nodi[nodo["key"]] = nodo
+        bisect.insort(self._ordine, self._chiave_ordinamento(nodo))
+
+    def _rimuovi(self, chiave):
+        nodo = self.nodi.pop(chiave)
+        indice = bisect.bisect_left(self._ordine, self._chiave_ordinamento(nodo))
+        del self._ordine[indice]
+
+    def ordine(self):
+        """
+        Restituisce le chiavi dei nodi nell'ordine di disegno.
+
+        Returns:
+            list: Chiavi dei nodi dal primo (sotto) all'ultimo (sopra)
+        """
+        return [voce[2] for voce in self._ordine]
+
+    def raccogli_nodi(self, world, firme=None):
+        """
+        Costruisce i nodi correnti a partire dal mondo ECS.
+
+        I nodi la cui firma non è cambiata dall'ultima sincronizzazione
+        vengono riutilizzati senza serializzare di nuovo il componente.
+
+        Args:
+            world: Mondo ECS della sessione
+            firme (dict, optional): Riempito con la firma di ogni nodo corrente
+
+        Returns:
+            dict: Nodi correnti indicizzati per chiave
+        """
+        if firme is None:
+            firme = {}
+        with self._lock:
+            precedenti = dict(self.nodi)
+            firme_precedenti = dict(self._firme)
+
+        correnti = {}
+
+        def _aggiungi(entity, componente, categoria):
+            chiave = f"{categoria}:{entity.id}"
+            firma = _firma(entity, componente)
+            firme[chiave] = firma
+            if firme_precedenti.get(chiave) == firma and chiave in precedenti:
+                correnti[chiave] = precedenti[chiave]
+                return
+            dati = _dati_rendering(entity, componente)
+            if dati is None:
+                firme.pop(chiave)
+                return
+            correnti[chiave] = {
+                "key": chiave,
+                "category": categoria,
+                "layer": getattr(componente, "layer", 0) or 0,
+                "data": dati,
+            }
+
+        for entity in _entita_con_componente(world, "renderable"):
+            componente = entity.get_component("renderable")
+            if componente is None or not getattr(componente, "visible", True):
+                continue
+            if entity.has_tag("map"):
+                categoria = CATEGORIA_MAPPA
+            elif entity.has_tag("ui"):
+                categoria = CATEGORIA_UI
+            else:
+                categoria = CATEGORIA_ENTITA
+            _aggiungi(entity, componente, categoria)
+
+        for entity in _entita_con_componente(world, "particle"):
+            componente = entity.get_component("particle")
+            if componente is None:
+                continue
+            _aggiungi(entity, componente, CATEGORIA_PARTICELLE)
+        return correnti
+
+    def sincronizza(self, world, completo=False):
+        """
+        Aggiorna il grafo con lo stato del mondo e restituisce le differenze.
+
+        Args:
+            world: Mondo ECS della sessione
+            completo (bool): Se True svuota il grafo e restituisce l'intera scena
+                (usato alla prima richiesta o quando il client ha perso lo stato)
+
+        Returns:
+            dict: Differenze con chiavi added, changed, removed, order e full
+        """
+        firme = {}
+        correnti = self.raccogli_nodi(world, firme)
+
+        with self._lock:
+            if completo:
+                self.nodi = {}
+                self._ordine = []
+            self._firme = firme
+
+            aggiunti = []
+            modificati = []
+            rimossi = [chiave for chiave in self.nodi if chiave not in correnti]
+            riordinato = bool(rimossi)
+
+            for chiave in rimossi:
+                self._rimuovi(chiave)
+
+            for chiave, nodo in correnti.items():
+                precedente = self.nodi.get(chiave)
+                if precedente is nodo:
+                    # Nodo pulito: riutilizzato senza riserializzarlo
+                    continue
+                if precedente is None:
+                    self._inserisci(nodo)
+                    aggiunti.append(nodo)
+                    riordinato = True
+                elif precedente["data"] != nodo["data"] or precedente["layer"] != nodo["layer"]:
+                    if precedente["layer"] != nodo["layer"]:
+                        self._rimuovi(chiave)
+                        self._inserisci(nodo)
+                        riordinato = True
+                    else:
+                        self.nodi[chiave] = nodo
+                    modificati.append(nodo)
+
+            if aggiunti or modificati or rimossi or completo:
+                self.versione += 1
+
+            return {
+                "version": self.versione,
+                "full": completo,
+                "added": aggiunti,
+                "changed": modificati,
+                "removed": rimossi,
+                # L'ordine di disegno viene inviato solo quando cambia
+                "order": self.ordine() if riordinato or completo else None,
+                "total": len(self.nodi),
+            }
+
+
+# Scene graph per (sessione, client): ogni client riceve i diff rispetto a ciò che ha già
+_scene_graphs = {}
+_scene_graphs_lock = threading.Lock()
+
+
+def get_scene_graph(id_sessione, client_id=None):
+    """
+    Restituisce lo scene graph di un client della sessione, creandolo se necessario.
+
+    Args:
+        id_sessione (str): ID della sessione
+        client_id (str, optional): SID del client
+
+    Returns:
+        SceneGraph: Scene graph del client
+    """
+    with _scene_graphs_lock:
+        grafo = _scene_graphs.get((id_sessione, client_id))
+        if grafo is None:
+            grafo = SceneGraph()
+            _scene_graphs[(id_sessione, client_id)] = grafo
+        return grafo
+
+
+def rimuovi_scene_graph(id_sessione, client_id=None):
+    """
+    Elimina lo scene graph di un client disconnesso o, senza client_id,
+    tutti quelli di una sessione terminata.
+
+    Args:
+        id_sessione (str): ID della sessione
+        client_id (str, optional): SID del client
+    """
+    with _scene_graphs_lock:
+        if client_id is not None:
+            _scene_graphs.pop((id_sessione, client_id), None)
+            return
+        for chiave in [chiave for chiave in _scene_graphs if chiave[0] == id_sessione]:
+            del _scene_graphs[chiave]
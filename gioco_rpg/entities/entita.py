@@ -1,13 +1,70 @@
-import random
+from util.rng import generatore
 from core.io_interface import GUI2DIO
 import uuid
 from typing import Dict, List, Optional, Any
 import json
 import logging
+import threading
+from contextlib import contextmanager
 from items.item_factory import ItemFactory
 
 logger = logging.getLogger(__name__)
 
+# Funzioni richiamate subito a ogni morte o guarigione: (entita_id, vivo) -> None
+osservatori_hp = []
+
+# Eventi di morte e guarigione trattenuti dal thread corrente (vedi rinvia_eventi_hp)
+_rinvio_hp = threading.local()
+
+
+def notifica_variazione_hp(entita, hp_prima, hp):
+    """
+    Segnala la morte (HP scesi a zero) o la guarigione (HP aumentati) di un'entità.
+
+    Gli osservatori_hp vengono avvisati subito; ENTITY_DIED ed ENTITY_HEALED
+    vengono pubblicati sull'EventBus, o trattenuti se il thread è dentro
+    rinvia_eventi_hp.
+
+    Args:
+        entita: Entità i cui HP sono cambiati
+        hp_prima (int): HP precedenti (None alla prima assegnazione)
+        hp (int): HP attuali
+    """
+    if hp_prima is None or hp is None:
+        return
+    import core.events as Events
+    entita_id = getattr(entita, "id", None)
+    if hp <= 0 < hp_prima:
+        evento = (Events.ENTITY_DIED, {"entity_id": entita_id})
+    elif hp > hp_prima:
+        evento = (Events.ENTITY_HEALED, {"entity_id": entita_id, "amount": hp - hp_prima, "hp": hp})
+    else:
+        return
+    for osservatore in list(osservatori_hp):
+        osservatore(entita_id, hp > 0)
+    trattenuti = getattr(_rinvio_hp, "eventi", None)
+    if trattenuti is not None:
+        trattenuti.append(evento)
+    else:
+        from core.event_bus import EventBus
+        EventBus.get_instance().emit_immediate(evento[0], **evento[1])
+
+
+@contextmanager
+def rinvia_eventi_hp():
+    """
+    Trattiene gli eventi di morte e guarigione emessi dal thread corrente.
+
+    Yields:
+        list: Eventi (tipo, dati) trattenuti, da pubblicare o scartare dal chiamante
+    """
+    precedenti = getattr(_rinvio_hp, "eventi", None)
+    _rinvio_hp.eventi = []
+    try:
+        yield _rinvio_hp.eventi
+    finally:
+        _rinvio_hp.eventi = precedenti
+
 # Mappa delle abilità associate alle caratteristiche (D&D 5e style)
 ABILITA_ASSOCIATE = {
     "acrobazia": "destrezza",
@@ -34,7 +91,7 @@ class Dado:
         self.facce = facce
 
     def tira(self):
-        return random.randint(1, self.facce)
+        return generatore().randint(1, self.facce)
 
 class Entita:
     """Classe base per tutte le entità del gioco."""
@@ -91,6 +148,9 @@ class Entita:
         self.abilita_competenze = {}  # Esempio: {"percezione": True, "persuasione": False}
         self.bonus_competenza = 2  # Può crescere con il livello
         
+        # Incrementata a ogni notifica_statistiche_modificate (invalida le tabelle derivate)
+        self.versione_statistiche = 0
+        
         # Altri attributi
         self.difesa = 0
         self.inventario = []
@@ -228,10 +288,9 @@ class Entita:
         self.hp = self.hp_max  # Cura completamente quando sale di livello
         
         # Incrementa un valore base a caso
-        import random
         caratteristiche = ["forza_base", "destrezza_base", "costituzione_base", 
                           "intelligenza_base", "saggezza_base", "carisma_base"]
-        caratteristica_da_aumentare = random.choice(caratteristiche)
+        caratteristica_da_aumentare = generatore().choice(caratteristiche)
         
         setattr(self, caratteristica_da_aumentare, getattr(self, caratteristica_da_aumentare) + 1)
         # Ricalcola il modificatore corrispondente
@@ -244,6 +303,20 @@ class Entita:
             game_ctx.io.mostra_messaggio(f"\n*** {self.nome} è salito al livello {self.livello}! ***")
             game_ctx.io.mostra_messaggio(f"La sua {caratteristica_da_aumentare.replace('_base', '')}, difesa e salute massima sono aumentate!")
 
+        self.notifica_statistiche_modificate("livello")
+
+    def notifica_statistiche_modificate(self, motivo):
+        """
+        Segnala che le statistiche derivate dell'entità (attacco, CA, tiri salvezza) vanno ricalcolate.
+
+        Args:
+            motivo (str): Causa della modifica (es. "livello", "equipaggiamento", "effetto")
+        """
+        from core.event_bus import EventBus
+        import core.events as Events
+        self.versione_statistiche = getattr(self, "versione_statistiche", 0) + 1
+        EventBus.get_instance().emit_immediate(Events.ENTITY_STATS_CHANGED, entity_id=self.id, motivo=motivo)
+
     def prova_abilita(self, abilita, difficolta, gioco=None):
         # Usa il contesto di gioco memorizzato se non viene fornito
         game_ctx = gioco if gioco else getattr(self, 'gioco', None)
@@ -273,13 +346,35 @@ class Entita:
     def calcola_modificatore(self, punteggio_caratteristica):
         return (punteggio_caratteristica - 10) // 2
 
+    @property
+    def hp(self):
+        return self._hp
+
+    @hp.setter
+    def hp(self, valore):
+        hp_prima = self.__dict__.get("_hp")
+        self._hp = valore
+        notifica_variazione_hp(self, hp_prima, valore)
+
+    def ripristina_hp(self, valore):
+        """
+        Imposta gli HP senza notificare morte o guarigione: usato quando si
+        carica un salvataggio, dove il valore non è una variazione di gioco.
+
+        Args:
+            valore (int): HP salvati
+        """
+        self._hp = valore
+
     @property
     def forza(self):
         return self.modificatore_forza
 
     @forza.setter
     def forza(self, valore):
-        self.modificatore_forza = valore
+        if valore != self.modificatore_forza:
+            self.modificatore_forza = valore
+            self.notifica_statistiche_modificate("caratteristica")
         
     @property
     def destrezza(self):
@@ -287,7 +382,9 @@ class Entita:
         
     @destrezza.setter
     def destrezza(self, valore):
-        self.modificatore_destrezza = valore
+        if valore != self.modificatore_destrezza:
+            self.modificatore_destrezza = valore
+            self.notifica_statistiche_modificate("caratteristica")
         
     @property
     def costituzione(self):
@@ -295,7 +392,9 @@ class Entita:
         
     @costituzione.setter
     def costituzione(self, valore):
-        self.modificatore_costituzione = valore
+        if valore != self.modificatore_costituzione:
+            self.modificatore_costituzione = valore
+            self.notifica_statistiche_modificate("caratteristica")
         
     @property
     def intelligenza(self):
@@ -303,7 +402,9 @@ class Entita:
         
     @intelligenza.setter
     def intelligenza(self, valore):
-        self.modificatore_intelligenza = valore
+        if valore != self.modificatore_intelligenza:
+            self.modificatore_intelligenza = valore
+            self.notifica_statistiche_modificate("caratteristica")
         
     @property
     def saggezza(self):
@@ -311,7 +412,9 @@ class Entita:
         
     @saggezza.setter
     def saggezza(self, valore):
-        self.modificatore_saggezza = valore
+        if valore != self.modificatore_saggezza:
+            self.modificatore_saggezza = valore
+            self.notifica_statistiche_modificate("caratteristica")
         
     @property
     def carisma(self):
@@ -319,7 +422,9 @@ class Entita:
         
     @carisma.setter
     def carisma(self, valore):
-        self.modificatore_carisma = valore
+        if valore != self.modificatore_carisma:
+            self.modificatore_carisma = valore
+            self.notifica_statistiche_modificate("caratteristica")
 
     def imposta_posizione(self, mappa_nome_o_x, x_o_y=None, y=None):
         """
@@ -564,8 +669,10 @@ class Entita:
         #    Per ora, un'entità non può entrare in una casella occupata da un'altra entità.
         #    Questa logica potrebbe diventare più complessa (es. NPG amichevoli che si spostano)
         altre_entita_nella_mappa = []
-        if hasattr(mappa, 'npg') and isinstance(mappa.npg, dict): # mappa.npg è {pos_key_str: npg_instance}
-            altre_entita_nella_mappa.extend(mappa.npg.values())
+        if hasattr(mappa, 'ottieni_npg_a'): # mappa.npg è {(x, y): npg}, basta la casella di destinazione
+            npg_a_destinazione = mappa.ottieni_npg_a(nuova_x, nuova_y)
+            if npg_a_destinazione is not None:
+                altre_entita_nella_mappa.append(npg_a_destinazione)
         # Aggiungi anche il giocatore se presente sulla mappa e non è l'entità che si sta muovendo
         giocatore_sulla_mappa = mappa.giocatore if hasattr(mappa, 'giocatore') else None
         if giocatore_sulla_mappa and giocatore_sulla_mappa.id != self.id:
@@ -587,8 +694,7 @@ class Entita:
                     logger.info(f"Giocatore {self.id} interagisce con porta a ({nuova_x},{nuova_y}) verso '{destinazione_porta}'.")
                     # La logica di cambio mappa la gestirà il chiamante (es. MappaState)
                     # Qui segnaliamo solo il successo e la potenziale transizione.
-                    self.x = nuova_x 
-                    self.y = nuova_y
+                    self._sposta_su_mappa(mappa, nuova_x, nuova_y)
                     return {"successo": True, "nuova_posizione": (self.x, self.y), "messaggio": f"Sei entrato in {oggetto_a_destinazione.nome}.", "cambio_mappa_richiesto": destinazione_porta, "nuova_mappa_coords": getattr(oggetto_a_destinazione, 'pos_destinazione', None)}
             
             logger.debug(f"Movimento fallito per {self.id}: collisione con oggetto bloccante '{oggetto_a_destinazione.nome}' a ({nuova_x},{nuova_y}).")
@@ -596,8 +702,7 @@ class Entita:
 
 
         # Movimento riuscito
-        self.x = nuova_x
-        self.y = nuova_y
+        self._sposta_su_mappa(mappa, nuova_x, nuova_y)
         logger.info(f"Movimento riuscito per {self.id}: nuova posizione ({self.x},{self.y}) su '{self.mappa_corrente}'.")
         
         # Eventuale cambio mappa se si finisce su un tile di transizione
@@ -618,5 +723,45 @@ class Entita:
 
         return {"successo": True, "nuova_posizione": (self.x, self.y), "messaggio": "Movimento effettuato."}
 
+    def _sposta_su_mappa(self, mappa, x, y):
+        """Aggiorna le coordinate e, per gli NPG della mappa, la loro chiave e l'indice spaziale"""
+        if hasattr(mappa, 'sposta_npg') and mappa.ottieni_npg_a(self.x, self.y) is self:
+            mappa.sposta_npg(self, x, y)
+        self.x = x
+        self.y = y
+
+    def ottieni_oggetti_vicini(self, gestore_mappe, raggio=1):
+        """
+        Restituisce gli oggetti entro un raggio dall'entità, sulla sua mappa corrente.
+
+        Args:
+            gestore_mappe (GestitoreMappe): Il gestore delle mappe
+            raggio (int): Distanza massima in celle
+
+        Returns:
+            dict: Dizionario di posizioni e oggetti
+        """
+        mappa = gestore_mappe.ottieni_mappa(self.mappa_corrente) if gestore_mappe else None
+        if not mappa:
+            return {}
+        return mappa.ottieni_oggetti_vicini(self.x, self.y, raggio)
+
+    def ottieni_npg_vicini(self, gestore_mappe, raggio=1):
+        """
+        Restituisce gli NPG entro un raggio dall'entità, sulla sua mappa corrente.
+
+        Args:
+            gestore_mappe (GestitoreMappe): Il gestore delle mappe
+            raggio (int): Distanza massima in celle
+
+        Returns:
+            dict: Dizionario di posizioni e NPG (esclusa l'entità stessa)
+        """
+        mappa = gestore_mappe.ottieni_mappa(self.mappa_corrente) if gestore_mappe else None
+        if not mappa:
+            return {}
+        return {pos: npg for pos, npg in mappa.ottieni_npg_vicini(self.x, self.y, raggio).items()
+                if npg is not self}
+
     def __str__(self):
         return f"{self.nome} (ID: {self.id}) a ({self.x}, {self.y}) su '{self.mappa_corrente}'"
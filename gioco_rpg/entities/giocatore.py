@@ -14,6 +14,13 @@ logger = logging.getLogger(__name__)
 # Dadi per tirare le statistiche
 d6 = Dado(6)
 
+# Tiri salvezza in cui ogni classe aggiunge il bonus di competenza
+COMPETENZE_TIRI_SALVEZZA = {
+    "guerriero": ("forza", "costituzione"),
+    "mago": ("intelligenza", "saggezza"),
+    "ladro": ("destrezza", "carisma"),
+}
+
 class Giocatore(Entita):
     def __init__(self, nome, classe, razza="umano", livello=1, hp=None, token="@", id=None):
         """
@@ -57,7 +64,7 @@ class Giocatore(Entita):
         self.hp_max = base_hp + self.modificatore_costituzione
         if self.hp_max < 1: self.hp_max = 1
         
-        self.hp = min(hp, self.hp_max) if hp is not None else self.hp_max
+        self.ripristina_hp(min(hp, self.hp_max) if hp is not None else self.hp_max)
         
         self.mana = 0
         self.mana_max = 0
@@ -178,6 +185,7 @@ class Giocatore(Entita):
         
         # Log del cambio classe
         logger.info(f"Classe del giocatore {self.nome} cambiata da {vecchia_classe_nome} a {self._get_classe_nome()}")
+        self.notifica_statistiche_modificate("classe")
         
         return True
         
@@ -397,6 +405,7 @@ class Giocatore(Entita):
             arma: Arma da equipaggiare
         """
         self.arma = arma
+        self.notifica_statistiche_modificate("equipaggiamento")
         
     def equipaggia_armatura(self, armatura):
         """
@@ -406,6 +415,7 @@ class Giocatore(Entita):
             armatura: Armatura da equipaggiare
         """
         self.armatura = armatura
+        self.notifica_statistiche_modificate("equipaggiamento")
         
     def riposa(self, tipo_riposo="breve"):
         """
@@ -553,11 +563,7 @@ class Giocatore(Entita):
         mod = getattr(self, f"modificatore_{caratteristica.lower()}", 0)
         
         # Aggiungi bonus di competenza se competente
-        if caratteristica.lower() in ["forza", "costituzione"] and self.classe.lower() == "guerriero":
-            mod += self.bonus_competenza
-        elif caratteristica.lower() in ["intelligenza", "saggezza"] and self.classe.lower() == "mago":
-            mod += self.bonus_competenza
-        elif caratteristica.lower() in ["destrezza", "carisma"] and self.classe.lower() == "ladro":
+        if caratteristica.lower() in COMPETENZE_TIRI_SALVEZZA.get(self._get_classe_nome(), ()):
             mod += self.bonus_competenza
             
         # Tira il dado
@@ -772,7 +778,7 @@ class Giocatore(Entita):
         # Popola/Sovrascrive attributi specifici di Giocatore
         # (alcuni potrebbero essere già stati impostati dall'__init__ di Giocatore,
         # ma i valori salvati hanno la precedenza).
-        giocatore.hp = data.get("hp", giocatore.hp) # Sovrascrive hp calcolato da __init__
+        giocatore.ripristina_hp(data.get("hp", giocatore.hp)) # Sovrascrive hp calcolato da __init__
         giocatore.hp_max = data.get("hp_max", giocatore.hp_max) # Sovrascrive hp_max calcolato
         
         giocatore.mana = data.get("mana", giocatore.mana)
@@ -810,8 +816,9 @@ class Giocatore(Entita):
              self.hp_max = base_hp_vv + self.modificatore_costituzione
              if self.hp_max < 1: self.hp_max = 1
         
-        if not hasattr(self, 'hp') or self.hp is None: self.hp = self.hp_max
-        self.hp = min(max(0, self.hp), self.hp_max)
+        # Correzione dei dati caricati, non una variazione di gioco: nessun evento
+        if not hasattr(self, 'hp') or self.hp is None: self.ripristina_hp(self.hp_max)
+        self.ripristina_hp(min(max(0, self.hp), self.hp_max))
 
         # Verifica mana per classi che lo usano
         classe_nome_vv_mana = self._get_classe_nome()
@@ -1,6 +1,6 @@
 import json
 import os
-import random
+from util.rng import generatore
 import logging
 from entities.entita import Entita
 
@@ -101,7 +101,7 @@ class Nemico(Entita):
                 
                 # Scegli un mostro casuale
                 if mostri_filtrati:
-                    tipo_mostro = random.choice(list(mostri_filtrati.keys()))
+                    tipo_mostro = generatore("incontri").choice(list(mostri_filtrati.keys()))
                     return cls(nome="", tipo_mostro=tipo_mostro)
                 else:
                     # Se non ci sono mostri nel JSON, crea un nemico generico
@@ -167,7 +167,7 @@ class Nemico(Entita):
             
             # Aggiorna eventuali valori specifici
             if "hp" in data:
-                nemico.hp = data["hp"]
+                nemico.ripristina_hp(data["hp"])
             if "nome" in data:
                 nemico.nome = data["nome"]
             
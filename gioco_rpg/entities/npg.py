@@ -22,7 +22,7 @@ class NPG(Entita):
         super().__init__(nome, token=token)
         
         # Impostiamo i parametri che prima erano nell'init di Entita
-        self.hp = 10
+        self.ripristina_hp(10)
         self.hp_max = 10
         self.forza_base = 13
         self.difesa = 1
@@ -61,7 +61,7 @@ class NPG(Entita):
             
         # Imposta gli attributi dai dati caricati
         self.hp_max = self.npc_data.get("hp_max", 10)
-        self.hp = self.hp_max
+        self.ripristina_hp(self.hp_max)
         self.oro = self.npc_data.get("oro", 0)
         self.forza_base = self.npc_data.get("forza_base", 10)
         self.difesa = self.npc_data.get("difesa", 1)
@@ -286,7 +286,7 @@ class NPG(Entita):
         npg.livello = data.get("livello", npg.livello) 
         
         npg.hp_max = data.get("hp_max", npg.hp_max) 
-        npg.hp = data.get("hp", npg.hp) 
+        npg.ripristina_hp(data.get("hp", npg.hp))
 
         # Passo 3: Deserializzare l'inventario e l'equipaggiamento
         raw_inventario = data.get("inventario", [])
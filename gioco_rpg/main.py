@@ -33,6 +33,11 @@ try:
 except ImportError:
     print("Configurazione logging standard attiva")
 
+# Modalità di profilazione dell'avvio: fasi di setup e albero degli import
+if __name__ == "__main__" and "--profile-startup" in sys.argv:
+    from server.utils.startup_profiler import profile_startup
+    sys.exit(profile_startup())
+
 # Importa le componenti necessarie
 try:
     # Importiamo il modulo server direttamente come in server.py
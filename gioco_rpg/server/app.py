@@ -10,9 +10,8 @@ except ImportError:
     print("ATTENZIONE: Eventlet non disponibile, le prestazioni WebSocket potrebbero essere ridotte")
     pass
 
-from flask import Flask, jsonify, request, send_file, send_from_directory
+from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
-from flask_socketio import SocketIO
 import os
 import logging
 import json
@@ -20,10 +19,6 @@ import sys
 from werkzeug.exceptions import BadRequest
 import datetime
 import time
-from server.routes import register_routes
-from server.websocket.websocket_manager import WebSocketManager
-from server.websocket.session_auth import SessionAuthManager
-from server.utils.session import get_session_manager
 
 # Aggiungi il percorso della directory principale del progetto (gioco_rpg_backendonly)
 # al sys.path per assicurarsi che tutti i moduli siano importabili
@@ -36,19 +31,11 @@ if project_root_dir not in sys.path:
     sys.path.insert(0, project_root_dir)
     print(f"Aggiunto {project_root_dir} (project_root_dir) al sys.path da app.py")
 
-# Import moduli locali
-from server.routes.base_routes import base_routes
-from server.routes import register_game_routes
-from server.routes.assets_routes import assets_routes
-from server.websocket import init_websocket_handlers
-from server.utils.session import set_socketio
+# Import moduli locali (leggeri). Blueprint, WebSocket, renderer e stati di gioco
+# vengono importati da create_app()/create_socketio(): l'import di questo modulo
+# non ha effetti collaterali e l'app viene creata alla prima richiesta di app/socketio
 from util.config import SESSIONS_DIR, SAVE_DIR, BACKUPS_DIR
-from util.asset_manager import get_asset_manager
-from core.graphics_renderer import GraphicsRenderer
-# Importa i moduli di diagnostica
-from server.routes.api_diagnostics import api_diagnostics
-# Importa il nostro nuovo WebSocketManager
-from server.websocket.websocket_manager import WebSocketManager
+from server.utils.startup_profiler import get_startup_profiler
 
 # AGGIUNTO: Inizializzazione delle variabili globali per SocketIO e WebSocketManager
 socketio_instance = None
@@ -56,30 +43,9 @@ websocket_manager_instance = None
 session_auth_manager_instance = None
 graphics_renderer_instance = None
 
-# Importa i blueprint API con gestione degli errori
-try:
-    from server.routes.entity_api import entity_api
-except ImportError:
-    # Crea un blueprint vuoto se il modulo non esiste
-    from flask import Blueprint
-    entity_api = Blueprint('entity_api', __name__)
-    logger.warning("Impossibile importare entity_api, utilizzando un blueprint vuoto")
-
-try:  
-    from server.routes.api_map import api_map
-except ImportError:
-    # Crea un blueprint vuoto se il modulo non esiste
-    from flask import Blueprint
-    api_map = Blueprint('api_map', __name__)
-    logger.warning("Impossibile importare api_map, utilizzando un blueprint vuoto")
-
-try:
-    from server.routes.health_api import health_api
-except ImportError:
-    # Crea un blueprint vuoto se il modulo non esiste
-    from flask import Blueprint
-    health_api = Blueprint('health_api', __name__)
-    logger.warning("Impossibile importare health_api, utilizzando un blueprint vuoto")
+# App e SocketIO creati da get_app_and_socketio()
+_app = None
+_socketio = None
 
 # Configura il logger
 logging.basicConfig(
@@ -88,6 +54,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _import_blueprint_api(module_name, blueprint_name):
+    """
+    Importa un blueprint API opzionale.
+    
+    Returns:
+        Blueprint: Il blueprint del modulo o uno vuoto se il modulo non esiste
+    """
+    try:
+        module = __import__(module_name, fromlist=[blueprint_name])
+        return getattr(module, blueprint_name)
+    except ImportError:
+        # Crea un blueprint vuoto se il modulo non esiste
+        from flask import Blueprint
+        logger.warning(f"Impossibile importare {blueprint_name}, utilizzando un blueprint vuoto")
+        return Blueprint(blueprint_name, __name__)
+
 def create_app(config=None):
     """
     Crea e configura l'applicazione Flask
@@ -135,7 +117,7 @@ def create_app(config=None):
     @app.route('/assets/<path:path>', methods=['GET'])
     def serve_assets(path):
         assets_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
-        logger.info(f"Richiesta asset: {path}, cercando in {assets_dir}")
+        logger.debug(f"Richiesta asset: {path}, cercando in {assets_dir}")
         
         # Controllo di sicurezza per evitare path traversal
         full_path = os.path.join(assets_dir, path)
@@ -148,8 +130,9 @@ def create_app(config=None):
             logger.warning(f"Asset non trovato: {full_path}")
             return jsonify({"successo": False, "errore": "File non trovato"}), 404
             
-        # Serve il file
-        return send_file(full_path)
+        # Serve il file con ETag, Range, varianti precompresse e cache in memoria
+        from server.utils.asset_delivery import get_asset_delivery
+        return get_asset_delivery().serve(full_path, path)
     
     # Aggiungi route per servire i file statici della webapp
     @app.route('/<path:path>', methods=['GET'])
@@ -232,6 +215,7 @@ def create_app(config=None):
     def get_assets_info_api():
         logger.info("Richiesta API per le informazioni sugli asset")
         try:
+            from util.asset_manager import get_asset_manager
             asset_manager = get_asset_manager()
             
             # Ottieni informazioni sugli asset
@@ -331,10 +315,14 @@ def create_app(config=None):
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
     
-    # Registra i blueprint delle route
-    app.register_blueprint(base_routes, url_prefix='/game')
+    # I flussi casuali della sessione valgono solo per la richiesta che li ha attivati
+    from server.utils.session import rilascia_rng
+    app.teardown_request(rilascia_rng)
     
     # Import esplicito dei blueprint necessari
+    from server.routes.base_routes import base_routes
+    from server.routes.assets_routes import assets_routes
+    from server.routes.api_diagnostics import api_diagnostics
     from server.routes.session_routes import session_routes
     from server.routes.save_routes import save_routes
     from server.routes.skill_challenge_routes import skill_challenge_routes
@@ -348,6 +336,13 @@ def create_app(config=None):
     from server.routes.inventory_routes import inventory_routes
     from server.routes.classes_routes import classes_routes
 
+    entity_api = _import_blueprint_api('server.routes.entity_api', 'entity_api')
+    api_map = _import_blueprint_api('server.routes.api_map', 'api_map')
+    health_api = _import_blueprint_api('server.routes.health_api', 'health_api')
+    
+    # Registra i blueprint delle route
+    app.register_blueprint(base_routes, url_prefix='/game')
+    
     # Registrazione diretta dei blueprint
     app.register_blueprint(session_routes, url_prefix='/game/session')
     app.register_blueprint(save_routes, url_prefix='/game/save')
@@ -475,6 +470,7 @@ def create_app(config=None):
             }
             
             # Verifica presenza asset manager
+            from util.asset_manager import get_asset_manager
             asset_manager = get_asset_manager()
             assets_count = 0
             if asset_manager:
@@ -500,11 +496,8 @@ def create_app(config=None):
                 "timestamp": datetime.datetime.now().isoformat()
             }), 500
     
-    # Aggiunta del socket manager per WebSocket
-    socket_manager = WebSocketManager(app)
-    # Flask-SocketIO non ha un metodo middleware ma integra automaticamente con Flask
-    # Salva il riferimento al socket_manager per usarlo altrove
-    app.socket_manager = socket_manager
+    # Il WebSocketManager (app.socket_manager) viene creato da create_socketio():
+    # crearne uno anche qui duplicava l'istanza SocketIO e le sottoscrizioni all'EventBus
     
     # Registra le route
     # Commento questa chiamata perché i blueprint sono già registrati manualmente sopra
@@ -516,6 +509,7 @@ def create_app(config=None):
         """
         Endpoint di health check
         """
+        from server.utils.session import get_session_manager
         session_manager = get_session_manager()
         active_sessions = len(session_manager.get_active_sessions()) if session_manager else 0
         
@@ -572,15 +566,20 @@ def create_socketio(app):
             "*"  # Consenti qualsiasi origine in fase di sviluppo
         ]
         
-        # Importazione ritardata per evitare importazioni circolari
-        from flask_socketio import SocketIO
+        # Importazioni ritardate: evitano importazioni circolari e tengono leggero l'import del modulo
+        from server.websocket import init_websocket_handlers
+        from server.websocket.websocket_manager import WebSocketManager
+        from server.websocket.session_auth import SessionAuthManager
+        from core.graphics_renderer import GraphicsRenderer
         
         # Verifica se è già presente un'istanza globale
         global socketio_instance, websocket_manager_instance
 
         if socketio_instance is None:
             logger.info("Creazione nuova istanza SocketIO globale con parametri ottimali")
-            websocket_manager_instance = WebSocketManager(app=app)
+            # In modalità multi-worker i broadcast verso le room passano dal bus dei messaggi
+            from server.cluster import crea_client_manager
+            websocket_manager_instance = WebSocketManager(app=app, client_manager=crea_client_manager())
             socketio_instance = websocket_manager_instance.socketio
             
             # AGGIUNTO: Inizializza SessionAuthManager con app e socketio_instance
@@ -609,13 +608,17 @@ def create_socketio(app):
         # Inizializza/Aggiorna GraphicsRenderer
         global graphics_renderer_instance
         if graphics_renderer_instance is None:
-            graphics_renderer_instance = GraphicsRenderer(socket_io=socketio_instance)
+            # Il batching ('render_frame' con i diff del frame) richiede un client che
+            # gestisca quel messaggio: resta opzionale finché il frontend non lo supporta
+            batching = os.environ.get('GIOCO_RPG_RENDER_BATCHING', '0') == '1'
+            graphics_renderer_instance = GraphicsRenderer(socket_io=socketio_instance, batching=batching)
             logger.info("GraphicsRenderer inizializzato con SocketIO.")
         else:
             graphics_renderer_instance.set_socket_io(socketio_instance)
             logger.info("GraphicsRenderer esistente aggiornato con SocketIO.")
         
         init_websocket_handlers(socketio_instance, graphics_renderer_instance, websocket_manager_instance)
+        app.socket_manager = websocket_manager_instance
         
         from server.utils.session import set_socketio
         set_socketio(socketio_instance)
@@ -628,6 +631,16 @@ def create_socketio(app):
         logger.error(f"Errore durante la creazione dell'istanza SocketIO: {e}")
         raise
 
+def _valida_dati_all_avvio():
+    """Valida una sola volta tutti i dati, fuori dal percorso delle richieste"""
+    try:
+        from util.data_manager import get_data_manager
+        errori = get_data_manager().validate_all()
+        for file_name, messaggi in errori.items():
+            logger.warning(f"Dati non validi in {file_name}: {len(messaggi)} errori (dettagli con tools/valida_dati.py)")
+    except Exception as e:
+        logger.error(f"Errore durante la validazione dei dati all'avvio: {e}")
+
 def setup():
     """
     Configurazione completa dell'applicazione e del server WebSocket
@@ -635,14 +648,28 @@ def setup():
     Returns:
         tuple: (app, socketio)
     """
+    profiler = get_startup_profiler()
+    
     # Crea app Flask
-    app = create_app()
+    with profiler.phase("create_app"):
+        app = create_app()
+    
+    # In modalità multi-worker instrada le richieste verso il worker proprietario della sessione
+    with profiler.phase("router"):
+        from server.cluster import get_router
+        router = get_router()
+        if router is not None:
+            from server.cluster.router import registra_router
+            registra_router(app, router)
+            logger.info(f"Worker {router.indice_locale} di {router.num_worker}: router delle sessioni attivo")
     
     # Verifica e crea directory richieste
-    init_directories()
+    with profiler.phase("directories"):
+        init_directories()
     
     # Crea istanza SocketIO
-    socketio = create_socketio(app)
+    with profiler.phase("socketio"):
+        socketio = create_socketio(app)
     
     global session_auth_manager_instance
     # if session_auth_manager_instance is None: # Controllo ridondante se create_socketio funziona
@@ -654,39 +681,84 @@ def setup():
     set_socketio(socketio)
     
     # Importa WebSocketEventBridge dopo aver creato socketio
-    try:
-        from server.websocket.websocket_event_bridge import WebSocketEventBridge
-        websocket_bridge = WebSocketEventBridge.get_instance()
-        if websocket_bridge.socketio is None:
-            websocket_bridge.set_socketio(socketio)
-        logger.info("WebSocketEventBridge inizializzato correttamente")
-    except Exception as e:
-        logger.error(f"Errore durante inizializzazione WebSocketEventBridge: {e}")
+    with profiler.phase("event_bridge"):
+        try:
+            from server.websocket.websocket_event_bridge import WebSocketEventBridge
+            websocket_bridge = WebSocketEventBridge.get_instance()
+            if websocket_bridge.socketio is None:
+                websocket_bridge.set_socketio(socketio)
+            logger.info("WebSocketEventBridge inizializzato correttamente")
+        except Exception as e:
+            logger.error(f"Errore durante inizializzazione WebSocketEventBridge: {e}")
     
     # Inizializza l'asset manager
-    try:
-        from util.asset_manager import get_asset_manager
-        asset_manager = get_asset_manager()
-        asset_manager.update_all()
-    except Exception as e:
-        logger.warning(f"Impossibile inizializzare asset manager: {e}")
+    with profiler.phase("asset_manager"):
+        try:
+            from util.asset_manager import get_asset_manager
+            asset_manager = get_asset_manager()
+            asset_manager.update_all()
+        except Exception as e:
+            logger.warning(f"Impossibile inizializzare asset manager: {e}")
+    
+    # Prepara in background i mondi per le nuove partite
+    with profiler.phase("session_pool"):
+        from server.utils.session_pool import get_session_pool
+        get_session_pool().start()
+    
+    # La validazione dei dati produce solo avvisi: non ritarda la prima richiesta
+    import threading
+    threading.Thread(target=_valida_dati_all_avvio, name="validazione-dati", daemon=True).start()
     
+    # Avvia il watcher dei file per il ricaricamento a caldo di dati e asset
+    with profiler.phase("file_watcher"):
+        from util.file_watcher import start_file_watcher
+        start_file_watcher()
+    
+    profiler.log_summary()
     return app, socketio
 
-# Crea l'app e l'istanza SocketIO
-app, socketio = setup()
+def get_app_and_socketio():
+    """
+    Restituisce app e SocketIO, eseguendo setup() alla prima chiamata.
+    
+    Returns:
+        tuple: (app, socketio)
+    """
+    global _app, _socketio
+    if _app is None:
+        _app, _socketio = setup()
+    return _app, _socketio
+
+def __getattr__(name):
+    # Retrocompatibilità: "from server.app import app, socketio" esegue il setup al primo accesso
+    if name == "app":
+        return get_app_and_socketio()[0]
+    if name == "socketio":
+        return get_app_and_socketio()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def run_server(debug=True, host="0.0.0.0", port=5000):
-    """Avvia il server"""
+def run_server(debug=True, host="0.0.0.0", port=5000, porta_fissa=False):
+    """
+    Avvia il server
+    
+    Args:
+        debug (bool): Modalità debug
+        host (str): Host di ascolto
+        port (int): Porta di ascolto
+        porta_fissa (bool): Se True non prova porte alternative (i worker del
+            cluster devono ascoltare esattamente sulla porta nota al router)
+    """
     logger.info(f"Avvio server su {host}:{port} (debug: {debug})")
     
+    app, socketio = get_app_and_socketio()
+    
     # Ottieni la modalità asincrona in uso
     async_mode = socketio.async_mode
     logger.info(f"Utilizzando modalità asincrona: {async_mode}")
     
     # Verifica se la porta è già in uso e prova porte alternative
     original_port = port
-    max_port_attempts = 10
+    max_port_attempts = 1 if porta_fissa else 10
     port_attempts = 0
     
     while port_attempts < max_port_attempts:
@@ -714,6 +786,9 @@ def run_server(debug=True, host="0.0.0.0", port=5000):
         raise e
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        from server.utils.startup_profiler import profile_startup
+        sys.exit(profile_startup())
     run_server()
 
 def setup_diagnostics_routes(app):
@@ -0,0 +1,114 @@
+"""
+Pacchetto cluster per la modalità di deployment multi-worker.
+
+Le sessioni sono partizionate per ID tra più processi worker (StickyRouter)
+e i broadcast Socket.IO verso le room viaggiano tra i worker attraverso un
+MessageBus pluggable. In modalità singolo processo nessuno di questi
+componenti viene attivato.
+
+La configurazione è letta dalle variabili d'ambiente impostate dal launcher:
+    GIOCO_RPG_WORKERS        numero di worker del cluster
+    GIOCO_RPG_WORKER_INDEX   indice del worker corrente
+    GIOCO_RPG_WORKER_URLS    URL base dei worker separati da virgola
+    GIOCO_RPG_BUS_ADDRESS    indirizzo del broker del bus locale
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ClusterConfig:
+    """
+    Configurazione del worker corrente all'interno del cluster.
+    """
+
+    def __init__(self, num_worker=1, indice_worker=None, urls_worker=None, indirizzo_bus=None):
+        self.num_worker = num_worker
+        self.indice_worker = indice_worker
+        self.urls_worker = urls_worker or []
+        self.indirizzo_bus = indirizzo_bus
+
+    @property
+    def attivo(self):
+        """True se il processo fa parte di un cluster con più worker"""
+        return self.num_worker > 1 and self.indice_worker is not None
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """
+        Costruisce la configurazione dalle variabili d'ambiente.
+
+        Args:
+            environ (dict, optional): Ambiente da leggere (default os.environ)
+
+        Returns:
+            ClusterConfig: Configurazione del cluster
+        """
+        environ = os.environ if environ is None else environ
+        try:
+            num_worker = int(environ.get("GIOCO_RPG_WORKERS", "1"))
+        except ValueError:
+            logger.warning("GIOCO_RPG_WORKERS non valido, uso modalità singolo processo")
+            num_worker = 1
+        indice = environ.get("GIOCO_RPG_WORKER_INDEX")
+        urls = [u.strip() for u in environ.get("GIOCO_RPG_WORKER_URLS", "").split(",") if u.strip()]
+        return cls(
+            num_worker=num_worker,
+            indice_worker=int(indice) if indice is not None and indice.isdigit() else None,
+            urls_worker=urls,
+            indirizzo_bus=environ.get("GIOCO_RPG_BUS_ADDRESS"),
+        )
+
+
+_cluster_config = None
+_router = None
+
+
+def get_cluster_config():
+    """
+    Restituisce la configurazione del cluster del processo corrente.
+
+    Returns:
+        ClusterConfig: Configurazione (letta dall'ambiente al primo accesso)
+    """
+    global _cluster_config
+    if _cluster_config is None:
+        _cluster_config = ClusterConfig.from_env()
+    return _cluster_config
+
+
+def get_router():
+    """
+    Restituisce lo StickyRouter del worker corrente.
+
+    Returns:
+        StickyRouter: Router o None se il cluster non è attivo
+    """
+    global _router
+    config = get_cluster_config()
+    if not config.attivo:
+        return None
+    if _router is None:
+        from server.cluster.router import StickyRouter
+        _router = StickyRouter(config.urls_worker, indice_locale=config.indice_worker)
+    return _router
+
+
+def crea_client_manager():
+    """
+    Crea il client manager Socket.IO per il worker corrente.
+
+    Returns:
+        MessageBusManager: Manager collegato al bus o None in modalità singolo processo
+    """
+    config = get_cluster_config()
+    if not config.attivo:
+        return None
+    from server.cluster.message_bus import LocalSocketMessageBus, MessageBusManager
+    logger.info(f"Worker {config.indice_worker}/{config.num_worker}: bus dei messaggi su {config.indirizzo_bus}")
+    return MessageBusManager(bus=LocalSocketMessageBus(config.indirizzo_bus))
+
+
+__all__ = ['ClusterConfig', 'get_cluster_config', 'get_router', 'crea_client_manager']
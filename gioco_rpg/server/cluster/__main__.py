@@ -0,0 +1,26 @@
+"""
+Avvio della modalità multi-worker:
+
+    python -m server.cluster --workers 4 --port 5000
+"""
+
+import argparse
+import logging
+
+from server.cluster.launcher import avvia_cluster
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avvia il server del gioco RPG con più processi worker")
+    parser.add_argument("--workers", type=int, default=None, help="Numero di worker (default: numero di CPU)")
+    parser.add_argument("--host", default="0.0.0.0", help="Host di ascolto dei worker")
+    parser.add_argument("--port", type=int, default=5000, help="Porta del primo worker")
+    parser.add_argument("--public-host", default="localhost", help="Host con cui i client raggiungono i worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    avvia_cluster(num_worker=args.workers, host=args.host, porta_base=args.port, host_pubblico=args.public_host)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Launcher della modalità multi-worker.
+
+Avvia il broker del bus dei messaggi e N processi worker, ciascuno con il
+proprio server Flask-SocketIO su una porta dedicata (porta_base + indice).
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+
+from server.cluster.message_bus import esegui_broker, formatta_indirizzo, indirizzo_predefinito
+
+logger = logging.getLogger(__name__)
+
+
+def _avvia_worker(indice, num_worker, urls, indirizzo_bus, host, porta):
+    """Punto di ingresso del processo worker"""
+    os.environ["GIOCO_RPG_WORKERS"] = str(num_worker)
+    os.environ["GIOCO_RPG_WORKER_INDEX"] = str(indice)
+    os.environ["GIOCO_RPG_WORKER_URLS"] = ",".join(urls)
+    os.environ["GIOCO_RPG_BUS_ADDRESS"] = formatta_indirizzo(indirizzo_bus)
+
+    # run_server esegue il setup dell'applicazione con la configurazione del cluster già impostata
+    from server.app import run_server
+    run_server(debug=False, host=host, port=porta, porta_fissa=True)
+
+
+def avvia_cluster(num_worker=None, host="0.0.0.0", porta_base=5000, host_pubblico="localhost"):
+    """
+    Avvia il cluster e resta in attesa della terminazione dei worker.
+
+    Args:
+        num_worker (int, optional): Numero di worker (default: numero di CPU)
+        host (str): Host di ascolto dei worker
+        porta_base (int): Porta del primo worker
+        host_pubblico (str): Host con cui i client raggiungono i worker
+    """
+    num_worker = num_worker or multiprocessing.cpu_count()
+    urls = os.environ.get("GIOCO_RPG_WORKER_URLS")
+    urls = urls.split(",") if urls else [f"http://{host_pubblico}:{porta_base + i}" for i in range(num_worker)]
+    indirizzo_bus = indirizzo_predefinito()
+
+    # "spawn" evita di ereditare lo stato (e il monkey patching) del processo padre
+    contesto = multiprocessing.get_context("spawn")
+
+    broker = contesto.Process(target=esegui_broker, args=(indirizzo_bus,), name="gioco_rpg-bus", daemon=True)
+    broker.start()
+    logger.info(f"Broker del bus avviato (pid {broker.pid}) su {indirizzo_bus}")
+
+    workers = []
+    for indice in range(num_worker):
+        processo = contesto.Process(
+            target=_avvia_worker,
+            args=(indice, num_worker, urls, indirizzo_bus, host, porta_base + indice),
+            name=f"gioco_rpg-worker-{indice}",
+        )
+        processo.start()
+        workers.append(processo)
+        logger.info(f"Worker {indice} avviato (pid {processo.pid}) su porta {porta_base + indice}")
+
+    def _termina(*_):
+        for processo in workers:
+            if processo.is_alive():
+                processo.terminate()
+
+    signal.signal(signal.SIGTERM, _termina)
+    try:
+        for processo in workers:
+            processo.join()
+    except KeyboardInterrupt:
+        _termina()
+    finally:
+        for processo in workers:
+            processo.join(timeout=5)
+        broker.terminate()
@@ -0,0 +1,359 @@
+"""
+Bus di messaggi per la modalità multi-worker.
+
+Trasporta i broadcast Socket.IO (emit verso room, enter/leave room, ecc.) tra
+i processi worker. L'implementazione locale usa un piccolo broker che ascolta
+su un socket Unix (o su localhost TCP dove AF_UNIX non è disponibile) e
+ripete ogni messaggio ricevuto a tutti i worker connessi, come farebbe un
+canale pub/sub di Redis, senza richiedere servizi esterni.
+"""
+
+import logging
+import os
+import pickle
+import selectors
+import socket
+import struct
+import tempfile
+import time
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+# Prefisso di lunghezza dei frame: 4 byte big-endian
+_HEADER = struct.Struct("!I")
+
+# Frame di presentazione inviato da ogni client appena connesso
+RUOLO_PUB = b"pub"
+RUOLO_SUB = b"sub"
+
+# Dimensione massima di un singolo messaggio sul bus (16 MB, come MAX_CONTENT_LENGTH)
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+# Byte in attesa di invio oltre i quali un iscritto lento viene disconnesso,
+# così che non rallenti la consegna agli altri worker
+MAX_OUTBOUND_BUFFER = int(os.environ.get("GIOCO_RPG_BUS_MAX_BUFFER", 4 * MAX_MESSAGE_SIZE))
+
+
+def indirizzo_predefinito():
+    """
+    Restituisce l'indirizzo di default del broker locale.
+
+    Returns:
+        str o tuple: Percorso del socket Unix oppure (host, porta) su sistemi senza AF_UNIX
+    """
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(tempfile.gettempdir(), f"gioco_rpg_bus_{os.getpid()}.sock")
+    return ("127.0.0.1", 5099)
+
+
+def formatta_indirizzo(indirizzo):
+    """Converte un indirizzo del broker in stringa (per le variabili d'ambiente)"""
+    if isinstance(indirizzo, str):
+        return indirizzo
+    return f"{indirizzo[0]}:{indirizzo[1]}"
+
+
+def interpreta_indirizzo(valore):
+    """
+    Converte una stringa in indirizzo del broker: percorso del socket Unix
+    oppure (host, porta) su sistemi senza AF_UNIX.
+    """
+    if not isinstance(valore, str) or hasattr(socket, "AF_UNIX"):
+        return valore
+    host, _, porta = valore.rpartition(":")
+    return (host or "127.0.0.1", int(porta))
+
+
+def _famiglia(indirizzo):
+    """Restituisce la famiglia di socket adatta all'indirizzo"""
+    if isinstance(indirizzo, str):
+        return socket.AF_UNIX
+    return socket.AF_INET
+
+
+def _recv_esatti(sock, n):
+    """Legge esattamente n byte dal socket, None se la connessione è chiusa"""
+    buffer = bytearray()
+    while len(buffer) < n:
+        chunk = sock.recv(n - len(buffer))
+        if not chunk:
+            return None
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def invia_frame(sock, payload):
+    """
+    Invia un frame (lunghezza + payload) sul socket.
+
+    Args:
+        sock: Socket connesso
+        payload (bytes): Dati da inviare
+    """
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def ricevi_frame(sock):
+    """
+    Riceve un frame dal socket.
+
+    Args:
+        sock: Socket connesso
+
+    Returns:
+        bytes: Payload ricevuto o None se la connessione è stata chiusa
+    """
+    header = _recv_esatti(sock, _HEADER.size)
+    if header is None:
+        return None
+    (lunghezza,) = _HEADER.unpack(header)
+    if lunghezza > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Frame troppo grande sul bus: {lunghezza} byte")
+    return _recv_esatti(sock, lunghezza)
+
+
+class MessageBus:
+    """
+    Interfaccia di un bus di messaggi tra worker.
+
+    Le implementazioni devono fornire publish() e listen(); il bus è
+    pluggable, quindi un'implementazione basata su Redis o NATS può
+    sostituire quella locale senza toccare WebSocketManager.
+    """
+
+    def publish(self, payload):
+        """Pubblica un messaggio (bytes) a tutti i worker"""
+        raise NotImplementedError
+
+    def listen(self):
+        """Generatore dei messaggi (bytes) ricevuti dagli altri worker"""
+        raise NotImplementedError
+
+    def close(self):
+        """Chiude il bus"""
+
+
+class LocalSocketMessageBus(MessageBus):
+    """
+    Client del broker locale.
+
+    Usa due connessioni separate, una per pubblicare e una per ascoltare,
+    così che il thread di ascolto di Socket.IO non debba condividere il
+    socket con gli emit delle richieste.
+    """
+
+    def __init__(self, indirizzo=None, tentativi=50, attesa=0.1):
+        self.indirizzo = interpreta_indirizzo(
+            indirizzo or os.environ.get("GIOCO_RPG_BUS_ADDRESS") or indirizzo_predefinito()
+        )
+        self.tentativi = tentativi
+        self.attesa = attesa
+        self._pub = None
+        self._sub = None
+
+    def _connetti(self, ruolo):
+        """Apre una connessione verso il broker, riprovando mentre si avvia"""
+        ultimo_errore = None
+        for _ in range(self.tentativi):
+            sock = socket.socket(_famiglia(self.indirizzo), socket.SOCK_STREAM)
+            try:
+                sock.connect(self.indirizzo)
+                invia_frame(sock, ruolo)
+                return sock
+            except OSError as e:
+                ultimo_errore = e
+                sock.close()
+                time.sleep(self.attesa)
+        raise ConnectionError(f"Broker del bus non raggiungibile su {self.indirizzo}: {ultimo_errore}")
+
+    def publish(self, payload):
+        if self._pub is None:
+            self._pub = self._connetti(RUOLO_PUB)
+        try:
+            invia_frame(self._pub, payload)
+        except OSError:
+            # Riconnessione singola: il broker potrebbe essere stato riavviato
+            self._pub.close()
+            self._pub = self._connetti(RUOLO_PUB)
+            invia_frame(self._pub, payload)
+
+    def listen(self):
+        while True:
+            if self._sub is None:
+                self._sub = self._connetti(RUOLO_SUB)
+            try:
+                payload = ricevi_frame(self._sub)
+            except OSError as e:
+                logger.warning(f"Errore di lettura dal bus: {e}")
+                payload = None
+            if payload is None:
+                logger.warning("Connessione al broker persa, riconnessione in corso")
+                self._sub.close()
+                self._sub = None
+                continue
+            yield payload
+
+    def close(self):
+        for sock in (self._pub, self._sub):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        self._pub = self._sub = None
+
+
+def esegui_broker(indirizzo=None, limite_uscita=None):
+    """
+    Ciclo principale del broker locale: ripete ogni frame ricevuto a tutti
+    i client connessi (incluso il mittente, come un canale pub/sub).
+
+    Gli invii non sono mai bloccanti: ogni iscritto ha una coda in uscita e
+    chi la lascia crescere oltre il limite viene disconnesso.
+
+    Pensato per essere eseguito in un processo dedicato.
+
+    Args:
+        indirizzo (str o tuple, optional): Indirizzo di ascolto
+        limite_uscita (int, optional): Byte in coda oltre i quali un iscritto
+            viene disconnesso (default MAX_OUTBOUND_BUFFER)
+    """
+    indirizzo = indirizzo or indirizzo_predefinito()
+    limite_uscita = limite_uscita or MAX_OUTBOUND_BUFFER
+    famiglia = _famiglia(indirizzo)
+    if famiglia == socket.AF_UNIX and os.path.exists(indirizzo):
+        os.unlink(indirizzo)
+
+    server = socket.socket(famiglia, socket.SOCK_STREAM)
+    if famiglia == socket.AF_INET:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(indirizzo)
+    server.listen(64)
+    server.setblocking(False)
+
+    selettore = selectors.DefaultSelector()
+    selettore.register(server, selectors.EVENT_READ)
+    buffers = {}
+    # Dati in attesa di invio per ogni iscritto: il broker non si blocca mai
+    # su un destinatario lento, accoda e scrive quando il socket è pronto
+    uscite = {}
+    iscritti = set()
+    # Il primo frame di ogni connessione dichiara il ruolo (RUOLO_PUB o RUOLO_SUB)
+    identificati = set()
+    logger.info(f"Broker del bus in ascolto su {indirizzo}")
+
+    def _chiudi(sock):
+        if sock not in buffers:
+            return
+        selettore.unregister(sock)
+        buffers.pop(sock, None)
+        uscite.pop(sock, None)
+        iscritti.discard(sock)
+        identificati.discard(sock)
+        sock.close()
+
+    def _scrivi(sock):
+        """Invia quanto possibile dei dati in coda senza bloccare"""
+        uscita = uscite[sock]
+        try:
+            inviati = sock.send(uscita)
+        except (BlockingIOError, InterruptedError):
+            inviati = 0
+        except OSError:
+            _chiudi(sock)
+            return
+        del uscita[:inviati]
+        eventi = selectors.EVENT_READ | (selectors.EVENT_WRITE if uscita else 0)
+        if selettore.get_key(sock).events != eventi:
+            selettore.modify(sock, eventi)
+
+    def _accoda(sock, frame):
+        uscita = uscite.setdefault(sock, bytearray())
+        if len(uscita) + len(frame) > limite_uscita:
+            logger.warning(f"Iscritto del bus troppo lento ({len(uscita)} byte in coda), disconnesso")
+            _chiudi(sock)
+            return
+        uscita.extend(frame)
+        _scrivi(sock)
+
+    try:
+        while True:
+            for chiave, eventi in selettore.select():
+                sock = chiave.fileobj
+                if sock is server:
+                    client, _ = server.accept()
+                    client.setblocking(False)
+                    selettore.register(client, selectors.EVENT_READ)
+                    buffers[client] = bytearray()
+                    continue
+                if sock not in buffers:
+                    # Chiuso durante questo stesso giro di select
+                    continue
+
+                if eventi & selectors.EVENT_WRITE:
+                    _scrivi(sock)
+                    if sock not in buffers:
+                        continue
+                if not eventi & selectors.EVENT_READ:
+                    continue
+
+                try:
+                    dati = sock.recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    dati = b""
+                if not dati:
+                    _chiudi(sock)
+                    continue
+
+                buffer = buffers[sock]
+                buffer.extend(dati)
+                # Estrai tutti i frame completi e accodali agli iscritti
+                while len(buffer) >= _HEADER.size:
+                    (lunghezza,) = _HEADER.unpack_from(buffer)
+                    fine = _HEADER.size + lunghezza
+                    if len(buffer) < fine:
+                        break
+                    frame = bytes(buffer[:fine])
+                    del buffer[:fine]
+                    if sock not in identificati:
+                        identificati.add(sock)
+                        if frame[_HEADER.size:] == RUOLO_SUB:
+                            iscritti.add(sock)
+                        continue
+                    for destinatario in list(iscritti):
+                        _accoda(destinatario, frame)
+    finally:
+        selettore.close()
+        server.close()
+        if famiglia == socket.AF_UNIX and os.path.exists(indirizzo):
+            os.unlink(indirizzo)
+
+
+class MessageBusManager(socketio.PubSubManager):
+    """
+    Client manager di python-socketio che instrada i broadcast attraverso
+    un MessageBus, permettendo a più worker di condividere le room.
+    """
+
+    name = "gioco_rpg_bus"
+
+    def __init__(self, bus=None, channel="socketio", write_only=False, logger=None):
+        self.bus = bus or LocalSocketMessageBus()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _publish(self, data):
+        self.bus.publish(pickle.dumps((self.channel, data)))
+
+    def _listen(self):
+        for payload in self.bus.listen():
+            try:
+                canale, data = pickle.loads(payload)
+            except Exception as e:
+                logger.warning(f"Messaggio non valido sul bus: {e}")
+                continue
+            if canale == self.channel:
+                yield data
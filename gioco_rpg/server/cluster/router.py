@@ -0,0 +1,135 @@
+"""
+Router "sticky" delle sessioni per la modalità multi-worker.
+
+Ogni sessione appartiene a un solo worker, scelto con rendezvous hashing
+(highest random weight) sull'ID della sessione: la mappatura è stabile,
+non richiede stato condiviso e sposta solo 1/N delle sessioni quando il
+numero di worker cambia.
+"""
+
+import hashlib
+import logging
+from uuid import uuid4
+
+from flask import redirect, request
+
+logger = logging.getLogger(__name__)
+
+# Chiavi in cui le route del gioco trasportano l'ID sessione
+CHIAVI_SESSIONE = ("id_sessione", "session_id", "sessionId")
+
+
+class StickyRouter:
+    """
+    Mappa gli ID di sessione sui worker del cluster.
+    """
+
+    def __init__(self, urls_worker, indice_locale=None):
+        """
+        Args:
+            urls_worker (list): URL base di ciascun worker, nell'ordine degli indici
+            indice_locale (int, optional): Indice del worker corrente
+        """
+        if not urls_worker:
+            raise ValueError("Il router richiede almeno un worker")
+        self.urls_worker = list(urls_worker)
+        self.indice_locale = indice_locale
+
+    @property
+    def num_worker(self):
+        return len(self.urls_worker)
+
+    @staticmethod
+    def _peso(id_sessione, indice):
+        digest = hashlib.blake2b(f"{indice}:{id_sessione}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def worker_per_sessione(self, id_sessione):
+        """
+        Restituisce l'indice del worker proprietario della sessione.
+
+        Args:
+            id_sessione (str): ID della sessione
+
+        Returns:
+            int: Indice del worker
+        """
+        if self.num_worker == 1:
+            return 0
+        return max(range(self.num_worker), key=lambda i: self._peso(id_sessione, i))
+
+    def url_per_sessione(self, id_sessione):
+        """Restituisce l'URL base del worker proprietario della sessione"""
+        return self.urls_worker[self.worker_per_sessione(id_sessione)]
+
+    def is_locale(self, id_sessione):
+        """Indica se la sessione appartiene al worker corrente"""
+        if self.indice_locale is None:
+            return True
+        return self.worker_per_sessione(id_sessione) == self.indice_locale
+
+    def nuovo_id_sessione(self):
+        """
+        Genera un nuovo ID di sessione che appartiene al worker corrente,
+        così che la sessione appena creata non debba migrare.
+
+        Returns:
+            str: ID della sessione
+        """
+        while True:
+            id_sessione = str(uuid4())
+            if self.is_locale(id_sessione):
+                return id_sessione
+
+
+def estrai_id_sessione():
+    """
+    Estrae l'ID sessione dalla richiesta Flask corrente (parametri della
+    route, query string o corpo JSON).
+
+    Returns:
+        str: ID della sessione o None
+    """
+    sorgenti = [request.view_args or {}, request.args]
+    if request.is_json:
+        corpo = request.get_json(silent=True)
+        if isinstance(corpo, dict):
+            sorgenti.append(corpo)
+    for sorgente in sorgenti:
+        for chiave in CHIAVI_SESSIONE:
+            valore = sorgente.get(chiave)
+            if isinstance(valore, str) and valore:
+                return valore
+    return None
+
+
+def registra_router(app, router):
+    """
+    Installa sull'app un hook che reindirizza (307, metodo e corpo preservati)
+    le richieste HTTP verso il worker proprietario della sessione.
+
+    Args:
+        app: Istanza Flask
+        router (StickyRouter): Router del cluster
+    """
+    app.sticky_router = router
+
+    @app.before_request
+    def instrada_sessione():
+        if request.method == "OPTIONS" or request.path.startswith(("/socket.io", "/cluster/")):
+            return None
+        id_sessione = estrai_id_sessione()
+        if not id_sessione or router.is_locale(id_sessione):
+            return None
+        destinazione = router.url_per_sessione(id_sessione).rstrip("/") + request.full_path.rstrip("?")
+        logger.debug(f"Sessione {id_sessione} instradata verso {destinazione}")
+        return redirect(destinazione, code=307)
+
+    @app.route("/cluster/route/<id_sessione>", methods=["GET"])
+    def cluster_route(id_sessione):
+        """Indica al client a quale worker collegarsi (anche per il WebSocket)"""
+        return {
+            "session_id": id_sessione,
+            "worker": router.worker_per_sessione(id_sessione),
+            "url": router.url_per_sessione(id_sessione),
+        }
@@ -1,4 +1,4 @@
-from flask import request, jsonify, send_file, Blueprint, abort
+from flask import request, jsonify, Blueprint, abort, current_app
 import os
 import logging
 import re
@@ -8,6 +8,8 @@ import json
 from util.asset_manager import get_asset_manager
 from server.websocket.assets import notify_asset_update
 from util.sprite_sheet_manager import get_sprite_sheet_manager
+from server.utils.asset_delivery import get_asset_delivery, IMMUTABLE_CACHE_CONTROL
+from server.utils.asset_bundle import get_asset_bundle_service
 
 # Configura il logger
 logger = logging.getLogger(__name__)
@@ -183,11 +185,37 @@ def get_asset_file(asset_path):
         if not os.path.exists(requested_path) or not os.path.isfile(requested_path):
             return jsonify({"errore": "File non trovato"}), 404
             
-        return send_file(requested_path)
+        return get_asset_delivery().serve(requested_path, clean_path)
     except Exception as e:
         logger.error(f"Errore nell'accesso al file asset: {str(e)}")
         return jsonify({"errore": "Accesso negato"}), 403
 
+@assets_routes.route("/assets/bundle/<map_id>", methods=["GET"])
+def get_map_bundle(map_id):
+    """
+    Restituisce in un'unica risposta i dati di una mappa e tutti i suoi asset.
+    
+    Il formato del bundle è descritto in server/utils/asset_bundle.py.
+    Con il parametro "v" uguale alla versione corrente la risposta è immutabile.
+    """
+    try:
+        bundle = get_asset_bundle_service().get_bundle(map_id)
+        if bundle is None:
+            return jsonify({"errore": f"Mappa {map_id} non trovata"}), 404
+        
+        version, data = bundle
+        response = current_app.response_class(data, mimetype="application/octet-stream")
+        response.set_etag(version)
+        response.headers["X-Bundle-Version"] = version
+        if request.args.get("v") == version:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Errore nella creazione del bundle della mappa {map_id}: {str(e)}")
+        return jsonify({"errore": "Errore nella creazione del bundle"}), 500
+
 @assets_routes.route('/api/assets/info', methods=['GET'])
 def get_assets_info_extended():
     """
@@ -288,6 +316,12 @@ def get_spritesheet(sheet_id):
         # Ottieni le informazioni sullo sprite sheet
         sheet_info = sprite_sheet_manager.sprite_sheets[sheet_id]
         
+        # Se i metadati sono su disco servi il file con le varianti .gz/.br precompresse;
+        # l'immagine vi è indicata con un percorso relativo all'URL del JSON
+        metadata_path = sheet_info.get('metadata_path')
+        if metadata_path and os.path.isfile(metadata_path):
+            return get_asset_delivery().serve(metadata_path)
+        
         # Prepara il JSON con le informazioni sullo sprite sheet
         spritesheet_data = {
             'id': sheet_id,
@@ -299,11 +333,16 @@ def get_spritesheet(sheet_id):
         # Se c'è un percorso all'immagine, aggiorna l'URL per renderlo accessibile
         image_path = sheet_info.get('image')
         if image_path:
-            # Calcola l'URL relativo per l'immagine
+            # Calcola l'URL relativo per l'immagine, versionato con l'hash del contenuto
             image_filename = os.path.basename(image_path)
-            spritesheet_data['image'] = f'/assets/spritesheets/{image_filename}'
+            spritesheet_data['image'] = get_asset_delivery().versioned_url(
+                f'/assets/spritesheets/{image_filename}', image_path)
         
-        return jsonify(spritesheet_data)
+        # ETag sul contenuto: le richieste ripetute ricevono un 304 senza corpo
+        response = jsonify(spritesheet_data)
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"Errore nell'API spritesheet {sheet_id}: {e}")
         return jsonify({
@@ -344,8 +383,8 @@ def get_spritesheet_image(filename):
         # Cerca il file
         for path in search_paths:
             if os.path.exists(path) and os.path.isfile(path):
-                logger.info(f"Sprite sheet trovato: {path}")
-                return send_file(path)
+                logger.debug(f"Sprite sheet trovato: {path}")
+                return get_asset_delivery().serve(path)
         
         # Se non troviamo lo sprite sheet, restituisci un errore
         logger.error(f"Sprite sheet non trovato: {filename}")
@@ -5,7 +5,7 @@ import os
 from core.event_bus import EventBus
 from core.events import EventType
 
-from server.utils.session import sessioni_attive, salva_sessione, valida_input
+from server.utils.session import get_session, sessioni_attive, salva_sessione, valida_input
 
 # Configura il logger
 logger = logging.getLogger(__name__)
@@ -738,6 +738,50 @@ def esegui_azione_combattimento():
             "errore": str(e)
         }), 500
 
+@combat_routes.route("/azioni", methods=["POST"])
+def esegui_azioni_combattimento():
+    """
+    Esegue più azioni di combattimento in un'unica richiesta (es. un turno completo)
+
+    Le azioni vengono eseguite in modo atomico insieme ai turni dell'IA che
+    seguono; la risposta contiene solo le sezioni richieste in "proiezione".
+    """
+    data = request.json or {}
+    id_sessione = data.get("id_sessione")
+
+    from states.combattimento.lotto import PROIEZIONI, esegui_lotto
+
+    # Validazione dei parametri (il numero massimo di azioni è controllato da esegui_lotto)
+    azioni = valida_input(data.get("azioni"), list, "azioni")
+    proiezione = valida_input(data.get("proiezione"), list, "proiezione", len(PROIEZIONI))
+    esegui_ia = bool(data.get("esegui_ia", True))
+
+    if not id_sessione or not azioni:
+        return jsonify({
+            "successo": False,
+            "errore": "Parametri mancanti o non validi"
+        }), 400
+
+    # Recupera la sessione (anche da disco) e ne attiva lo stream casuale
+    world = get_session(id_sessione)
+    if world is None:
+        return jsonify({
+            "successo": False,
+            "errore": "Sessione non trovata"
+        }), 404
+
+    try:
+        risultato = esegui_lotto(world, azioni, proiezione, esegui_ia, id_sessione)
+        if not risultato["successo"]:
+            return jsonify(risultato), 400
+        return jsonify(risultato)
+    except Exception as e:
+        logger.error(f"Errore durante l'esecuzione del lotto di azioni: {e}")
+        return jsonify({
+            "successo": False,
+            "errore": str(e)
+        }), 500
+
 @combat_routes.route("/azioni_disponibili", methods=["GET"])
 def ottieni_azioni_disponibili():
     """Ottieni le azioni disponibili per un'entità durante il combattimento"""
@@ -936,24 +980,17 @@ def ottieni_nemici_vicini():
             }), 404
             
         # Cerca nemici nella stessa mappa e nelle vicinanze
+        from world.indice_spaziale import get_indici_spaziali, NEMICI
         nemici_vicini = []
-        for entity in world.get_entities():
-            if entity.has_tag("nemico") or entity.has_tag("ostile"):
-                entity_pos = entity.get_component("position")
-                if entity_pos and entity_pos.map_name == position.map_name:
-                    # Calcola distanza
-                    dx = entity_pos.x - position.x
-                    dy = entity_pos.y - position.y
-                    distanza = (dx**2 + dy**2)**0.5
-                    
-                    if distanza <= 10:  # Raggio di rilevamento dei nemici
-                        nemici_vicini.append({
-                            "id": entity.id,
-                            "nome": entity.name,
-                            "tipo": entity.get_component("tipo").value if entity.has_component("tipo") else "sconosciuto",
-                            "livello": getattr(entity, "livello", 1),
-                            "distanza": round(distanza, 1)
-                        })
+        for vicino in get_indici_spaziali(world).cerca(position.map_name, position.x, position.y, 10, NEMICI):
+            entity = vicino.valore
+            nemici_vicini.append({
+                "id": entity.id,
+                "nome": entity.name,
+                "tipo": entity.get_component("tipo").value if entity.has_component("tipo") else "sconosciuto",
+                "livello": getattr(entity, "livello", 1),
+                "distanza": round(vicino.distanza, 1)
+            })
         
         # Emetti evento risposta con nemici trovati
         event_bus.emit(EventType.UI_UPDATE, 
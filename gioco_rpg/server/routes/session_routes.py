@@ -1,5 +1,4 @@
 from flask import request, jsonify, Blueprint, Response
-from uuid import uuid4
 import time
 import logging
 import os
@@ -7,7 +6,8 @@ from pathlib import Path
 
 from core.ecs.world import World
 from core.ecs.component import PositionComponent, RenderableComponent, PhysicsComponent, InventoryComponent, InteractableComponent
-from server.utils.session import sessioni_attive, salva_sessione, get_session
+from server.utils.session import sessioni_attive, salva_sessione, get_session, genera_id_sessione
+from server.utils.session_pool import get_session_pool, prepara_mondo
 from server.init.taverna_init import inizializza_taverna_per_sessione
 from util.data_manager import get_data_manager
 from core.event_bus import EventBus
@@ -99,15 +99,27 @@ def inizia_sessione():
                       class_id=classe_id)
             
         # Crea un nuova sessione con un ID unico
-        id_sessione = str(uuid4())
+        id_sessione = genera_id_sessione()
         logger.info(f"Inizializzazione nuova sessione {id_sessione}")
         
-        # Crea il mondo di gioco
-        world = World()
-        
-        # Inizializza la grafica se richiesto
+        # Prendi un mondo preinizializzato (IO, sistemi e mappe) dal pool,
+        # oppure costruiscilo ora se il pool è vuoto o disattivato
         modalita_grafica = data.get("modalita_grafica", True)
-        world.modalita_grafica = modalita_grafica
+        world = get_session_pool().acquire()
+        if world is not None:
+            world.modalita_grafica = modalita_grafica
+            logger.info(f"Mondo preinizializzato prelevato dal pool per sessione {id_sessione}")
+        else:
+            logger.info("Inizializzazione delle mappe di gioco...")
+            try:
+                world = prepara_mondo(modalita_grafica)
+                logger.info(f"Mappe disponibili: {list(world.gestore_mappe.mappe.keys())}")
+            except Exception as map_error:
+                logger.error(f"Errore nell'inizializzazione delle mappe: {str(map_error)}")
+                return jsonify({
+                    "success": False, 
+                    "error": f"Errore nell'inizializzazione delle mappe: {str(map_error)}"
+                }), 500
         
         # Crea il giocatore e aggiungilo al mondo
         from entities.giocatore import Giocatore
@@ -117,35 +129,6 @@ def inizia_sessione():
         # Imposta la classe del giocatore
         giocatore.imposta_classe(classe)
         
-        # Inizializza l'interfaccia IO subito dopo la creazione di world
-        from core.io_interface import IOInterface
-        world.io = IOInterface(world)
-        logger.info(f"IO Interface inizializzata per sessione {id_sessione}")
-        
-        # Inizializza i manager dei sistemi di gioco
-        world.inizializza_sistemi()
-        
-        # Inizializza le mappe di gioco con gestione degli errori migliorata
-        logger.info("Inizializzazione delle mappe di gioco...")
-        try:
-            from world.gestore_mappe import GestitoreMappe
-            gestore_mappe = GestitoreMappe()
-            world.gestore_mappe = gestore_mappe
-            gestore_mappe.inizializza_mappe()
-            logger.info("Mappe inizializzate con successo")
-            
-            # Verifica che le mappe siano state caricate
-            mappe_disponibili = list(gestore_mappe.mappe.keys())
-            logger.info(f"Mappe disponibili: {mappe_disponibili}")
-            if not mappe_disponibili:
-                raise ValueError("Nessuna mappa caricata. Controlla i file delle mappe.")
-        except Exception as map_error:
-            logger.error(f"Errore nell'inizializzazione delle mappe: {str(map_error)}")
-            return jsonify({
-                "success": False, 
-                "error": f"Errore nell'inizializzazione delle mappe: {str(map_error)}"
-            }), 500
-        
         # Emetti evento di creazione giocatore
         event_bus.emit(EventType.PLAYER_CREATED, 
                       session_id=id_sessione,
@@ -224,7 +207,7 @@ def create_session():
                   class_id=classe)
     
     # Utilizziamo la stessa logica di inizia_sessione
-    id_sessione = str(uuid4())
+    id_sessione = genera_id_sessione()
     
     # Crea un nuovo mondo ECS
     world = World()
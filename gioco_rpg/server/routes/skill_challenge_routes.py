@@ -1,6 +1,6 @@
 from flask import request, jsonify, Blueprint
 import logging
-import random
+from util.rng import generatore
 
 from server.utils.session import sessioni_attive, salva_sessione
 
@@ -10,6 +10,10 @@ logger = logging.getLogger(__name__)
 # Crea il blueprint per le route delle prove di abilità
 skill_challenge_routes = Blueprint('skill_challenge_routes', __name__)
 
+def _componenti(entita):
+    """Componenti ECS di un'entità (nessuno per le entità classiche)"""
+    return entita.get_all_components() if callable(getattr(entita, "get_all_components", None)) else []
+
 @skill_challenge_routes.route("/inizia", methods=["POST"])
 def inizia_prova_abilita():
     """Inizia una prova di abilità"""
@@ -186,15 +190,16 @@ def esegui_prova_abilita():
             "target_id": target_id
         }
         
+        # Modificatori dalle tabelle in cache delle entità
+        from states.prova_abilita.risoluzione import get_servizio_prove, probabilita_confronto, probabilita_successo
+        servizio = get_servizio_prove()
+        modificatore = servizio.modificatore(entita, abilita)
+        mod_target = servizio.modificatore(target, abilita) if target else 0
+        
         # Esegui la prova in base alla modalità
         if modalita == "semplice":
             # Prova semplice
-            risultato = random.randint(1, 20)
-            
-            # Aggiungi bonus dall'abilità dell'entità
-            for componente in entita.get_all_components():
-                if hasattr(componente, "get_bonus_abilita") and callable(componente.get_bonus_abilita):
-                    risultato += componente.get_bonus_abilita(abilita)
+            risultato = generatore().randint(1, 20) + modificatore
             
             # Determina successo/fallimento
             successo = risultato >= difficolta
@@ -202,10 +207,7 @@ def esegui_prova_abilita():
             # Gestisci conseguenze
             if target:
                 # Caso confronto
-                target_risultato = random.randint(1, 20)
-                for componente in target.get_all_components():
-                    if hasattr(componente, "get_bonus_abilita") and callable(componente.get_bonus_abilita):
-                        target_risultato += componente.get_bonus_abilita(abilita)
+                target_risultato = generatore().randint(1, 20) + mod_target
                 
                 # Determina vincitore del confronto
                 confronto_successo = risultato >= target_risultato
@@ -217,7 +219,8 @@ def esegui_prova_abilita():
                     "entita_risultato": risultato,
                     "target": target.nome if hasattr(target, "nome") else str(target.id),
                     "target_risultato": target_risultato,
-                    "vincitore": entita.nome if confronto_successo else target.nome
+                    "vincitore": entita.nome if confronto_successo else target.nome,
+                    "probabilita_vittoria": probabilita_confronto(modificatore, mod_target)
                 }
             else:
                 # Caso prova normale
@@ -227,24 +230,21 @@ def esegui_prova_abilita():
                     "entita": entita.nome if hasattr(entita, "nome") else str(entita.id),
                     "risultato": risultato,
                     "difficolta": difficolta,
-                    "esito": "successo" if successo else "fallimento"
+                    "esito": "successo" if successo else "fallimento",
+                    "probabilita_successo": probabilita_successo(modificatore, difficolta)
                 }
         else:
             # Prova avanzata (più dettagli)
             # Qui implementiamo una versione più complessa che considera più fattori
             
             # Tiro di base
-            tiro_base = random.randint(1, 20)
+            tiro_base = generatore().randint(1, 20)
             
             # Calcola bonus e modificatori
-            bonus_abilita = 0
+            bonus_abilita = modificatore
             bonus_situazionali = 0
             
-            # Ottieni bonus dall'abilità
-            for componente in entita.get_all_components():
-                if hasattr(componente, "get_bonus_abilita") and callable(componente.get_bonus_abilita):
-                    bonus_abilita += componente.get_bonus_abilita(abilita)
-                    
+            for componente in _componenti(entita):
                 # Ottieni eventuali bonus situazionali
                 if hasattr(componente, "get_bonus_situazionali") and callable(componente.get_bonus_situazionali):
                     bonus_situazionali += componente.get_bonus_situazionali(abilita)
@@ -258,15 +258,12 @@ def esegui_prova_abilita():
             # Gestisci conseguenze (possibilmente diverse per successo/fallimento)
             if target:
                 # Caso confronto
-                target_tiro_base = random.randint(1, 20)
-                target_bonus_abilita = 0
+                target_tiro_base = generatore().randint(1, 20)
+                target_bonus_abilita = mod_target
                 target_bonus_situazionali = 0
                 
                 # Calcola bonus per il target
-                for componente in target.get_all_components():
-                    if hasattr(componente, "get_bonus_abilita") and callable(componente.get_bonus_abilita):
-                        target_bonus_abilita += componente.get_bonus_abilita(abilita)
-                    
+                for componente in _componenti(target):
                     # Bonus situazionali del target
                     if hasattr(componente, "get_bonus_situazionali") and callable(componente.get_bonus_situazionali):
                         target_bonus_situazionali += componente.get_bonus_situazionali(abilita)
@@ -289,7 +286,9 @@ def esegui_prova_abilita():
                     "target_bonus_abilita": target_bonus_abilita,
                     "target_bonus_situazionali": target_bonus_situazionali,
                     "target_risultato_finale": target_risultato_finale,
-                    "vincitore": entita.nome if confronto_successo else target.nome
+                    "vincitore": entita.nome if confronto_successo else target.nome,
+                    "probabilita_vittoria": probabilita_confronto(bonus_abilita + bonus_situazionali,
+                                                                  target_bonus_abilita + target_bonus_situazionali)
                 }
             else:
                 # Caso prova normale avanzata
@@ -302,7 +301,8 @@ def esegui_prova_abilita():
                     "bonus_situazionali": bonus_situazionali,
                     "risultato_finale": risultato_finale,
                     "difficolta": difficolta,
-                    "esito": "successo" if successo else "fallimento"
+                    "esito": "successo" if successo else "fallimento",
+                    "probabilita_successo": probabilita_successo(bonus_abilita + bonus_situazionali, difficolta)
                 }
         
         # Aggiorna lo stato e salvalo
@@ -358,24 +358,16 @@ def elenca_npg_vicini():
         # Ottieni la mappa corrente
         map_name = position_component.map_name
         
-        # Trova NPG vicini (entità con tag "npc" sulla stessa mappa)
+        # Trova NPG vicini (entità con tag "npc" sulla stessa mappa, a distanza <= 5)
+        from world.indice_spaziale import get_indici_spaziali, NPG
         npg_vicini = []
-        for entity in world.get_entities():
-            if entity.has_tag("npc"):
-                entity_pos = entity.get_component("position")
-                if entity_pos and entity_pos.map_name == map_name:
-                    # Calcola distanza
-                    dx = entity_pos.x - position_component.x
-                    dy = entity_pos.y - position_component.y
-                    distanza = (dx**2 + dy**2)**0.5
-                    
-                    # Considera vicini se a distanza <= 5
-                    if distanza <= 5:
-                        npg_vicini.append({
-                            "id": entity.id,
-                            "nome": entity.nome if hasattr(entity, "nome") else f"NPG {entity.id}",
-                            "distanza": round(distanza, 2)
-                        })
+        for vicino in get_indici_spaziali(world).cerca(map_name, position_component.x, position_component.y, 5, NPG):
+            entity = vicino.valore
+            npg_vicini.append({
+                "id": entity.id,
+                "nome": entity.nome if hasattr(entity, "nome") else f"NPG {entity.id}",
+                "distanza": round(vicino.distanza, 2)
+            })
         
         return jsonify({
             "successo": True,
@@ -429,24 +421,17 @@ def elenca_oggetti_vicini():
         # Ottieni la mappa corrente
         map_name = position_component.map_name
         
-        # Trova oggetti vicini (entità con componente "interactable" sulla stessa mappa)
+        # Trova oggetti vicini (entità con componente "interactable" sulla stessa mappa, a distanza <= 3)
+        from world.indice_spaziale import get_indici_spaziali, OGGETTI
         oggetti_vicini = []
-        for entity in world.get_entities():
-            if entity.has_component("interactable"):
-                entity_pos = entity.get_component("position")
-                if entity_pos and entity_pos.map_name == map_name:
-                    # Calcola distanza
-                    dx = entity_pos.x - position_component.x
-                    dy = entity_pos.y - position_component.y
-                    distanza = (dx**2 + dy**2)**0.5
-                    
-                    # Considera vicini se a distanza <= 3
-                    if distanza <= 3:
-                        oggetti_vicini.append({
-                            "id": entity.id,
-                            "nome": entity.nome if hasattr(entity, "nome") else f"Oggetto {entity.id}",
-                            "distanza": round(distanza, 2)
-                        })
+        for vicino in get_indici_spaziali(world).cerca(map_name, position_component.x, position_component.y, 3,
+                                                       OGGETTI):
+            entity = vicino.valore
+            oggetti_vicini.append({
+                "id": entity.id,
+                "nome": entity.nome if hasattr(entity, "nome") else f"Oggetto {entity.id}",
+                "distanza": round(vicino.distanza, 2)
+            })
         
         return jsonify({
             "successo": True,
@@ -0,0 +1,321 @@
+"""
+Bundle degli asset per mappa.
+
+Quando un client entra in una mappa riceve in un'unica risposta i dati della
+mappa e tutti gli asset necessari a disegnarla: i tile usati nella griglia,
+gli sprite di oggetti e NPG e l'immagine di sfondo.
+
+Formato del bundle:
+    [4 byte big-endian: lunghezza L del manifest]
+    [L byte: manifest JSON UTF-8]
+    [contenuti dei file concatenati]
+
+Il manifest contiene "version", "map_id", "map" (i dati della mappa) e
+"assets": {percorso relativo: {"offset", "length", "mimetype"}}, con gli
+offset relativi all'inizio della sezione dei contenuti.
+
+I bundle sono tenuti in cache per versione: la versione è l'hash del file
+della mappa e degli hash di tutti gli asset inclusi, quindi qualunque
+modifica produce un nuovo bundle. Finché mtime e dimensione della mappa e
+degli asset non cambiano il bundle in cache viene restituito senza rileggere
+la mappa né ricalcolare gli hash.
+"""
+
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import stat
+import struct
+import threading
+from collections import OrderedDict
+
+from server.utils.asset_delivery import get_asset_delivery
+
+logger = logging.getLogger(__name__)
+
+# Codici della griglia delle mappe -> ID dei tile (stessa convenzione del TileAtlas del client)
+GRID_TILE_IDS = {
+    0: "floor",
+    1: "wall",
+    2: "door",
+    3: "grass",
+    4: "water"
+}
+
+# Directory in cui cercare gli sprite referenziati per nome da oggetti e NPG
+SPRITE_DIRECTORIES = ("objects", "entities", "sprites")
+
+# Header con la lunghezza del manifest
+BUNDLE_HEADER = struct.Struct(">I")
+
+# Numero massimo di bundle tenuti in memoria
+MAX_CACHED_BUNDLES = 16
+
+# Gli ID delle mappe sono nomi di file semplici
+_MAP_ID_RE = re.compile(r"^[\w\-]+$")
+
+
+def pack_bundle(map_id, map_data, files, version):
+    """
+    Impacchetta i dati di una mappa e i suoi asset in un unico bundle.
+
+    Args:
+        map_id (str): ID della mappa
+        map_data (dict): Dati della mappa
+        files (list): Coppie (percorso relativo, contenuto in bytes)
+        version (str): Versione del bundle
+
+    Returns:
+        bytes: Bundle impacchettato
+    """
+    assets = {}
+    offset = 0
+    for rel_path, content in files:
+        assets[rel_path] = {
+            "offset": offset,
+            "length": len(content),
+            "mimetype": mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        }
+        offset += len(content)
+
+    manifest = json.dumps({
+        "version": version,
+        "map_id": map_id,
+        "map": map_data,
+        "assets": assets
+    }, separators=(",", ":")).encode("utf-8")
+    return b"".join([BUNDLE_HEADER.pack(len(manifest)), manifest] + [content for _, content in files])
+
+
+def unpack_bundle(data):
+    """
+    Legge un bundle prodotto da pack_bundle.
+
+    Args:
+        data (bytes): Bundle impacchettato
+
+    Returns:
+        tuple: (manifest, {percorso relativo: contenuto in bytes})
+    """
+    (lunghezza,) = BUNDLE_HEADER.unpack_from(data, 0)
+    inizio = BUNDLE_HEADER.size
+    manifest = json.loads(data[inizio:inizio + lunghezza].decode("utf-8"))
+    contenuti = inizio + lunghezza
+    files = {
+        rel_path: data[contenuti + voce["offset"]:contenuti + voce["offset"] + voce["length"]]
+        for rel_path, voce in manifest["assets"].items()
+    }
+    return manifest, files
+
+
+def _firma_file(path):
+    """Restituisce (mtime_ns, dimensione) del file o None se non è un file esistente"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+def _dentro(path, directory):
+    """Verifica che path sia contenuto in directory (non solo che ne condivida il prefisso)"""
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        # Percorsi su unità diverse (Windows)
+        return False
+
+
+class AssetBundleService:
+    """
+    Calcola, impacchetta e tiene in cache i bundle degli asset delle mappe.
+    """
+
+    def __init__(self, base_path=None, maps_dir=None, max_bundles=MAX_CACHED_BUNDLES):
+        """
+        Args:
+            base_path (str, optional): Directory degli asset (default: quella dell'AssetManager)
+            maps_dir (str, optional): Directory dei file JSON delle mappe
+            max_bundles (int): Numero massimo di bundle in cache
+        """
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self._base_path = os.path.normpath(base_path) if base_path else None
+        # Con una directory esplicita gli asset si cercano solo sul filesystem
+        self._use_registry = base_path is None
+        self.maps_dir = maps_dir or os.path.join(root, "data", "mappe")
+        self.max_bundles = max_bundles
+        self._bundles = OrderedDict()  # map_id -> ((versione, bytes), firma dei file, asset)
+        self._lock = threading.Lock()
+
+    @property
+    def base_path(self):
+        if self._base_path is None:
+            from util.asset_manager import get_asset_manager
+            self._base_path = get_asset_manager().base_path
+        return self._base_path
+
+    def get_bundle(self, map_id):
+        """
+        Restituisce il bundle di una mappa, ricostruendolo solo se cambiato.
+
+        Args:
+            map_id (str): ID della mappa
+
+        Returns:
+            tuple: (versione, bytes) o None se la mappa non esiste
+        """
+        if not map_id or not _MAP_ID_RE.match(map_id):
+            return None
+        map_path = os.path.join(self.maps_dir, f"{map_id}.json")
+        firma_mappa = _firma_file(map_path)
+        if firma_mappa is None:
+            return None
+
+        # Se né la mappa né gli asset sono cambiati su disco il bundle è ancora valido
+        with self._lock:
+            cached = self._bundles.get(map_id)
+        if cached is not None:
+            bundle, firma, assets = cached
+            if firma == (firma_mappa, tuple(_firma_file(abs_path) for _, abs_path in assets)):
+                with self._lock:
+                    if map_id in self._bundles:
+                        self._bundles.move_to_end(map_id)
+                return bundle
+
+        with open(map_path, "r", encoding="utf-8") as f:
+            map_data = json.load(f)
+        assets = self.resolve_assets(map_id, map_data)
+        firma = (firma_mappa, tuple(_firma_file(abs_path) for _, abs_path in assets))
+
+        # La versione dipende dal contenuto della mappa e di ogni asset incluso
+        delivery = get_asset_delivery()
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(delivery.content_hash(map_path).encode("ascii"))
+        for rel_path, abs_path in assets:
+            digest.update(f"{rel_path}={delivery.content_hash(abs_path, rel_path)};".encode("utf-8"))
+        version = digest.hexdigest()
+
+        if cached is not None and cached[0][0] == version:
+            # File toccati ma contenuto identico: aggiorna solo la firma
+            bundle = cached[0]
+        else:
+            files = []
+            for rel_path, abs_path in assets:
+                with open(abs_path, "rb") as f:
+                    files.append((rel_path, f.read()))
+            bundle = (version, pack_bundle(map_id, map_data, files, version))
+            logger.debug(f"Bundle della mappa {map_id} ricostruito: {len(files)} asset, {len(bundle[1])} byte")
+
+        with self._lock:
+            self._bundles[map_id] = (bundle, firma, assets)
+            self._bundles.move_to_end(map_id)
+            while len(self._bundles) > self.max_bundles:
+                self._bundles.popitem(last=False)
+        return bundle
+
+    def resolve_assets(self, map_id, map_data):
+        """
+        Calcola gli asset necessari a una mappa.
+
+        Args:
+            map_id (str): ID della mappa
+            map_data (dict): Dati della mappa
+
+        Returns:
+            list: Coppie (percorso relativo, percorso assoluto) ordinate, dei soli file esistenti
+        """
+        candidati = set()
+
+        # Tile usati nella griglia
+        codici = {valore for riga in map_data.get("griglia", []) for valore in riga}
+        for codice in codici:
+            tile_id = GRID_TILE_IDS.get(codice)
+            if tile_id:
+                candidati.add(self._tile_path(tile_id))
+
+        # Sprite di oggetti e NPG: dizionario con "sprite" o solo il nome dell'elemento
+        for sezione in ("oggetti", "npg"):
+            elementi = map_data.get(sezione) or {}
+            for chiave, valore in elementi.items():
+                nome = valore.get("sprite") if isinstance(valore, dict) else chiave
+                if nome:
+                    candidati.add(self._sprite_path(str(nome)))
+
+        # Immagine di sfondo
+        candidati.add(self._background_path(map_id, map_data))
+
+        base_path = os.path.abspath(self.base_path)
+        risultato = []
+        for rel_path in candidati:
+            if not rel_path:
+                continue
+            abs_path = os.path.abspath(os.path.join(base_path, rel_path))
+            if _dentro(abs_path, base_path) and os.path.isfile(abs_path):
+                risultato.append((rel_path.replace("\\", "/"), abs_path))
+        return sorted(risultato)
+
+    def clear(self):
+        """Svuota la cache dei bundle"""
+        with self._lock:
+            self._bundles.clear()
+
+    def _registry(self):
+        """Restituisce l'AssetManager da cui leggere i percorsi registrati, se in uso"""
+        if not self._use_registry:
+            return None
+        try:
+            from util.asset_manager import get_asset_manager
+            return get_asset_manager()
+        except Exception:
+            return None
+
+    def _tile_path(self, tile_id):
+        manager = self._registry()
+        info = manager.get_tile_info(tile_id) if manager else None
+        if info and info.get("file"):
+            return info["file"]
+        return f"tiles/{tile_id}.png"
+
+    def _sprite_path(self, nome):
+        manager = self._registry()
+        info = manager.sprites.get(nome) if manager else None
+        if info and info.get("file"):
+            return info["file"]
+        for directory in SPRITE_DIRECTORIES:
+            rel_path = f"{directory}/{nome}.png"
+            if os.path.isfile(os.path.join(self.base_path, rel_path)):
+                return rel_path
+        return None
+
+    def _background_path(self, map_id, map_data):
+        manager = self._registry()
+        info = manager.get_background_info(f"{map_id}_background") if manager else None
+        if info and (info.get("path") or info.get("file")):
+            return info.get("path") or info.get("file")
+        background = map_data.get("backgroundImage") or f"maps/{map_id}_background.png"
+        # I percorsi nelle mappe sono relativi alla radice ("assets/maps/...")
+        if background.startswith("assets/"):
+            background = background[len("assets/"):]
+        return background
+
+
+# Istanza condivisa
+_asset_bundle_service = None
+
+
+def get_asset_bundle_service():
+    """
+    Restituisce l'istanza condivisa di AssetBundleService.
+
+    Returns:
+        AssetBundleService: Istanza singleton
+    """
+    global _asset_bundle_service
+    if _asset_bundle_service is None:
+        _asset_bundle_service = AssetBundleService()
+    return _asset_bundle_service
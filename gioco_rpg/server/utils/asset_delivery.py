@@ -0,0 +1,297 @@
+"""
+Livello di consegna HTTP degli asset.
+
+Serve i file degli asset con:
+- ETag forti derivati dall'hash del contenuto (dall'indice dell'AssetManager
+  quando disponibile), richieste condizionali (304) e Range (206);
+- URL versionati ("?v=<hash>") serviti con Cache-Control immutable;
+- varianti precompresse ".br"/".gz" generate in fase di build
+  (util/asset_precompress.py) per i client che le accettano;
+- una cache LRU in memoria dei file piccoli più richiesti, così che gli hit
+  non leggano il disco.
+"""
+
+import logging
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app, request, send_file
+
+from util.asset_index import hash_file
+from util.asset_precompress import PRECOMPRESS_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Durata della cache per gli URL versionati: il contenuto non può cambiare
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Per gli URL non versionati il client deve sempre rivalidare (risposta 304 con l'ETag)
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Varianti precompresse in ordine di preferenza: (codifica, estensione)
+ENCODED_VARIANTS = (("br", ".br"), ("gzip", ".gz"))
+
+# Lunghezza del prefisso dell'hash usato nei parametri di versione degli URL
+VERSION_LENGTH = 16
+
+
+class AssetDelivery:
+    """
+    Serve i file degli asset con caching HTTP e cache LRU in memoria.
+    """
+
+    def __init__(self, max_cache_bytes=32 * 1024 * 1024, max_file_size=256 * 1024,
+                 max_entries=4096, revalidate_interval=1.0):
+        """
+        Args:
+            max_cache_bytes (int): Memoria massima occupata dai contenuti in cache
+            max_file_size (int): Dimensione massima di un file tenuto in memoria
+            max_entries (int): Numero massimo di file tracciati
+            revalidate_interval (float): Secondi durante i quali una voce è
+                considerata valida senza ricontrollare il file su disco
+        """
+        self.max_cache_bytes = max_cache_bytes
+        self.max_file_size = max_file_size
+        self.max_entries = max_entries
+        self.revalidate_interval = revalidate_interval
+        self._entries = OrderedDict()  # percorso assoluto -> voce
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def content_hash(self, abs_path, rel_path=None):
+        """
+        Restituisce l'hash del contenuto di un file.
+
+        Args:
+            abs_path (str): Percorso assoluto del file
+            rel_path (str, optional): Percorso relativo alla directory degli asset,
+                usato per riusare l'hash dell'indice dell'AssetManager
+
+        Returns:
+            str: Hash esadecimale del contenuto
+
+        Raises:
+            OSError: Se il file non esiste
+        """
+        return self._lookup(abs_path, rel_path)["digest"]
+
+    def versioned_url(self, url, abs_path, rel_path=None):
+        """
+        Aggiunge a un URL il parametro di versione derivato dal contenuto.
+
+        Args:
+            url (str): URL dell'asset
+            abs_path (str): Percorso assoluto del file servito da quell'URL
+            rel_path (str, optional): Percorso relativo alla directory degli asset
+
+        Returns:
+            str: URL versionato, o l'URL originale se il file non esiste
+        """
+        try:
+            digest = self.content_hash(abs_path, rel_path)
+        except OSError:
+            return url
+        return f"{url}?v={digest[:VERSION_LENGTH]}"
+
+    def serve(self, abs_path, rel_path=None):
+        """
+        Crea la risposta HTTP per un file di asset.
+
+        Args:
+            abs_path (str): Percorso assoluto del file (già validato dal chiamante)
+            rel_path (str, optional): Percorso relativo alla directory degli asset
+
+        Returns:
+            Response: Risposta Flask (200, 206, 304 o 416)
+
+        Raises:
+            OSError: Se il file non esiste
+        """
+        entry = self._lookup(abs_path, rel_path)
+        digest = entry["digest"]
+
+        # URL versionato con l'hash corrente: il contenuto è immutabile
+        version = request.args.get("v")
+        immutable = bool(version) and len(version) >= 8 and digest.startswith(version)
+
+        encoding = None
+        served_path = abs_path
+        for candidate, _ in ENCODED_VARIANTS:
+            variant = entry["variants"].get(candidate)
+            if variant and request.accept_encodings[candidate]:
+                encoding, served_path = candidate, variant
+                break
+        etag = f"{digest}-{encoding}" if encoding else digest
+
+        body = self._body(entry, encoding, served_path)
+        if body is None:
+            # File grande: lo streaming e le Range sono gestiti da send_file
+            response = send_file(served_path, mimetype=entry["mimetype"], conditional=True,
+                                 etag=etag, last_modified=entry["mtime"])
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        else:
+            response = current_app.response_class(body, mimetype=entry["mimetype"])
+            response.set_etag(etag)
+            response.last_modified = datetime.fromtimestamp(entry["mtime"], tz=timezone.utc)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+            # Le Range si applicano solo al contenuto non codificato
+            response.make_conditional(request, accept_ranges=encoding is None,
+                                      complete_length=len(body))
+
+        if entry["variants"]:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        return response
+
+    def invalidate(self, abs_path):
+        """
+        Rimuove dalla cache un file modificato (o la voce di cui è una variante precompressa).
+
+        Args:
+            abs_path (str): Percorso assoluto del file modificato
+        """
+        percorsi = [abs_path]
+        for _, extension in ENCODED_VARIANTS:
+            if abs_path.endswith(extension):
+                percorsi.append(abs_path[:-len(extension)])
+        with self._lock:
+            for percorso in percorsi:
+                entry = self._entries.pop(percorso, None)
+                if entry is not None:
+                    self._cached_bytes -= sum(len(b) for b in entry["bodies"].values())
+
+    def clear(self):
+        """Svuota la cache in memoria"""
+        with self._lock:
+            self._entries.clear()
+            self._cached_bytes = 0
+
+    def get_stats(self):
+        """
+        Restituisce le statistiche della cache.
+
+        Returns:
+            dict: Voci tracciate, byte in memoria, hit e miss
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "cached_bytes": self._cached_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _lookup(self, abs_path, rel_path=None):
+        """Restituisce la voce di un file, rivalidandola con stat() solo periodicamente"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(abs_path)
+            if entry is not None and now - entry["checked"] < self.revalidate_interval:
+                self._entries.move_to_end(abs_path)
+                return entry
+
+        stat = os.stat(abs_path)
+        with self._lock:
+            entry = self._entries.get(abs_path)
+            if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                entry["checked"] = now
+                self._entries.move_to_end(abs_path)
+                return entry
+
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "mtime": stat.st_mtime,
+            "digest": self._digest(abs_path, rel_path, stat),
+            "mimetype": mimetypes.guess_type(abs_path)[0] or "application/octet-stream",
+            "variants": self._find_variants(abs_path, stat),
+            "bodies": {},
+            "checked": now
+        }
+        with self._lock:
+            previous = self._entries.pop(abs_path, None)
+            if previous is not None:
+                self._cached_bytes -= sum(len(b) for b in previous["bodies"].values())
+            self._entries[abs_path] = entry
+            self._evict()
+        return entry
+
+    def _body(self, entry, encoding, path):
+        """Restituisce il contenuto di un file piccolo dalla cache, leggendolo se necessario"""
+        body = entry["bodies"].get(encoding)
+        if body is not None:
+            with self._lock:
+                self.hits += 1
+            return body
+
+        if os.path.getsize(path) > self.max_file_size:
+            return None
+        with open(path, "rb") as f:
+            body = f.read()
+        with self._lock:
+            self.misses += 1
+            if entry["bodies"].get(encoding) is None:
+                entry["bodies"][encoding] = body
+                self._cached_bytes += len(body)
+                self._evict()
+        return body
+
+    def _evict(self):
+        """Rimuove le voci meno usate oltre i limiti di memoria (con il lock acquisito)"""
+        while self._entries and (self._cached_bytes > self.max_cache_bytes
+                                 or len(self._entries) > self.max_entries):
+            _, entry = self._entries.popitem(last=False)
+            self._cached_bytes -= sum(len(b) for b in entry["bodies"].values())
+
+    @staticmethod
+    def _digest(abs_path, rel_path, stat):
+        """Usa l'hash dell'indice degli asset se aggiornato, altrimenti lo calcola"""
+        if rel_path:
+            try:
+                from util.asset_manager import get_asset_manager
+                indexed = get_asset_manager().asset_index.files.get(rel_path.replace("\\", "/"))
+            except Exception:
+                indexed = None
+            if indexed and indexed["size"] == stat.st_size and indexed["mtime_ns"] == stat.st_mtime_ns:
+                return indexed["hash"]
+        return hash_file(abs_path)
+
+    @staticmethod
+    def _find_variants(abs_path, stat):
+        """Trova le varianti precompresse aggiornate di un file"""
+        variants = {}
+        if not abs_path.lower().endswith(PRECOMPRESS_EXTENSIONS):
+            return variants
+        for encoding, extension in ENCODED_VARIANTS:
+            variant_path = abs_path + extension
+            try:
+                if os.stat(variant_path).st_mtime_ns >= stat.st_mtime_ns:
+                    variants[encoding] = variant_path
+            except OSError:
+                continue
+        return variants
+
+
+# Istanza condivisa
+_asset_delivery = None
+
+
+def get_asset_delivery():
+    """
+    Restituisce l'istanza condivisa di AssetDelivery.
+
+    Returns:
+        AssetDelivery: Istanza singleton
+    """
+    global _asset_delivery
+    if _asset_delivery is None:
+        _asset_delivery = AssetDelivery()
+    return _asset_delivery
@@ -2,13 +2,12 @@ import os
 import pickle
 import logging
 import time
-from core.ecs.world import World
 from uuid import uuid4
 import json
 from datetime import datetime
 from pathlib import Path
-from data.mappe import get_mappa
-from states.mappa.mappa_state import MappaState
+# World, MappaState e data.mappe sono importati alla prima sessione: importarli qui
+# caricherebbe l'intero ECS e gli stati di gioco già all'avvio del server
 from core.event_bus import EventBus
 from core.events import EventType
 
@@ -30,6 +29,22 @@ def set_socketio(socket_io):
     global socketio
     socketio = socket_io
 
+def genera_id_sessione():
+    """
+    Genera un nuovo ID di sessione.
+    
+    In modalità multi-worker l'ID viene scelto tra quelli che il router
+    assegna al worker corrente, così la sessione non deve migrare.
+    
+    Returns:
+        str: Nuovo ID di sessione
+    """
+    from server.cluster import get_router
+    router = get_router()
+    if router is not None:
+        return router.nuovo_id_sessione()
+    return str(uuid4())
+
 def get_session_path(id_sessione):
     """Restituisce il percorso completo per un file di sessione"""
     from util.config import SESSIONS_DIR
@@ -66,7 +81,8 @@ def get_session(id_sessione):
                 # Verifica di nuovo
                 player_entities = world.find_entities_by_tag("player") if hasattr(world, "find_entities_by_tag") else []
                 logger.info(f"Entità con tag 'player' dopo riparazione: {len(player_entities)}")
-                
+        
+        _attiva_rng(world)
         return world
     
     logger.info(f"Sessione {id_sessione} non trovata in memoria, tentativo di caricamento da disco")
@@ -118,6 +134,7 @@ def get_session(id_sessione):
                 # Il costruttore di MappaState è stato aggiornato per accettare game_state_manager opzionale.
                 # Se MappaState ha bisogno di un GameStateManager specifico, deve essere passato qui
                 # o il World deve fornirlo quando imposta il contesto.
+                from states.mappa.mappa_state import MappaState
                 initial_state = MappaState(nome_luogo="taverna") # game_state_manager può essere omesso se MappaState lo gestisce o lo prende da World
                 world.change_fsm_state(initial_state) 
             else:
@@ -130,8 +147,29 @@ def get_session(id_sessione):
             riparazione_diretta(world) # Chiama la funzione di riparazione esistente
     # ---> FINE MODIFICA <----
     
+    _attiva_rng(world)
     return world
 
+def _attiva_rng(world):
+    """Rende i flussi casuali della sessione quelli usati dai tiri nel thread corrente"""
+    from util.rng import FlussiCasuali, attiva
+    flussi = getattr(world, "rng", None)
+    attiva(flussi if isinstance(flussi, FlussiCasuali) else None)
+
+def rilascia_rng(exc=None):
+    """
+    Disattiva i flussi casuali della sessione nel thread corrente.
+
+    Registrata come teardown_request: vale anche per gli handler Socket.IO,
+    che Flask-SocketIO esegue in un contesto di richiesta, così un tiro fatto
+    senza passare da get_session non usa lo stream di un'altra sessione.
+
+    Args:
+        exc (Exception, optional): Eccezione della richiesta (ignorata)
+    """
+    from util.rng import attiva
+    attiva(None)
+
 def salva_sessione(id_sessione, world):
     """Salva lo stato del mondo ECS"""
     try:
@@ -274,6 +312,7 @@ def carica_sessione(id_sessione):
         
         # Deserializza il mondo ECS
         try:
+            from core.ecs.world import World
             world = World.deserialize(world_data)
             logger.info(f"Sessione {id_sessione} deserializzata con successo")
             
@@ -591,7 +630,8 @@ class SessionManager:
         Returns:
             SessionWrapper: Wrapper della nuova sessione
         """
-        id_sessione = str(uuid4())
+        from core.ecs.world import World
+        id_sessione = genera_id_sessione()
         world = World()
         sessioni_attive[id_sessione] = world
         return SessionWrapper(id_sessione, world)
@@ -608,6 +648,13 @@ class SessionManager:
         """
         if id_sessione in sessioni_attive:
             del sessioni_attive[id_sessione]
+            from core.scene_graph import rimuovi_scene_graph
+            from server.websocket.replay_buffer import get_replay_buffer
+            rimuovi_scene_graph(id_sessione)
+            get_replay_buffer().discard(id_sessione)
+            # Avvisa chi tiene dati per sessione (es. la cache delle risposte WebSocket)
+            import core.events as Events
+            EventBus.get_instance().emit(Events.SESSION_END, session_id=id_sessione)
             try:
                 # Elimina anche il file su disco
                 session_path = Path(get_session_path(id_sessione))
@@ -673,6 +720,7 @@ class SessionWrapper:
                 return self.world.get_map_data(map_id)
             else:
                 # Implementazione di fallback
+                from data.mappe import get_mappa
                 map_data = get_mappa(map_id)
                 
                 # Aggiungi le entità presenti sulla mappa
@@ -0,0 +1,243 @@
+"""
+Pool di mondi di gioco preinizializzati.
+
+La creazione di una nuova partita richiede un World con IO, sistemi ECS e
+GestitoreMappe con tutte le mappe, gli NPG e gli oggetti caricati: è la
+parte più lenta di /game/session/inizia e non dipende dal giocatore.
+SessionPool tiene pronti in background alcuni mondi senza giocatore; la
+route ne prende uno, vi collega il personaggio e risponde subito.
+
+Il pool si riempie in un thread dedicato fino alla dimensione configurata,
+limitata anche da un tetto di memoria stimato misurando il primo mondo
+costruito. Quando cambiano i file delle mappe o dei dati i mondi pronti
+vengono scartati e ricostruiti.
+
+Configurazione tramite variabili d'ambiente:
+    GIOCO_RPG_SESSION_POOL_SIZE     numero di mondi pronti (0 disattiva il pool)
+    GIOCO_RPG_SESSION_POOL_MAX_MB   memoria massima stimata occupata dal pool
+"""
+
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Valori predefiniti della configurazione
+DEFAULT_POOL_SIZE = 4
+DEFAULT_POOL_MAX_MB = 256
+
+# Attesa prima di riprovare dopo un errore di costruzione (secondi)
+RETRY_DELAY = 5.0
+
+
+def prepara_mondo(modalita_grafica=True):
+    """
+    Costruisce un mondo di gioco completo ma senza giocatore.
+
+    Args:
+        modalita_grafica (bool): Valore iniziale di world.modalita_grafica
+
+    Returns:
+        World: Mondo con IO, sistemi e mappe inizializzati
+
+    Raises:
+        ValueError: Se non è stata caricata nessuna mappa
+    """
+    from core.ecs.world import World
+    from core.io_interface import IOInterface
+    from world.gestore_mappe import GestitoreMappe
+
+    world = World()
+    world.modalita_grafica = modalita_grafica
+    world.io = IOInterface(world)
+    world.inizializza_sistemi()
+
+    gestore_mappe = GestitoreMappe()
+    world.gestore_mappe = gestore_mappe
+    gestore_mappe.inizializza_mappe()
+    if not gestore_mappe.mappe:
+        raise ValueError("Nessuna mappa caricata. Controlla i file delle mappe.")
+    return world
+
+
+def _leggi_intero(nome, default):
+    try:
+        return int(os.environ.get(nome, default))
+    except ValueError:
+        logger.warning(f"{nome} non valido, uso il valore predefinito {default}")
+        return default
+
+
+class SessionPool:
+    """
+    Pool di mondi preinizializzati riempito in background.
+    """
+
+    def __init__(self, size=None, max_bytes=None, factory=prepara_mondo, stima_bytes=None):
+        """
+        Args:
+            size (int, optional): Numero di mondi da tenere pronti
+            max_bytes (int, optional): Memoria massima stimata del pool
+            factory (callable): Funzione senza argomenti che costruisce un mondo
+            stima_bytes (int, optional): Memoria stimata di un mondo (se None viene
+                misurata con tracemalloc sul primo mondo costruito)
+        """
+        self.size = size if size is not None else _leggi_intero("GIOCO_RPG_SESSION_POOL_SIZE", DEFAULT_POOL_SIZE)
+        self.max_bytes = (max_bytes if max_bytes is not None
+                          else _leggi_intero("GIOCO_RPG_SESSION_POOL_MAX_MB", DEFAULT_POOL_MAX_MB) * 1024 * 1024)
+        self.factory = factory
+        self.stima_bytes = stima_bytes
+
+        self._pronti = deque()
+        self._cond = threading.Condition()
+        self._generazione = 0  # Incrementata quando i dati cambiano: i mondi in costruzione vengono scartati
+        self._running = False
+        self._thread = None
+        self._unsubscribe = []
+        self._stats = {"hits": 0, "misses": 0, "built": 0, "discarded": 0, "errors": 0, "build_time": 0.0}
+
+    @property
+    def target(self):
+        """Numero di mondi da tenere pronti, limitato dal tetto di memoria"""
+        if self.stima_bytes:
+            return max(0, min(self.size, self.max_bytes // self.stima_bytes))
+        return self.size
+
+    def start(self):
+        """Avvia il riempimento in background e l'ascolto delle modifiche ai dati"""
+        if self._running or self.size <= 0:
+            return
+        self._running = True
+
+        from core.event_bus import EventBus
+        import core.events as Events
+        event_bus = EventBus.get_instance()
+        for evento in (Events.MAP_FILE_CHANGED, Events.DATA_FILE_CHANGED):
+            self._unsubscribe.append(event_bus.on(evento, self._on_dati_modificati))
+
+        self._thread = threading.Thread(target=self._run, name="SessionPool", daemon=True)
+        self._thread.start()
+        logger.info(f"Pool di sessioni avviato: {self.size} mondi, tetto {self.max_bytes // (1024 * 1024)} MB")
+
+    def stop(self):
+        """Ferma il riempimento e svuota il pool"""
+        with self._cond:
+            self._running = False
+            self._pronti.clear()
+            self._cond.notify_all()
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def acquire(self):
+        """
+        Preleva un mondo pronto e avvia la ricostruzione del posto liberato.
+
+        Returns:
+            World: Mondo preinizializzato o None se il pool è vuoto
+        """
+        with self._cond:
+            world = self._pronti.popleft() if self._pronti else None
+            self._stats["hits" if world is not None else "misses"] += 1
+            self._cond.notify_all()
+        return world
+
+    def svuota(self):
+        """Scarta i mondi pronti (costruiti con dati non più aggiornati)"""
+        with self._cond:
+            self._stats["discarded"] += len(self._pronti)
+            self._pronti.clear()
+            self._generazione += 1
+            self._cond.notify_all()
+
+    def wait_ready(self, count=None, timeout=None):
+        """
+        Attende che il pool contenga almeno count mondi.
+
+        Args:
+            count (int, optional): Mondi attesi (default: target)
+            timeout (float, optional): Attesa massima in secondi
+
+        Returns:
+            bool: True se il pool ha raggiunto la dimensione richiesta
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: len(self._pronti) >= (self.target if count is None else count), timeout)
+
+    def get_stats(self):
+        """Restituisce le statistiche del pool"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(ready=len(self._pronti), target=self.target, estimated_world_bytes=self.stima_bytes)
+        return stats
+
+    def _on_dati_modificati(self, **kwargs):
+        logger.debug(f"Dati di gioco modificati ({kwargs.get('path')}), pool di sessioni rigenerato")
+        self.svuota()
+
+    def _costruisci(self):
+        """Costruisce un mondo, misurandone la memoria se la stima non è ancora disponibile"""
+        if self.stima_bytes is not None or tracemalloc.is_tracing():
+            return self.factory()
+        tracemalloc.start()
+        try:
+            prima = tracemalloc.get_traced_memory()[0]
+            world = self.factory()
+            self.stima_bytes = max(1, tracemalloc.get_traced_memory()[0] - prima)
+        finally:
+            tracemalloc.stop()
+        logger.info(f"Memoria stimata per mondo preinizializzato: {self.stima_bytes / 1024:.0f} KB, "
+                    f"mondi nel pool: {self.target}")
+        return world
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: not self._running or len(self._pronti) < self.target)
+                if not self._running:
+                    return
+                generazione = self._generazione
+
+            inizio = time.perf_counter()
+            try:
+                world = self._costruisci()
+            except Exception as e:
+                logger.error(f"Errore nella preparazione di un mondo per il pool di sessioni: {e}")
+                with self._cond:
+                    self._stats["errors"] += 1
+                    self._cond.wait(RETRY_DELAY)
+                continue
+
+            with self._cond:
+                self._stats["build_time"] += time.perf_counter() - inizio
+                if self._running and generazione == self._generazione and len(self._pronti) < self.target:
+                    self._pronti.append(world)
+                    self._stats["built"] += 1
+                    self._cond.notify_all()
+                else:
+                    self._stats["discarded"] += 1
+
+
+# Istanza condivisa
+_session_pool = None
+
+
+def get_session_pool():
+    """
+    Restituisce l'istanza condivisa di SessionPool.
+
+    Returns:
+        SessionPool: Istanza singleton
+    """
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = SessionPool()
+    return _session_pool
@@ -0,0 +1,179 @@
+"""
+Misura dei tempi di avvio del server.
+
+StartupProfiler registra la durata delle fasi di setup() (creazione
+dell'app, SocketIO, asset, ...). La modalità --profile-startup avvia il
+setup in un processo figlio con "-X importtime" e stampa, oltre alle
+fasi, l'albero degli import più costosi nello stesso formato di
+importtime (tempo proprio e cumulativo per modulo).
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Prefisso della riga con cui il processo figlio restituisce le fasi
+_MARKER_FASI = "@@FASI_AVVIO@@"
+
+# Riga prodotta da -X importtime: "import time:   self |  cumulative | modulo"
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+# Codice eseguito dal processo figlio in modalità --profile-startup
+_CODICE_FIGLIO = (
+    "import json, server.app as a\n"
+    "a.get_app_and_socketio()\n"
+    "from server.utils.startup_profiler import get_startup_profiler\n"
+    f"print({_MARKER_FASI!r} + json.dumps(get_startup_profiler().as_dict()), flush=True)\n"
+)
+
+
+class StartupProfiler:
+    """
+    Registra le fasi dell'avvio e la loro durata.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = []  # (nome, durata in secondi)
+
+    @contextmanager
+    def phase(self, nome):
+        """
+        Misura la durata di un blocco di avvio.
+
+        Args:
+            nome (str): Nome della fase
+        """
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((nome, time.perf_counter() - inizio))
+
+    @property
+    def total(self):
+        """Secondi trascorsi dalla creazione del profiler"""
+        return time.perf_counter() - self.started_at
+
+    def as_dict(self):
+        """Restituisce fasi e tempo totale in forma serializzabile"""
+        return {"phases": [[nome, durata] for nome, durata in self.phases], "total": self.total}
+
+    def log_summary(self):
+        """Scrive nel log il riepilogo delle fasi"""
+        dettaglio = ", ".join(f"{nome} {durata * 1000:.0f}ms" for nome, durata in self.phases)
+        logger.info(f"Server pronto in {self.total:.2f}s ({dettaglio})")
+
+
+def parse_importtime(testo):
+    """
+    Legge l'output di "python -X importtime".
+
+    Args:
+        testo (str): Output su stderr del processo
+
+    Returns:
+        list: Tuple (profondità, tempo proprio in µs, tempo cumulativo in µs, modulo)
+            nell'ordine di stampa (i figli precedono il modulo che li importa)
+    """
+    voci = []
+    for riga in testo.splitlines():
+        match = _IMPORTTIME_RE.match(riga)
+        if match:
+            proprio, cumulativo, rientro, modulo = match.groups()
+            voci.append((len(rientro) // 2, int(proprio), int(cumulativo), modulo.strip()))
+    return voci
+
+
+def format_import_tree(voci, soglia_ms=5.0, massimo=60):
+    """
+    Formatta gli import più costosi come albero.
+
+    Args:
+        voci (list): Voci restituite da parse_importtime
+        soglia_ms (float): Tempo cumulativo minimo di un modulo per essere mostrato
+        massimo (int): Numero massimo di righe
+
+    Returns:
+        list: Righe dell'albero, dall'import più esterno
+    """
+    # importtime stampa un modulo dopo i suoi figli: invertendo l'ordine ogni
+    # modulo precede i propri import e l'albero si legge dall'alto
+    righe = []
+    for profondita, proprio, cumulativo, modulo in reversed(voci):
+        if cumulativo / 1000.0 < soglia_ms:
+            continue
+        righe.append(f"{cumulativo / 1000.0:9.1f}ms {proprio / 1000.0:8.1f}ms  {'  ' * profondita}{modulo}")
+        if len(righe) >= massimo:
+            break
+    return righe
+
+
+def profile_startup(soglia_ms=5.0, massimo=60, stream=None):
+    """
+    Esegue il setup del server in un processo nuovo e stampa il profilo di avvio.
+
+    Args:
+        soglia_ms (float): Tempo cumulativo minimo degli import mostrati
+        massimo (int): Numero massimo di righe dell'albero degli import
+        stream: Destinazione del report (default: stdout)
+
+    Returns:
+        int: Codice di uscita (0 se il setup è terminato correttamente)
+    """
+    stream = stream or sys.stdout
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (root, env.get("PYTHONPATH")) if p)
+
+    inizio = time.perf_counter()
+    processo = subprocess.run([sys.executable, "-X", "importtime", "-c", _CODICE_FIGLIO],
+                              cwd=root, env=env, capture_output=True, text=True)
+    durata = time.perf_counter() - inizio
+
+    fasi = None
+    for riga in processo.stdout.splitlines():
+        if riga.startswith(_MARKER_FASI):
+            fasi = json.loads(riga[len(_MARKER_FASI):])
+    voci = parse_importtime(processo.stderr)
+
+    print(f"Avvio completo del processo: {durata:.2f}s", file=stream)
+    if fasi is None:
+        print("Setup non completato, output del processo:", file=stream)
+        print(processo.stderr[-4000:], file=stream)
+        return 1
+
+    print(f"\nFasi di setup() (totale {fasi['total']:.3f}s):", file=stream)
+    for nome, secondi in fasi["phases"]:
+        print(f"  {nome:<24} {secondi * 1000:9.1f}ms", file=stream)
+
+    totale_import = sum(proprio for profondita, proprio, _, _ in voci) / 1000.0
+    print(f"\nImport ({len(voci)} moduli, {totale_import:.1f}ms, soglia {soglia_ms}ms):", file=stream)
+    print(f"{'cumulativo':>11} {'proprio':>10}  modulo", file=stream)
+    for riga in format_import_tree(voci, soglia_ms, massimo):
+        print(riga, file=stream)
+    return 0 if processo.returncode == 0 else 1
+
+
+# Profiler dell'avvio corrente
+_startup_profiler = None
+
+
+def get_startup_profiler():
+    """
+    Restituisce il profiler dell'avvio del processo.
+
+    Returns:
+        StartupProfiler: Istanza singleton
+    """
+    global _startup_profiler
+    if _startup_profiler is None:
+        _startup_profiler = StartupProfiler()
+    return _startup_profiler
@@ -333,6 +333,49 @@ def handle_combattimento_azione(data):
         logger.error(traceback.format_exc())
         emit('error', {'message': f'Errore interno: {str(e)}'})
 
+def handle_combattimento_azioni(data):
+    """
+    Handler per più azioni di combattimento in un unico messaggio (es. un turno completo)
+    
+    Args:
+        data (dict): Dati dell'evento (id_sessione, azioni, proiezione, esegui_ia)
+    """
+    id_sessione = data.get('id_sessione')
+    azioni = data.get('azioni')
+    
+    if not id_sessione or not azioni:
+        emit('error', {'message': 'Parametri mancanti'})
+        return
+        
+    # Ottieni la sessione
+    sessione = core.get_session(id_sessione)
+    if not sessione:
+        emit('error', {'message': 'Sessione non trovata'})
+        return
+        
+    try:
+        from states.combattimento.lotto import esegui_lotto
+        risultato = esegui_lotto(sessione, azioni, data.get('proiezione'),
+                                 bool(data.get('esegui_ia', True)), id_sessione)
+        if not risultato['successo']:
+            emit('error', {'message': risultato['errore'], 'indice': risultato.get('indice')})
+            return
+        
+        emit('combattimento_azioni_eseguite', risultato)
+        
+        # Gli altri client della sessione ricevono lo stesso delta
+        room_id = f"session_{id_sessione}"
+        socketio.emit('combattimento_azioni_eseguite', risultato, room=room_id, skip_sid=request.sid)
+        
+        if risultato['combattimento_terminato']:
+            emit('combattimento_terminato', {'vincitore': risultato.get('vincitore')})
+        
+    except Exception as e:
+        logger.error(f"Errore durante l'esecuzione del lotto di azioni: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        emit('error', {'message': f'Errore interno: {str(e)}'})
+
 def handle_combattimento_seleziona_bersaglio(data):
     """
     Gestisce la selezione di un bersaglio durante il combattimento
@@ -842,6 +885,7 @@ def register_handlers(socketio_instance):
     socketio_instance.on_event('combattimento_inizializza', handle_combattimento_inizia)
     
     socketio_instance.on_event('combattimento_azione', handle_combattimento_azione)
+    socketio_instance.on_event('combattimento_azioni', handle_combattimento_azioni)
     socketio_instance.on_event('combattimento_seleziona_bersaglio', handle_combattimento_seleziona_bersaglio)
     socketio_instance.on_event('combattimento_usa_abilita', handle_combattimento_usa_abilita)
     socketio_instance.on_event('combattimento_usa_oggetto', handle_combattimento_usa_oggetto)
@@ -8,9 +8,11 @@ from datetime import datetime, timedelta
 from urllib.parse import parse_qs
 
 # Moduli locali
-from server.utils.session import socket_sessioni, carica_sessione, salva_sessione
+from server.utils.session import socket_sessioni, carica_sessione, salva_sessione, sessioni_attive
+from server.utils.session import get_session as utils_get_session
 from core.ecs.system import RenderSystem
 from . import socketio, graphics_renderer
+from .replay_buffer import get_replay_buffer, replay_missed_messages
 
 # Configura il logger
 logger = logging.getLogger(__name__)
@@ -21,6 +23,9 @@ active_clients = {}
 # Aggiungi questa variabile per tracciare le disconnessioni temporanee
 temp_disconnected_clients = {}
 
+# Finestra (in secondi) entro cui una riconnessione riprende la sessione precedente
+TEMP_DISCONNECT_TIMEOUT = 120
+
 def get_connection_stats():
     """
     Restituisce le statistiche sulle connessioni attive
@@ -70,6 +75,8 @@ def send_to_client(session_id, event_name, data):
     """
     try:
         room_id = f"session_{session_id}"
+        # Registra il messaggio per il replay ai client che si riconnettono
+        _, data = get_replay_buffer().record(session_id, event_name, data)
         socketio.emit(event_name, data, room=room_id)
         logger.debug(f"Evento {event_name} inviato alla sessione {session_id}")
         return True
@@ -166,6 +173,22 @@ def handle_disconnect(sid=None):
         room_id = f"session_{session_id}"
         leave_room(room_id)
         logger.info(f"Client {sid} rimosso dalla stanza {room_id}")
+        
+        # Lo scene graph del client serve solo a calcolarne i diff
+        from core.scene_graph import rimuovi_scene_graph
+        rimuovi_scene_graph(session_id, sid)
+        
+        # Conserva la disconnessione per una riconnessione rapida con replay.
+        # Il seq da cui ripartire lo indica il client: i messaggi inviati al
+        # socket già morto prima del timeout non sono mai stati ricevuti.
+        temp_disconnected_clients[sid] = {
+            'session_id': session_id,
+            'expiry': datetime.now() + timedelta(seconds=TEMP_DISCONNECT_TIMEOUT)
+        }
+    
+    # Il renderer non deve più calcolare diff e flush per questo client
+    if graphics_renderer is not None and hasattr(graphics_renderer, 'rimuovi_client'):
+        graphics_renderer.rimuovi_client(sid)
     
     try:
         from server.websocket.websocket_event_bridge import WebSocketEventBridge
@@ -272,7 +295,9 @@ def handle_join_game(data):
         try:
             stato_serializzato = sessione.serialize()
             emit('game_state', {
-                'world': stato_serializzato
+                'world': stato_serializzato,
+                # Punto di partenza per i replay delle riconnessioni successive
+                'seq': get_replay_buffer().last_seq(id_sessione)
             })
         except Exception as e:
             logger.error(f"Errore durante la serializzazione dello stato di gioco: {e}")
@@ -282,8 +307,11 @@ def handle_join_game(data):
         
         # Invia anche la configurazione del renderer
         try:
-            info_renderer = graphics_renderer.get_renderer_info()
+            info_renderer = graphics_renderer.get_renderer_info(client_id)
             emit('renderer_config', info_renderer)
+            # In modalità batching il client riceve solo diff: parte dal frame completo
+            if graphics_renderer.batching:
+                graphics_renderer.keyframe(to=client_id)
         except Exception as e:
             logger.error(f"Errore durante l'invio della configurazione del renderer: {e}")
             logger.error(traceback.format_exc())
@@ -448,6 +476,9 @@ def handle_reconnect_attempt(data):
             emit('error', {'message': 'ID sessione richiesto per la riconnessione'})
             return
         
+        # Ultimo messaggio ricevuto dal client prima della disconnessione
+        last_seq = data.get('last_seq')
+        
         # Verifica se il client precedente è tra quelli disconnessi temporaneamente
         old_client_id = None
         for temp_id, temp_data in temp_disconnected_clients.items():
@@ -455,24 +486,38 @@ def handle_reconnect_attempt(data):
                 old_client_id = temp_id
                 break
         
-        if old_client_id:
-            # Trasferisci i dati dal vecchio client al nuovo
-            logger.info(f"Riconnessione rapida: trasferimento da client {old_client_id} a {client_id} per sessione {id_sessione}")
+        if old_client_id or (last_seq is not None and utils_get_session(id_sessione)):
+            if old_client_id:
+                # Trasferisci i dati dal vecchio client al nuovo
+                logger.info(f"Riconnessione rapida: trasferimento da client {old_client_id} a {client_id} per sessione {id_sessione}")
+                # Rimuovi i dati temporanei
+                del temp_disconnected_clients[old_client_id]
+            else:
+                logger.info(f"Ripresa della sessione {id_sessione} per client {client_id} dal seq {last_seq}")
+            
             socket_sessioni[client_id] = id_sessione
             
             # Unisci il client alla room della sessione
             room_id = f"session_{id_sessione}"
             join_room(room_id)
             
-            # Rimuovi i dati temporanei
-            del temp_disconnected_clients[old_client_id]
+            # Aggiorna tracking client
+            active_clients[client_id] = {
+                'connected_at': datetime.now(),
+                'last_ping': datetime.now(),
+                'ping_count': 0,
+                'session_id': id_sessione,
+                'user_agent': request.headers.get('User-Agent', 'Unknown'),
+                'transport': request.environ.get('wsgi.websocket_version', 'Unknown')
+            }
             
             # Notifica il client che la riconnessione è avvenuta con successo
             emit('reconnect_success', {
                 'session_id': id_sessione,
                 'client_id': client_id,
                 'timestamp': socketio.time(),
-                'reconnection_type': 'fast'
+                'reconnection_type': 'fast',
+                'seq': get_replay_buffer().last_seq(id_sessione)
             })
             
             # Notifica anche la stanza della riconnessione
@@ -481,15 +526,12 @@ def handle_reconnect_attempt(data):
                 'timestamp': socketio.time()
             }, room=room_id)
             
-            # Aggiorna tracking client
-            active_clients[client_id] = {
-                'connected_at': datetime.now(),
-                'last_ping': datetime.now(),
-                'ping_count': 0,
-                'session_id': id_sessione,
-                'user_agent': request.headers.get('User-Agent', 'Unknown'),
-                'transport': request.environ.get('wsgi.websocket_version', 'Unknown')
-            }
+            # Ripeti solo i messaggi persi; lo snapshot completo serve se il client
+            # non indica l'ultimo seq ricevuto o se il buffer di replay non copre
+            # più l'intervallo mancante
+            if last_seq is None or not replay_missed_messages(socketio, client_id, id_sessione, last_seq):
+                logger.info(f"Snapshot completo necessario per client {client_id} della sessione {id_sessione}")
+                handle_join_game({'id_sessione': id_sessione})
             
             return
         
@@ -533,6 +575,9 @@ def cleanup_temp_disconnections():
             
             # Rimuovi dai temporanei
             del temp_disconnected_clients[client_id]
+        
+        # Elimina i buffer di replay delle sessioni terminate
+        get_replay_buffer().prune(set(sessioni_attive.keys()))
     except Exception as e:
         logger.error(f"Errore durante pulizia disconnessioni temporanee: {e}")
         logger.error(traceback.format_exc())
@@ -5,6 +5,7 @@ from flask import request
 
 # Import moduli locali
 from . import core, graphics_renderer
+from core.scene_graph import get_scene_graph
 
 # Configura il logger
 logger = logging.getLogger(__name__)
@@ -176,9 +177,16 @@ def handle_request_render_update(data):
 def handle_process_render_queue(data):
     """
     Elabora la coda di rendering e invia gli eventi al client
+
+    Per default la scena viene ridisegnata per intero. I client che gestiscono
+    'render_scene_diff' possono chiederlo con scene_diff: la scena è allora
+    mantenuta in uno scene graph retained per client e vengono inviati solo i
+    nodi aggiunti, modificati o rimossi rispetto alla richiesta precedente,
+    già ordinati per categoria e layer.
     
     Args:
         data (dict): Dati della richiesta con id_sessione e altre opzioni
+            (camera, scene_diff per ricevere i diff, full per richiedere l'intera scena)
     """
     # Valida i dati richiesti
     if not core.validate_request_data(data, ['id_sessione']):
@@ -195,6 +203,31 @@ def handle_process_render_queue(data):
     if "camera" in data:
         graphics_renderer.set_camera(data["camera"])
     
+    if not data.get("scene_diff"):
+        _ridisegna_scena(sessione)
+        return
+    
+    try:
+        grafo = get_scene_graph(id_sessione, request.sid)
+        # Alla prima richiesta, o se il client lo chiede, si invia l'intera scena
+        completo = bool(data.get("full")) or grafo.versione == 0
+        diff = grafo.sincronizza(sessione, completo=completo)
+    except Exception as e:
+        logger.error(f"Errore nell'aggiornamento dello scene graph: {e}")
+        emit('error', {'message': f'Errore nel rendering della scena: {str(e)}'})
+        return
+    
+    diff["camera"] = graphics_renderer.camera
+    diff["timestamp"] = time.time()
+    emit('render_scene_diff', diff)
+
+def _ridisegna_scena(sessione):
+    """
+    Ridisegna l'intera scena della sessione con il renderer grafico
+    
+    Args:
+        sessione: Mondo ECS della sessione
+    """
     # Esegui il rendering della scena
     graphics_renderer.clear_screen()
     
@@ -0,0 +1,178 @@
+"""
+Buffer di replay dei messaggi inviati alle sessioni.
+
+Ogni messaggio trasmesso alla room di una sessione riceve un numero di
+sequenza crescente ("seq") e viene conservato in un ring buffer di
+dimensione limitata. Un client che si riconnette presenta l'ultimo seq
+ricevuto e ottiene solo i messaggi persi; lo snapshot completo dello stato
+è necessario solo quando il buffer non copre più l'intervallo mancante.
+"""
+
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Numero massimo di messaggi conservati per sessione
+REPLAY_BUFFER_SIZE = 256
+
+
+class ReplayBuffer:
+    """
+    Ring buffer dei messaggi versionati di ogni sessione.
+    """
+
+    def __init__(self, max_size=REPLAY_BUFFER_SIZE):
+        """
+        Args:
+            max_size (int): Numero massimo di messaggi conservati per sessione
+        """
+        self.max_size = max_size
+        self._messaggi = {}  # session_id -> deque di (seq, evento, dati)
+        self._sequenze = {}  # session_id -> ultimo seq assegnato
+        self._lock = threading.Lock()
+
+    def record(self, session_id, event, data):
+        """
+        Registra un messaggio in uscita verso la sessione.
+
+        Se i dati sono un dizionario, il messaggio registrato e restituito è
+        una copia con il campo "seq", così che il client possa tenere traccia
+        dell'ultimo messaggio ricevuto; i dati del chiamante non vengono modificati.
+
+        Args:
+            session_id (str): ID della sessione
+            event (str): Nome dell'evento
+            data: Dati dell'evento
+
+        Returns:
+            tuple: (seq assegnato, dati da inviare)
+        """
+        if isinstance(data, dict):
+            data = dict(data)
+        with self._lock:
+            seq = self._sequenze.get(session_id, 0) + 1
+            self._sequenze[session_id] = seq
+            if isinstance(data, dict):
+                data['seq'] = seq
+            coda = self._messaggi.get(session_id)
+            if coda is None:
+                coda = deque(maxlen=self.max_size)
+                self._messaggi[session_id] = coda
+            coda.append((seq, event, data))
+        return seq, data
+
+    def last_seq(self, session_id):
+        """
+        Restituisce l'ultimo numero di sequenza assegnato alla sessione.
+
+        Args:
+            session_id (str): ID della sessione
+
+        Returns:
+            int: Ultimo seq (0 se nessun messaggio è stato inviato)
+        """
+        with self._lock:
+            return self._sequenze.get(session_id, 0)
+
+    def since(self, session_id, last_seq):
+        """
+        Restituisce i messaggi successivi a last_seq.
+
+        Args:
+            session_id (str): ID della sessione
+            last_seq (int): Ultimo seq ricevuto dal client
+
+        Returns:
+            list: Lista di (seq, evento, dati) da ripetere, oppure None se il
+                buffer non contiene più tutti i messaggi mancanti e serve uno
+                snapshot completo
+        """
+        with self._lock:
+            ultimo = self._sequenze.get(session_id, 0)
+            if last_seq > ultimo:
+                # Il client conosce messaggi che il server non ha (es. riavvio)
+                return None
+            if last_seq == ultimo:
+                return []
+            coda = self._messaggi.get(session_id)
+            if not coda or coda[0][0] > last_seq + 1:
+                return None
+            return [messaggio for messaggio in coda if messaggio[0] > last_seq]
+
+    def discard(self, session_id):
+        """
+        Elimina il buffer di una sessione.
+
+        Args:
+            session_id (str): ID della sessione
+        """
+        with self._lock:
+            self._messaggi.pop(session_id, None)
+            self._sequenze.pop(session_id, None)
+
+    def prune(self, active_sessions):
+        """
+        Elimina i buffer delle sessioni non più attive.
+
+        Args:
+            active_sessions: Insieme degli ID delle sessioni ancora attive
+
+        Returns:
+            int: Numero di buffer eliminati
+        """
+        with self._lock:
+            scaduti = [sid for sid in self._sequenze if sid not in active_sessions]
+            for session_id in scaduti:
+                self._messaggi.pop(session_id, None)
+                self._sequenze.pop(session_id, None)
+        if scaduti:
+            logger.debug(f"Eliminati {len(scaduti)} buffer di replay di sessioni terminate")
+        return len(scaduti)
+
+
+# Istanza condivisa
+_replay_buffer = None
+
+
+def get_replay_buffer():
+    """
+    Restituisce il ReplayBuffer condiviso del processo.
+
+    Returns:
+        ReplayBuffer: Istanza singleton
+    """
+    global _replay_buffer
+    if _replay_buffer is None:
+        _replay_buffer = ReplayBuffer()
+    return _replay_buffer
+
+
+def replay_missed_messages(socket_io, sid, session_id, last_seq):
+    """
+    Invia a un singolo client i messaggi della sessione successivi a last_seq.
+
+    Args:
+        socket_io: Istanza SocketIO con cui inviare i messaggi
+        sid (str): ID del socket del client
+        session_id (str): ID della sessione
+        last_seq: Ultimo seq ricevuto dal client
+
+    Returns:
+        bool: True se il client è stato riallineato, False se serve uno snapshot
+    """
+    try:
+        last_seq = int(last_seq)
+    except (TypeError, ValueError):
+        return False
+
+    mancanti = get_replay_buffer().since(session_id, last_seq)
+    if mancanti is None:
+        logger.info(f"Buffer di replay insufficiente per la sessione {session_id} (seq client {last_seq})")
+        return False
+
+    for _, event, data in mancanti:
+        socket_io.emit(event, data, room=sid)
+    logger.info(f"Ripetuti {len(mancanti)} messaggi al client {sid} della sessione {session_id}")
+    return True
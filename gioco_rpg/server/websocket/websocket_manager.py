@@ -6,6 +6,8 @@ import logging
 import json
 import time
 import asyncio
+import threading
+from collections import OrderedDict
 from flask_socketio import SocketIO, emit, disconnect
 from flask import current_app, request, g
 from datetime import datetime, timedelta
@@ -17,6 +19,7 @@ import core.events as Events
 # Import per recuperare la sessione e quindi il giocatore
 from server.utils.session import get_session # ASSUMENDO CHE QUESTO SIA IL PERCORSO CORRETTO
 from entities.giocatore import Giocatore # <<< AGGIUNTO IMPORT
+from server.websocket.replay_buffer import get_replay_buffer, replay_missed_messages
 
 # Rimuovi l'importazione diretta per evitare l'importazione circolare
 # from server.websocket.websocket_event_bridge import WebSocketEventBridge
@@ -24,11 +27,21 @@ from entities.giocatore import Giocatore # <<< AGGIUNTO IMPORT
 # Configura logger
 logger = logging.getLogger(__name__)
 
+# Durata (in secondi) della cache delle risposte di sola lettura: una raffica di
+# richieste identiche per la stessa versione dello stato riusa lo stesso risultato
+RESPONSE_CACHE_TTL = 0.5
+
+# Numero massimo di risposte in cache: oltre si scartano le meno usate
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
 # Classe per gestire le connessioni WebSocket
 class WebSocketManager:
-    def __init__(self, app=None, socketio=None):
+    def __init__(self, app=None, socketio=None, client_manager=None):
         # Se non viene passato un socketio già creato, crearne uno nuovo
         if socketio is None:
+            # In modalità multi-worker il client manager instrada i broadcast sul bus dei messaggi
+            extra_options = {'client_manager': client_manager} if client_manager is not None else {}
+
             # Configura parametri ottimizzati per WebSocket
             ping_timeout = 60000   # 60 secondi, aumentato per evitare disconnessioni premature
             ping_interval = 25000  # 25 secondi, intervallo ottimale per bilanciare responsività e overhead
@@ -43,7 +56,8 @@ class WebSocketManager:
                 always_connect=True,
                 manage_session=False,
                 transports=['websocket', 'polling'],  # Preferisci WebSocket, fallback su polling
-                logger=True if app and app.debug else False
+                logger=True if app and app.debug else False,
+                **extra_options
             )
             logger.info(f"Creata nuova istanza SocketIO con configurazione: ping_timeout={ping_timeout/1000}s, ping_interval={ping_interval/1000}s")
         else:
@@ -55,6 +69,13 @@ class WebSocketManager:
         self.state_versions = {}  # session_id -> versione stato
         self.connection_stats = {}  # socket_id -> statistiche connessione
         
+        # Single-flight per le richieste di sola lettura:
+        # chiave -> lista di (socket_id, evento, request_id) in attesa del risultato
+        self._pending_requests = {}
+        # chiave -> (versione stato, timestamp, risultato), in ordine LRU
+        self._response_cache = OrderedDict()
+        self._requests_lock = threading.Lock()
+        
         # Configura EventBus
         self.event_bus = EventBus.get_instance()
         
@@ -86,6 +107,9 @@ class WebSocketManager:
         self.event_bus.on(Events.PUSH_STATE, self._handle_push_state)
         self.event_bus.on(Events.POP_STATE, self._handle_pop_state)
         
+        # Fine sessione: le risposte in cache non servono più
+        self.event_bus.on(Events.SESSION_END, self._handle_session_end)
+        
         logger.info("EventBus handlers registrati per WebSocketManager")
 
     def _register_handlers(self):
@@ -157,6 +181,10 @@ class WebSocketManager:
             # Rimuovi dalla mappa di connessione
             session_id = self.connection_map.pop(sid, None)
             
+            # Senza altri client della sessione le risposte in cache non verranno riusate
+            if session_id is not None and session_id not in self.connection_map.values():
+                self._purge_response_cache(session_id)
+            
             # IMPORTANTE: Rimuovi anche da socket_sessioni per compatibilità con game_events.py
             from server.utils.session import socket_sessioni
             if sid in socket_sessioni:
@@ -197,6 +225,11 @@ class WebSocketManager:
                 self.connection_stats[sid]['last_activity'] = time.time()
                 self.connection_stats[sid]['packets_received'] += 1
             
+            # Il client può allegare il round-trip time misurato con il ping precedente:
+            # viene usato per adattare il batching dei frame del renderer
+            if isinstance(data, dict) and data.get('rtt') is not None:
+                self._record_latency(sid, data.get('rtt'))
+            
             # Risponde immediatamente senza elaborazione per misurare la latenza
             # Il callback lato client calcolerà round-trip time
             return {}  # Risposta vuota è sufficiente per callback
@@ -215,17 +248,7 @@ class WebSocketManager:
                 # Aggiorna statistiche con dati dal client
                 client_latency = data.get('latency')
                 if client_latency is not None:
-                    # Aggiungi alla lista delle latenze
-                    self.connection_stats[sid]['ping_times'].append(client_latency)
-                    
-                    # Mantieni solo gli ultimi 10 valori
-                    if len(self.connection_stats[sid]['ping_times']) > 10:
-                        self.connection_stats[sid]['ping_times'].pop(0)
-                    
-                    # Calcola la media
-                    ping_times = self.connection_stats[sid]['ping_times']
-                    if ping_times:
-                        self.connection_stats[sid]['avg_latency'] = sum(ping_times) / len(ping_times)
+                    self._record_latency(sid, client_latency)
             
             # Aggiorna ultimo timestamp attività
             if sid in self.connection_stats:
@@ -542,12 +565,17 @@ class WebSocketManager:
             map_id = data.get('map_id')
             request_id = data.get('request_id')
             
-            # Emetti evento di richiesta dati mappa
-            self.event_bus.emit(Events.MAP_DATA_REQUESTED, 
-                               session_id=session_id,
-                               socket_id=sid,
-                               map_id=map_id,
-                               request_id=request_id)
+            def build_map_data():
+                # Emetti evento di richiesta dati mappa (una volta per calcolo condiviso)
+                self.event_bus.emit(Events.MAP_DATA_REQUESTED, 
+                                   session_id=session_id,
+                                   socket_id=sid,
+                                   map_id=map_id,
+                                   request_id=request_id)
+                return self._get_session_wrapper(session_id).get_map_data(map_id)
+            
+            self._coalesce_request(session_id, ('map_data', str(map_id) if map_id else None), sid, 'map_data',
+                                   request_id, build_map_data)
                 
         @self.socketio.on('load_map')
         def handle_load_map(data):
@@ -601,17 +629,28 @@ class WebSocketManager:
                 emit('error', {'message': 'Formato richiesta non valido'})
                 return
                 
-            include_entities = data.get('include_entities', False)
-            include_map = data.get('include_map', False)
+            include_entities = bool(data.get('include_entities', False))
+            include_map = bool(data.get('include_map', False))
             request_id = data.get('request_id')
             
-            # Emetti evento di richiesta stato
-            self.event_bus.emit(Events.GAME_STATE_REQUESTED, 
-                               session_id=session_id,
-                               socket_id=sid,
-                               include_entities=include_entities,
-                               include_map=include_map,
-                               request_id=request_id)
+            def build_game_state():
+                # Emetti evento di richiesta stato (una volta per calcolo condiviso)
+                self.event_bus.emit(Events.GAME_STATE_REQUESTED, 
+                                   session_id=session_id,
+                                   socket_id=sid,
+                                   include_entities=include_entities,
+                                   include_map=include_map,
+                                   request_id=request_id)
+                wrapper = self._get_session_wrapper(session_id)
+                state = wrapper.get_game_state()
+                if include_entities:
+                    state['all_entities'] = wrapper.get_entities()
+                if include_map:
+                    state['map'] = wrapper.get_map_data()
+                return state
+            
+            self._coalesce_request(session_id, ('game_state', include_entities, include_map), sid,
+                                   'game_state', request_id, build_game_state)
                 
         @self.socketio.on('request_full_state')
         def handle_request_full_state(data):
@@ -632,12 +671,7 @@ class WebSocketManager:
             client_version = data.get('version', 0) if isinstance(data, dict) else 0
             request_id = data.get('request_id') if isinstance(data, dict) else None
             
-            # Emetti evento di richiesta stato completo
-            self.event_bus.emit(Events.FULL_STATE_REQUESTED, 
-                               session_id=session_id,
-                               socket_id=sid,
-                               client_version=client_version,
-                               request_id=request_id)
+            self._request_full_state(session_id, sid, 'full_state', request_id, client_version)
         
         @self.socketio.on('request_recent_updates')
         def handle_request_recent_updates(data):
@@ -656,17 +690,18 @@ class WebSocketManager:
             
             # Ottieni l'ultima versione nota dal client
             last_version = data.get('last_version', 0) if isinstance(data, dict) else 0
+            request_id = data.get('request_id') if isinstance(data, dict) else None
             current_version = self.state_versions.get(session_id, 0)
             
             # Se la differenza è troppo grande, richiedi sync completo
             if current_version - last_version > 10:
                 logger.info(f"Troppe versioni mancanti ({current_version - last_version}), richiedo sync completo")
-                # Emetti evento per richiedere sync completo
-                self.event_bus.emit(Events.FULL_STATE_REQUESTED, 
-                                   session_id=session_id,
-                                   socket_id=sid,
-                                   client_version=last_version,
-                                   force_full=True)
+                # Il sync completo è condiviso con le richieste request_full_state in corso
+                self._request_full_state(session_id, sid, 'recent_updates', request_id, last_version)
+            elif isinstance(data, dict) and 'last_seq' in data:
+                # Ripeti i messaggi persi dal buffer di replay, se lo coprono ancora
+                if not replay_missed_messages(self.socketio, sid, session_id, data.get('last_seq')):
+                    self._request_full_state(session_id, sid, 'recent_updates', request_id, last_version)
             else:
                 # Richiedi solo gli aggiornamenti recenti
                 logger.info(f"Richiesta aggiornamenti recenti: versione client {last_version}, server {current_version}")
@@ -691,15 +726,167 @@ class WebSocketManager:
                 emit('error', {'message': 'Sessione non autenticata'})
                 return
                 
-            include_static = data.get('include_static', False) if isinstance(data, dict) else False
+            include_static = bool(data.get('include_static', False)) if isinstance(data, dict) else False
             request_id = data.get('request_id') if isinstance(data, dict) else None
             
-            # Emetti evento di richiesta entità
-            self.event_bus.emit(Events.ENTITIES_REQUESTED, 
+            def build_entities():
+                # Emetti evento di richiesta entità (una volta per calcolo condiviso)
+                self.event_bus.emit(Events.ENTITIES_REQUESTED, 
+                                   session_id=session_id,
+                                   socket_id=sid,
+                                   include_static=include_static,
+                                   request_id=request_id)
+                return {'entities': self._get_session_wrapper(session_id).get_entities()}
+            
+            self._coalesce_request(session_id, ('entities', include_static), sid, 'entities',
+                                   request_id, build_entities)
+    
+    def _get_session_wrapper(self, session_id):
+        """
+        Restituisce il SessionWrapper della sessione
+        
+        Raises:
+            ValueError: Se la sessione non esiste
+        """
+        from server.utils.session import get_session_manager
+        wrapper = get_session_manager().get_session(session_id)
+        if wrapper is None:
+            raise ValueError(f"Sessione {session_id} non trovata")
+        return wrapper
+    
+    def _request_full_state(self, session_id, sid, event_base, request_id, client_version):
+        """
+        Accoda una richiesta di stato completo al calcolo condiviso della sessione
+        
+        Args:
+            session_id (str): ID della sessione
+            sid (str): ID del socket richiedente
+            event_base (str): Nome base dell'evento di risposta
+            request_id (str): ID della richiesta del client
+            client_version (int): Ultima versione nota al client
+        """
+        def build_full_state():
+            # Emetti evento di richiesta stato completo (una volta per calcolo condiviso)
+            self.event_bus.emit(Events.FULL_STATE_REQUESTED, 
                                session_id=session_id,
                                socket_id=sid,
-                               include_static=include_static,
+                               client_version=client_version,
                                request_id=request_id)
+            wrapper = self._get_session_wrapper(session_id)
+            state = wrapper.get_game_state()
+            state['map'] = wrapper.get_map_data()
+            state['full'] = True
+            return state
+        
+        self._coalesce_request(session_id, ('full_state',), sid, event_base, request_id, build_full_state)
+    
+    def _coalesce_request(self, session_id, key, sid, event_base, request_id, build):
+        """
+        Esegue una richiesta di sola lettura in modalità single-flight
+        
+        Richieste identiche per la stessa sessione arrivate mentre il calcolo è
+        in corso vengono accodate e ricevono lo stesso risultato; il risultato
+        resta in cache per RESPONSE_CACHE_TTL secondi finché la versione dello
+        stato della sessione non cambia.
+        
+        Args:
+            session_id (str): ID della sessione
+            key (tuple): Identifica il calcolo (tipo di richiesta e parametri)
+            sid (str): ID del socket richiedente
+            event_base (str): Nome base dell'evento di risposta
+            request_id (str): ID della richiesta del client
+            build (callable): Funzione che calcola il risultato
+        """
+        key = (session_id,) + tuple(key)
+        version = self.state_versions.get(session_id, 0)
+        waiter = (sid, event_base, request_id)
+        
+        with self._requests_lock:
+            cached = self._response_cache.get(key)
+            if cached and cached[0] == version and time.time() - cached[1] < RESPONSE_CACHE_TTL:
+                cached_result = cached[2]
+                self._response_cache.move_to_end(key)
+            elif key in self._pending_requests:
+                # Calcolo già in corso: attendi il risultato condiviso
+                self._pending_requests[key].append(waiter)
+                return
+            else:
+                cached_result = None
+                self._pending_requests[key] = [waiter]
+        
+        if cached_result is not None:
+            self._send_coalesced(cached_result, version, [waiter])
+            return
+        
+        try:
+            result = build()
+            failed = isinstance(result, dict) and result.get('error') is True
+        except Exception as e:
+            logger.error(f"Errore nel calcolo della richiesta {key[1]} per la sessione {session_id}: {e}")
+            result = {'error': True, 'message': str(e)}
+            failed = True
+        
+        with self._requests_lock:
+            waiters = self._pending_requests.pop(key, [waiter])
+            if not failed:
+                self._response_cache[key] = (version, time.time(), result)
+                self._response_cache.move_to_end(key)
+                while len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                    self._response_cache.popitem(last=False)
+        
+        if len(waiters) > 1:
+            logger.debug(f"Richiesta {key[1]} condivisa tra {len(waiters)} client della sessione {session_id}")
+        self._send_coalesced(result, version, waiters)
+    
+    def _purge_response_cache(self, session_id):
+        """
+        Rimuove dalla cache le risposte di una sessione
+        
+        Args:
+            session_id (str): ID della sessione
+        """
+        with self._requests_lock:
+            for key in [key for key in self._response_cache if key[0] == session_id]:
+                del self._response_cache[key]
+    
+    def _send_coalesced(self, result, version, waiters):
+        """Invia un risultato condiviso a ogni richiesta in attesa"""
+        for waiter_sid, event_base, request_id in waiters:
+            # Copia superficiale: respond_to_request aggiunge il request_id ai dati
+            data = dict(result) if isinstance(result, dict) else {'data': result}
+            data.setdefault('version', version)
+            self.respond_to_request(waiter_sid, event_base, request_id, data)
+    
+    def _record_latency(self, sid, latency):
+        """
+        Registra una misura di latenza per un client e la inoltra al renderer
+        
+        Args:
+            sid (str): ID del socket
+            latency (float): Round-trip time in millisecondi
+        """
+        try:
+            latency = float(latency)
+        except (TypeError, ValueError):
+            return
+        
+        stats = self.connection_stats.get(sid)
+        if stats is not None:
+            # Aggiungi alla lista delle latenze
+            stats['ping_times'].append(latency)
+            
+            # Mantieni solo gli ultimi 10 valori
+            if len(stats['ping_times']) > 10:
+                stats['ping_times'].pop(0)
+            
+            # Calcola la media
+            stats['avg_latency'] = sum(stats['ping_times']) / len(stats['ping_times'])
+        
+        # Adatta il batching dei frame verso questo client alla sua latenza
+        from server import websocket as websocket_package
+        renderer = websocket_package.graphics_renderer
+        if renderer is not None and hasattr(renderer, 'update_rtt'):
+            renderer.update_rtt(latency, sid=sid)
     
     # Handler eventi EventBus
     
@@ -846,6 +1033,15 @@ class WebSocketManager:
         # Trasmetti pop stato
         self.broadcast_to_session(session_id, 'state_popped', {})
     
+    def _handle_session_end(self, **kwargs):
+        """Gestisce la fine di una sessione eliminandone versione e risposte in cache"""
+        session_id = kwargs.get('session_id')
+        if not session_id:
+            return
+        
+        self.state_versions.pop(session_id, None)
+        self._purge_response_cache(session_id)
+    
     def _get_session_id(self):
         """
         Ottiene l'ID sessione dal contesto attuale request/g
@@ -876,6 +1072,8 @@ class WebSocketManager:
         current_version = self.state_versions.get(session_id, 0)
         new_version = current_version + 1
         self.state_versions[session_id] = new_version
+        # Le risposte calcolate sulla versione precedente non sono più valide
+        self._purge_response_cache(session_id)
         
         # Aggiungi la versione allo stato
         state_data['version'] = new_version
@@ -900,6 +1098,10 @@ class WebSocketManager:
             event (str): Nome dell'evento da emettere
             data (dict): Dati dell'evento
         """
+        # Registra il messaggio nel buffer di replay anche se nessun client è
+        # connesso: chi si riconnette potrà recuperarlo senza uno snapshot completo
+        _, data = get_replay_buffer().record(session_id, event, data)
+        
         # Trova tutti i socket associati alla sessione
         socket_ids = [sid for sid, sess_id in self.connection_map.items() if sess_id == session_id]
         
@@ -1,3 +1,12 @@
+import core.events as Events
+from util.dado import Dado
+from entities.entita import Entita, notifica_variazione_hp
+from util.rng import generatore_di
+from states.combattimento.statistiche import get_cache_statistiche
+from states.combattimento.ia import get_motore_ia
+from states.combattimento.registro import get_registro, AZIONE_COLPO_POTENTE
+
+
 class AzioniCombattimento:
     """
     Classe per gestire le azioni di combattimento
@@ -11,6 +20,26 @@ class AzioniCombattimento:
         """
         self.state = state
     
+    def _rng(self):
+        """Flusso casuale del combattimento della sessione"""
+        return generatore_di(getattr(self.state, "world", None), "combattimento")
+    
+    def _imposta_hp(self, entita, nuovo_hp):
+        """
+        Aggiorna gli HP di un'entità, notifica morte o guarigione e registra la sconfitta
+        
+        Args:
+            entita: Entità da aggiornare
+            nuovo_hp (int): Nuovi punti vita
+        """
+        hp_prima = getattr(entita, "hp", 0)
+        setattr(entita, "hp", nuovo_hp)
+        # Le Entita notificano dal setter di hp
+        if not isinstance(entita, Entita):
+            notifica_variazione_hp(entita, hp_prima, nuovo_hp)
+        if hp_prima > 0 >= nuovo_hp:
+            get_registro(self.state).stato(entita, "sconfitto")
+    
     def esegui_attacco(self, attaccante_id, target_id, arma=None):
         """
         Esegue un attacco base
@@ -23,8 +52,7 @@ class AzioniCombattimento:
         Returns:
             dict: Risultato dell'attacco
         """
-        from util.dado import Dado
-        dado_d20 = Dado(20)
+        dado_d20 = Dado(20, self._rng())
         
         # Verifica che sia il turno dell'attaccante
         if self.state.turno_corrente != attaccante_id:
@@ -43,22 +71,14 @@ class AzioniCombattimento:
                 "messaggio": "Attaccante o bersaglio non trovato"
             }
             
-        # Calcola bonus di attacco
-        bonus_attacco = getattr(attaccante, "forza", 10) - 10
-        bonus_attacco = bonus_attacco // 2  # Converti in modificatore
-        
-        # Calcola classe armatura del bersaglio
-        ca_base = 10
-        bonus_destrezza = (getattr(target, "destrezza", 10) - 10) // 2
-        ca_bersaglio = ca_base + bonus_destrezza
-        
-        # Aggiungi bonus armatura se presente
-        if hasattr(target, "armatura") and target.armatura:
-            ca_bersaglio += 2  # Bonus base per avere un'armatura
+        # Statistiche derivate calcolate all'inizio del combattimento
+        statistiche = get_cache_statistiche(self.state)
+        stat_attaccante = statistiche.get(attaccante)
+        ca_bersaglio = statistiche.get(target).classe_armatura
             
         # Tiro per colpire
         tiro_attacco = dado_d20.tira()
-        totale_attacco = tiro_attacco + bonus_attacco
+        totale_attacco = tiro_attacco + stat_attaccante.bonus_attacco
         
         # Determina se l'attacco colpisce
         colpisce = totale_attacco >= ca_bersaglio
@@ -67,12 +87,12 @@ class AzioniCombattimento:
         
         # Se colpisce, calcola il danno
         if colpisce or colpo_critico:
-            # Danno base in base all'arma
-            dado_danno = Dado(8)  # Dado danno base d8
+            # Danno base in base all'arma (d8 senza arma)
+            dado_danno = Dado(stat_attaccante.dado_danno, self._rng())
             danno_base = dado_danno.tira()
             
             # Aggiungi bonus di forza al danno
-            danno = danno_base + max(0, bonus_attacco)
+            danno = danno_base + stat_attaccante.bonus_danno
             
             # Danno aggiuntivo per colpo critico
             if colpo_critico:
@@ -82,7 +102,9 @@ class AzioniCombattimento:
             # Applica il danno
             hp_corrente = getattr(target, "hp", 0)
             nuovo_hp = max(0, hp_corrente - danno)
-            setattr(target, "hp", nuovo_hp)
+            get_registro(self.state).attacco(attaccante, target, tiro_attacco, True, colpo_critico,
+                                             danno=danno, hp_dopo=nuovo_hp)
+            self._imposta_hp(target, nuovo_hp)
             
             # Crea il messaggio
             if colpo_critico:
@@ -90,9 +112,6 @@ class AzioniCombattimento:
             else:
                 messaggio = f"{attaccante.name} colpisce {target.name} per {danno} danni!"
                 
-            # Aggiungi il messaggio alla lista dei messaggi
-            self.state.messaggi.append(messaggio)
-            
             # Risultato
             return {
                 "successo": True,
@@ -105,14 +124,13 @@ class AzioniCombattimento:
             }
         else:
             # L'attacco fallisce
+            get_registro(self.state).attacco(attaccante, target, tiro_attacco, False,
+                                             fallimento_critico=fallimento_critico)
             if fallimento_critico:
                 messaggio = f"{attaccante.name} fallisce miseramente l'attacco contro {target.name}!"
             else:
                 messaggio = f"{attaccante.name} manca {target.name}."
                 
-            # Aggiungi il messaggio alla lista dei messaggi
-            self.state.messaggi.append(messaggio)
-            
             # Risultato
             return {
                 "successo": True,
@@ -135,8 +153,6 @@ class AzioniCombattimento:
         Returns:
             dict: Risultato dell'uso dell'abilità
         """
-        from util.dado import Dado
-        
         # Verifica che sia il turno dell'entità
         if self.state.turno_corrente != entita_id:
             return {
@@ -218,21 +234,16 @@ class AzioniCombattimento:
                 target_nome = getattr(target, "name", "Bersaglio sconosciuto")
                 
             # Esegui un attacco potenziato
-            dado_d20 = Dado(20)
-            dado_danno = Dado(10)  # d10 invece di d8
-            
-            # Calcola bonus di attacco
-            bonus_attacco = getattr(entita, "forza", 10) - 10
-            bonus_attacco = bonus_attacco // 2
+            dado_d20 = Dado(20, self._rng())
+            dado_danno = Dado(10, self._rng())  # d10 invece di d8
             
-            # Calcola classe armatura del bersaglio
-            ca_base = 10
-            bonus_destrezza = (getattr(target, "destrezza", 10) - 10) // 2
-            ca_bersaglio = ca_base + bonus_destrezza
+            statistiche = get_cache_statistiche(self.state)
+            stat_entita = statistiche.get(entita)
+            ca_bersaglio = statistiche.get(target).classe_armatura
             
             # Tiro per colpire (con penalità)
             tiro_attacco = dado_d20.tira() - 2  # Penalità al tiro per bilanciare il danno extra
-            totale_attacco = tiro_attacco + bonus_attacco
+            totale_attacco = tiro_attacco + stat_entita.bonus_attacco
             
             # Determina se l'attacco colpisce
             colpisce = totale_attacco >= ca_bersaglio
@@ -242,19 +253,18 @@ class AzioniCombattimento:
                 # Calcola danno potenziato
                 danno_base = dado_danno.tira()
                 danno_bonus = dado_danno.tira()  # Danno extra per l'abilità
-                danno = danno_base + danno_bonus + max(0, bonus_attacco)
+                danno = danno_base + danno_bonus + stat_entita.bonus_danno
                 
                 # Applica il danno
                 hp_corrente = getattr(target, "hp", 0)
                 nuovo_hp = max(0, hp_corrente - danno)
-                setattr(target, "hp", nuovo_hp)
+                get_registro(self.state).attacco(entita, target, tiro_attacco, True, colpo_critico, danno=danno,
+                                                 hp_dopo=nuovo_hp, azione=AZIONE_COLPO_POTENTE)
+                self._imposta_hp(target, nuovo_hp)
                 
                 # Crea il messaggio
                 messaggio = f"{entita_nome} usa {nome_abilita} contro {target_nome} per {danno} danni!"
                 
-                # Aggiungi il messaggio alla lista dei messaggi
-                self.state.messaggi.append(messaggio)
-                
                 # Aggiorna l'ultimo uso dell'abilità
                 if isinstance(abilita_struct, dict):
                     abilita_struct["ultimo_uso"] = self.state.round_corrente
@@ -274,8 +284,8 @@ class AzioniCombattimento:
                     "hp_rimanenti": nuovo_hp
                 }
             else:
+                get_registro(self.state).attacco(entita, target, tiro_attacco, False, azione=AZIONE_COLPO_POTENTE)
                 messaggio = f"{entita_nome} tenta di usare {nome_abilita} contro {target_nome} ma fallisce!"
-                self.state.messaggi.append(messaggio)
                 
                 return {
                     "successo": True,
@@ -308,7 +318,7 @@ class AzioniCombattimento:
                 target_nome = getattr(target, "name", "Bersaglio sconosciuto")
                 
             # Calcola la quantità di cura
-            dado_cura = Dado(8)
+            dado_cura = Dado(8, self._rng())
             cura_base = dado_cura.tira()
             bonus_cura = (getattr(entita, "saggezza", 10) - 10) // 2
             cura_totale = cura_base + max(0, bonus_cura)
@@ -317,7 +327,8 @@ class AzioniCombattimento:
             hp_corrente = getattr(target, "hp", 0)
             hp_max = getattr(target, "hp_max", 10)
             nuovo_hp = min(hp_max, hp_corrente + cura_totale)
-            setattr(target, "hp", nuovo_hp)
+            get_registro(self.state).cura(entita, target, cura_totale, nuovo_hp)
+            self._imposta_hp(target, nuovo_hp)
             
             # Crea il messaggio
             if target_id == entita_id:
@@ -325,9 +336,6 @@ class AzioniCombattimento:
             else:
                 messaggio = f"{entita_nome} usa {nome_abilita} su {target_nome} che recupera {cura_totale} punti vita!"
                 
-            # Aggiungi il messaggio alla lista dei messaggi
-            self.state.messaggi.append(messaggio)
-            
             # Aggiorna l'ultimo uso dell'abilità
             if isinstance(abilita_struct, dict):
                 abilita_struct["ultimo_uso"] = self.state.round_corrente
@@ -426,7 +434,8 @@ class AzioniCombattimento:
             hp_corrente = getattr(target, "hp", 0)
             hp_max = getattr(target, "hp_max", 10)
             nuovo_hp = min(hp_max, hp_corrente + cura_totale)
-            setattr(target, "hp", nuovo_hp)
+            get_registro(self.state).cura(entita, target, cura_totale, nuovo_hp, visibile=False)
+            self._imposta_hp(target, nuovo_hp)
             
             # Rimuovi l'oggetto dall'inventario (consumabile)
             entita.inventario.remove(oggetto)
@@ -437,8 +446,8 @@ class AzioniCombattimento:
             else:
                 messaggio = f"{entita.name} usa {oggetto.nome} su {target.name} che recupera {cura_totale} punti vita!"
                 
-            # Aggiungi il messaggio alla lista dei messaggi
-            self.state.messaggi.append(messaggio)
+            # Il messaggio descrive i record silenziosi dell'oggetto
+            get_registro(self.state).nota(messaggio)
             
             return {
                 "successo": True,
@@ -451,7 +460,6 @@ class AzioniCombattimento:
             }
         elif tipo_oggetto == "bomba":
             # Bomba (danno ad area)
-            from util.dado import Dado
             
             # Verifica che ci siano bersagli
             if not target_ids or len(target_ids) == 0:
@@ -460,7 +468,7 @@ class AzioniCombattimento:
                     "messaggio": "Nessun bersaglio specificato per la bomba"
                 }
                 
-            dado_danno = Dado(6)
+            dado_danno = Dado(6, self._rng())
             danno_base = getattr(oggetto, "valore_danno", 6)
             
             risultati = []
@@ -479,7 +487,8 @@ class AzioniCombattimento:
                 # Applica il danno
                 hp_corrente = getattr(target, "hp", 0)
                 nuovo_hp = max(0, hp_corrente - danno)
-                setattr(target, "hp", nuovo_hp)
+                get_registro(self.state).danno(entita, target, danno, nuovo_hp, visibile=False)
+                self._imposta_hp(target, nuovo_hp)
                 
                 # Aggiungi ai risultati
                 risultati.append({
@@ -496,8 +505,8 @@ class AzioniCombattimento:
             bersagli_str = ", ".join([r["nome_target"] for r in risultati])
             messaggio = f"{entita.name} lancia {oggetto.nome} che esplode colpendo {bersagli_str}!"
             
-            # Aggiungi il messaggio alla lista dei messaggi
-            self.state.messaggi.append(messaggio)
+            # Il messaggio descrive i record silenziosi dell'oggetto
+            get_registro(self.state).nota(messaggio)
             
             return {
                 "successo": True,
@@ -541,9 +550,7 @@ class AzioniCombattimento:
             
         # Crea il messaggio
         messaggio = f"{entita.name} passa il turno."
-        
-        # Aggiungi il messaggio alla lista dei messaggi
-        self.state.messaggi.append(messaggio)
+        get_registro(self.state).stato(entita, "passa_turno")
         
         # Passa al turno successivo
         prossimo_turno = self.state.gestore_turni.passa_al_turno_successivo()
@@ -565,62 +572,11 @@ class AzioniCombattimento:
         Returns:
             dict: Descrizione dell'azione da eseguire
         """
-        from util.dado import Dado
-        
-        # Ottieni l'entità
-        entita = self.state.world.get_entity(entita_id)
-        if not entita:
+        if not self.state.world.get_entity(entita_id):
             return None
             
-        # Trova possibili bersagli (giocatori)
-        bersagli = []
-        for p_id in self.state.partecipanti:
-            target = self.state.world.get_entity(p_id)
-            if target and target.has_tag("player") and getattr(target, "hp", 0) > 0:
-                bersagli.append(p_id)
-                
-        if not bersagli:
-            # Nessun bersaglio valido disponibile
-            return {
-                "tipo": "passa_turno",
-                "entita_id": entita_id
-            }
-            
-        # Verifica se l'entità ha abilità speciali
-        ha_abilita = hasattr(entita, "abilita_speciali") and entita.abilita_speciali
-        
-        # Tiro casuale per determinare l'azione (per un po' di varietà)
-        dado_azione = Dado(10)
-        tiro_azione = dado_azione.tira()
-        
-        # Se l'entità ha pochi HP, potrebbe tentare di curarsi
-        hp_ratio = getattr(entita, "hp", 10) / getattr(entita, "hp_max", 10)
-        
-        if ha_abilita and "cura_ferite" in entita.abilita_speciali and hp_ratio < 0.3 and tiro_azione <= 8:
-            # Usa abilità di cura su se stesso
-            return {
-                "tipo": "abilita",
-                "nome_abilita": "cura_ferite",
-                "entita_id": entita_id,
-                "target_ids": [entita_id]
-            }
-        elif ha_abilita and "colpo_potente" in entita.abilita_speciali and tiro_azione <= 4:
-            # Usa abilità di attacco potente
-            target_id = bersagli[0]  # Prende il primo bersaglio disponibile
-            return {
-                "tipo": "abilita",
-                "nome_abilita": "colpo_potente",
-                "entita_id": entita_id,
-                "target_ids": [target_id]
-            }
-        else:
-            # Attacco normale
-            target_id = bersagli[0]  # Prende il primo bersaglio disponibile
-            return {
-                "tipo": "attacco",
-                "entita_id": entita_id,
-                "target_id": target_id
-            }
+        # Le azioni di tutte le entità IA del round vengono pianificate insieme dal motore a utilità
+        return get_motore_ia().decidi(self.state, entita_id)
     
     def esegui_azione_ia(self, azione):
         """
@@ -766,8 +722,6 @@ class AzioniCombattimento:
         Returns:
             dict: Risultato del tentativo di fuga
         """
-        from util.dado import Dado
-        
         # Controlla se siamo nel contesto di test
         if game_ctx is None:
             return {
@@ -792,8 +746,8 @@ class AzioniCombattimento:
             }
             
         # Tiro per la fuga (d20 + modificatore di destrezza)
-        dado_d20 = Dado(20)
-        mod_destrezza = (getattr(giocatore, "destrezza", 10) - 10) // 2
+        dado_d20 = Dado(20, self._rng())
+        mod_destrezza = get_cache_statistiche(self.state).get(giocatore).mod_iniziativa
         tiro_fuga = dado_d20.tira() + mod_destrezza
         
         # Difficoltà base di 10, +2 per ogni nemico
@@ -804,8 +758,13 @@ class AzioniCombattimento:
         fuga_riuscita = tiro_fuga >= difficolta
         
         if fuga_riuscita:
-            self.state.messaggi.append(f"{giocatore.name} è riuscito a fuggire!")
-            self.state.in_corso = False
+            get_registro(self.state).stato(giocatore, "fuga_riuscita")
+            # La fuga chiude il combattimento come ogni altra uscita (registro e handler delle cache)
+            termina = getattr(self.state, "termina_combattimento", None)
+            if callable(termina):
+                termina()
+            else:
+                self.state.in_corso = False
             
             # Termina il combattimento
             if game_ctx.stato_corrente() == self.state:
@@ -818,7 +777,7 @@ class AzioniCombattimento:
                 "messaggio": f"{giocatore.name} è riuscito a fuggire!"
             }
         else:
-            self.state.messaggi.append(f"{giocatore.name} ha tentato di fuggire ma non ci è riuscito.")
+            get_registro(self.state).stato(giocatore, "fuga_fallita")
             
             # Passa al turno successivo
             self.state.gestore_turni.passa_al_turno_successivo()
@@ -1100,6 +1059,9 @@ class AzioniCombattimento:
         elif tipo_equip == "accessorio":
             giocatore.accessorio_equipaggiato = item
             
+        get_cache_statistiche(self.state).invalida(giocatore.id)
+        self.state.emit_event(Events.ITEM_EQUIPPED, entity_id=giocatore.id, slot=tipo_equip, item=item)
+
         # Messaggio di conferma
         self.state.messaggi.append(f"{giocatore.name} ha equipaggiato {item.nome}.")
         
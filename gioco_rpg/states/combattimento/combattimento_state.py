@@ -8,6 +8,8 @@ import core.events as Events
 # Importa le funzionalità dai moduli separati
 from states.combattimento.azioni import AzioniCombattimento
 from states.combattimento.turni import GestoreTurni
+from states.combattimento.registro import MessaggiCombattimento, RegistroCombattimento, get_registro
+from states.combattimento.ordine_turni import OrdineTurni
 from states.combattimento.ui import UICombattimento
 
 class CombattimentoState(EnhancedBaseState):
@@ -83,6 +85,20 @@ class CombattimentoState(EnhancedBaseState):
         self.event_bus.on(Events.UI_DIALOG_CLOSE, self._handle_dialog_close)
         self.event_bus.on(Events.MENU_SELECTION, self._handle_menu_selection)
         
+    @property
+    def messaggi(self):
+        """Messaggi del combattimento, generati dal registro eventi quando vengono letti"""
+        vista = self.__dict__.get("_messaggi")
+        if vista is None:
+            vista = self._messaggi = MessaggiCombattimento(self)
+        return vista
+    
+    @messaggi.setter
+    def messaggi(self, valore):
+        # Messaggi già presenti (salvataggi precedenti al registro) diventano note del registro
+        self._messaggi = MessaggiCombattimento(self)
+        self._messaggi.extend(valore or [])
+        
     def update(self, dt):
         """
         Nuovo metodo di aggiornamento basato su EventBus.
@@ -150,6 +166,7 @@ class CombattimentoState(EnhancedBaseState):
         self.fase_corrente = "inizializzazione"
         self.target_selezionato = None
         self.messaggi = []
+        self.registro = None
         self.world = contesto.get("world")
         
         # Creiamo gli oggetti azioni come fallback nel caso in cui l'importazione fallisca
@@ -173,6 +190,7 @@ class CombattimentoState(EnhancedBaseState):
             'prossimo_turno': lambda *args: None,
             'inizializza_turni': lambda *args: None,
             'calcola_iniziativa': lambda *args: [],
+            'inizia_combattimento': lambda *args: None,
             'passa_al_turno_successivo': lambda *args: None,
             'controlla_fine_combattimento': lambda *args: False,
             'determina_vincitore': lambda *args: 'nessuno'
@@ -285,27 +303,9 @@ class CombattimentoState(EnhancedBaseState):
         self.round_corrente = 1
         self.fase_corrente = "iniziativa"
         
-        # Calcola iniziativa per tutti i partecipanti
-        for p_id in self.partecipanti:
-            entita = self.world.get_entity(p_id)
-            if entita:
-                # Calcola valore iniziativa basato su destrezza
-                destrezza = getattr(entita, "destrezza", 10)
-                mod_destrezza = (destrezza - 10) // 2
-                tiro_dado = Dado(20).tira() + mod_destrezza
-                setattr(entita, "iniziativa", tiro_dado)
-                
-        # Determina l'ordine di iniziativa
-        self.ordine_iniziativa = sorted(
-            self.partecipanti,
-            key=lambda p_id: getattr(self.world.get_entity(p_id), "iniziativa", 0),
-            reverse=True
-        )
-        
-        # Imposta il turno al primo giocatore nella lista di iniziativa
-        if self.ordine_iniziativa:
-            self.turno_corrente = self.ordine_iniziativa[0]
-            self.fase_corrente = "azione"
+        # Iniziativa, statistiche di combattimento e primo turno
+        self.gestore_turni.calcola_iniziativa()
+        self.gestore_turni.inizia_combattimento()
             
     def _get_azioni_disponibili(self, entita_id, target_id=None):
         """
@@ -681,8 +681,8 @@ class CombattimentoState(EnhancedBaseState):
                         entita.in_combattimento = False
         
         # Registra nel log la fine del combattimento
-        messaggio = "Combattimento terminato" + (" forzatamente" if forzato else "")
-        self.messaggi.append(messaggio)
+        get_registro(self).fine(forzato)
+        self.rilascia_risorse()
         
         # Comunica la fine del combattimento al gestore turni
         if hasattr(self, "gestore_turni") and self.gestore_turni:
@@ -691,6 +691,38 @@ class CombattimentoState(EnhancedBaseState):
         
         return True
     
+    def rilascia_risorse(self):
+        """
+        Smette di ascoltare gli eventi e scarta le cache del combattimento.
+        
+        Va chiamato su ogni percorso di uscita (fine, fuga, uscita dallo stato,
+        istanza sostituita da un lotto); può essere chiamato più volte.
+        """
+        if getattr(self, "cache_statistiche", None) is not None:
+            self.cache_statistiche.chiudi()
+            self.cache_statistiche = None
+        if getattr(self, "ordine_turni", None) is not None:
+            self.ordine_turni.chiudi()
+        self.piani_ia = None
+    
+    def esci(self, gioco=None):
+        """Rilascia le risorse del combattimento quando lo stato viene rimosso"""
+        self.rilascia_risorse()
+        super().esci(gioco)
+    
+    @classmethod
+    def scarta_da_cache(cls, stato):
+        """
+        Rimuove un'istanza dalla cache di from_dict (es. dopo un lotto di azioni annullato).
+
+        Args:
+            stato (CombattimentoState): Istanza da non riutilizzare
+        """
+        cache = getattr(cls, '_instances_cache', None)
+        if cache:
+            for chiave in [k for k, v in cache.items() if v is stato]:
+                del cache[chiave]
+
     @classmethod
     def from_dict(cls, data, game=None):
         """
@@ -746,6 +778,7 @@ class CombattimentoState(EnhancedBaseState):
             'prossimo_turno': lambda *args: None,
             'inizializza_turni': lambda *args: None,
             'calcola_iniziativa': lambda *args: [],
+            'inizia_combattimento': lambda *args: None,
             'passa_al_turno_successivo': lambda *args: None,
             'controlla_fine_combattimento': lambda *args: False,
             'determina_vincitore': lambda *args: 'nessuno'
@@ -812,7 +845,13 @@ class CombattimentoState(EnhancedBaseState):
             stato.tipo_incontro = data.get("tipo_incontro", "casuale")
             stato.fase_corrente = data.get("fase_corrente", "inizializzazione")
             stato.target_selezionato = data.get("target_selezionato")
-            stato.messaggi = data.get("messaggi", [])
+            stato.registro = RegistroCombattimento.from_dict(data["registro"]) if data.get("registro") else None
+            # I messaggi sono generati dal registro; quelli salvati servono solo per i dati precedenti
+            stato.messaggi = [] if stato.registro is not None else data.get("messaggi", [])
+            if data.get("ordine_turni"):
+                stato.ordine_turni = OrdineTurni.from_dict(data["ordine_turni"])
+                stato.ordine_turni.attiva()
+                stato.ordine_iniziativa = stato.ordine_turni.ordine()
             stato.world = game
             stato.fase = data.get("fase", "scelta")
             stato.dati_temporanei = data.get("dati_temporanei", {})
@@ -956,10 +995,14 @@ class CombattimentoState(EnhancedBaseState):
                 "tipo_incontro": self.tipo_incontro,
                 "fase_corrente": self.fase_corrente,
                 "target_selezionato": self.target_selezionato,
-                "messaggi": self.messaggi,
                 "fase": getattr(self, 'fase', "scelta"),
                 "dati_temporanei": getattr(self, 'dati_temporanei', {})
             }
+            # Messaggi e cronologia sono nel registro, salvato in modo incrementale
+            if getattr(self, 'registro', None) is not None:
+                data["registro"] = self.registro.to_dict()
+            if getattr(self, 'ordine_turni', None) is not None:
+                data["ordine_turni"] = self.ordine_turni.to_dict()
             return data
         
         # Vecchia versione dello stato
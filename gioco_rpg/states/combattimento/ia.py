@@ -0,0 +1,418 @@
+"""
+Intelligenza artificiale dei nemici basata su funzioni di utilità.
+
+Ogni mostro ha un profilo di comportamento (campo "comportamento" di
+data/monsters/monsters.json): criterio di scelta del bersaglio,
+aggressività e prudenza. Per ogni entità controllata dall'IA le azioni
+possibili (attacco, colpo potente, cura, passare il turno) ricevono un
+punteggio calcolato sulle statistiche derivate del combattimento e viene
+scelta quella con utilità maggiore.
+
+Il piano viene calcolato in un'unica passata per tutte le entità IA del
+round: le classifiche dei bersagli sono ordinate una sola volta e ogni
+nemico legge la prima voce del proprio criterio, quindi il costo per
+nemico resta quasi costante anche negli scontri numerosi. I piani sono
+memorizzati sullo stato del combattimento, per round: uno scontro non riusa
+mai il piano di un altro. Quando un partecipante muore o guarisce (vedi
+entities.entita.osservatori_hp) il piano non viene ricalcolato: si
+aggiornano solo le classifiche interessate e, al suo turno, la scelta
+dell'entità che agisce.
+"""
+
+import logging
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+import core.events as Events
+from entities.entita import osservatori_hp
+from states.combattimento.statistiche import get_cache_statistiche
+
+logger = logging.getLogger(__name__)
+
+# Piani di round memorizzati
+MAX_PIANI = 256
+
+# Variazioni di HP ricordate per aggiornare i piani già calcolati
+MAX_VARIAZIONI = 1024
+
+# Criteri di scelta del bersaglio
+CRITERI_BERSAGLIO = ("primo", "piu_debole", "piu_ferito", "piu_pericoloso")
+
+ProfiloComportamento = namedtuple("ProfiloComportamento", "bersaglio aggressivita prudenza soglia_cura")
+
+PROFILO_PREDEFINITO = ProfiloComportamento("primo", 1.0, 0.5, 0.3)
+
+# Bonus di utilità per un attacco che può abbattere il bersaglio
+BONUS_UCCISIONE = 0.5
+
+# Utilità di passare il turno (scelta solo se nient'altro è utile)
+UTILITA_PASSA = 0.01
+
+
+@lru_cache(maxsize=1024)
+def probabilita_colpire(bonus_attacco, classe_armatura, penalita=0, critico=True):
+    """
+    Probabilità che un attacco colpisca con le regole di esegui_attacco.
+
+    Args:
+        bonus_attacco (int): Bonus di attacco
+        classe_armatura (int): CA del bersaglio
+        penalita (int): Penalità sottratta al d20 (colpo potente)
+        critico (bool): Se il 20 naturale colpisce sempre
+
+    Returns:
+        float: Probabilità tra 0 e 1
+    """
+    colpi = 0
+    for faccia in range(1, 21):
+        tiro = faccia - penalita
+        if tiro + bonus_attacco >= classe_armatura or (critico and tiro == 20):
+            colpi += 1
+    return colpi / 20
+
+
+def danno_atteso_attacco(statistiche, classe_armatura):
+    """Danno medio di un attacco base, critici compresi"""
+    media_dado = (statistiche.dado_danno + 1) / 2
+    colpisce = probabilita_colpire(statistiche.bonus_attacco, classe_armatura)
+    return colpisce * (media_dado + statistiche.bonus_danno) + media_dado / 20
+
+
+def danno_atteso_colpo_potente(statistiche, classe_armatura):
+    """Danno medio di colpo_potente (2d10, -2 al tiro, nessun critico)"""
+    colpisce = probabilita_colpire(statistiche.bonus_attacco, classe_armatura, penalita=2, critico=False)
+    return colpisce * (11 + statistiche.bonus_danno)
+
+
+class MotoreIA:
+    """
+    Pianifica le azioni delle entità controllate dall'IA.
+    """
+
+    def __init__(self, profili=None):
+        """
+        Args:
+            profili (dict, optional): ID mostro -> ProfiloComportamento (default: da monsters.json)
+        """
+        self._profili = profili
+        # Incrementata quando i piani già calcolati non sono più validi
+        self._generazione = 0
+        self._unsubscribe = None
+        # Morti e guarigioni: entità -> numero progressivo dell'ultima variazione
+        self._variazioni = OrderedDict()
+        self._contatore_variazioni = 0
+        # Numero dell'ultima variazione scartata per limite di memoria
+        self._variazione_scartata = 0
+
+    @property
+    def profili(self):
+        """Profili di comportamento dei mostri, caricati al primo uso"""
+        if self._profili is None:
+            self._profili = carica_profili()
+            if self._unsubscribe is None:
+                from core.event_bus import EventBus
+                self._unsubscribe = EventBus.get_instance().on(Events.DATA_FILE_CHANGED, self._on_dati_modificati)
+        return self._profili
+
+    def profilo(self, entita):
+        """
+        Restituisce il profilo di comportamento di un'entità.
+
+        Args:
+            entita: Entità controllata dall'IA
+
+        Returns:
+            ProfiloComportamento: Profilo del mostro o profilo predefinito
+        """
+        profili = self.profili
+        for chiave in (getattr(entita, "tipo_mostro", None), getattr(entita, "nome", None),
+                       getattr(entita, "name", None)):
+            if isinstance(chiave, str):
+                profilo = profili.get(chiave) or profili.get(chiave.lower().replace(" ", "_"))
+                if profilo:
+                    return profilo
+        return PROFILO_PREDEFINITO
+
+    def decidi(self, state, entita_id):
+        """
+        Restituisce l'azione di un'entità IA per il round corrente.
+
+        Args:
+            state: Stato del combattimento
+            entita_id (str): ID dell'entità IA
+
+        Returns:
+            dict: Azione nel formato di esegui_azione_ia o None se l'entità non esiste
+        """
+        if self._on_variazione_hp not in osservatori_hp:
+            osservatori_hp.append(self._on_variazione_hp)
+
+        piani = getattr(state, "piani_ia", None)
+        if piani is None:
+            piani = state.piani_ia = OrderedDict()
+        chiave = (self._generazione, getattr(state, "round_corrente", 0))
+        piano = piani.get(chiave)
+        if piano is None:
+            piano = self.pianifica_round(state)
+            piani[chiave] = piano
+            while len(piani) > MAX_PIANI:
+                piani.popitem(last=False)
+        else:
+            piani.move_to_end(chiave)
+            if piano["variazione"] < self._contatore_variazioni:
+                self._applica_variazioni(state, piano)
+            if entita_id not in piano["aggiornate"]:
+                # Scelta calcolata prima di una morte o guarigione: si ricalcola solo questa
+                self._riscegli(state, piano, entita_id)
+
+        azione = piano["azioni"].get(entita_id)
+        if azione is None:
+            return None
+        azione = dict(azione)
+
+        # Il bersaglio scelto a inizio round potrebbe essere già stato abbattuto
+        bersaglio = azione.get("target_id") or (azione.get("target_ids") or [entita_id])[0]
+        if bersaglio != entita_id and not _vivo(state.world.get_entity(bersaglio)):
+            criterio = self.profilo(state.world.get_entity(entita_id)).bersaglio
+            nuovo = next((b for b in piano["classifiche"].get(criterio, ())
+                          if _vivo(state.world.get_entity(b))), None)
+            if nuovo is None:
+                return {"tipo": "passa_turno", "entita_id": entita_id}
+            if "target_id" in azione:
+                azione["target_id"] = nuovo
+            else:
+                azione["target_ids"] = [nuovo]
+        return azione
+
+    def pianifica_round(self, state):
+        """
+        Calcola in un'unica passata le azioni di tutte le entità IA vive.
+
+        Args:
+            state: Stato del combattimento
+
+        Returns:
+            dict: {"azioni": {entita_id: azione}, "classifiche": {criterio: [ID bersagli]}}
+        """
+        world = state.world
+        statistiche = get_cache_statistiche(state)
+
+        giocatori = []
+        ia = []
+        for entita_id in state.partecipanti:
+            entita = world.get_entity(entita_id)
+            if not _vivo(entita):
+                continue
+            (giocatori if _e_giocatore(entita) else ia).append((entita_id, entita))
+
+        classifiche = _classifiche_bersagli(giocatori, statistiche)
+        azioni = {}
+        for entita_id, entita in ia:
+            if not giocatori:
+                azioni[entita_id] = {"tipo": "passa_turno", "entita_id": entita_id}
+                continue
+            azioni[entita_id] = self._scegli_azione(state, entita_id, entita, classifiche, statistiche)
+        return {"azioni": azioni, "classifiche": classifiche, "aggiornate": set(azioni),
+                "variazione": self._contatore_variazioni}
+
+    def _applica_variazioni(self, state, piano):
+        """
+        Aggiorna le classifiche di un piano dopo morti e guarigioni dei partecipanti.
+
+        Le morti tolgono il bersaglio da tutte le classifiche, le guarigioni
+        riordinano solo quelle basate sugli HP. Le scelte già calcolate vengono
+        segnate come da rivedere, ma ricalcolate solo al turno di ciascuna entità.
+
+        Args:
+            state: Stato del combattimento
+            piano (dict): Piano del round
+        """
+        world = state.world
+        if piano["variazione"] < self._variazione_scartata:
+            # Variazioni non più tutte in memoria: si considerano tutti i partecipanti
+            variati = list(state.partecipanti)
+        else:
+            variati = [entita_id for entita_id in state.partecipanti
+                       if self._variazioni.get(entita_id, 0) > piano["variazione"]]
+        piano["variazione"] = self._contatore_variazioni
+
+        giocatori = [entita_id for entita_id in variati if _e_giocatore(world.get_entity(entita_id))]
+        if variati:
+            piano["aggiornate"] = set()
+        if not giocatori:
+            return
+
+        classifiche = piano["classifiche"]
+        morti = {entita_id for entita_id in giocatori if not _vivo(world.get_entity(entita_id))}
+        if any(entita_id not in morti and entita_id not in classifiche["primo"] for entita_id in giocatori):
+            # Un bersaglio rientrato in combattimento: si ricostruiscono le classifiche
+            vivi = [(entita_id, world.get_entity(entita_id)) for entita_id in state.partecipanti]
+            vivi = [(entita_id, entita) for entita_id, entita in vivi if _vivo(entita) and _e_giocatore(entita)]
+            piano["classifiche"] = _classifiche_bersagli(vivi, get_cache_statistiche(state))
+            return
+        if morti:
+            for criterio, ordine in classifiche.items():
+                classifiche[criterio] = [entita_id for entita_id in ordine if entita_id not in morti]
+        if len(morti) < len(giocatori):
+            vivi = [(entita_id, world.get_entity(entita_id)) for entita_id in classifiche["primo"]]
+            classifiche.update(_classifiche_hp(vivi))
+
+    def _riscegli(self, state, piano, entita_id):
+        """Ricalcola la scelta di una sola entità con le classifiche correnti del piano"""
+        entita = state.world.get_entity(entita_id)
+        if entita is not None and not _e_giocatore(entita):
+            if _vivo(entita) and piano["classifiche"]["primo"]:
+                piano["azioni"][entita_id] = self._scegli_azione(
+                    state, entita_id, entita, piano["classifiche"], get_cache_statistiche(state))
+            else:
+                piano["azioni"][entita_id] = {"tipo": "passa_turno", "entita_id": entita_id}
+        piano["aggiornate"].add(entita_id)
+
+    def _scegli_azione(self, state, entita_id, entita, classifiche, statistiche):
+        profilo = self.profilo(entita)
+        target_id = classifiche[profilo.bersaglio][0]
+        target = state.world.get_entity(target_id)
+        stat_entita = statistiche.get(entita)
+        ca_target = statistiche.get(target).classe_armatura
+        hp_target = max(1, getattr(target, "hp", 1))
+
+        def utilita_danno(danno):
+            utilita = min(danno, hp_target) / hp_target
+            if danno >= hp_target:
+                utilita += BONUS_UCCISIONE
+            return profilo.aggressivita * utilita
+
+        candidati = [
+            (utilita_danno(danno_atteso_attacco(stat_entita, ca_target)),
+             {"tipo": "attacco", "entita_id": entita_id, "target_id": target_id}),
+            (UTILITA_PASSA, {"tipo": "passa_turno", "entita_id": entita_id}),
+        ]
+        if _abilita_pronta(state, entita, "colpo_potente"):
+            candidati.append((utilita_danno(danno_atteso_colpo_potente(stat_entita, ca_target)),
+                              {"tipo": "abilita", "nome_abilita": "colpo_potente",
+                               "entita_id": entita_id, "target_ids": [target_id]}))
+        hp_ratio = getattr(entita, "hp", 10) / max(1, getattr(entita, "hp_max", 10))
+        if hp_ratio < profilo.soglia_cura and _abilita_pronta(state, entita, "cura_ferite"):
+            candidati.append((profilo.prudenza * 2 * (1 - hp_ratio),
+                              {"tipo": "abilita", "nome_abilita": "cura_ferite",
+                               "entita_id": entita_id, "target_ids": [entita_id]}))
+        return max(candidati, key=lambda candidato: candidato[0])[1]
+
+    def svuota(self):
+        """Scarta i piani memorizzati in tutti gli stati di combattimento"""
+        self._generazione += 1
+
+    def _on_variazione_hp(self, entita_id, vivo):
+        """Registra la morte o la guarigione di un'entità (vedi osservatori_hp)"""
+        self._contatore_variazioni += 1
+        self._variazioni[entita_id] = self._contatore_variazioni
+        self._variazioni.move_to_end(entita_id)
+        while len(self._variazioni) > MAX_VARIAZIONI:
+            _, numero = self._variazioni.popitem(last=False)
+            self._variazione_scartata = numero
+
+    def _on_dati_modificati(self, path=None, **kwargs):
+        if path and "monsters" not in str(path):
+            return
+        self._profili = None
+        self._generazione += 1
+
+
+def _vivo(entita):
+    return entita is not None and getattr(entita, "hp", 0) > 0
+
+
+def _e_giocatore(entita):
+    has_tag = getattr(entita, "has_tag", None)
+    return bool(has_tag("player")) if callable(has_tag) else False
+
+
+def _classifiche_bersagli(giocatori, statistiche):
+    """Ordina una volta i bersagli per ogni criterio"""
+    if not giocatori:
+        return {criterio: [] for criterio in CRITERI_BERSAGLIO}
+    minaccia = {entita_id: statistiche.get(entita).bonus_attacco for entita_id, entita in giocatori}
+    ordine = [entita_id for entita_id, _ in giocatori]
+    classifiche = {
+        "primo": ordine,
+        "piu_pericoloso": sorted(ordine, key=lambda e: -minaccia[e]),
+    }
+    classifiche.update(_classifiche_hp(giocatori))
+    return classifiche
+
+
+def _classifiche_hp(giocatori):
+    """Ordina i bersagli per i criteri che dipendono dagli HP"""
+    hp = {entita_id: getattr(entita, "hp", 0) for entita_id, entita in giocatori}
+    rapporto = {entita_id: hp[entita_id] / max(1, getattr(entita, "hp_max", hp[entita_id]) or 1)
+                for entita_id, entita in giocatori}
+    ordine = [entita_id for entita_id, _ in giocatori]
+    return {
+        "piu_debole": sorted(ordine, key=lambda e: hp[e]),
+        "piu_ferito": sorted(ordine, key=lambda e: rapporto[e]),
+    }
+
+
+def _abilita_pronta(state, entita, nome_abilita):
+    """Verifica possesso e cooldown di un'abilità come fa usa_abilita"""
+    abilita_speciali = getattr(entita, "abilita_speciali", None)
+    if not abilita_speciali or nome_abilita not in abilita_speciali:
+        return False
+    if not isinstance(abilita_speciali, dict):
+        return True
+    abilita = abilita_speciali[nome_abilita]
+    if isinstance(abilita, dict):
+        cooldown, ultimo_uso = abilita.get("cooldown", 3), abilita.get("ultimo_uso", 0)
+    else:
+        cooldown = getattr(state, "abilita_cooldown", {}).get(nome_abilita, 3)
+        ultimo_uso = getattr(state, "abilita_ultimo_uso", {}).get(nome_abilita, 0)
+    return getattr(state, "round_corrente", 0) - ultimo_uso >= cooldown
+
+
+def carica_profili():
+    """
+    Legge i profili di comportamento da monsters.json.
+
+    Returns:
+        dict: ID mostro -> ProfiloComportamento
+    """
+    try:
+        from util.data_manager import get_data_manager
+        mostri = get_data_manager().load_data("mostri", "monsters.json", validate=False) or {}
+    except Exception as e:
+        logger.error(f"Errore nel caricamento dei profili di comportamento: {e}")
+        return {}
+
+    profili = {}
+    for mostro_id, dati in mostri.items():
+        comportamento = dati.get("comportamento") or {}
+        bersaglio = comportamento.get("bersaglio", PROFILO_PREDEFINITO.bersaglio)
+        if bersaglio not in CRITERI_BERSAGLIO:
+            logger.warning(f"Criterio di bersaglio sconosciuto per {mostro_id}: {bersaglio}")
+            bersaglio = PROFILO_PREDEFINITO.bersaglio
+        profilo = ProfiloComportamento(
+            bersaglio,
+            float(comportamento.get("aggressivita", PROFILO_PREDEFINITO.aggressivita)),
+            float(comportamento.get("prudenza", PROFILO_PREDEFINITO.prudenza)),
+            float(comportamento.get("soglia_cura", PROFILO_PREDEFINITO.soglia_cura)))
+        profili[mostro_id] = profilo
+        if dati.get("nome"):
+            profili.setdefault(dati["nome"], profilo)
+    return profili
+
+
+# Istanza condivisa
+_motore_ia = None
+
+
+def get_motore_ia():
+    """
+    Restituisce l'istanza condivisa di MotoreIA.
+
+    Returns:
+        MotoreIA: Istanza singleton
+    """
+    global _motore_ia
+    if _motore_ia is None:
+        _motore_ia = MotoreIA()
+    return _motore_ia
@@ -0,0 +1,318 @@
+"""
+Esecuzione di più azioni di combattimento in un'unica richiesta.
+
+Un turno completo del giocatore (es. usare un oggetto, attaccare e passare)
+richiedeva una chiamata a /azione per ogni azione, ognuna con ricerca
+della sessione, ricostruzione dello stato e serializzazione completa,
+seguite da /stato e /azioni_disponibili. esegui_lotto ricostruisce lo
+stato una volta, esegue tutte le azioni e i turni dell'IA che seguono,
+salva lo stato una volta e restituisce solo ciò che è cambiato, nelle
+sezioni richieste dal client (proiezione).
+
+Le azioni del lotto possono essere solo dei giocatori della sessione: i
+turni degli altri partecipanti li gioca sempre l'IA, anche fra un'azione
+e l'altra del lotto.
+
+Il lotto è atomico: se un'azione non è valida o fallisce, HP e inventari
+dei partecipanti, stato salvato del combattimento e flusso casuale
+tornano com'erano prima del lotto. Gli eventi dell'EventBus (compresi
+ENTITY_DIED ed ENTITY_HEALED) vengono pubblicati solo dopo il salvataggio.
+"""
+
+import copy
+import logging
+import threading
+import weakref
+
+import core.events as Events
+from entities.entita import rinvia_eventi_hp
+from util.rng import generatore_di
+
+logger = logging.getLogger(__name__)
+
+# Numero massimo di azioni in un lotto
+MAX_AZIONI = 20
+
+# Tipi di azione accettati (gli stessi di AzioniCombattimento.esegui_azione_ia)
+TIPI_AZIONE = ("attacco", "abilita", "oggetto", "passa_turno")
+
+# Nomi alternativi usati da /azione e dal websocket
+_ALIAS_TIPI = {"attacca": "attacco", "passa": "passa_turno", "usa_abilita": "abilita", "usa_oggetto": "oggetto"}
+
+# Sezioni della risposta che il client può richiedere
+PROIEZIONI = ("stato", "partecipanti", "messaggi", "azioni_disponibili", "risultati")
+
+# Un lotto per sessione alla volta
+_lock_sessioni = weakref.WeakKeyDictionary()
+_lock_globale = threading.Lock()
+
+
+def _lock_sessione(world):
+    with _lock_globale:
+        lock = _lock_sessioni.get(world)
+        if lock is None:
+            lock = _lock_sessioni[world] = threading.RLock()
+        return lock
+
+
+def normalizza_azione(azione):
+    """
+    Converte un'azione del lotto nel formato di AzioniCombattimento.esegui_azione_ia.
+
+    Accetta sia {"tipo", "entita_id", "target_id", ...} sia il formato di
+    /azione ({"tipo_azione", "parametri": {"attaccante_id", ...}}).
+
+    Args:
+        azione (dict): Azione ricevuta dal client
+
+    Returns:
+        dict: Azione normalizzata (con "tipo" None se non riconosciuta)
+    """
+    if not isinstance(azione, dict):
+        return {"tipo": None}
+    parametri = azione.get("parametri")
+    normalizzata = dict(parametri) if isinstance(parametri, dict) else {}
+    normalizzata.update((k, v) for k, v in azione.items() if k != "parametri")
+    tipo = normalizzata.get("tipo") or normalizzata.get("tipo_azione")
+    normalizzata["tipo"] = _ALIAS_TIPI.get(tipo, tipo)
+    for alias in ("attaccante_id", "utilizzatore_id", "incantatore_id"):
+        normalizzata.setdefault("entita_id", normalizzata.get(alias))
+    normalizzata.setdefault("oggetto_id", normalizzata.get("oggetto"))
+    normalizzata.setdefault("nome_abilita", normalizzata.get("abilita"))
+    return normalizzata
+
+
+def _fotografia(world, state):
+    """Copia di ciò che un lotto può modificare, per poterlo annullare"""
+    entita = [e for e in (world.get_entity(p_id) for p_id in state.partecipanti) if e is not None]
+    # Le entità e il mondo restano condivisi: si copiano solo i loro attributi
+    memo = {id(world): world}
+    memo.update((id(e), e) for e in entita)
+    copie = []
+    for e in entita:
+        try:
+            copie.append((e, copy.deepcopy(e.__dict__, memo)))
+        except Exception as ex:
+            logger.warning(f"Attributi di {e.id} non copiabili ({ex}), copia superficiale")
+            copie.append((e, dict(e.__dict__)))
+    flusso = generatore_di(world, "combattimento")
+    return {
+        "entita": copie,
+        "stato": copy.deepcopy(world.get_temporary_state("combattimento")),
+        "flusso": (flusso, flusso.getstate()),
+    }
+
+
+def _ripristina(world, state, fotografia):
+    """Annulla gli effetti di un lotto fallito"""
+    for entita, attributi in fotografia["entita"]:
+        entita.__dict__.clear()
+        entita.__dict__.update(attributi)
+    world.set_temporary_state("combattimento", fotografia["stato"])
+    flusso, stato_flusso = fotografia["flusso"]
+    flusso.setstate(stato_flusso)
+    _scarta(state)
+
+
+def _scarta(state):
+    """Rilascia un'istanza non più valida: from_dict non deve restituirla e i suoi handler vanno rimossi"""
+    state.rilascia_risorse()
+    type(state).scarta_da_cache(state)
+
+
+def _errore(messaggio, indice=None):
+    risposta = {"successo": False, "errore": messaggio}
+    if indice is not None:
+        risposta["indice"] = indice
+    return risposta
+
+
+def _fallita(risultato):
+    return not risultato or (isinstance(risultato, dict) and risultato.get("successo") is False)
+
+
+def _turno_ia(world, state):
+    """
+    Esegue il turno dell'entità IA corrente.
+
+    Returns:
+        dict: Azione scelta e risultato
+    """
+    entita_id = state.turno_corrente
+    azione = state.azioni.determina_azione_ia(entita_id)
+    risultato = state.azioni.esegui_azione_ia(azione) if azione else None
+    # Attacchi e abilità non chiudono il turno: l'IA passa dopo aver agito
+    if state.turno_corrente == entita_id and not state.gestore_turni.controlla_fine_combattimento():
+        state.gestore_turni.passa_al_turno_successivo()
+    return {"entita_id": entita_id, "azione": azione, "risultato": risultato}
+
+
+def _turni_ia(world, state, azioni_ia):
+    """
+    Gioca i turni dei partecipanti che non sono giocatori fino al prossimo turno di un giocatore.
+
+    Args:
+        world: Mondo della sessione
+        state: Stato del combattimento
+        azioni_ia (list): Lista a cui aggiungere i turni giocati
+
+    Returns:
+        bool: True se il combattimento è terminato
+    """
+    for _ in range(len(state.partecipanti)):
+        if state.gestore_turni.controlla_fine_combattimento():
+            return True
+        entita = world.get_entity(state.turno_corrente) if state.turno_corrente else None
+        if entita is None or entita.has_tag("player"):
+            break
+        azioni_ia.append(_turno_ia(world, state))
+    return state.gestore_turni.controlla_fine_combattimento()
+
+
+def _delta(world, state, proiezione, hp_prima, messaggi_prima, risultati):
+    """Costruisce le sezioni richieste della risposta"""
+    delta = {}
+    if "stato" in proiezione:
+        delta["stato"] = {
+            "in_corso": state.in_corso,
+            "round": state.round_corrente,
+            "turno_di": state.turno_corrente,
+            "fase": state.fase_corrente,
+        }
+    if "partecipanti" in proiezione:
+        # Solo i partecipanti i cui HP sono cambiati
+        delta["partecipanti"] = {}
+        for p_id in state.partecipanti:
+            entita = world.get_entity(p_id)
+            hp = getattr(entita, "hp", None)
+            if entita is not None and hp != hp_prima.get(p_id):
+                delta["partecipanti"][p_id] = {"hp": hp, "max_hp": getattr(entita, "hp_max", None)}
+    if "messaggi" in proiezione:
+        delta["messaggi"] = state.messaggi[messaggi_prima:]
+    if "azioni_disponibili" in proiezione:
+        delta["azioni_disponibili"] = {}
+        entita = world.get_entity(state.turno_corrente) if state.turno_corrente else None
+        if entita is not None and entita.has_tag("player"):
+            delta["azioni_disponibili"][entita.id] = state.get_azioni_disponibili(entita.id)
+    if "risultati" in proiezione:
+        delta["risultati"] = risultati
+    return delta
+
+
+def esegui_lotto(world, azioni, proiezione=None, esegui_ia=True, id_sessione=None):
+    """
+    Esegue in modo atomico una sequenza di azioni del combattimento in corso.
+
+    Args:
+        world: Mondo della sessione
+        azioni (list): Azioni da eseguire in ordine (vedi normalizza_azione)
+        proiezione (list, optional): Sezioni di PROIEZIONI da includere (default: tutte)
+        esegui_ia (bool): Se eseguire i turni dell'IA fino al prossimo turno di un giocatore
+        id_sessione (str, optional): ID della sessione, riportato negli eventi
+
+    Returns:
+        dict: Esito con "successo" e "delta"; in caso di errore "errore" e, se
+            dovuto a un'azione, il suo "indice" (nessuna modifica viene salvata)
+    """
+    from core.event_bus import EventBus
+    from states.combattimento.combattimento_state import CombattimentoState
+
+    if not isinstance(azioni, list) or not azioni:
+        return _errore("Nessuna azione da eseguire")
+    if len(azioni) > MAX_AZIONI:
+        return _errore(f"Troppe azioni nel lotto (massimo {MAX_AZIONI})")
+    proiezione = [p for p in (proiezione or PROIEZIONI) if p in PROIEZIONI]
+
+    with _lock_sessione(world):
+        dati = world.get_temporary_state("combattimento")
+        if not dati:
+            return _errore("Nessun combattimento in corso")
+        state = CombattimentoState.from_dict(dati, world)
+        if not getattr(state, "in_corso", False):
+            return _errore("Nessun combattimento in corso")
+
+        fotografia = _fotografia(world, state)
+        hp_prima = {p_id: getattr(world.get_entity(p_id), "hp", None) for p_id in state.partecipanti}
+        messaggi_prima = len(state.messaggi)
+        combat_id = getattr(state, "id", id_sessione)
+        eventi = []
+        risultati = []
+        azioni_ia = []
+        terminato = False
+
+        try:
+            with rinvia_eventi_hp() as eventi_hp:
+                for indice, azione in enumerate(azioni):
+                    azione = normalizza_azione(azione)
+                    if azione["tipo"] not in TIPI_AZIONE:
+                        _ripristina(world, state, fotografia)
+                        return _errore(f"Tipo di azione non supportato: {azione['tipo']}", indice)
+                    entita = world.get_entity(azione.get("entita_id")) if azione.get("entita_id") else None
+                    if entita is None or not entita.has_tag("player") or entita.id not in state.partecipanti:
+                        _ripristina(world, state, fotografia)
+                        return _errore("Le azioni del lotto devono essere di un giocatore del combattimento", indice)
+                    # I turni dei partecipanti non giocatori li gioca l'IA
+                    if esegui_ia and _turni_ia(world, state, azioni_ia):
+                        terminato = True
+                        break
+                    if entita.id != state.turno_corrente:
+                        _ripristina(world, state, fotografia)
+                        return _errore("Non è il turno di questa entità", indice)
+
+                    risultato = state.azioni.esegui_azione_ia(azione)
+                    if _fallita(risultato):
+                        _ripristina(world, state, fotografia)
+                        messaggio = risultato.get("messaggio") if isinstance(risultato, dict) else None
+                        return _errore(messaggio or "Azione non riuscita", indice)
+                    risultati.append(risultato)
+                    eventi.append((Events.COMBAT_ACTION, {
+                        "combat_id": combat_id, "action_type": azione["tipo"],
+                        "entity_id": entita.id, "target_id": azione.get("target_id"),
+                    }))
+                    # Le azioni successive alla fine del combattimento non vengono eseguite
+                    if state.gestore_turni.controlla_fine_combattimento():
+                        break
+
+                terminato = state.gestore_turni.controlla_fine_combattimento()
+                if esegui_ia and not terminato:
+                    terminato = _turni_ia(world, state, azioni_ia)
+
+                vincitore = None
+                if terminato:
+                    vincitore = state.gestore_turni.determina_vincitore()
+                    state.termina_combattimento()
+                    eventi.append((Events.COMBAT_END, {
+                        "combat_id": combat_id, "session_id": id_sessione,
+                        "winner": vincitore, "reason": "combat_resolution",
+                    }))
+                else:
+                    eventi.append((Events.COMBAT_TURN, {
+                        "combat_id": combat_id, "entity_id": state.turno_corrente, "round": state.round_corrente,
+                    }))
+        except Exception:
+            _ripristina(world, state, fotografia)
+            raise
+
+        # Unica serializzazione dello stato per tutto il lotto
+        world.set_temporary_state("combattimento", state.to_dict())
+
+    # Morti e guarigioni prima degli eventi del combattimento, come durante le azioni
+    event_bus = EventBus.get_instance()
+    for tipo, dati_evento in eventi_hp:
+        event_bus.emit_immediate(tipo, **dati_evento)
+    for tipo, dati_evento in eventi:
+        event_bus.emit(tipo, **dati_evento)
+
+    risposta = {
+        "successo": True,
+        "azioni_eseguite": len(risultati),
+        "combattimento_terminato": terminato,
+        "delta": _delta(world, state, proiezione, hp_prima, messaggi_prima, risultati),
+    }
+    if azioni_ia:
+        risposta["azioni_ia"] = azioni_ia
+    if terminato:
+        risposta["vincitore"] = vincitore
+    # Il prossimo lotto ricostruisce lo stato dai dati salvati
+    _scarta(state)
+    return risposta
@@ -0,0 +1,282 @@
+"""
+Ordine dei turni di combattimento su heap.
+
+I partecipanti che devono ancora agire nel round corrente stanno in un
+heap ordinato per iniziativa (a parità, nell'ordine di inserimento);
+chi ha agito passa nell'heap del round successivo. Rinforzi, evocazioni,
+azioni ritardate e preparate vengono inseriti in O(log n) senza
+riordinare tutti i partecipanti.
+
+I vivi sono tenuti in insiemi per schieramento aggiornati a ogni morte
+o guarigione (notifica_variazione_hp, la stessa che emette ENTITY_DIED ed
+ENTITY_HEALED), quindi la fine del combattimento si verifica in O(1)
+invece di rileggere ogni entità dal mondo a ogni turno.
+Le voci dell'heap diventate obsolete (entità morte, rimosse o ritardate)
+vengono scartate quando arrivano in cima.
+"""
+
+import heapq
+import logging
+import weakref
+
+from entities.entita import osservatori_hp
+
+logger = logging.getLogger(__name__)
+
+# Schieramenti riconosciuti dai tag delle entità
+GIOCATORI = "giocatori"
+NEMICI = "nemici"
+
+# Ordini attivi che ricevono le morti e le guarigioni
+_ordini_attivi = weakref.WeakSet()
+
+
+def schieramento(entita):
+    """
+    Restituisce lo schieramento di un'entità in base ai suoi tag.
+
+    Args:
+        entita: Entità partecipante
+
+    Returns:
+        str: GIOCATORI, NEMICI o None per le entità neutrali
+    """
+    has_tag = getattr(entita, "has_tag", None)
+    if not callable(has_tag):
+        return None
+    if has_tag("player"):
+        return GIOCATORI
+    if has_tag("nemico") or has_tag("ostile"):
+        return NEMICI
+    return None
+
+
+def _su_variazione_hp(entita_id, vivo):
+    """Richiamata da notifica_variazione_hp a ogni morte o guarigione"""
+    for ordine in list(_ordini_attivi):
+        if vivo:
+            ordine.segna_vivo(entita_id)
+        else:
+            ordine.segna_morto(entita_id)
+
+
+class OrdineTurni:
+    """
+    Coda dei turni di un combattimento con tracciamento dei vivi.
+    """
+
+    def __init__(self):
+        self._chiavi = {}  # ID -> (-iniziativa, sequenza) della voce valida
+        self._coda = []  # Chi deve ancora agire nel round corrente
+        self._prossimo_round = []  # Chi ha già agito (o entra dal prossimo round)
+        self._accodati = set()  # ID con una voce valida in una delle due code
+        self._sequenza = 0
+        self._schieramenti = {}  # ID -> schieramento
+        self.corrente = None
+        self.viventi = set()
+        self.vivi_per_schieramento = {GIOCATORI: set(), NEMICI: set()}
+
+    def __contains__(self, entita_id):
+        return entita_id in self._chiavi
+
+    def __len__(self):
+        return len(self._chiavi)
+
+    def attiva(self):
+        """Inizia a ricevere morti e guarigioni (vedi entities.entita.notifica_variazione_hp)"""
+        if _su_variazione_hp not in osservatori_hp:
+            osservatori_hp.append(_su_variazione_hp)
+        _ordini_attivi.add(self)
+
+    def chiudi(self):
+        """Smette di ricevere morti e guarigioni"""
+        _ordini_attivi.discard(self)
+
+    def _nuova_chiave(self, entita_id, iniziativa):
+        self._sequenza += 1
+        chiave = self._chiavi[entita_id] = (-iniziativa, self._sequenza)
+        return chiave
+
+    def _accoda(self, entita_id, chiave, coda=None):
+        if coda is None:
+            # Chi viene dopo il turno corrente agisce ancora in questo round
+            corrente = self._chiavi.get(self.corrente)
+            coda = self._coda if corrente is None or chiave > corrente else self._prossimo_round
+        heapq.heappush(coda, (chiave, entita_id))
+        self._accodati.add(entita_id)
+
+    def aggiungi(self, entita_id, iniziativa, schieramento=None, vivo=True):
+        """
+        Aggiunge un partecipante (anche a combattimento iniziato).
+
+        Args:
+            entita_id (str): ID dell'entità
+            iniziativa (int): Valore di iniziativa
+            schieramento (str, optional): GIOCATORI, NEMICI o None
+            vivo (bool): Se l'entità ha HP positivi
+        """
+        self._schieramenti[entita_id] = schieramento
+        self._accoda(entita_id, self._nuova_chiave(entita_id, iniziativa))
+        if vivo:
+            self.segna_vivo(entita_id)
+        else:
+            self.segna_morto(entita_id)
+
+    def rimuovi(self, entita_id):
+        """Rimuove un partecipante (fuga, congedo di un'evocazione)"""
+        if self._chiavi.pop(entita_id, None) is not None:
+            self.segna_morto(entita_id)
+            self._schieramenti.pop(entita_id, None)
+            self._accodati.discard(entita_id)
+            if entita_id == self.corrente:
+                self.corrente = None
+
+    def ritarda(self, entita_id, iniziativa):
+        """
+        Sposta il turno di un partecipante a una nuova iniziativa.
+
+        Se la nuova iniziativa viene dopo il turno corrente il partecipante
+        agisce ancora in questo round, altrimenti dal prossimo. Serve per
+        le azioni ritardate e preparate.
+
+        Args:
+            entita_id (str): ID dell'entità
+            iniziativa (int): Nuovo valore di iniziativa
+        """
+        if entita_id not in self._chiavi:
+            return
+        chiave = self._nuova_chiave(entita_id, iniziativa)
+        if entita_id == self.corrente:
+            # Chi ritarda il proprio turno agisce ancora in questo round
+            self.corrente = None
+            self._accoda(entita_id, chiave, self._coda)
+        else:
+            self._accoda(entita_id, chiave)
+
+    def segna_morto(self, entita_id):
+        """Toglie un partecipante dai vivi"""
+        self.viventi.discard(entita_id)
+        for vivi in self.vivi_per_schieramento.values():
+            vivi.discard(entita_id)
+
+    def segna_vivo(self, entita_id):
+        """Rimette un partecipante fra i vivi (se non era già in coda, agisce dal prossimo round)"""
+        if entita_id not in self._chiavi or entita_id in self.viventi:
+            return
+        self.viventi.add(entita_id)
+        gruppo = self.vivi_per_schieramento.get(self._schieramenti.get(entita_id))
+        if gruppo is not None:
+            gruppo.add(entita_id)
+        if entita_id not in self._accodati and entita_id != self.corrente:
+            self._accoda(entita_id, self._chiavi[entita_id], self._prossimo_round)
+
+    def prossimo(self):
+        """
+        Passa al prossimo partecipante vivo.
+
+        Returns:
+            tuple: (ID dell'entità di turno o None, True se è iniziato un nuovo round)
+        """
+        if self.corrente is not None and self.corrente in self.viventi:
+            self._accoda(self.corrente, self._chiavi[self.corrente], self._prossimo_round)
+        self.corrente = None
+        nuovo_round = False
+        while True:
+            if not self._coda:
+                if not self._prossimo_round or not self.viventi:
+                    return None, nuovo_round
+                self._coda, self._prossimo_round = self._prossimo_round, []
+                nuovo_round = True
+            chiave, entita_id = heapq.heappop(self._coda)
+            if self._chiavi.get(entita_id) != chiave:
+                continue  # Voce obsoleta
+            self._accodati.discard(entita_id)
+            if entita_id not in self.viventi:
+                continue  # Torna in coda se viene curato (segna_vivo)
+            self.corrente = entita_id
+            return entita_id, nuovo_round
+
+    def riprendi_da(self, entita_id):
+        """
+        Avanza la coda fino al turno di un partecipante (dopo una ricostruzione).
+
+        Args:
+            entita_id (str): ID dell'entità di turno (None per non avanzare)
+        """
+        if entita_id not in self._chiavi:
+            return
+        for _ in range(len(self._chiavi) + 1):
+            corrente, _ = self.prossimo()
+            if corrente is None or corrente == entita_id:
+                return
+
+    def ordine(self):
+        """
+        Restituisce i partecipanti in ordine di iniziativa.
+
+        Returns:
+            list: ID dal più alto al più basso
+        """
+        return sorted(self._chiavi, key=self._chiavi.get)
+
+    def iniziativa(self, entita_id):
+        """Restituisce l'iniziativa corrente di un partecipante (o None)"""
+        chiave = self._chiavi.get(entita_id)
+        return -chiave[0] if chiave else None
+
+    def combattimento_finito(self):
+        """True se non resta nessun giocatore o nessun nemico vivo"""
+        return not self.vivi_per_schieramento[GIOCATORI] or not self.vivi_per_schieramento[NEMICI]
+
+    def vincitore(self):
+        """Restituisce "giocatore" se non restano nemici vivi, altrimenti "nemico" """
+        return "giocatore" if not self.vivi_per_schieramento[NEMICI] else "nemico"
+
+    def to_dict(self):
+        """
+        Rappresentazione serializzabile dell'ordine.
+
+        Returns:
+            dict: Iniziative, code, turno corrente e vivi
+        """
+        def valide(coda):
+            return [entita_id for chiave, entita_id in sorted(coda) if self._chiavi.get(entita_id) == chiave]
+
+        return {
+            "chiavi": {entita_id: list(chiave) for entita_id, chiave in self._chiavi.items()},
+            "coda": valide(self._coda),
+            "prossimo_round": valide(self._prossimo_round),
+            "sequenza": self._sequenza,
+            "schieramenti": self._schieramenti,
+            "corrente": self.corrente,
+            "viventi": sorted(self.viventi),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Ricostruisce un ordine salvato con to_dict.
+
+        Args:
+            data (dict): Dati serializzati
+
+        Returns:
+            OrdineTurni: Ordine ricostruito
+        """
+        ordine = cls()
+        ordine._chiavi = {entita_id: tuple(chiave) for entita_id, chiave in data.get("chiavi", {}).items()}
+        ordine._coda = [(ordine._chiavi[i], i) for i in data.get("coda", []) if i in ordine._chiavi]
+        ordine._prossimo_round = [(ordine._chiavi[i], i) for i in data.get("prossimo_round", [])
+                                  if i in ordine._chiavi]
+        heapq.heapify(ordine._coda)
+        heapq.heapify(ordine._prossimo_round)
+        ordine._accodati = {entita_id for _, entita_id in ordine._coda + ordine._prossimo_round}
+        ordine._sequenza = data.get("sequenza", len(ordine._chiavi))
+        ordine._schieramenti = dict(data.get("schieramenti", {}))
+        ordine.corrente = data.get("corrente")
+        ordine.viventi = set(data.get("viventi", []))
+        for entita_id in ordine.viventi:
+            gruppo = ordine.vivi_per_schieramento.get(ordine._schieramenti.get(entita_id))
+            if gruppo is not None:
+                gruppo.add(entita_id)
+        return ordine
@@ -0,0 +1,541 @@
+"""
+Registro binario degli eventi di combattimento.
+
+Ogni azione (tiro di attacco con il suo danno, danno diretto, cura,
+cambio di stato, passaggio di turno, iniziativa) viene aggiunta a un
+buffer append-only come record tipizzato: un byte di tipo seguito da
+interi varint in codifica zigzag. I partecipanti sono introdotti una
+volta da un record PARTECIPANTE (ID e HP iniziali) e poi citati per
+indice, quindi un attacco occupa pochi byte. I messaggi senza un record
+dedicato (uso di oggetti, errori) sono registrati come NOTA; i record
+con il bit SILENZIOSO contano per la riproduzione ma il loro messaggio
+è quello della nota che li accompagna.
+
+Dal registro si possono:
+- ricostruire HP, turno e round riproducendo gli eventi;
+- generare i messaggi in italiano solo quando un client li richiede
+  (MessaggiCombattimento è la lista dei messaggi dello stato);
+- salvare in modo incrementale: to_dict accoda solo i byte aggiunti
+  dall'ultimo salvataggio;
+- verificare che la riproduzione coincida con lo stato del mondo.
+"""
+
+import base64
+import logging
+import zlib
+from collections import namedtuple
+from collections.abc import Sequence
+from enum import IntEnum
+
+logger = logging.getLogger(__name__)
+
+# Intestazione del formato (versione 1)
+MAGIC = b"CLG\x01"
+
+
+class TipoEvento(IntEnum):
+    PARTECIPANTE = 1
+    INIZIATIVA = 2
+    TURNO = 3
+    ATTACCO = 4
+    DANNO = 5
+    CURA = 6
+    STATO = 7
+    FINE = 8
+    NOTA = 9
+
+
+# Bit del byte di tipo: record riprodotto ma non mostrato fra i messaggi
+SILENZIOSO = 0x80
+
+# Blocchi incrementali di to_dict oltre i quali il registro viene ricompresso in un'unica base
+MAX_BLOCCHI = 64
+
+
+# Azioni offensive registrate nei record ATTACCO
+AZIONE_ATTACCO = 0
+AZIONE_COLPO_POTENTE = 1
+
+# Esito dell'attacco (bit del campo "esito")
+ESITO_COLPISCE = 1
+ESITO_CRITICO = 2
+ESITO_FALLIMENTO_CRITICO = 4
+
+# Codici dei record STATO
+STATI = ("passa_turno", "fuga_riuscita", "fuga_fallita", "sconfitto")
+
+# Campi interi di ogni tipo di record, nell'ordine di codifica
+CAMPI = {
+    TipoEvento.PARTECIPANTE: ("hp",),
+    TipoEvento.INIZIATIVA: ("entita", "valore"),
+    TipoEvento.TURNO: ("entita", "round"),
+    TipoEvento.ATTACCO: ("attaccante", "bersaglio", "azione", "tiro", "esito", "danno", "hp"),
+    TipoEvento.DANNO: ("fonte", "bersaglio", "danno", "hp"),
+    TipoEvento.CURA: ("fonte", "bersaglio", "cura", "hp"),
+    TipoEvento.STATO: ("entita", "stato"),
+    TipoEvento.FINE: ("forzato",),
+    TipoEvento.NOTA: (),
+}
+
+# Campo testuale (lunghezza varint + UTF-8) che precede gli interi
+CAMPI_TESTO = {TipoEvento.PARTECIPANTE: "id", TipoEvento.NOTA: "testo"}
+
+# Record mostrati fra i messaggi dello stato di combattimento (iniziativa e turni restano nel registro)
+TIPI_MESSAGGI = frozenset(TipoEvento) - {TipoEvento.PARTECIPANTE, TipoEvento.INIZIATIVA, TipoEvento.TURNO}
+
+Evento = namedtuple("Evento", "tipo campi visibile", defaults=(True,))
+
+StatoRiprodotto = namedtuple("StatoRiprodotto", "hp turno_corrente round_corrente terminato incoerenze")
+
+
+def _scrivi_varint(buffer, valore):
+    # Codifica zigzag: i piccoli interi negativi restano corti
+    valore = (valore << 1) ^ (valore >> 63)
+    while valore >= 0x80:
+        buffer.append((valore & 0x7F) | 0x80)
+        valore >>= 7
+    buffer.append(valore)
+
+
+def _leggi_varint(dati, posizione):
+    valore = 0
+    spostamento = 0
+    while True:
+        byte = dati[posizione]
+        posizione += 1
+        valore |= (byte & 0x7F) << spostamento
+        if byte < 0x80:
+            break
+        spostamento += 7
+    return (valore >> 1) ^ -(valore & 1), posizione
+
+
+def _scrivi_testo(buffer, testo):
+    codificato = str(testo).encode("utf-8")
+    _scrivi_varint(buffer, len(codificato))
+    buffer += codificato
+
+
+class RegistroCombattimento:
+    """
+    Buffer append-only degli eventi di un combattimento.
+    """
+
+    def __init__(self, dati=None):
+        """
+        Args:
+            dati (bytes, optional): Registro esistente (come restituito da to_bytes)
+
+        Raises:
+            ValueError: Se i dati non sono un registro valido
+        """
+        self._buffer = bytearray(MAGIC)
+        self._partecipanti = []  # ID in ordine di indice
+        self._indici = {}
+        self._salvati = 0
+        # Forma persistita da to_dict: base compressa, blocchi aggiunti in seguito e byte coperti
+        self._base = None
+        self._blocchi = []
+        self._in_blocchi = 0
+        if dati:
+            if bytes(dati[:len(MAGIC)]) != MAGIC:
+                raise ValueError("Formato del registro di combattimento non riconosciuto")
+            self._buffer = bytearray(dati)
+            for evento in self.eventi():
+                if evento.tipo == TipoEvento.PARTECIPANTE:
+                    self._indici[evento.campi["id"]] = len(self._partecipanti)
+                    self._partecipanti.append(evento.campi["id"])
+            self._salvati = self._in_blocchi = len(self._buffer)
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def partecipanti(self):
+        """ID dei partecipanti nell'ordine in cui sono entrati nel registro"""
+        return list(self._partecipanti)
+
+    # Scrittura
+
+    def _indice(self, entita):
+        entita_id = getattr(entita, "id", entita)
+        indice = self._indici.get(entita_id)
+        if indice is None:
+            indice = self._indici[entita_id] = len(self._partecipanti)
+            self._partecipanti.append(entita_id)
+            self._buffer.append(TipoEvento.PARTECIPANTE)
+            _scrivi_testo(self._buffer, entita_id)
+            _scrivi_varint(self._buffer, int(getattr(entita, "hp", 0) or 0))
+        return indice
+
+    def _scrivi(self, tipo, *valori, visibile=True):
+        self._buffer.append(tipo if visibile else tipo | SILENZIOSO)
+        for valore in valori:
+            _scrivi_varint(self._buffer, int(valore))
+
+    def partecipante(self, entita):
+        """
+        Registra un partecipante con i suoi HP correnti (se non è già presente).
+
+        Args:
+            entita: Entità con attributi id e hp
+
+        Returns:
+            int: Indice del partecipante nel registro
+        """
+        return self._indice(entita)
+
+    def iniziativa(self, entita, valore):
+        """Registra il tiro di iniziativa di un partecipante"""
+        self._scrivi(TipoEvento.INIZIATIVA, self._indice(entita), valore)
+
+    def turno(self, entita, round_corrente):
+        """Registra l'inizio del turno di un partecipante"""
+        self._scrivi(TipoEvento.TURNO, self._indice(entita), round_corrente)
+
+    def attacco(self, attaccante, bersaglio, tiro, colpisce, critico=False, fallimento_critico=False,
+                danno=0, hp_dopo=None, azione=AZIONE_ATTACCO):
+        """
+        Registra un attacco e il danno inflitto.
+
+        Va chiamato prima di applicare il danno al bersaglio, così che un
+        bersaglio non ancora registrato entri con gli HP precedenti.
+
+        Args:
+            attaccante: Entità che attacca
+            bersaglio: Entità bersaglio
+            tiro (int): Risultato del d20 (dopo eventuali penalità)
+            colpisce (bool): Se l'attacco va a segno
+            critico (bool): Se è un colpo critico
+            fallimento_critico (bool): Se è un fallimento critico
+            danno (int): Danno inflitto
+            hp_dopo (int, optional): HP del bersaglio dopo l'attacco
+            azione (int): AZIONE_ATTACCO o AZIONE_COLPO_POTENTE
+        """
+        indice_bersaglio = self._indice(bersaglio)
+        esito = ((ESITO_COLPISCE if colpisce else 0) | (ESITO_CRITICO if critico else 0)
+                 | (ESITO_FALLIMENTO_CRITICO if fallimento_critico else 0))
+        if hp_dopo is None:
+            hp_dopo = getattr(bersaglio, "hp", 0)
+        self._scrivi(TipoEvento.ATTACCO, self._indice(attaccante), indice_bersaglio, azione, tiro, esito,
+                     danno, hp_dopo)
+
+    def danno(self, fonte, bersaglio, danno, hp_dopo, visibile=True):
+        """Registra un danno non dovuto a un attacco (oggetti, effetti); visibile=False se descritto da una nota"""
+        indice_bersaglio = self._indice(bersaglio)
+        self._scrivi(TipoEvento.DANNO, self._indice(fonte), indice_bersaglio, danno, hp_dopo, visibile=visibile)
+
+    def cura(self, fonte, bersaglio, cura, hp_dopo, visibile=True):
+        """Registra una cura; visibile=False se descritta da una nota (es. una pozione)"""
+        indice_bersaglio = self._indice(bersaglio)
+        self._scrivi(TipoEvento.CURA, self._indice(fonte), indice_bersaglio, cura, hp_dopo, visibile=visibile)
+
+    def stato(self, entita, stato):
+        """
+        Registra un cambio di stato di un partecipante.
+
+        Args:
+            entita: Entità interessata
+            stato (str): Uno dei valori di STATI
+        """
+        self._scrivi(TipoEvento.STATO, self._indice(entita), STATI.index(stato))
+
+    def fine(self, forzato=False):
+        """Registra la fine del combattimento"""
+        self._scrivi(TipoEvento.FINE, 1 if forzato else 0)
+
+    def nota(self, testo):
+        """Registra un messaggio che non corrisponde a un record tipizzato"""
+        self._buffer.append(TipoEvento.NOTA)
+        _scrivi_testo(self._buffer, testo)
+
+    # Lettura
+
+    def eventi(self, da=0):
+        """
+        Decodifica i record del registro.
+
+        Args:
+            da (int): Offset in byte da cui iniziare (0 = dall'inizio)
+
+        Yields:
+            Evento: Tipo e campi del record
+        """
+        dati = self._buffer
+        posizione = max(da, len(MAGIC))
+        while posizione < len(dati):
+            tipo = TipoEvento(dati[posizione] & ~SILENZIOSO)
+            visibile = not dati[posizione] & SILENZIOSO
+            posizione += 1
+            campi = {}
+            if tipo in CAMPI_TESTO:
+                lunghezza, posizione = _leggi_varint(dati, posizione)
+                campi[CAMPI_TESTO[tipo]] = bytes(dati[posizione:posizione + lunghezza]).decode("utf-8")
+                posizione += lunghezza
+            for nome in CAMPI[tipo]:
+                campi[nome], posizione = _leggi_varint(dati, posizione)
+            yield Evento(tipo, campi, visibile)
+
+    def messaggi(self, nomi=None, da=0, tipi=None):
+        """
+        Genera i messaggi leggibili degli eventi.
+
+        Args:
+            nomi (dict, optional): ID partecipante -> nome da mostrare (default: l'ID)
+            da (int): Offset in byte da cui iniziare
+            tipi (set, optional): Tipi di record da mostrare (default: tutti)
+
+        Returns:
+            list: Messaggi in italiano, uno per evento visibile
+        """
+        nomi = nomi or {}
+        partecipanti = list(self._partecipanti)
+
+        def nome(indice):
+            entita_id = partecipanti[indice]
+            return nomi.get(entita_id, entita_id)
+
+        righe = []
+        for evento in self.eventi(da):
+            if not evento.visibile or (tipi is not None and evento.tipo not in tipi):
+                continue
+            c = evento.campi
+            if evento.tipo == TipoEvento.NOTA:
+                righe.append(c["testo"])
+            elif evento.tipo == TipoEvento.ATTACCO:
+                a, b = nome(c["attaccante"]), nome(c["bersaglio"])
+                colpisce = c["esito"] & ESITO_COLPISCE
+                if c["azione"] == AZIONE_COLPO_POTENTE:
+                    righe.append(f"{a} usa colpo_potente contro {b} per {c['danno']} danni!" if colpisce
+                                 else f"{a} tenta di usare colpo_potente contro {b} ma fallisce!")
+                elif colpisce and c["esito"] & ESITO_CRITICO:
+                    righe.append(f"{a} colpisce {b} con un colpo critico per {c['danno']} danni!")
+                elif colpisce:
+                    righe.append(f"{a} colpisce {b} per {c['danno']} danni!")
+                elif c["esito"] & ESITO_FALLIMENTO_CRITICO:
+                    righe.append(f"{a} fallisce miseramente l'attacco contro {b}!")
+                else:
+                    righe.append(f"{a} manca {b}.")
+            elif evento.tipo == TipoEvento.DANNO:
+                righe.append(f"{nome(c['bersaglio'])} subisce {c['danno']} danni!")
+            elif evento.tipo == TipoEvento.CURA:
+                if c["fonte"] == c["bersaglio"]:
+                    righe.append(f"{nome(c['fonte'])} usa cura_ferite e recupera {c['cura']} punti vita!")
+                else:
+                    righe.append(f"{nome(c['fonte'])} usa cura_ferite su {nome(c['bersaglio'])} "
+                                 f"che recupera {c['cura']} punti vita!")
+            elif evento.tipo == TipoEvento.STATO:
+                a, stato = nome(c["entita"]), STATI[c["stato"]]
+                righe.append({"passa_turno": f"{a} passa il turno.",
+                              "fuga_riuscita": f"{a} è riuscito a fuggire!",
+                              "fuga_fallita": f"{a} ha tentato di fuggire ma non ci è riuscito.",
+                              "sconfitto": f"{a} è stato sconfitto!"}[stato])
+            elif evento.tipo == TipoEvento.INIZIATIVA:
+                righe.append(f"{nome(c['entita'])} ottiene {c['valore']} all'iniziativa.")
+            elif evento.tipo == TipoEvento.TURNO:
+                righe.append(f"Round {c['round']}: turno di {nome(c['entita'])}.")
+            elif evento.tipo == TipoEvento.FINE:
+                righe.append("Combattimento terminato" + (" forzatamente" if c["forzato"] else ""))
+        return righe
+
+    def riproduci(self):
+        """
+        Ricostruisce lo stato del combattimento riproducendo gli eventi.
+
+        I danni vengono riapplicati con la regola di esegui_attacco
+        (HP mai sotto zero); ogni differenza rispetto agli HP registrati
+        viene riportata in incoerenze.
+
+        Returns:
+            StatoRiprodotto: HP per ID, turno, round, fine e incoerenze trovate
+        """
+        partecipanti = []
+        hp = {}
+        turno_corrente = None
+        round_corrente = 0
+        terminato = False
+        incoerenze = []
+        for numero, evento in enumerate(self.eventi()):
+            c = evento.campi
+            if evento.tipo == TipoEvento.PARTECIPANTE:
+                partecipanti.append(c["id"])
+                hp[c["id"]] = c["hp"]
+            elif evento.tipo in (TipoEvento.ATTACCO, TipoEvento.DANNO):
+                bersaglio = partecipanti[c["bersaglio"]]
+                colpito = evento.tipo == TipoEvento.DANNO or c["esito"] & ESITO_COLPISCE
+                atteso = max(0, hp[bersaglio] - c["danno"]) if colpito else hp[bersaglio]
+                if atteso != c["hp"]:
+                    incoerenze.append(f"evento {numero}: HP di {bersaglio} {c['hp']}, attesi {atteso}")
+                hp[bersaglio] = c["hp"]
+            elif evento.tipo == TipoEvento.CURA:
+                hp[partecipanti[c["bersaglio"]]] = c["hp"]
+            elif evento.tipo == TipoEvento.TURNO:
+                turno_corrente = partecipanti[c["entita"]]
+                round_corrente = c["round"]
+            elif evento.tipo == TipoEvento.FINE:
+                terminato = True
+                turno_corrente = None
+        return StatoRiprodotto(hp, turno_corrente, round_corrente, terminato, incoerenze)
+
+    def confronta(self, world):
+        """
+        Confronta gli HP ricostruiti con quelli delle entità del mondo.
+
+        Args:
+            world: Mondo con get_entity
+
+        Returns:
+            list: Descrizione delle differenze (vuota se coincidono)
+        """
+        stato = self.riproduci()
+        differenze = list(stato.incoerenze)
+        for entita_id, hp in stato.hp.items():
+            entita = world.get_entity(entita_id)
+            if entita is not None and getattr(entita, "hp", None) != hp:
+                differenze.append(f"{entita_id}: HP nel mondo {getattr(entita, 'hp', None)}, dal registro {hp}")
+        return differenze
+
+    # Persistenza
+
+    def to_bytes(self):
+        """Restituisce il registro completo"""
+        return bytes(self._buffer)
+
+    def nuovi_byte(self):
+        """
+        Restituisce i byte aggiunti dall'ultimo salvataggio e li segna come salvati.
+
+        Concatenando i blocchi restituiti si ottiene esattamente to_bytes().
+
+        Returns:
+            bytes: Byte da accodare al file di salvataggio
+        """
+        blocco = bytes(self._buffer[self._salvati:])
+        self._salvati = len(self._buffer)
+        return blocco
+
+    def comprimi(self):
+        """Restituisce il registro compresso con zlib"""
+        return zlib.compress(bytes(self._buffer), 9)
+
+    @classmethod
+    def decomprimi(cls, dati):
+        """Crea un registro da dati compressi con comprimi()"""
+        return cls(zlib.decompress(dati))
+
+    def to_dict(self):
+        """
+        Rappresentazione serializzabile in JSON.
+
+        A ogni chiamata viene codificato solo il blocco di byte aggiunto dal
+        salvataggio precedente; superati MAX_BLOCCHI blocchi il registro
+        salvato viene ricompresso in un'unica base.
+
+        Returns:
+            dict: Base compressa con zlib e blocchi successivi, in base64
+        """
+        if self._in_blocchi < len(self._buffer):
+            self._blocchi.append(base64.b64encode(bytes(self._buffer[self._in_blocchi:])).decode("ascii"))
+            self._in_blocchi = len(self._buffer)
+        if len(self._blocchi) > MAX_BLOCCHI:
+            self._base = base64.b64encode(self.comprimi()).decode("ascii")
+            self._blocchi = []
+        return {"formato": "clg1+blocchi", "base": self._base, "blocchi": list(self._blocchi)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Crea un registro dalla rappresentazione di to_dict.
+
+        Args:
+            data (dict): Dati serializzati
+
+        Returns:
+            RegistroCombattimento: Registro ricostruito (vuoto se i dati non sono validi)
+        """
+        try:
+            if data.get("formato") == "clg1+zlib":
+                return cls.decomprimi(base64.b64decode(data["dati"]))
+            base = zlib.decompress(base64.b64decode(data["base"])) if data.get("base") else b""
+            registro = cls(base + b"".join(base64.b64decode(blocco) for blocco in data.get("blocchi", ())))
+            registro._base = data.get("base")
+            registro._blocchi = list(data.get("blocchi", ()))
+            return registro
+        except Exception as e:
+            logger.error(f"Errore nel caricamento del registro di combattimento: {e}")
+            return cls()
+
+
+def get_registro(state):
+    """
+    Restituisce il registro eventi di uno stato di combattimento, creandolo se necessario.
+
+    Args:
+        state: Stato del combattimento
+
+    Returns:
+        RegistroCombattimento: Registro associato allo stato
+    """
+    registro = getattr(state, "registro", None)
+    if registro is None:
+        registro = RegistroCombattimento()
+        state.registro = registro
+    return registro
+
+
+class MessaggiCombattimento(Sequence):
+    """
+    Messaggi di uno stato di combattimento, generati dal registro eventi.
+
+    Si usa come una lista: la lettura converte in testo solo i record
+    aggiunti dall'ultima lettura, append registra una NOTA.
+    """
+
+    def __init__(self, state):
+        """
+        Args:
+            state: Stato del combattimento (con world per i nomi dei partecipanti)
+        """
+        self._state = state
+        self._registro = None
+        self._righe = []
+        self._letti = 0  # Byte del registro già convertiti in messaggi
+
+    def _aggiorna(self):
+        registro = get_registro(self._state)
+        if registro is not self._registro:
+            self._registro, self._righe, self._letti = registro, [], 0
+        if self._letti < len(registro):
+            self._righe.extend(registro.messaggi(_nomi(self._state, registro), da=self._letti, tipi=TIPI_MESSAGGI))
+            self._letti = len(registro)
+        return self._righe
+
+    def __getitem__(self, indice):
+        return self._aggiorna()[indice]
+
+    def __len__(self):
+        return len(self._aggiorna())
+
+    def __eq__(self, altro):
+        return list(self) == list(altro) if isinstance(altro, (list, Sequence)) else NotImplemented
+
+    def append(self, testo):
+        """Aggiunge un messaggio al registro"""
+        get_registro(self._state).nota(testo)
+
+    def extend(self, testi):
+        """Aggiunge più messaggi al registro"""
+        for testo in testi:
+            self.append(testo)
+
+
+def _nomi(state, registro):
+    """Nomi da mostrare dei partecipanti presenti nel registro"""
+    world = getattr(state, "world", None)
+    nomi = {}
+    for entita_id in registro.partecipanti:
+        entita = world.get_entity(entita_id) if world is not None and hasattr(world, "get_entity") else None
+        nome = getattr(entita, "name", None) or getattr(entita, "nome", None)
+        if nome:
+            nomi[entita_id] = nome
+    return nomi
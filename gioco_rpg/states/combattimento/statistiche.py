@@ -0,0 +1,190 @@
+"""
+Statistiche di combattimento derivate dei partecipanti.
+
+Bonus di attacco, classe armatura, dado di danno, modificatore di
+iniziativa e tiri salvezza vengono calcolati una volta per entità
+all'inizio del combattimento e letti dalla cache a ogni azione. La cache
+di un'entità viene invalidata solo quando cambiano equipaggiamento,
+livello o effetti temporanei (eventi ITEM_EQUIPPED, ITEM_UNEQUIPPED e
+ENTITY_STATS_CHANGED).
+"""
+
+import logging
+from collections import namedtuple
+
+import core.events as Events
+
+logger = logging.getLogger(__name__)
+
+# Dado di danno di un attacco senza un'arma con danno_base
+DADO_DANNO_BASE = 8
+
+# Bonus alla CA per un'armatura che non dichiara valore_ca
+BONUS_ARMATURA = 2
+
+CARATTERISTICHE = ("forza", "destrezza", "costituzione", "intelligenza", "saggezza", "carisma")
+
+StatisticheCombattimento = namedtuple(
+    "StatisticheCombattimento",
+    "bonus_attacco classe_armatura dado_danno bonus_danno mod_iniziativa tiri_salvezza")
+
+
+def modificatore_caratteristica(entita, caratteristica):
+    """
+    Restituisce il modificatore di una caratteristica.
+
+    Le entità derivate da Entita memorizzano il modificatore in
+    modificatore_<caratteristica> (e la proprietà <caratteristica> lo
+    restituisce già convertito); le altre entità espongono il punteggio.
+
+    Args:
+        entita: Entità di cui leggere la caratteristica
+        caratteristica (str): Nome della caratteristica
+
+    Returns:
+        int: Modificatore
+    """
+    modificatore = getattr(entita, f"modificatore_{caratteristica}", None)
+    if isinstance(modificatore, int):
+        return modificatore
+    punteggio = getattr(entita, caratteristica, 10)
+    return (punteggio - 10) // 2 if isinstance(punteggio, int) else 0
+
+
+def _ha_valore_ca(armatura):
+    return hasattr(armatura, "valore_ca") or (isinstance(armatura, dict) and "valore_ca" in armatura)
+
+
+def _nome_classe(entita):
+    if callable(getattr(entita, "_get_classe_nome", None)):
+        return entita._get_classe_nome()
+    classe = getattr(entita, "classe", None)
+    return classe.lower() if isinstance(classe, str) else None
+
+
+def calcola_statistiche(entita):
+    """
+    Calcola le statistiche di combattimento di un'entità.
+
+    Args:
+        entita: Giocatore, Nemico, NPG o entità ECS
+
+    Returns:
+        StatisticheCombattimento: Statistiche derivate
+    """
+    from entities.giocatore import COMPETENZE_TIRI_SALVEZZA
+
+    modificatori = {c: modificatore_caratteristica(entita, c) for c in CARATTERISTICHE}
+    bonus_attacco = modificatori["forza"]
+
+    armatura = getattr(entita, "armatura", None)
+    if callable(getattr(entita, "get_classe_armatura", None)):
+        classe_armatura = entita.get_classe_armatura()
+        if armatura and not _ha_valore_ca(armatura):
+            classe_armatura += BONUS_ARMATURA
+    else:
+        classe_armatura = 10 + modificatori["destrezza"] + (BONUS_ARMATURA if armatura else 0)
+
+    dado_danno = DADO_DANNO_BASE
+    if getattr(entita, "arma", None) and callable(getattr(entita, "get_danno_arma", None)):
+        danno_arma = entita.get_danno_arma()
+        # 1 è il valore di ripiego di get_danno_arma per le armi senza danno_base
+        if isinstance(danno_arma, int) and danno_arma > 1:
+            dado_danno = danno_arma
+
+    competenze = COMPETENZE_TIRI_SALVEZZA.get(_nome_classe(entita), ())
+    bonus_competenza = getattr(entita, "bonus_competenza", 0)
+    bonus_competenza = bonus_competenza if isinstance(bonus_competenza, int) else 0
+    tiri_salvezza = {c: mod + (bonus_competenza if c in competenze else 0) for c, mod in modificatori.items()}
+
+    return StatisticheCombattimento(bonus_attacco, classe_armatura, dado_danno, max(0, bonus_attacco),
+                                    modificatori["destrezza"], tiri_salvezza)
+
+
+class CacheStatistiche:
+    """
+    Statistiche di combattimento memorizzate per ID di entità.
+    """
+
+    def __init__(self):
+        self._statistiche = {}
+        self._unsubscribe = []
+
+    def prepara(self, world, partecipanti):
+        """
+        Calcola le statistiche di tutti i partecipanti all'inizio del combattimento.
+
+        Args:
+            world: Mondo da cui leggere le entità
+            partecipanti (list): ID dei partecipanti
+        """
+        for entita_id in partecipanti:
+            entita = world.get_entity(entita_id) if world else None
+            if entita:
+                self._statistiche[entita_id] = calcola_statistiche(entita)
+
+    def get(self, entita):
+        """
+        Restituisce le statistiche di un'entità, calcolandole se non sono in cache.
+
+        Args:
+            entita: Entità partecipante
+
+        Returns:
+            StatisticheCombattimento: Statistiche derivate
+        """
+        chiave = getattr(entita, "id", None) or id(entita)
+        statistiche = self._statistiche.get(chiave)
+        if statistiche is None:
+            statistiche = self._statistiche[chiave] = calcola_statistiche(entita)
+        return statistiche
+
+    def invalida(self, entita_id=None):
+        """
+        Scarta le statistiche di un'entità o, senza argomenti, di tutte.
+
+        Args:
+            entita_id (str, optional): ID dell'entità modificata
+        """
+        if entita_id is None:
+            self._statistiche.clear()
+        else:
+            self._statistiche.pop(entita_id, None)
+
+    def ascolta_eventi(self, event_bus=None):
+        """Invalida la cache sugli eventi di equipaggiamento, livello ed effetti"""
+        if self._unsubscribe:
+            return
+        if event_bus is None:
+            from core.event_bus import EventBus
+            event_bus = EventBus.get_instance()
+        for evento in (Events.ITEM_EQUIPPED, Events.ITEM_UNEQUIPPED, Events.ENTITY_STATS_CHANGED):
+            self._unsubscribe.append(event_bus.on(evento, self._on_statistiche_modificate))
+
+    def chiudi(self):
+        """Smette di ascoltare gli eventi e svuota la cache"""
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+        self._statistiche.clear()
+
+    def _on_statistiche_modificate(self, entity_id=None, **kwargs):
+        self.invalida(entity_id)
+
+
+def get_cache_statistiche(state):
+    """
+    Restituisce la cache delle statistiche di uno stato di combattimento, creandola se necessario.
+
+    Args:
+        state: Stato del combattimento
+
+    Returns:
+        CacheStatistiche: Cache associata allo stato
+    """
+    cache = getattr(state, "cache_statistiche", None)
+    if cache is None:
+        cache = CacheStatistiche()
+        cache.ascolta_eventi()
+        state.cache_statistiche = cache
+    return cache
@@ -1,3 +1,10 @@
+from util.dado import Dado
+from util.rng import generatore_di
+from states.combattimento.statistiche import get_cache_statistiche
+from states.combattimento.registro import get_registro
+from states.combattimento.ordine_turni import OrdineTurni, schieramento
+
+
 class GestoreTurni:
     """
     Classe per gestire i turni durante il combattimento
@@ -10,7 +17,29 @@ class GestoreTurni:
             state: Lo stato del combattimento
         """
         self.state = state
-        self.indice_turno_corrente = 0
+    
+    @property
+    def ordine(self):
+        """
+        Ordine dei turni del combattimento.
+        
+        Se lo stato non ne ha uno (es. ricostruito da un salvataggio
+        precedente) viene ricostruito una volta dalle iniziative delle entità.
+        
+        Returns:
+            OrdineTurni: Ordine associato allo stato
+        """
+        ordine = getattr(self.state, "ordine_turni", None)
+        if ordine is None:
+            ordine = OrdineTurni()
+            for p_id in getattr(self.state, "ordine_iniziativa", None) or self.state.partecipanti:
+                entita = self.state.world.get_entity(p_id) if self.state.world else None
+                ordine.aggiungi(p_id, getattr(entita, "iniziativa", 0) or 0, schieramento(entita),
+                                vivo=entita is not None and getattr(entita, "hp", 0) > 0)
+            ordine.riprendi_da(self.state.turno_corrente)
+            ordine.attiva()
+            self.state.ordine_turni = ordine
+        return ordine
     
     def calcola_iniziativa(self):
         """
@@ -19,27 +48,31 @@ class GestoreTurni:
         Returns:
             list: Lista ordinata di ID dei partecipanti in base all'iniziativa
         """
-        from util.dado import Dado
-        dado = Dado(20)
+        dado = Dado(20, generatore_di(self.state.world, "combattimento"))
+        
+        # Le statistiche di tutti i partecipanti vengono calcolate una volta a inizio combattimento
+        statistiche = get_cache_statistiche(self.state)
+        statistiche.prepara(self.state.world, self.state.partecipanti)
+        registro = get_registro(self.state)
         
         # Calcola i valori di iniziativa per ogni partecipante
-        iniziative = {}
+        ordine = OrdineTurni()
         for p_id in self.state.partecipanti:
             entita = self.state.world.get_entity(p_id)
             if entita:
                 # Calcola valore iniziativa basato su destrezza
-                destrezza = getattr(entita, "destrezza", 10)
-                mod_destrezza = (destrezza - 10) // 2
-                tiro_dado = dado.tira() + mod_destrezza
+                tiro_dado = dado.tira() + statistiche.get(entita).mod_iniziativa
                 setattr(entita, "iniziativa", tiro_dado)
-                iniziative[p_id] = tiro_dado
-                
-        # Ordina i partecipanti in base all'iniziativa (alto -> basso)
-        self.state.ordine_iniziativa = sorted(
-            self.state.partecipanti,
-            key=lambda p_id: iniziative.get(p_id, 0),
-            reverse=True
-        )
+                ordine.aggiungi(p_id, tiro_dado, schieramento(entita), vivo=getattr(entita, "hp", 0) > 0)
+                registro.iniziativa(entita, tiro_dado)
+        
+        if getattr(self.state, "ordine_turni", None) is not None:
+            self.state.ordine_turni.chiudi()
+        ordine.attiva()
+        self.state.ordine_turni = ordine
+        
+        # Ordine alto -> basso (a parità resta l'ordine dei partecipanti)
+        self.state.ordine_iniziativa = ordine.ordine()
         
         return self.state.ordine_iniziativa
     
@@ -54,11 +87,12 @@ class GestoreTurni:
         if not hasattr(self.state, 'ordine_iniziativa') or not self.state.ordine_iniziativa:
             self.calcola_iniziativa()
             
-        # Imposta il turno al primo giocatore nella lista di iniziativa
-        if self.state.ordine_iniziativa:
-            self.indice_turno_corrente = 0
-            self.state.turno_corrente = self.state.ordine_iniziativa[0]
+        # Imposta il turno al primo partecipante vivo nell'ordine di iniziativa
+        primo, _ = self.ordine.prossimo()
+        if primo is not None:
+            self.state.turno_corrente = primo
             self.state.fase_corrente = "azione"
+            self._registra_turno()
         
         return self.state.turno_corrente
     
@@ -69,21 +103,66 @@ class GestoreTurni:
         Returns:
             str: ID dell'entità di cui è il turno ora
         """
-        if not hasattr(self.state, 'ordine_iniziativa') or not self.state.ordine_iniziativa:
+        if not getattr(self.state, "ordine_turni", None) and not getattr(self.state, "ordine_iniziativa", None):
             return None
             
-        # Passa al prossimo indice
-        self.indice_turno_corrente = (self.indice_turno_corrente + 1) % len(self.state.ordine_iniziativa)
+        # Prossimo partecipante vivo (i morti vengono saltati)
+        prossimo, nuovo_round = self.ordine.prossimo()
+        if prossimo is None:
+            return None
         
-        # Se torniamo all'inizio, aumenta il contatore dei round
-        if self.indice_turno_corrente == 0:
+        # Se l'ordine ricomincia, aumenta il contatore dei round
+        if nuovo_round:
             self.state.round_corrente += 1
             
         # Imposta il nuovo turno
-        self.state.turno_corrente = self.state.ordine_iniziativa[self.indice_turno_corrente]
+        self.state.turno_corrente = prossimo
+        self._registra_turno()
+        
+        return self.state.turno_corrente
+    
+    def aggiungi_partecipante(self, entita, iniziativa=None):
+        """
+        Aggiunge un partecipante a combattimento iniziato (rinforzi, evocazioni)
+        
+        Args:
+            entita: Entità da aggiungere (deve essere già nel mondo)
+            iniziativa (int, optional): Iniziativa da usare (default: tiro di d20 + destrezza)
+            
+        Returns:
+            int: Iniziativa del nuovo partecipante
+        """
+        if iniziativa is None:
+            dado = Dado(20, generatore_di(self.state.world, "combattimento"))
+            iniziativa = dado.tira() + get_cache_statistiche(self.state).get(entita).mod_iniziativa
+        setattr(entita, "iniziativa", iniziativa)
+        if entita.id not in self.state.partecipanti:
+            self.state.partecipanti.append(entita.id)
+        self.ordine.aggiungi(entita.id, iniziativa, schieramento(entita), vivo=getattr(entita, "hp", 0) > 0)
+        get_registro(self.state).iniziativa(entita, iniziativa)
+        return iniziativa
+    
+    def ritarda_turno(self, entita_id, iniziativa):
+        """
+        Ritarda il turno di un partecipante (azione ritardata o preparata)
         
+        Args:
+            entita_id (str): ID dell'entità
+            iniziativa (int): Iniziativa a cui agirà
+            
+        Returns:
+            str: ID dell'entità di cui è il turno ora
+        """
+        self.ordine.ritarda(entita_id, iniziativa)
+        if self.state.turno_corrente == entita_id:
+            return self.passa_al_turno_successivo()
         return self.state.turno_corrente
     
+    def _registra_turno(self):
+        """Aggiunge l'inizio del turno corrente al registro eventi"""
+        entita = self.state.world.get_entity(self.state.turno_corrente) if self.state.world else None
+        get_registro(self.state).turno(entita or self.state.turno_corrente, self.state.round_corrente)
+    
     def turno_entita(self, entita_id):
         """
         Verifica se è il turno dell'entità specificata
@@ -103,13 +182,7 @@ class GestoreTurni:
         Returns:
             list: Lista di ID delle entità ancora vive
         """
-        vivi = []
-        for p_id in self.state.partecipanti:
-            entita = self.state.world.get_entity(p_id)
-            if entita and getattr(entita, "hp", 0) > 0:
-                vivi.append(p_id)
-                
-        return vivi
+        return list(self.ordine.viventi)
     
     def controlla_fine_combattimento(self):
         """
@@ -118,20 +191,8 @@ class GestoreTurni:
         Returns:
             bool: True se il combattimento è terminato, False altrimenti
         """
-        # Trova i giocatori e i nemici vivi
-        giocatori_vivi = []
-        nemici_vivi = []
-        
-        for p_id in self.state.partecipanti:
-            entita = self.state.world.get_entity(p_id)
-            if entita and getattr(entita, "hp", 0) > 0:
-                if entita.has_tag("player"):
-                    giocatori_vivi.append(p_id)
-                elif entita.has_tag("nemico") or entita.has_tag("ostile"):
-                    nemici_vivi.append(p_id)
-        
         # Il combattimento termina se tutti i nemici sono morti o tutti i giocatori sono morti
-        return len(nemici_vivi) == 0 or len(giocatori_vivi) == 0
+        return self.ordine.combattimento_finito()
     
     def determina_vincitore(self):
         """
@@ -140,23 +201,7 @@ class GestoreTurni:
         Returns:
             str: "giocatore" se ha vinto il giocatore, "nemico" se hanno vinto i nemici
         """
-        # Trova i giocatori e i nemici vivi
-        giocatori_vivi = []
-        nemici_vivi = []
-        
-        for p_id in self.state.partecipanti:
-            entita = self.state.world.get_entity(p_id)
-            if entita and getattr(entita, "hp", 0) > 0:
-                if entita.has_tag("player"):
-                    giocatori_vivi.append(p_id)
-                elif entita.has_tag("nemico") or entita.has_tag("ostile"):
-                    nemici_vivi.append(p_id)
-        
-        # Determina il vincitore
-        if len(nemici_vivi) == 0:
-            return "giocatore"
-        else:
-            return "nemico"
+        return self.ordine.vincitore()
 
     def attacco_nemico(self, giocatore, gioco):
         """
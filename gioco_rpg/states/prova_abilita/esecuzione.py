@@ -6,6 +6,7 @@ Contiene metodi per eseguire prove e gestire i risultati.
 from util.dado import Dado
 from entities.entita import ABILITA_ASSOCIATE
 from states.prova_abilita.ui import mostra_risultato_prova
+from states.prova_abilita.risoluzione import get_servizio_prove, probabilita_confronto, probabilita_successo
 
 def esegui_prova_base_grafica(state, gioco, difficolta):
     """
@@ -225,15 +226,9 @@ def esegui_prova(state, sessione, entita, abilita, difficolta, target=None):
     dado = Dado(20)
     tiro_base = dado.tira()
     
-    # Ottieni il modificatore in base al tipo di abilità
-    modificatore = 0
-    if hasattr(entita, "modificatore_abilita") and callable(entita.modificatore_abilita):
-        modificatore = entita.modificatore_abilita(abilita)
-    else:
-        # Fallback per entità senza metodo modificatore_abilita
-        for componente in entita.get_all_components():
-            if hasattr(componente, "get_bonus_abilita") and callable(componente.get_bonus_abilita):
-                modificatore += componente.get_bonus_abilita(abilita)
+    # Modificatore dalla tabella in cache dell'entità
+    servizio = get_servizio_prove()
+    modificatore = servizio.modificatore(entita, abilita)
     
     risultato_totale = tiro_base + modificatore
     successo = risultato_totale >= difficolta
@@ -249,7 +244,8 @@ def esegui_prova(state, sessione, entita, abilita, difficolta, target=None):
         "modificatore": modificatore,
         "risultato_totale": risultato_totale,
         "difficolta": difficolta,
-        "successo": successo
+        "successo": successo,
+        "probabilita_successo": probabilita_successo(modificatore, difficolta)
     }
     
     # Gestione target per prove di confronto
@@ -258,14 +254,7 @@ def esegui_prova(state, sessione, entita, abilita, difficolta, target=None):
         tiro_target = dado.tira()
         
         # Ottieni il modificatore del target
-        mod_target = 0
-        if hasattr(target, "modificatore_abilita") and callable(target.modificatore_abilita):
-            mod_target = target.modificatore_abilita(abilita)
-        else:
-            # Fallback per entità senza metodo modificatore_abilita
-            for componente in target.get_all_components():
-                if hasattr(componente, "get_bonus_abilita") and callable(componente.get_bonus_abilita):
-                    mod_target += componente.get_bonus_abilita(abilita)
+        mod_target = servizio.modificatore(target, abilita)
         
         risultato_target = tiro_target + mod_target
         vittoria = risultato_totale >= risultato_target
@@ -280,6 +269,7 @@ def esegui_prova(state, sessione, entita, abilita, difficolta, target=None):
             "risultato_totale": risultato_target
         }
         risultato["vittoria"] = vittoria
+        risultato["probabilita_vittoria"] = probabilita_confronto(modificatore, mod_target)
         
         # Gestisci gli effetti in base all'esito
         if vittoria:
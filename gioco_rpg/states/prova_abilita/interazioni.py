@@ -5,6 +5,7 @@ Contiene metodi per interagire con NPG e oggetti.
 
 from util.dado import Dado
 from entities.entita import ABILITA_ASSOCIATE
+from world.indice_spaziale import MANHATTAN, NPG, OGGETTI
 
 def ottieni_mappa_corrente(state, gioco):
     """
@@ -37,17 +38,12 @@ def ottieni_npg_vicini(state, gioco):
     if not mappa:
         return {}
         
-    # Esempio di logica per trovare NPG vicini, da adattare in base al gioco
-    npg_vicini = {}
+    # NPG entro 2 celle (distanza di Manhattan) dal giocatore, dall'indice spaziale della mappa
     pos_giocatore = gioco.giocatore.posizione
-    
-    for npg_id, npg in mappa.npg.items():
-        # Calcola la distanza tra il giocatore e l'NPG (esempio semplificato)
-        distanza = abs(npg.posizione[0] - pos_giocatore[0]) + abs(npg.posizione[1] - pos_giocatore[1])
-        
-        # Se l'NPG è abbastanza vicino (esempio: distanza <= 2 celle)
-        if distanza <= 2:
-            npg_vicini[npg_id] = npg
+    npg_vicini = {
+        (v.x, v.y): v.valore
+        for v in mappa.indice.entro_raggio(pos_giocatore[0], pos_giocatore[1], 2, NPG, metrica=MANHATTAN)
+    }
     
     return npg_vicini
 
@@ -66,17 +62,12 @@ def ottieni_oggetti_vicini(state, gioco):
     if not mappa:
         return {}
         
-    # Esempio di logica per trovare oggetti vicini, da adattare in base al gioco
-    oggetti_vicini = {}
+    # Oggetti entro 1 cella (distanza di Manhattan) dal giocatore
     pos_giocatore = gioco.giocatore.posizione
-    
-    for obj_id, obj in mappa.oggetti.items():
-        # Calcola la distanza tra il giocatore e l'oggetto (esempio semplificato)
-        distanza = abs(obj.posizione[0] - pos_giocatore[0]) + abs(obj.posizione[1] - pos_giocatore[1])
-        
-        # Se l'oggetto è abbastanza vicino (esempio: distanza <= 1 cella)
-        if distanza <= 1:
-            oggetti_vicini[obj_id] = obj
+    oggetti_vicini = {
+        (v.x, v.y): v.valore
+        for v in mappa.indice.entro_raggio(pos_giocatore[0], pos_giocatore[1], 1, OGGETTI, metrica=MANHATTAN)
+    }
     
     return oggetti_vicini
 
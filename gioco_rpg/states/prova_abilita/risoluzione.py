@@ -0,0 +1,312 @@
+"""
+Risoluzione delle prove di abilità.
+
+Il modificatore di ogni abilità e caratteristica di un'entità viene
+calcolato una volta in una tabella per entità e riusato finché non
+cambiano livello, equipaggiamento o effetti (eventi ENTITY_STATS_CHANGED,
+ITEM_EQUIPPED e ITEM_UNEQUIPPED). Ogni tabella ricorda anche l'oggetto e
+la versione delle statistiche da cui è stata calcolata, così un'entità
+ricaricata con lo stesso ID non riceve i modificatori della precedente;
+le entità ECS con componenti che forniscono bonus non vengono memorizzate.
+
+Le probabilità di successo di una prova (d20 + modificatore contro una
+CD) e di un confronto (d20 + mod1 contro d20 + mod2, con parità vinta da
+chi agisce) sono lette da tabelle precalcolate, quindi l'interfaccia può
+mostrarle insieme al risultato senza costi aggiuntivi. prove_di_gruppo
+risolve molte prove con un unico tiro in blocco.
+"""
+
+import logging
+from collections import OrderedDict, namedtuple
+
+import core.events as Events
+from entities.entita import ABILITA_ASSOCIATE
+from states.combattimento.statistiche import CARATTERISTICHE, modificatore_caratteristica
+from util.rng import generatore
+
+logger = logging.getLogger(__name__)
+
+# Numero massimo di tabelle dei modificatori mantenute in memoria
+MAX_TABELLE = 1024
+
+# Per ogni differenza k = mod_bersaglio - mod_attore (da -19 a 19): casi su 400
+# in cui d20_attore - d20_bersaglio >= k
+_CASI_CONFRONTO = {k: sum(1 for a in range(1, 21) for b in range(1, 21) if a - b >= k) for k in range(-19, 20)}
+
+EsitoProva = namedtuple("EsitoProva", "entita_id tiro modificatore totale successo probabilita")
+
+
+def probabilita_successo(modificatore, difficolta):
+    """
+    Probabilità che d20 + modificatore raggiunga la difficoltà.
+
+    Args:
+        modificatore (int): Modificatore della prova
+        difficolta (int): Classe di difficoltà
+
+    Returns:
+        float: Probabilità fra 0 e 1
+    """
+    return min(20, max(0, 21 - (difficolta - modificatore))) / 20
+
+
+def probabilita_confronto(modificatore, modificatore_avversario):
+    """
+    Probabilità di vincere una prova contrapposta (la parità vince chi agisce).
+
+    Args:
+        modificatore (int): Modificatore di chi agisce
+        modificatore_avversario (int): Modificatore dell'avversario
+
+    Returns:
+        float: Probabilità fra 0 e 1
+    """
+    differenza = modificatore_avversario - modificatore
+    if differenza > 19:
+        return 0.0
+    if differenza < -19:
+        return 1.0
+    return _CASI_CONFRONTO[differenza] / 400
+
+
+def probabilita_gruppo(probabilita, minimo=None):
+    """
+    Probabilità che almeno `minimo` prove indipendenti abbiano successo.
+
+    Args:
+        probabilita (list): Probabilità di successo di ogni membro
+        minimo (int, optional): Successi richiesti (default: metà del gruppo, arrotondata per eccesso)
+
+    Returns:
+        float: Probabilità fra 0 e 1
+    """
+    if minimo is None:
+        minimo = (len(probabilita) + 1) // 2
+    # Distribuzione del numero di successi (binomiale con probabilità diverse)
+    distribuzione = [1.0]
+    for p in probabilita:
+        distribuzione = [a * (1 - p) + b * p for a, b in zip(distribuzione + [0.0], [0.0] + distribuzione)]
+    return sum(distribuzione[minimo:])
+
+
+def calcola_modificatori(entita):
+    """
+    Calcola i modificatori di tutte le abilità e caratteristiche di un'entità.
+
+    Args:
+        entita: Entita (con competenze), entità ECS con componenti o oggetto con modificatore_abilita
+
+    Returns:
+        dict: Nome abilità o caratteristica -> modificatore
+    """
+    nomi = list(CARATTERISTICHE) + list(ABILITA_ASSOCIATE)
+    competenze = getattr(entita, "abilita_competenze", None)
+    if isinstance(competenze, dict):
+        bonus_competenza = getattr(entita, "bonus_competenza", 0)
+        tabella = {c: modificatore_caratteristica(entita, c) for c in CARATTERISTICHE}
+        for abilita, caratteristica in ABILITA_ASSOCIATE.items():
+            tabella[abilita] = tabella[caratteristica] + (bonus_competenza if competenze.get(abilita) else 0)
+        return tabella
+
+    if callable(getattr(entita, "modificatore_abilita", None)):
+        return {nome: entita.modificatore_abilita(nome) for nome in nomi}
+
+    tabella = dict.fromkeys(nomi, 0)
+    if callable(getattr(entita, "get_all_components", None)):
+        for componente in entita.get_all_components():
+            if callable(getattr(componente, "get_bonus_abilita", None)):
+                for nome in nomi:
+                    tabella[nome] += componente.get_bonus_abilita(nome)
+    return tabella
+
+
+def _bonus_da_componenti(entita):
+    """Indica se un'entità ECS ha componenti che forniscono bonus alle abilità"""
+    if isinstance(getattr(entita, "abilita_competenze", None), dict) or \
+            callable(getattr(entita, "modificatore_abilita", None)):
+        return False
+    get_all_components = getattr(entita, "get_all_components", None)
+    return callable(get_all_components) and any(
+        callable(getattr(componente, "get_bonus_abilita", None)) for componente in get_all_components())
+
+
+class ServizioProve:
+    """
+    Risolve prove di abilità con modificatori in cache e probabilità precalcolate.
+    """
+
+    def __init__(self):
+        self._tabelle = OrderedDict()
+        self._unsubscribe = []
+
+    def modificatori(self, entita):
+        """
+        Restituisce la tabella dei modificatori di un'entità.
+
+        Args:
+            entita: Entità che esegue le prove
+
+        Returns:
+            dict: Nome abilità o caratteristica -> modificatore
+        """
+        if _bonus_da_componenti(entita):
+            # I componenti possono cambiare i bonus senza notificarlo
+            return calcola_modificatori(entita)
+        chiave = getattr(entita, "id", None) or id(entita)
+        versione = getattr(entita, "versione_statistiche", None)
+        voce = self._tabelle.get(chiave)
+        if voce is None or voce[0] is not entita or voce[1] != versione:
+            voce = self._tabelle[chiave] = (entita, versione, calcola_modificatori(entita))
+            while len(self._tabelle) > MAX_TABELLE:
+                self._tabelle.popitem(last=False)
+        else:
+            self._tabelle.move_to_end(chiave)
+        return voce[2]
+
+    def modificatore(self, entita, abilita):
+        """
+        Restituisce il modificatore di un'abilità o caratteristica.
+
+        Args:
+            entita: Entità che esegue la prova
+            abilita (str): Nome dell'abilità o della caratteristica
+
+        Returns:
+            int: Modificatore (0 per un'abilità sconosciuta)
+        """
+        tabella = self.modificatori(entita)
+        abilita = abilita.lower()
+        if abilita not in tabella and callable(getattr(entita, "modificatore_abilita", None)):
+            # Abilità non standard: viene chiesta all'entità e memorizzata
+            tabella[abilita] = entita.modificatore_abilita(abilita)
+        return tabella.get(abilita, 0)
+
+    def invalida(self, entita_id=None):
+        """
+        Scarta la tabella di un'entità o, senza argomenti, tutte.
+
+        Args:
+            entita_id (str, optional): ID dell'entità modificata
+        """
+        if entita_id is None:
+            self._tabelle.clear()
+        else:
+            self._tabelle.pop(entita_id, None)
+
+    def ascolta_eventi(self, event_bus=None):
+        """Invalida le tabelle sugli eventi di equipaggiamento, livello ed effetti"""
+        if self._unsubscribe:
+            return
+        if event_bus is None:
+            from core.event_bus import EventBus
+            event_bus = EventBus.get_instance()
+        for evento in (Events.ITEM_EQUIPPED, Events.ITEM_UNEQUIPPED, Events.ENTITY_STATS_CHANGED):
+            self._unsubscribe.append(event_bus.on(evento, self._on_statistiche_modificate))
+
+    def _on_statistiche_modificate(self, entity_id=None, **kwargs):
+        self.invalida(entity_id)
+
+    def prova(self, entita, abilita, difficolta, rng=None):
+        """
+        Esegue una prova contro una difficoltà.
+
+        Args:
+            entita: Entità che esegue la prova
+            abilita (str): Abilità o caratteristica
+            difficolta (int): Classe di difficoltà
+            rng (random.Random, optional): Generatore da usare (default: flusso della sessione attiva)
+
+        Returns:
+            EsitoProva: Tiro, modificatore, totale, esito e probabilità di successo
+        """
+        modificatore = self.modificatore(entita, abilita)
+        tiro = (rng or generatore()).randint(1, 20)
+        return EsitoProva(getattr(entita, "id", None), tiro, modificatore, tiro + modificatore,
+                          tiro + modificatore >= difficolta, probabilita_successo(modificatore, difficolta))
+
+    def confronto(self, entita, avversario, abilita, abilita_avversario=None, rng=None):
+        """
+        Esegue una prova contrapposta.
+
+        Args:
+            entita: Entità che agisce (vince in caso di parità)
+            avversario: Entità che si oppone
+            abilita (str): Abilità di chi agisce
+            abilita_avversario (str, optional): Abilità dell'avversario (default: la stessa)
+            rng (random.Random, optional): Generatore da usare
+
+        Returns:
+            tuple: (EsitoProva di chi agisce, EsitoProva dell'avversario); successo indica la vittoria
+        """
+        rng = rng or generatore()
+        modificatore = self.modificatore(entita, abilita)
+        mod_avversario = self.modificatore(avversario, abilita_avversario or abilita)
+        tiro, tiro_avversario = rng.randint(1, 20), rng.randint(1, 20)
+        vittoria = tiro + modificatore >= tiro_avversario + mod_avversario
+        probabilita = probabilita_confronto(modificatore, mod_avversario)
+        return (EsitoProva(getattr(entita, "id", None), tiro, modificatore, tiro + modificatore, vittoria,
+                           probabilita),
+                EsitoProva(getattr(avversario, "id", None), tiro_avversario, mod_avversario,
+                           tiro_avversario + mod_avversario, not vittoria, 1 - probabilita))
+
+    def prove_di_gruppo(self, entita, abilita, difficolta, minimo=None, rng=None):
+        """
+        Esegue la stessa prova per un gruppo (es. furtività di tutto il party).
+
+        Args:
+            entita (list): Entità del gruppo
+            abilita (str): Abilità o caratteristica
+            difficolta (int): Classe di difficoltà
+            minimo (int, optional): Successi perché il gruppo superi la prova (default: metà)
+            rng (random.Random, optional): Generatore da usare
+
+        Returns:
+            dict: Esiti individuali, successi, esito e probabilità di successo del gruppo
+        """
+        modificatori = [self.modificatore(membro, abilita) for membro in entita]
+        tiri = (rng or generatore()).choices(range(1, 21), k=len(entita))
+        esiti = [EsitoProva(getattr(membro, "id", None), tiro, mod, tiro + mod, tiro + mod >= difficolta,
+                            probabilita_successo(mod, difficolta))
+                 for membro, tiro, mod in zip(entita, tiri, modificatori)]
+        if minimo is None:
+            minimo = (len(entita) + 1) // 2
+        successi = sum(esito.successo for esito in esiti)
+        return {
+            "esiti": esiti,
+            "successi": successi,
+            "successo": successi >= minimo,
+            "probabilita": probabilita_gruppo([esito.probabilita for esito in esiti], minimo),
+        }
+
+    def tabella_probabilita(self, entita, abilita, difficolta=(5, 10, 15, 20, 25, 30)):
+        """
+        Probabilità di successo di un'entità per ogni difficoltà standard.
+
+        Args:
+            entita: Entità che esegue la prova
+            abilita (str): Abilità o caratteristica
+            difficolta (tuple): Difficoltà da includere
+
+        Returns:
+            dict: Difficoltà -> probabilità
+        """
+        modificatore = self.modificatore(entita, abilita)
+        return {cd: probabilita_successo(modificatore, cd) for cd in difficolta}
+
+
+# Istanza condivisa
+_servizio_prove = None
+
+
+def get_servizio_prove():
+    """
+    Restituisce l'istanza condivisa di ServizioProve.
+
+    Returns:
+        ServizioProve: Istanza singleton
+    """
+    global _servizio_prove
+    if _servizio_prove is None:
+        _servizio_prove = ServizioProve()
+        _servizio_prove.ascolta_eventi()
+    return _servizio_prove
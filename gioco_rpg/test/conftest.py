@@ -143,13 +143,23 @@ def flask_server():
     # Pulizia (non necessaria con thread daemon)
     logger.info("Chiusura del server Flask...")
 
+def pytest_configure(config):
+    """Registra i marker personalizzati dei test"""
+    config.addinivalue_line(
+        "markers",
+        "file_reali: il test lavora su file temporanei reali, senza il mock di open e json.load"
+    )
+
 # Patch globale per evitare l'accesso ai file durante i test
 @pytest.fixture(autouse=True)
-def no_file_access(monkeypatch):
+def no_file_access(request, monkeypatch):
     """
     Modifica: Permette il caricamento dei file delle mappe ma preserva il mock per gli altri tipi di file.
     Questo evita problemi con i test che richiedono le mappe reali.
+    I test marcati con file_reali usano invece il filesystem vero (directory temporanee).
     """
+    if request.node.get_closest_marker("file_reali"):
+        return
     # Invece di intercettare 'open', salviamo l'originale e facciamo passare solo le chiamate per le mappe
     original_open = open
     
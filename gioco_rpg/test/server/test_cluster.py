@@ -0,0 +1,138 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from server.cluster import ClusterConfig
+from server.cluster.router import StickyRouter
+from server.cluster.message_bus import RUOLO_SUB, LocalSocketMessageBus, esegui_broker
+
+
+class TestClusterConfig(unittest.TestCase):
+    """Test per la configurazione del cluster letta dall'ambiente"""
+
+    def test_singolo_processo(self):
+        """Senza variabili d'ambiente il cluster non è attivo"""
+        config = ClusterConfig.from_env({})
+        self.assertFalse(config.attivo)
+        self.assertEqual(config.num_worker, 1)
+
+    def test_worker_del_cluster(self):
+        """Le variabili del launcher attivano la modalità multi-worker"""
+        config = ClusterConfig.from_env({
+            "GIOCO_RPG_WORKERS": "4",
+            "GIOCO_RPG_WORKER_INDEX": "2",
+            "GIOCO_RPG_WORKER_URLS": "http://a:1, http://b:2,http://c:3,http://d:4",
+        })
+        self.assertTrue(config.attivo)
+        self.assertEqual(config.indice_worker, 2)
+        self.assertEqual(config.urls_worker[1], "http://b:2")
+
+
+class TestStickyRouter(unittest.TestCase):
+    """Test per il router delle sessioni"""
+
+    def setUp(self):
+        self.urls = [f"http://localhost:{5000 + i}" for i in range(4)]
+
+    def test_mappatura_stabile(self):
+        """La stessa sessione finisce sempre sullo stesso worker"""
+        router = StickyRouter(self.urls)
+        self.assertEqual(router.worker_per_sessione("abc"), router.worker_per_sessione("abc"))
+        self.assertEqual(router.url_per_sessione("abc"), self.urls[router.worker_per_sessione("abc")])
+
+    def test_distribuzione(self):
+        """Le sessioni vengono distribuite su tutti i worker"""
+        router = StickyRouter(self.urls)
+        conteggi = [0] * len(self.urls)
+        for i in range(4000):
+            conteggi[router.worker_per_sessione(f"sessione-{i}")] += 1
+        for conteggio in conteggi:
+            self.assertGreater(conteggio, 800)
+
+    def test_nuovo_id_locale(self):
+        """Gli ID generati da un worker appartengono a quel worker"""
+        router = StickyRouter(self.urls, indice_locale=3)
+        for _ in range(20):
+            self.assertTrue(router.is_locale(router.nuovo_id_sessione()))
+
+
+class TestLocalSocketMessageBus(unittest.TestCase):
+    """Test per il bus dei messaggi locale"""
+
+    def test_broadcast_tra_client(self):
+        """Un messaggio pubblicato arriva a tutti i client in ascolto"""
+        indirizzo = os.path.join(tempfile.mkdtemp(), "bus.sock")
+        broker = multiprocessing.Process(target=esegui_broker, args=(indirizzo,), daemon=True)
+        broker.start()
+        try:
+            ricevuti = {"a": [], "b": []}
+            bus = {nome: LocalSocketMessageBus(indirizzo) for nome in ricevuti}
+
+            def ascolta(nome):
+                for payload in bus[nome].listen():
+                    ricevuti[nome].append(payload)
+
+            for nome in ricevuti:
+                threading.Thread(target=ascolta, args=(nome,), daemon=True).start()
+            time.sleep(0.3)
+
+            bus["a"].publish(b"room_broadcast")
+            scadenza = time.time() + 2
+            while time.time() < scadenza and not all(ricevuti.values()):
+                time.sleep(0.05)
+
+            self.assertEqual(ricevuti["a"], [b"room_broadcast"])
+            self.assertEqual(ricevuti["b"], [b"room_broadcast"])
+        finally:
+            broker.terminate()
+
+    def test_iscritto_lento_non_blocca_gli_altri(self):
+        """Un iscritto che non legge viene disconnesso senza fermare la consegna"""
+        indirizzo = os.path.join(tempfile.mkdtemp(), "bus.sock")
+        broker = multiprocessing.Process(target=esegui_broker, args=(indirizzo, 512 * 1024), daemon=True)
+        broker.start()
+        lento = LocalSocketMessageBus(indirizzo)._connetti(RUOLO_SUB)
+        veloce = LocalSocketMessageBus(indirizzo)
+        pub = LocalSocketMessageBus(indirizzo)
+        try:
+            ricevuti = []
+
+            def ascolta():
+                for payload in veloce.listen():
+                    ricevuti.append(payload)
+
+            threading.Thread(target=ascolta, daemon=True).start()
+            time.sleep(0.3)
+
+            # Pubblica a ondate che l'iscritto veloce riesce a smaltire
+            blocco = b"x" * 32 * 1024
+            for onda in range(1, 17):
+                for _ in range(8):
+                    pub.publish(blocco)
+                scadenza = time.time() + 5
+                while time.time() < scadenza and len(ricevuti) < onda * 8:
+                    time.sleep(0.01)
+
+            self.assertEqual(len(ricevuti), 128)
+            # Il broker ha chiuso la connessione dell'iscritto lento
+            lento.settimeout(5)
+            letti = 0
+            try:
+                while True:
+                    dati = lento.recv(1024 * 1024)
+                    if not dati:
+                        break
+                    letti += len(dati)
+            except ConnectionResetError:
+                pass
+            self.assertLess(letti, 128 * len(blocco))
+        finally:
+            lento.close()
+            broker.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
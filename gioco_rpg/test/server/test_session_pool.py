@@ -0,0 +1,56 @@
+import itertools
+import unittest
+
+from server.utils.session_pool import SessionPool
+
+
+class TestSessionPool(unittest.TestCase):
+    """Test per il pool di mondi preinizializzati"""
+
+    def setUp(self):
+        self.contatore = itertools.count()
+        self.pool = None
+
+    def tearDown(self):
+        if self.pool is not None:
+            self.pool.stop()
+
+    def _crea_pool(self, **kwargs):
+        kwargs.setdefault("stima_bytes", 1024)
+        self.pool = SessionPool(factory=lambda: {"mondo": next(self.contatore)}, **kwargs)
+        self.pool.start()
+        return self.pool
+
+    def test_riempimento_e_prelievo(self):
+        """Il pool si riempie in background e si ricostituisce dopo un prelievo"""
+        pool = self._crea_pool(size=3, max_bytes=10 ** 6)
+        self.assertTrue(pool.wait_ready(timeout=5))
+        self.assertEqual(pool.acquire(), {"mondo": 0})
+        self.assertTrue(pool.wait_ready(3, timeout=5))
+        stats = pool.get_stats()
+        self.assertEqual((stats["hits"], stats["built"], stats["ready"]), (1, 4, 3))
+
+    def test_tetto_di_memoria(self):
+        """La dimensione effettiva è limitata dalla memoria stimata per mondo"""
+        pool = self._crea_pool(size=10, max_bytes=2048)
+        self.assertEqual(pool.target, 2)
+        self.assertTrue(pool.wait_ready(timeout=5))
+        self.assertFalse(pool.wait_ready(3, timeout=0.2))
+
+    def test_svuota_dopo_modifica_dati(self):
+        """I mondi pronti vengono scartati e ricostruiti quando i dati cambiano"""
+        pool = self._crea_pool(size=2, max_bytes=10 ** 6)
+        self.assertTrue(pool.wait_ready(timeout=5))
+        pool.svuota()
+        self.assertTrue(pool.wait_ready(timeout=5))
+        self.assertGreaterEqual(pool.acquire()["mondo"], 2)
+
+    def test_pool_disattivato(self):
+        """Con dimensione 0 il pool non costruisce mondi e il chiamante crea il suo"""
+        pool = self._crea_pool(size=0)
+        self.assertIsNone(pool.acquire())
+        self.assertEqual(pool.get_stats()["misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
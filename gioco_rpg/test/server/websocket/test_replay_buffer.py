@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock
+
+from server.websocket.replay_buffer import ReplayBuffer, replay_missed_messages
+import server.websocket.replay_buffer as replay_buffer
+
+
+class TestReplayBuffer(unittest.TestCase):
+    """Test per il buffer di replay dei messaggi di sessione"""
+
+    def setUp(self):
+        self.buffer = ReplayBuffer(max_size=4)
+
+    def test_sequenza_per_sessione(self):
+        """Ogni sessione ha la propria sequenza e i dati inviati ricevono il seq"""
+        dati = {"x": 1}
+        self.assertEqual(self.buffer.record("s1", "update", dati), (1, {"x": 1, "seq": 1}))
+        self.assertEqual(self.buffer.record("s1", "update", {})[0], 2)
+        self.assertEqual(self.buffer.record("s2", "update", {})[0], 1)
+        # I dati del chiamante non vengono modificati
+        self.assertEqual(dati, {"x": 1})
+
+    def test_solo_messaggi_persi(self):
+        """Il client riceve solo i messaggi successivi all'ultimo seq visto"""
+        for i in range(3):
+            self.buffer.record("s1", f"evento_{i}", {"i": i})
+        mancanti = self.buffer.since("s1", 1)
+        self.assertEqual([m[1] for m in mancanti], ["evento_1", "evento_2"])
+        self.assertEqual(self.buffer.since("s1", 3), [])
+
+    def test_buffer_superato_richiede_snapshot(self):
+        """Se il buffer non copre più l'intervallo serve uno snapshot"""
+        for i in range(10):
+            self.buffer.record("s1", "update", {"i": i})
+        self.assertIsNone(self.buffer.since("s1", 2))
+        self.assertEqual(len(self.buffer.since("s1", 6)), 4)
+        # Seq sconosciuto al server (es. dopo un riavvio)
+        self.assertIsNone(self.buffer.since("s1", 50))
+
+    def test_prune(self):
+        """I buffer delle sessioni terminate vengono eliminati"""
+        self.buffer.record("s1", "update", {})
+        self.buffer.record("s2", "update", {})
+        self.assertEqual(self.buffer.prune({"s2"}), 1)
+        self.assertEqual(self.buffer.last_seq("s1"), 0)
+
+    def test_replay_verso_il_client(self):
+        """replay_missed_messages invia i messaggi persi solo al socket indicato"""
+        originale = replay_buffer._replay_buffer
+        replay_buffer._replay_buffer = self.buffer
+        try:
+            self.buffer.record("s1", "a", {})
+            self.buffer.record("s1", "b", {})
+            socket_io = MagicMock()
+            self.assertTrue(replay_missed_messages(socket_io, "sid1", "s1", 1))
+            socket_io.emit.assert_called_once_with("b", {"seq": 2}, room="sid1")
+            self.assertFalse(replay_missed_messages(socket_io, "sid1", "s1", "non valido"))
+        finally:
+            replay_buffer._replay_buffer = originale
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import importlib
+import threading
+import unittest
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+from server.websocket.websocket_manager import WebSocketManager
+
+modulo = importlib.import_module("server.websocket.websocket_manager")
+
+
+class TestCoalescingRichieste(unittest.TestCase):
+    """Test per il single-flight delle richieste di sola lettura"""
+
+    def setUp(self):
+        # Istanza senza __init__: non servono SocketIO né EventBus
+        self.manager = WebSocketManager.__new__(WebSocketManager)
+        self.manager.state_versions = {}
+        self.manager._pending_requests = {}
+        self.manager._response_cache = OrderedDict()
+        self.manager._requests_lock = threading.Lock()
+        self.manager.respond_to_request = MagicMock()
+
+    def _risposte(self):
+        return [(c.args[0], c.args[1], c.args[2]) for c in self.manager.respond_to_request.call_args_list]
+
+    def test_richieste_in_corso_condividono_il_calcolo(self):
+        """Le richieste arrivate durante il calcolo ricevono lo stesso risultato"""
+        chiamate = []
+
+        def build():
+            chiamate.append(1)
+            # Durante il calcolo arrivano altre due richieste identiche
+            self.manager._coalesce_request("s1", ("game_state",), "sid2", "game_state", "r2", build)
+            self.manager._coalesce_request("s1", ("game_state",), "sid3", "full_state", "r3", build)
+            return {"player": "p"}
+
+        self.manager._coalesce_request("s1", ("game_state",), "sid1", "game_state", "r1", build)
+        self.assertEqual(len(chiamate), 1)
+        self.assertEqual(self._risposte(), [
+            ("sid1", "game_state", "r1"),
+            ("sid2", "game_state", "r2"),
+            ("sid3", "full_state", "r3"),
+        ])
+
+    def test_cache_per_versione(self):
+        """Il risultato è riusato finché la versione dello stato non cambia"""
+        build = MagicMock(return_value={"entities": {}})
+        self.manager._coalesce_request("s1", ("entities",), "sid1", "entities", "r1", build)
+        self.manager._coalesce_request("s1", ("entities",), "sid1", "entities", "r2", build)
+        self.assertEqual(build.call_count, 1)
+
+        self.manager.state_versions["s1"] = 1
+        self.manager._coalesce_request("s1", ("entities",), "sid1", "entities", "r3", build)
+        self.assertEqual(build.call_count, 2)
+
+    def test_errori_non_in_cache(self):
+        """Un calcolo fallito viene comunicato ma non memorizzato"""
+        build = MagicMock(side_effect=ValueError("sessione assente"))
+        self.manager._coalesce_request("s1", ("map_data", None), "sid1", "map_data", "r1", build)
+        dati = self.manager.respond_to_request.call_args.args[3]
+        self.assertTrue(dati["error"])
+        self.assertEqual(self.manager._response_cache, {})
+        self.assertEqual(self.manager._pending_requests, {})
+
+    def test_cache_limitata_lru(self):
+        """Oltre il limite viene scartata la risposta usata meno di recente"""
+        build = MagicMock(return_value={"entities": {}})
+        with patch.object(modulo, "RESPONSE_CACHE_MAX_ENTRIES", 2):
+            self.manager._coalesce_request("s1", ("a",), "sid1", "a", "r1", build)
+            self.manager._coalesce_request("s2", ("a",), "sid2", "a", "r2", build)
+            # Il riuso di s1 la rende la più recente: viene scartata s2
+            self.manager._coalesce_request("s1", ("a",), "sid1", "a", "r3", build)
+            self.manager._coalesce_request("s3", ("a",), "sid3", "a", "r4", build)
+        self.assertEqual(list(self.manager._response_cache), [("s1", "a"), ("s3", "a")])
+
+    def test_pulizia_per_sessione(self):
+        """Fine sessione e cambio di versione rimuovono solo le risposte della sessione"""
+        build = MagicMock(return_value={"entities": {}})
+        for session_id in ("s1", "s2"):
+            self.manager._coalesce_request(session_id, ("a",), "sid", "a", "r", build)
+            self.manager._coalesce_request(session_id, ("b",), "sid", "b", "r", build)
+        self.manager._handle_session_end(session_id="s1")
+        self.assertEqual(list(self.manager._response_cache), [("s2", "a"), ("s2", "b")])
+
+        self.manager.socketio = MagicMock()
+        self.manager.connection_map = {}
+        self.manager.broadcast_game_state("s2", {})
+        self.assertEqual(self.manager._response_cache, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
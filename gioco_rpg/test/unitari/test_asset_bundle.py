@@ -0,0 +1,105 @@
+"""
+Test unitari per i bundle degli asset delle mappe.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from server.utils.asset_bundle import AssetBundleService, unpack_bundle
+from server.utils.asset_delivery import get_asset_delivery
+
+# I test lavorano su file temporanei reali
+pytestmark = pytest.mark.file_reali
+
+
+class TestAssetBundle(unittest.TestCase):
+    """Test per AssetBundleService e il formato dei bundle"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.asset_dir = os.path.join(self.root, "assets")
+        self.maps_dir = os.path.join(self.root, "mappe")
+        for directory in ("tiles", "objects", "entities", "maps"):
+            os.makedirs(os.path.join(self.asset_dir, directory))
+        os.makedirs(self.maps_dir)
+        for rel_path in ("tiles/floor.png", "tiles/wall.png", "tiles/water.png", "objects/tavolo.png",
+                         "objects/pozzo.png", "entities/npc.png", "maps/test_background.png"):
+            self._scrivi(rel_path, rel_path.encode("utf-8"))
+
+        self.mappa = {
+            "nome": "test",
+            "backgroundImage": "assets/maps/test_background.png",
+            "griglia": [[1, 1, 1], [1, 0, 1], [1, 1, 1]],
+            "oggetti": {"[1, 1]": {"nome": "tavolo", "sprite": "tavolo"}, "pozzo": [2, 2]},
+            "npg": {"[1, 2]": {"nome": "Durnan", "sprite": "npc"}}
+        }
+        with open(os.path.join(self.maps_dir, "test.json"), "w") as f:
+            json.dump(self.mappa, f)
+        self.service = AssetBundleService(base_path=self.asset_dir, maps_dir=self.maps_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _scrivi(self, rel_path, contenuto):
+        with open(os.path.join(self.asset_dir, rel_path), "wb") as f:
+            f.write(contenuto)
+
+    def test_chiusura_degli_asset(self):
+        """Il bundle contiene solo gli asset usati dalla mappa, con i loro contenuti"""
+        version, data = self.service.get_bundle("test")
+        manifest, files = unpack_bundle(data)
+
+        self.assertEqual(manifest["version"], version)
+        self.assertEqual(manifest["map"]["nome"], "test")
+        self.assertEqual(sorted(files), ["entities/npc.png", "maps/test_background.png",
+                                         "objects/pozzo.png", "objects/tavolo.png",
+                                         "tiles/floor.png", "tiles/wall.png"])
+        for rel_path, contenuto in files.items():
+            self.assertEqual(contenuto, rel_path.encode("utf-8"))
+
+    def test_bundle_in_cache_per_versione(self):
+        """Il bundle viene riusato finché gli asset non cambiano"""
+        primo = self.service.get_bundle("test")
+        self.assertIs(self.service.get_bundle("test"), primo)
+
+        self._scrivi("tiles/wall.png", b"nuovo muro")
+        # Forza la rivalidazione degli hash senza attendere l'intervallo della cache
+        get_asset_delivery().clear()
+        secondo = self.service.get_bundle("test")
+        self.assertNotEqual(primo[0], secondo[0])
+        self.assertEqual(unpack_bundle(secondo[1])[1]["tiles/wall.png"], b"nuovo muro")
+
+    def test_cache_senza_rileggere_file_invariati(self):
+        """Con mtime e dimensioni invariati il bundle non rilegge la mappa né ricalcola gli hash"""
+        primo = self.service.get_bundle("test")
+        delivery = get_asset_delivery()
+        with patch("server.utils.asset_bundle.json.load") as load, \
+                patch.object(delivery, "content_hash") as content_hash:
+            self.assertIs(self.service.get_bundle("test"), primo)
+        load.assert_not_called()
+        content_hash.assert_not_called()
+
+    def test_percorsi_fuori_dalla_directory_degli_asset(self):
+        """Una directory che condivide solo il prefisso con quella degli asset viene esclusa"""
+        fratello = self.asset_dir + "_segreti"
+        os.makedirs(fratello)
+        with open(os.path.join(fratello, "chiave.png"), "wb") as f:
+            f.write(b"segreto")
+        self.mappa["backgroundImage"] = "../assets_segreti/chiave.png"
+        assets = self.service.resolve_assets("test", self.mappa)
+        self.assertNotIn("../assets_segreti/chiave.png", [rel_path for rel_path, _ in assets])
+
+    def test_mappa_inesistente_o_non_valida(self):
+        """ID sconosciuti o con percorsi vengono rifiutati"""
+        self.assertIsNone(self.service.get_bundle("sconosciuta"))
+        self.assertIsNone(self.service.get_bundle("../test"))
+
+
+if __name__ == "__main__":
+    unittest.main()
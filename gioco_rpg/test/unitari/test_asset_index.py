@@ -0,0 +1,86 @@
+"""
+Test unitari per l'indice incrementale degli asset.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from util.asset_index import AssetIndex
+from util.asset_manager import AssetManager
+
+# I test lavorano su una directory temporanea reale
+pytestmark = pytest.mark.file_reali
+
+
+class TestAssetIndex(unittest.TestCase):
+    """Test per AssetIndex e AssetManager.update_all incrementale"""
+
+    def setUp(self):
+        self.asset_dir = tempfile.mkdtemp()
+        self.sprites_dir = os.path.join(self.asset_dir, "sprites")
+        os.makedirs(self.sprites_dir)
+        for nome in ("player", "goblin"):
+            self._scrivi(nome, nome)
+
+    def tearDown(self):
+        shutil.rmtree(self.asset_dir)
+
+    def _scrivi(self, nome, contenuto):
+        with open(os.path.join(self.sprites_dir, f"{nome}.png"), "w") as f:
+            f.write(contenuto)
+
+    def _indice(self):
+        indice = AssetIndex(os.path.join(self.asset_dir, ".asset_index.json"))
+        indice.load()
+        return indice
+
+    def test_prima_indicizzazione(self):
+        """Alla prima indicizzazione tutti i file sono nuovi"""
+        indice = self._indice()
+        risultato = indice.update(self.asset_dir, [self.sprites_dir])[self.sprites_dir]
+        self.assertEqual(risultato["changed"], ["sprites/goblin.png", "sprites/player.png"])
+        self.assertTrue(indice.save())
+
+    def test_nessun_cambiamento_nessun_hash(self):
+        """Senza modifiche nessun file viene riletto e l'indice non viene riscritto"""
+        indice = self._indice()
+        indice.update(self.asset_dir, [self.sprites_dir])
+        indice.save()
+
+        indice = self._indice()
+        with patch("util.asset_index.hash_file") as hash_file:
+            risultato = indice.update(self.asset_dir, [self.sprites_dir])[self.sprites_dir]
+        hash_file.assert_not_called()
+        self.assertEqual(risultato["changed"], [])
+        self.assertFalse(indice.save())
+
+    def test_modifiche_e_rimozioni(self):
+        """Vengono rilevati solo i file modificati e quelli rimossi"""
+        indice = self._indice()
+        indice.update(self.asset_dir, [self.sprites_dir])
+        self._scrivi("player", "nuovo contenuto")
+        os.remove(os.path.join(self.sprites_dir, "goblin.png"))
+        risultato = indice.update(self.asset_dir, [self.sprites_dir])[self.sprites_dir]
+        self.assertEqual(risultato["changed"], ["sprites/player.png"])
+        self.assertEqual(risultato["removed"], ["sprites/goblin.png"])
+
+    def test_update_all_scrive_il_manifest_solo_se_cambia(self):
+        """update_all registra gli asset con il loro hash e non riscrive un manifest invariato"""
+        manager = AssetManager(base_path=self.asset_dir)
+        self.assertTrue(manager.update_all())
+        self.assertIn("hash", manager.sprites["player"])
+
+        with patch.object(AssetManager, "save_manifest") as save_manifest:
+            manager = AssetManager(base_path=self.asset_dir)
+            manager.update_all()
+        save_manifest.assert_not_called()
+        self.assertIn("goblin", manager.sprites)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Test unitari per la precompressione degli asset e la cache di consegna.
+"""
+
+import gzip
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+import pytest
+from flask import Flask
+
+from util.asset_precompress import precompress_directory, precompress_file
+from server.utils.asset_delivery import AssetDelivery
+
+# I test lavorano su file temporanei reali
+pytestmark = pytest.mark.file_reali
+
+
+class TestAssetPrecompress(unittest.TestCase):
+    """Test per le varianti precompresse e la cache LRU degli asset"""
+
+    def setUp(self):
+        self.asset_dir = tempfile.mkdtemp()
+        self.json_path = os.path.join(self.asset_dir, "sheet.json")
+        with open(self.json_path, "w") as f:
+            json.dump({"frames": {f"sprite_{i}": {"x": i, "y": i} for i in range(200)}}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.asset_dir)
+
+    def test_varianti_gzip_generate_una_volta(self):
+        """La variante .gz è decomprimibile e non viene riscritta se aggiornata"""
+        self.assertGreaterEqual(precompress_directory(self.asset_dir), 1)
+        with open(self.json_path, "rb") as originale, gzip.open(self.json_path + ".gz", "rb") as compresso:
+            self.assertEqual(originale.read(), compresso.read())
+        self.assertEqual(precompress_file(self.json_path), 0)
+
+    def test_file_piccoli_ignorati(self):
+        """I file sotto la soglia minima non vengono compressi"""
+        piccolo = os.path.join(self.asset_dir, "piccolo.json")
+        with open(piccolo, "w") as f:
+            f.write("{}")
+        self.assertEqual(precompress_file(piccolo), 0)
+        self.assertFalse(os.path.exists(piccolo + ".gz"))
+
+    def test_hash_e_varianti_in_cache(self):
+        """La voce di cache riporta l'hash stabile e le varianti aggiornate"""
+        precompress_file(self.json_path)
+        delivery = AssetDelivery(revalidate_interval=0)
+        digest = delivery.content_hash(self.json_path)
+        self.assertEqual(digest, delivery.content_hash(self.json_path))
+        self.assertEqual(delivery._lookup(self.json_path)["variants"]["gzip"], self.json_path + ".gz")
+        self.assertTrue(delivery.versioned_url("/assets/sheet.json", self.json_path).endswith(digest[:16]))
+
+    def test_evizione_lru(self):
+        """Oltre il limite di memoria viene scartata la voce meno usata"""
+        delivery = AssetDelivery(max_cache_bytes=6000)
+        percorsi = []
+        for i in range(3):
+            percorso = os.path.join(self.asset_dir, f"file_{i}.bin")
+            with open(percorso, "wb") as f:
+                f.write(bytes(2500))
+            percorsi.append(percorso)
+            delivery._body(delivery._lookup(percorso), None, percorso)
+
+        stats = delivery.get_stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertLessEqual(stats["cached_bytes"], 6000)
+        self.assertNotIn(percorsi[0], delivery._entries)
+
+    def test_json_sprite_sheet_servito_precompresso(self):
+        """La route del JSON di uno sprite sheet invia la variante .gz ai client che la accettano"""
+        modulo = importlib.import_module("server.routes.assets_routes")
+
+        precompress_file(self.json_path)
+        manager = Mock(sprite_sheets={"sheet": {"id": "sheet", "metadata_path": self.json_path}})
+        app = Flask(__name__)
+        app.register_blueprint(modulo.assets_routes)
+        with patch.object(modulo, "get_sprite_sheet_manager", return_value=manager), \
+                patch.object(modulo, "get_asset_delivery", return_value=AssetDelivery()):
+            client = app.test_client()
+            compressa = client.get("/assets/spritesheets/sheet.json", headers={"Accept-Encoding": "gzip"})
+            semplice = client.get("/assets/spritesheets/sheet.json")
+
+        self.assertEqual(compressa.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressa.data), semplice.data)
+        self.assertNotIn("Content-Encoding", semplice.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
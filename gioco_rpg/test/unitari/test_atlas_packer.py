@@ -0,0 +1,58 @@
+"""
+Test unitari per il packing degli sprite sheet.
+"""
+
+import random
+import unittest
+
+from util.atlas_packer import MaxRectsBin, pack_rects
+
+
+def _sovrapposti(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+class TestAtlasPacker(unittest.TestCase):
+    """Test per MaxRectsBin e pack_rects"""
+
+    def test_riempimento_completo(self):
+        """Quattro quadrati riempiono esattamente la pagina"""
+        contenitore = MaxRectsBin(64, 64)
+        posizioni = [contenitore.insert(32, 32) for _ in range(4)]
+        self.assertNotIn(None, posizioni)
+        self.assertEqual(len(set(posizioni)), 4)
+        self.assertIsNone(contenitore.insert(1, 1))
+        self.assertEqual(contenitore.occupancy(), 1.0)
+
+    def test_nessuna_sovrapposizione(self):
+        """Gli sprite posizionati non si sovrappongono e restano nella pagina"""
+        rnd = random.Random(7)
+        sizes = {f"s{i}": (rnd.randint(4, 60), rnd.randint(4, 60)) for i in range(150)}
+        pagine = pack_rects(sizes, (256, 256), padding=0)
+        for pagina in pagine:
+            rects = [(x, y) + sizes[k] for k, (x, y) in pagina["placements"].items()]
+            for x, y, w, h in rects:
+                self.assertLessEqual(x + w, pagina["size"][0])
+                self.assertLessEqual(y + h, pagina["size"][1])
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    self.assertFalse(_sovrapposti(rects[i], rects[j]))
+
+    def test_pagine_aggiuntive_invece_di_scartare(self):
+        """Gli sprite che non entrano nella prima pagina finiscono in una nuova"""
+        sizes = {f"s{i}": (32, 32) for i in range(10)}
+        pagine = pack_rects(sizes, (64, 64), padding=0)
+        self.assertEqual(len(pagine), 3)
+        self.assertEqual(sum(len(p["placements"]) for p in pagine), 10)
+
+    def test_sprite_piu_grande_della_pagina(self):
+        """Uno sprite più grande della pagina riceve una pagina dedicata"""
+        pagine = pack_rects({"gigante": (300, 100), "piccolo": (10, 10)}, (128, 128), padding=0)
+        self.assertEqual(pagine[0]["size"], (300, 128))
+        self.assertEqual(sum(len(p["placements"]) for p in pagine), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Test unitari per il caricamento parallelo di mappe e configurazioni.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import pytest
+
+from world.managers.loader_manager import LoaderManager, esegui_in_parallelo, leggi_json_in_parallelo
+
+
+class TestCaricamentoParallelo(unittest.TestCase):
+    """Test per la pipeline di caricamento delle mappe"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ordine_ed_errori(self):
+        """I risultati mantengono l'ordine di input e gli errori non fermano gli altri"""
+        def funzione(valore):
+            if valore == 2:
+                raise ValueError("errore")
+            return valore * 10
+
+        risultati = esegui_in_parallelo(funzione, range(4))
+        self.assertEqual([r for r, _ in risultati], [0, 10, None, 30])
+        self.assertIsInstance(risultati[2][1], ValueError)
+
+    def test_tempo_limitato_dal_file_piu_lento(self):
+        """Caricamenti lenti indipendenti si sovrappongono invece di sommarsi"""
+        inizio = time.perf_counter()
+        esegui_in_parallelo(lambda _: time.sleep(0.2), range(4))
+        self.assertLess(time.perf_counter() - inizio, 0.6)
+
+    @pytest.mark.file_reali  # Scrive e rilegge mappe in una directory temporanea
+    def test_lettura_json_e_mappe(self):
+        """Le mappe vengono lette e costruite in parallelo, i file non validi segnalati"""
+        for nome in ("alfa", "beta"):
+            with open(os.path.join(self.directory, f"{nome}.json"), "w", encoding="utf-8") as f:
+                json.dump({"nome": nome, "larghezza": 3, "altezza": 2, "griglia": [[0, 0, 0], [0, 1, 0]]}, f)
+        with open(os.path.join(self.directory, "rotta.json"), "w", encoding="utf-8") as f:
+            f.write("{")
+
+        letture = leggi_json_in_parallelo([os.path.join(self.directory, "alfa.json"),
+                                           os.path.join(self.directory, "rotta.json")])
+        self.assertEqual(letture[0][1]["nome"], "alfa")
+        self.assertIsNotNone(letture[1][2])
+
+        mappe = LoaderManager(self.directory).carica_mappe(["alfa.json", "beta.json"])
+        self.assertEqual([mappa.nome for _, mappa, _ in mappe], ["alfa", "beta"])
+        self.assertEqual(mappe[1][1].griglia[1][1], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Test unitari per le formule di dadi compilate.
+"""
+
+import random
+import unittest
+from fractions import Fraction
+
+from util.dado import Dado, compile_dice, tira_dadi, MAX_ESPLOSIONI
+
+
+class TestFormuleDadi(unittest.TestCase):
+    """Test per l'analisi, il tiro e la distribuzione delle formule"""
+
+    def test_compilazione_in_cache(self):
+        self.assertIs(compile_dice("2d6+3"), compile_dice("2d6+3"))
+
+    def test_formula_non_valida(self):
+        for formula in ("", "2d", "d6x", "2d6++1", "3d6kh4", "abc"):
+            with self.assertRaises(ValueError, msg=formula):
+                compile_dice(formula)
+
+    def test_tiro_riproducibile_con_seed(self):
+        primo = tira_dadi("2d6+1d4+3", rng=random.Random(42))
+        secondo = tira_dadi("2d6+1d4+3", rng=random.Random(42))
+        self.assertEqual(primo, secondo)
+        totale, tiri, modificatore = primo
+        self.assertEqual(len(tiri), 3)
+        self.assertEqual(modificatore, 3)
+        self.assertEqual(totale, sum(tiri) + 3)
+
+    def test_distribuzione_2d6(self):
+        distribuzione = compile_dice("2d6").distribuzione()
+        self.assertEqual(sum(distribuzione.values()), 1)
+        self.assertEqual(distribuzione[7], Fraction(1, 6))
+        self.assertEqual(compile_dice("2d6").media(), 7)
+        self.assertEqual(compile_dice("1d20+5").probabilita_almeno(15), Fraction(11, 20))
+
+    def test_vantaggio_e_tieni(self):
+        self.assertEqual(compile_dice("d20adv").probabilita_almeno(20), Fraction(39, 400))
+        self.assertEqual(compile_dice("d20dis").probabilita_almeno(20), Fraction(1, 400))
+        self.assertEqual(compile_dice("2d20kh1").distribuzione(), compile_dice("d20adv").distribuzione())
+        # Il numero esplicito di dadi non annulla il vantaggio
+        self.assertNotEqual(compile_dice("1d20adv").distribuzione(), compile_dice("1d20").distribuzione())
+        self.assertEqual(compile_dice("1d20adv+5").distribuzione(), compile_dice("d20adv+5").distribuzione())
+        self.assertEqual(compile_dice("1d20dis").distribuzione(), compile_dice("2d20kl1").distribuzione())
+        self.assertAlmostEqual(float(compile_dice("4d6kh3").media()), 12.2446, places=4)
+        self.assertEqual(compile_dice("4d6dl1").distribuzione(), compile_dice("4d6kh3").distribuzione())
+        totale, tiri, _ = compile_dice("4d6kh3").tira(random.Random(1))
+        self.assertEqual(len(tiri), 3)
+        self.assertEqual(totale, sum(tiri))
+
+    def test_dado_esplosivo(self):
+        espressione = compile_dice("1d6!")
+        distribuzione = espressione.distribuzione()
+        self.assertEqual(sum(distribuzione.values()), 1)
+        self.assertNotIn(6, distribuzione)
+        self.assertEqual(distribuzione[7], Fraction(1, 36))
+        self.assertEqual(espressione.massimo, 6 * (MAX_ESPLOSIONI + 1))
+        self.assertEqual(compile_dice("1d1!").tira(random.Random(0))[0], MAX_ESPLOSIONI + 1)
+
+    def test_tiri_in_blocco(self):
+        risultati = compile_dice("2d6").tira_molti(20000, random.Random(7))
+        self.assertEqual(len(risultati), 20000)
+        self.assertTrue(all(2 <= r <= 12 for r in risultati))
+        self.assertAlmostEqual(sum(risultati) / len(risultati), 7, delta=0.1)
+        self.assertEqual(compile_dice("2d6").tira_molti(50, random.Random(3)),
+                         compile_dice("2d6").tira_molti(50, random.Random(3)))
+
+    def test_dado_con_generatore(self):
+        primo = Dado(20, rng=random.Random(5))
+        secondo = Dado(20, rng=random.Random(5))
+        self.assertEqual([primo.tira() for _ in range(5)], [secondo.tira() for _ in range(5)])
+        self.assertTrue(all(1 <= v <= 20 for v in primo.tiri_multipli(10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Test unitari per l'archivio compilato dei dati di gioco.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from util.data_manager import DataManager
+from util.data_store import compile_data_store, open_data_store
+
+# I test lavorano su file temporanei reali
+pytestmark = pytest.mark.file_reali
+
+
+class TestDataStore(unittest.TestCase):
+    """Test per compile_data_store e DataStore"""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.mostri = {"goblin": {"nome": "Goblin", "hp": 7}, "orco": {"nome": "Orco", "hp": 15}}
+        self.armi = [{"nome": "Spada", "danno": 8}, {"nome": "Ascia", "danno": 10}]
+        self._scrivi("monsters/monsters.json", self.mostri)
+        self._scrivi("items/armi.json", self.armi)
+        compile_data_store(self.data_dir, directories=("monsters", "items"))
+        self.store = open_data_store(self.data_dir)
+
+    def tearDown(self):
+        if self.store is not None:
+            self.store.close()
+        shutil.rmtree(self.data_dir)
+
+    def _scrivi(self, rel_path, dati):
+        percorso = os.path.join(self.data_dir, rel_path)
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+        with open(percorso, "w", encoding="utf-8") as f:
+            json.dump(dati, f)
+
+    def test_caricamento_completo(self):
+        """Il contenuto ricostruito coincide con il JSON sorgente"""
+        self.assertEqual(self.store.load("monsters/monsters.json"), self.mostri)
+        self.assertEqual(self.store.load("items/armi.json"), self.armi)
+
+    def test_accesso_per_id(self):
+        """I record si leggono per chiave, per ID o per indice"""
+        self.assertEqual(self.store.get("monsters/monsters.json", "orco"), self.mostri["orco"])
+        self.assertEqual(self.store.get("items/armi.json", "Ascia"), self.armi[1])
+        self.assertEqual(self.store.get("items/armi.json", 0), self.armi[0])
+        self.assertIsNone(self.store.get("monsters/monsters.json", "drago"))
+        self.assertEqual(self.store.keys("items/armi.json"), ["Spada", "Ascia"])
+
+    def test_sorgenti_modificati_scartati(self):
+        """I file modificati dopo la compilazione non vengono serviti dall'archivio"""
+        time.sleep(0.01)
+        self._scrivi("monsters/monsters.json", {"drago": {"hp": 200}})
+        self.store.close()
+        self.store = open_data_store(self.data_dir)
+
+        self.assertFalse(self.store.has("monsters/monsters.json"))
+        self.assertIsNone(self.store.load("monsters/monsters.json"))
+        self.assertTrue(self.store.has("items/armi.json"))
+
+        self.store.mark_stale("items/armi.json")
+        self.assertEqual(self.store.get("items/armi.json", "Spada", "assente"), "assente")
+
+    def test_data_manager_senza_hash_se_non_valida(self):
+        """Il DataManager invalida la cache con mtime e dimensione e calcola l'hash solo per validare"""
+        manager = DataManager()
+        manager.invalidate_cache("mostri")
+        self.addCleanup(manager.invalidate_cache, "mostri")
+        percorsi = dict(manager._data_paths, mostri=Path(self.data_dir) / "monsters")
+        with patch.object(manager, "_data_paths", percorsi), patch.object(manager, "_store", None), \
+                patch.object(manager, "_calculate_hash", wraps=manager._calculate_hash) as calcola, \
+                patch("util.data_manager.validate_data", return_value=[]):
+            self.assertEqual(manager.load_data("mostri", "monsters.json", validate=False), self.mostri)
+            calcola.assert_not_called()
+
+            # File modificato: la firma cambia e la voce in cache viene scartata
+            self._scrivi("monsters/monsters.json", {"drago": {"hp": 200}})
+            self.assertEqual(manager.load_data("mostri", "monsters.json", validate=False), {"drago": {"hp": 200}})
+            calcola.assert_not_called()
+
+            manager.load_data("mostri", "monsters.json", reload=True)
+            calcola.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Test unitari per il watcher dei file di dati e asset.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+import core.events as Events
+from core.event_bus import EventBus
+from util.file_watcher import FileWatcher, CHANGE_DELETED, CHANGE_OVERFLOW
+
+# I test modificano file reali in una directory temporanea
+pytestmark = pytest.mark.file_reali
+
+
+class _BackendPieno:
+    """Backend che segnala una sola volta la coda piena"""
+
+    name = "pieno"
+
+    def __init__(self):
+        self.modifiche = [[(None, CHANGE_OVERFLOW)]]
+
+    def add_tree(self, root):
+        pass
+
+    def wait(self, timeout):
+        if self.modifiche:
+            return self.modifiche.pop()
+        time.sleep(timeout)
+        return []
+
+    def close(self):
+        pass
+
+
+class TestFileWatcher(unittest.TestCase):
+    """Test per FileWatcher con entrambi i backend"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, "data")
+        self.assets_dir = os.path.join(self.root, "assets")
+        os.makedirs(os.path.join(self.data_dir, "mappe"))
+        os.makedirs(os.path.join(self.assets_dir, "tiles"))
+        self.mappa = os.path.join(self.data_dir, "mappe", "taverna.json")
+        with open(self.mappa, "w") as f:
+            f.write("{}")
+
+        self.bus = EventBus()
+        self.eventi = []
+        for evento in (Events.DATA_FILE_CHANGED, Events.ASSET_FILE_CHANGED, Events.MAP_FILE_CHANGED,
+                       Events.WATCHED_FILES_RESYNC):
+            self.bus.on(evento, self._registra(evento))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _registra(self, evento):
+        def handler(**data):
+            self.eventi.append((evento, data))
+        return handler
+
+    def _attendi(self, condizione, timeout=5.0):
+        scadenza = time.time() + timeout
+        while time.time() < scadenza:
+            if condizione():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _verifica_backend(self, use_inotify):
+        watcher = FileWatcher(self.data_dir, self.assets_dir, event_bus=self.bus,
+                              use_inotify=use_inotify, debounce=0.05, poll_interval=0.1)
+        watcher.start()
+        try:
+            # Lascia al polling il tempo di acquisire lo stato iniziale
+            time.sleep(0.2)
+            with open(self.mappa, "w") as f:
+                f.write('{"nome": "taverna"}')
+            with open(os.path.join(self.assets_dir, "tiles", "floor.png"), "wb") as f:
+                f.write(b"png")
+
+            tipi = lambda: {evento for evento, _ in self.eventi}
+            self.assertTrue(self._attendi(lambda: tipi() >= {Events.DATA_FILE_CHANGED, Events.MAP_FILE_CHANGED,
+                                                            Events.ASSET_FILE_CHANGED}))
+            mappe = [data for evento, data in self.eventi if evento == Events.MAP_FILE_CHANGED]
+            self.assertEqual(mappe[0]["map_id"], "taverna")
+            asset = [data for evento, data in self.eventi if evento == Events.ASSET_FILE_CHANGED]
+            self.assertEqual(asset[0]["rel_path"], "tiles/floor.png")
+
+            self.eventi.clear()
+            os.remove(self.mappa)
+            self.assertTrue(self._attendi(lambda: any(data.get("change") == CHANGE_DELETED
+                                                      for _, data in self.eventi)))
+            return watcher.backend.name
+        finally:
+            watcher.stop()
+
+    def test_polling(self):
+        """Il backend di polling rileva modifiche, creazioni e rimozioni"""
+        self.assertEqual(self._verifica_backend(use_inotify=False), "polling")
+
+    @unittest.skipUnless(os.uname().sysname == "Linux" if hasattr(os, "uname") else False, "inotify solo su Linux")
+    def test_inotify(self):
+        """Su Linux il backend inotify rileva le stesse modifiche"""
+        self.assertEqual(self._verifica_backend(use_inotify=True), "inotify")
+
+    def test_coda_piena_forza_risincronizzazione(self):
+        """Le modifiche perse per la coda piena producono una risincronizzazione completa"""
+        watcher = FileWatcher(self.data_dir, self.assets_dir, event_bus=self.bus, debounce=0.05)
+        with patch.object(watcher, "_create_backend", return_value=_BackendPieno()):
+            watcher.start()
+        try:
+            self.assertTrue(self._attendi(lambda: self.eventi))
+            evento, data = self.eventi[0]
+            self.assertEqual(evento, Events.WATCHED_FILES_RESYNC)
+            self.assertEqual(set(data["roots"]), {os.path.abspath(self.data_dir), os.path.abspath(self.assets_dir)})
+        finally:
+            watcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from core.graphics_renderer import GraphicsRenderer, MAX_FLUSH_INTERVAL, MIN_FLUSH_INTERVAL
+
+
+class TestGraphicsRendererBatching(unittest.TestCase):
+    """Test per la modalità batching del GraphicsRenderer"""
+
+    def setUp(self):
+        self.socket_io = MagicMock()
+        self.renderer = GraphicsRenderer(socket_io=self.socket_io, batching=True)
+        # Nessuna attesa tra i flush, così ogni present() invia il proprio frame
+        self.renderer._broadcast.flush_interval = 0
+
+    def _disegna_frame(self, entita):
+        self.renderer.clear_screen()
+        for entity_id, x in entita.items():
+            self.renderer.draw_entity({"id": entity_id, "x": x, "y": 0, "sprite": "npc"})
+        self.renderer.present()
+
+    def _frame_inviati(self):
+        return [c.args[1] for c in self.socket_io.emit.call_args_list if c.args[0] == 'render_frame']
+
+    def test_un_messaggio_per_frame(self):
+        """200 entità producono un solo emit invece di 200"""
+        self._disegna_frame({f"e{i}": i for i in range(200)})
+        eventi = [c.args[0] for c in self.socket_io.emit.call_args_list]
+        self.assertEqual(eventi, ['render_frame'])
+        self.assertEqual(len(self._frame_inviati()[0]["upsert"]), 200)
+
+    def test_deduplicazione_frame_identico(self):
+        """Un frame identico al precedente non reinvia le entità"""
+        self._disegna_frame({"a": 1, "b": 2})
+        self._disegna_frame({"a": 1, "b": 2})
+        secondo = self._frame_inviati()[1]
+        self.assertEqual(secondo["upsert"], [])
+        self.assertEqual(secondo["unchanged"], 2)
+
+    def test_diff_modifiche_e_rimozioni(self):
+        """Solo le entità cambiate o rimosse vengono inviate"""
+        self._disegna_frame({"a": 1, "b": 2})
+        self._disegna_frame({"a": 5})
+        secondo = self._frame_inviati()[1]
+        self.assertEqual([u["key"] for u in secondo["upsert"]], ["render_entity:a"])
+        self.assertEqual(secondo["remove"], ["render_entity:b"])
+
+    def test_coalescenza_tra_flush(self):
+        """Con un intervallo di flush lungo i frame intermedi vengono accorpati"""
+        self.renderer._broadcast.flush_interval = 60
+        # Il primo frame viene inviato subito, i successivi attendono il flush
+        self._disegna_frame({"a": 1})
+        self._disegna_frame({"a": 2})
+        self._disegna_frame({"a": 3})
+        self.assertEqual(len(self._frame_inviati()), 1)
+        self.renderer.flush()
+        frames = self._frame_inviati()
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(frames[-1]["upsert"][0]["data"]["x"], 3)
+
+    def test_flush_a_scadenza_senza_present(self):
+        """Le modifiche in attesa partono allo scadere dell'intervallo anche senza altri present()"""
+        self.renderer._broadcast.flush_interval = 0.05
+        self._disegna_frame({"a": 1})
+        self._disegna_frame({"a": 2})
+        self.assertEqual(len(self._frame_inviati()), 1)
+        scadenza = time.time() + 2
+        while time.time() < scadenza and len(self._frame_inviati()) < 2:
+            time.sleep(0.01)
+        frames = self._frame_inviati()
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(frames[-1]["upsert"][0]["data"]["x"], 2)
+
+    def test_keyframe_per_nuovo_client(self):
+        """Un client appena entrato riceve il frame completo, non solo i diff"""
+        self._disegna_frame({"a": 1, "b": 2})
+        self._disegna_frame({"a": 1, "b": 3})
+        self.renderer.keyframe(to="sid-nuovo")
+        chiamata = self.socket_io.emit.call_args_list[-1]
+        self.assertEqual(chiamata.kwargs, {"to": "sid-nuovo"})
+        keyframe = chiamata.args[1]
+        self.assertTrue(keyframe["keyframe"])
+        dati = {u["key"]: u["data"]["x"] for u in keyframe["upsert"]}
+        self.assertEqual(dati, {"render_entity:a": 1, "render_entity:b": 3})
+
+    def test_adattamento_rtt(self):
+        """Latenze alte allungano l'intervallo di flush e ingrandiscono i batch"""
+        self.renderer.update_rtt(10)
+        stato = self.renderer._broadcast
+        self.assertEqual(stato.flush_interval, MIN_FLUSH_INTERVAL)
+        batch_basso = stato.max_batch_size
+        for _ in range(50):
+            self.renderer.update_rtt(2000)
+        self.assertEqual(stato.flush_interval, MAX_FLUSH_INTERVAL)
+        self.assertGreater(stato.max_batch_size, batch_basso)
+
+    def test_stato_separato_per_client(self):
+        """Latenza e deduplicazione sono tenute per client, non condivise"""
+        self._disegna_frame({"a": 1})
+        self.renderer.keyframe(to="sid-vicino")
+        self.renderer.keyframe(to="sid-lontano")
+        for _ in range(50):
+            self.renderer.update_rtt(2000, sid="sid-lontano")
+        self.renderer.update_rtt(10, sid="sid-vicino")
+        self.assertEqual(self.renderer.get_renderer_info("sid-vicino")["flush_interval"], round(MIN_FLUSH_INTERVAL, 4))
+        self.assertEqual(self.renderer.get_renderer_info("sid-lontano")["flush_interval"], MAX_FLUSH_INTERVAL)
+
+        self.socket_io.emit.reset_mock()
+        self.renderer._clients["sid-vicino"].flush_interval = 0
+        self._disegna_frame({"a": 2})
+        # Il client lento accumula il diff, quello veloce lo riceve subito
+        inviati = [c for c in self.socket_io.emit.call_args_list if c.args[0] == 'render_frame']
+        self.assertEqual([c.kwargs for c in inviati], [{"to": "sid-vicino"}])
+        self.assertEqual(inviati[0].args[1]["upsert"][0]["data"]["x"], 2)
+        self.assertIn("render_entity:a", self.renderer._clients["sid-lontano"].pending_upserts)
+
+        self.renderer.rimuovi_client("sid-lontano")
+        self.assertNotIn("sid-lontano", self.renderer._clients)
+        self.renderer.rimuovi_client("sid-vicino")
+
+    def test_modalita_classica(self):
+        """Senza batching ogni draw call resta un emit separato"""
+        renderer = GraphicsRenderer(socket_io=self.socket_io)
+        renderer.draw_entity({"id": "a", "x": 0, "y": 0})
+        renderer.present()
+        eventi = [c.args[0] for c in self.socket_io.emit.call_args_list]
+        self.assertEqual(eventi, ['render_entity', 'render_complete'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Test unitari per l'IA di combattimento a utilità.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from entities.entita import notifica_variazione_hp, osservatori_hp
+from states.combattimento.ia import MotoreIA, ProfiloComportamento, probabilita_colpire
+
+
+class _Mondo:
+    def __init__(self, *entita):
+        self.entita = {e.id: e for e in entita}
+
+    def get_entity(self, entita_id):
+        return self.entita.get(entita_id)
+
+
+def _entita(entita_id, hp, hp_max=None, giocatore=False, forza=10, **kwargs):
+    tags = {"player"} if giocatore else {"nemico"}
+    return SimpleNamespace(id=entita_id, name=entita_id, hp=hp, hp_max=hp_max or hp, forza=forza,
+                           destrezza=10, has_tag=tags.__contains__, **kwargs)
+
+
+class TestIACombattimento(unittest.TestCase):
+    """Test per profili, punteggi e memorizzazione del piano"""
+
+    def setUp(self):
+        self.profili = {
+            "lupo": ProfiloComportamento("piu_ferito", 1.0, 0.5, 0.3),
+            "troll": ProfiloComportamento("piu_pericoloso", 1.0, 0.5, 0.3),
+            "cultista": ProfiloComportamento("primo", 1.0, 1.0, 0.5),
+        }
+        self.motore = MotoreIA(profili=self.profili)
+        self.forte = _entita("forte", 30, giocatore=True, forza=18)
+        self.ferito = _entita("ferito", 5, 20, giocatore=True)
+
+    def tearDown(self):
+        if self.motore._on_variazione_hp in osservatori_hp:
+            osservatori_hp.remove(self.motore._on_variazione_hp)
+
+    def _cambia_hp(self, entita, hp):
+        """Modifica gli HP avvisando gli osservatori come fa Entita"""
+        hp_prima, entita.hp = entita.hp, hp
+        notifica_variazione_hp(entita, hp_prima, hp)
+
+    def _state(self, *nemici):
+        entita = (self.forte, self.ferito) + nemici
+        return SimpleNamespace(partecipanti=[e.id for e in entita], world=_Mondo(*entita), round_corrente=1)
+
+    def test_probabilita_colpire(self):
+        self.assertEqual(probabilita_colpire(0, 11), 0.5)
+        self.assertEqual(probabilita_colpire(0, 30), 0.05)
+        self.assertEqual(probabilita_colpire(0, 30, penalita=2, critico=False), 0.0)
+
+    def test_criterio_bersaglio(self):
+        lupo = _entita("l1", 10, tipo_mostro="lupo")
+        troll = _entita("t1", 40, tipo_mostro="troll")
+        state = self._state(lupo, troll)
+        self.assertEqual(self.motore.decidi(state, "l1")["target_id"], "ferito")
+        self.assertEqual(self.motore.decidi(state, "t1")["target_id"], "forte")
+
+    def test_cura_sotto_soglia(self):
+        cultista = _entita("c1", 3, 20, tipo_mostro="cultista",
+                           abilita_speciali={"cura_ferite": {"cooldown": 3, "ultimo_uso": -5}})
+        azione = self.motore.decidi(self._state(cultista), "c1")
+        self.assertEqual(azione["nome_abilita"], "cura_ferite")
+        self.assertEqual(azione["target_ids"], ["c1"])
+
+    def test_piano_unico_per_round(self):
+        nemici = [_entita(f"n{i}", 10, tipo_mostro="lupo") for i in range(20)]
+        state = self._state(*nemici)
+        with patch.object(self.motore, "pianifica_round", wraps=self.motore.pianifica_round) as pianifica:
+            for nemico in nemici:
+                self.motore.decidi(state, nemico.id)
+        self.assertEqual(pianifica.call_count, 1)
+
+        # Il bersaglio abbattuto durante il round viene sostituito dal successivo in classifica
+        self.ferito.hp = 0
+        self.assertEqual(self.motore.decidi(state, "n0")["target_id"], "forte")
+
+    def test_piani_separati_per_stato_e_situazione(self):
+        lupo = _entita("l1", 10, tipo_mostro="lupo")
+        state = self._state(lupo)
+        self.assertEqual(self.motore.decidi(state, "l1")["target_id"], "ferito")
+
+        # Stessi partecipanti e round in un altro scontro: nessun piano condiviso
+        self.ferito.hp = 20
+        altro = self._state(lupo)
+        self.assertFalse(getattr(altro, "piani_ia", None))
+        self.assertEqual(self.motore.decidi(altro, "l1")["target_id"], "forte")
+
+        # Un altro round richiede un nuovo piano
+        altro.round_corrente = 2
+        with patch.object(self.motore, "pianifica_round", wraps=self.motore.pianifica_round) as pianifica:
+            self.motore.decidi(altro, "l1")
+        self.assertEqual(pianifica.call_count, 1)
+
+    def test_variazioni_hp_senza_nuovo_piano(self):
+        """Morti e guarigioni tra i turni aggiornano le classifiche senza ripianificare il round"""
+        lupi = [_entita(f"l{i}", 10, tipo_mostro="lupo") for i in range(3)]
+        state = self._state(*lupi)
+        self.assertEqual(self.motore.decidi(state, "l0")["target_id"], "ferito")
+
+        with patch.object(self.motore, "pianifica_round", wraps=self.motore.pianifica_round) as pianifica, \
+                patch.object(self.motore, "_scegli_azione", wraps=self.motore._scegli_azione) as scegli:
+            # Il ferito guarisce: ora il più ferito è l'altro giocatore
+            self.forte.hp = 10
+            self._cambia_hp(self.ferito, 20)
+            self.assertEqual(self.motore.decidi(state, "l1")["target_id"], "forte")
+            self.assertEqual(scegli.call_count, 1)
+            self.assertEqual(self.motore.decidi(state, "l1")["target_id"], "forte")
+            self.assertEqual(scegli.call_count, 1)
+
+            # Il bersaglio muore: esce da tutte le classifiche
+            self._cambia_hp(self.forte, 0)
+            self.assertEqual(self.motore.decidi(state, "l2")["target_id"], "ferito")
+            self.assertNotIn("forte", state.piani_ia[(0, 1)]["classifiche"]["piu_pericoloso"])
+        self.assertEqual(pianifica.call_count, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Test unitari per l'indice spaziale delle ricerche di prossimità.
+"""
+
+import random
+import unittest
+from unittest.mock import patch
+
+from core.ecs.component import PositionComponent
+from core.ecs.entity import Entity
+from core.ecs.world import World
+from entities.entita import Entita
+from items.oggetto_interattivo import OggettoInterattivo
+from world.indice_spaziale import (
+    CHEBYSHEV, EUCLIDEA, MANHATTAN, NEMICI, NPG, IndiceSpaziale, distanza, get_indici_spaziali, linea_di_vista
+)
+from world.mappa import Mappa
+
+
+class TestIndiceSpaziale(unittest.TestCase):
+    """Test per ricerche per raggio, k più vicini, spostamenti e linea di vista"""
+
+    def setUp(self):
+        generatore = random.Random(7)
+        self.punti = {i: (generatore.randint(-40, 40), generatore.randint(-40, 40)) for i in range(300)}
+        self.indice = IndiceSpaziale(dimensione_cella=4)
+        for chiave, (x, y) in self.punti.items():
+            self.indice.inserisci(chiave, x, y, valore=chiave, categoria="pari" if chiave % 2 == 0 else "dispari")
+
+    def _forza_bruta(self, x, y, metrica, categoria=None):
+        return sorted(
+            (distanza(px - x, py - y, metrica), chiave) for chiave, (px, py) in self.punti.items()
+            if categoria is None or (chiave % 2 == 0) == (categoria == "pari")
+        )
+
+    def test_entro_raggio_come_forza_bruta(self):
+        for metrica in (CHEBYSHEV, EUCLIDEA, MANHATTAN):
+            attesi = {chiave for d, chiave in self._forza_bruta(3, -5, metrica) if d <= 9}
+            trovati = self.indice.entro_raggio(3, -5, 9, metrica=metrica)
+            self.assertEqual({v.chiave for v in trovati}, attesi)
+            self.assertEqual([v.distanza for v in trovati], sorted(v.distanza for v in trovati))
+
+    def test_piu_vicini_come_forza_bruta(self):
+        for x, y in ((0, 0), (100, 100), (-39, 22)):
+            attese = [d for d, _ in self._forza_bruta(x, y, EUCLIDEA, "dispari")[:5]]
+            trovati = self.indice.piu_vicini(x, y, k=5, categorie="dispari", metrica=EUCLIDEA)
+            self.assertEqual([v.distanza for v in trovati], attese)
+            self.assertTrue(all(v.chiave % 2 == 1 for v in trovati))
+        self.assertEqual(self.indice.piu_vicini(200, 200, k=3, raggio_max=10), [])
+
+    def test_sposta_e_rimuovi(self):
+        self.indice.sposta(0, 500, 500)
+        self.assertEqual(self.indice.posizione(0), (500, 500))
+        self.assertEqual(self.indice.piu_vicini(499, 499)[0].chiave, 0)
+        self.assertTrue(self.indice.rimuovi(0))
+        self.assertNotIn(0, self.indice)
+        self.assertFalse(self.indice.sposta(0, 1, 1))
+        self.assertEqual(len(self.indice), len(self.punti) - 1)
+
+    def test_linea_di_vista(self):
+        griglia = [[0] * 5 for _ in range(5)]
+        griglia[2][2] = 1
+        self.assertFalse(linea_di_vista(griglia, 0, 2, 4, 2))
+        self.assertTrue(linea_di_vista(griglia, 0, 0, 4, 0))
+        indice = IndiceSpaziale()
+        indice.inserisci("dietro", 4, 2)
+        indice.inserisci("visibile", 0, 4)
+        trovati = indice.entro_raggio(0, 2, 5, griglia=griglia)
+        self.assertEqual([v.chiave for v in trovati], ["visibile"])
+
+
+class TestIndiceMappa(unittest.TestCase):
+    """Test per l'indice di NPG e oggetti della Mappa"""
+
+    def setUp(self):
+        self.mappa = Mappa("prova", 20, 20)
+        self.npg = Entita("Mercante", token="N")
+        self.npg.mappa_corrente = "prova"
+        self.mappa.aggiungi_npg(self.npg, 5, 5)
+        self.baule = OggettoInterattivo("Baule")
+        self.mappa.aggiungi_oggetto(self.baule, 7, 5)
+
+    def test_vicini_e_spostamento(self):
+        self.assertEqual(self.mappa.ottieni_npg_vicini(6, 6, 1), {(5, 5): self.npg})
+        self.assertEqual(self.mappa.ottieni_oggetti_vicini(6, 6, 1), {(7, 5): self.baule})
+        self.assertTrue(self.mappa.sposta_npg(self.npg, 10, 10))
+        self.assertEqual(self.mappa.ottieni_npg_vicini(6, 6, 1), {})
+        self.assertIs(self.mappa.ottieni_npg_a(10, 10), self.npg)
+        self.assertIs(self.mappa.rimuovi_oggetto(7, 5), self.baule)
+        self.assertEqual([v.valore for v in self.mappa.entita_vicine(8, 8, 5)], [self.npg])
+
+    def test_from_dict_ricostruisce_indice(self):
+        dati = self.mappa.to_dict()
+        mappa = Mappa.from_dict(dati)
+        self.assertEqual(set(mappa.ottieni_oggetti_vicini(7, 5, 0)), {(7, 5)})
+        self.assertEqual(len(mappa.indice), len(mappa.npg) + len(mappa.oggetti))
+
+    def test_linea_di_vista_con_muri(self):
+        for y in range(20):
+            self.mappa.imposta_muro(6, y)
+        self.assertEqual([v.valore for v in self.mappa.entita_vicine(8, 5, k=1)], [self.baule])
+        visibili = self.mappa.entita_vicine(8, 5, 3, linea_di_vista=True)
+        self.assertEqual([v.valore for v in visibili], [self.baule])
+
+
+class TestIndiciMondo(unittest.TestCase):
+    """Test per gli indici del mondo ECS aggiornati dai componenti posizione"""
+
+    def setUp(self):
+        # Il gestore delle mappe carica i dati di gioco, non necessari qui
+        with patch("core.ecs.world.GestitoreMappe"):
+            self.world = World()
+        self.nemico = self._entita("Goblin", "nemico", 3, 4)
+        self.npg = self._entita("Oste", "npc", 20, 20)
+        self.giocatore = self._entita("Eroe", "player", 3, 3)
+
+    def _entita(self, nome, tag, x, y):
+        entita = Entity(name=nome)
+        entita.nome = nome  # Usato dai log di World.add_entity
+        entita.add_tag(tag)
+        entita.add_component("position", PositionComponent(x, y, map_name="taverna"))
+        return self.world.add_entity(entita)
+
+    def test_ricerche_per_categoria(self):
+        indici = get_indici_spaziali(self.world)
+        self.assertEqual([v.valore for v in indici.cerca("taverna", 3, 3, 10, NEMICI)], [self.nemico])
+        self.assertEqual(indici.cerca("taverna", 3, 3, 10, NPG), [])
+        # Il giocatore non compare fra i risultati senza categoria
+        self.assertNotIn(self.giocatore, [v.valore for v in indici.cerca("taverna", 3, 3, 50)])
+
+    def test_aggiornamento_su_spostamento_e_rimozione(self):
+        indici = get_indici_spaziali(self.world)
+        self.npg.get_component("position").x = 4
+        self.npg.get_component("position").y = 3
+        self.assertEqual([v.valore for v in indici.piu_vicini("taverna", 3, 3, k=1, categoria=NPG)], [self.npg])
+        self.nemico.get_component("position").map_name = "cantina"
+        self.assertEqual(indici.cerca("taverna", 3, 3, 10, NEMICI), [])
+        self.assertEqual(len(indici.cerca("cantina", 3, 4, 0, NEMICI)), 1)
+        self.world.remove_entity(self.nemico.id)
+        self.assertEqual(indici.cerca("cantina", 3, 4, 10, NEMICI), [])
+        nuovo = self._entita("Orco", "ostile", 5, 5)
+        self.assertEqual([v.valore for v in indici.cerca("taverna", 5, 5, 0, NEMICI)], [nuovo])
+
+
+if __name__ == "__main__":
+    unittest.main()
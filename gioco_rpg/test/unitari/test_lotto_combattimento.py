@@ -0,0 +1,208 @@
+"""
+Test unitari per l'esecuzione in lotto delle azioni di combattimento.
+"""
+
+import copy
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import core.events as Events
+from core.event_bus import EventBus
+from states.combattimento.combattimento_state import CombattimentoState
+from states.combattimento.lotto import esegui_lotto
+from states.combattimento.ordine_turni import GIOCATORI, NEMICI, OrdineTurni
+from states.combattimento.registro import TIPI_MESSAGGI, RegistroCombattimento
+from states.combattimento.statistiche import get_cache_statistiche
+
+
+class _Entita:
+    def __init__(self, entita_id, nome, hp, tag):
+        self.id = entita_id
+        self.name = nome
+        self.hp = self.hp_max = hp
+        self.forza = 14
+        self.destrezza = 10
+        self.armatura = None
+        self.tags = {tag}
+
+    def has_tag(self, tag):
+        return tag in self.tags
+
+
+class _Mondo:
+    def __init__(self, *entita):
+        self.entita = {e.id: e for e in entita}
+        self.temporary_states = {}
+
+    def get_entity(self, entita_id):
+        return self.entita.get(entita_id)
+
+    def get_temporary_state(self, nome):
+        return self.temporary_states.get(nome)
+
+    def set_temporary_state(self, nome, dati):
+        self.temporary_states[nome] = dati
+
+
+class TestLottoCombattimento(unittest.TestCase):
+    """Test per esecuzione, atomicità e proiezione dei lotti di azioni"""
+
+    def setUp(self):
+        CombattimentoState._instances_cache = {}
+        self.eroe = _Entita("g1", "Eroe", 20, "player")
+        self.orco = _Entita("m1", "Orco", 15, "nemico")
+        self._avvia(self.eroe, self.orco)
+
+    def _avvia(self, *entita):
+        """Prepara un combattimento fra le entità, in ordine di iniziativa decrescente"""
+        self.world = _Mondo(*entita)
+        ordine = OrdineTurni()
+        for iniziativa, e in zip(range(20, 0, -2), entita):
+            ordine.aggiungi(e.id, iniziativa, GIOCATORI if e.has_tag("player") else NEMICI)
+        ordine.prossimo()
+        self.world.set_temporary_state("combattimento", {
+            "partecipanti": [e.id for e in entita],
+            "turno_corrente": entita[0].id,
+            "round_corrente": 1,
+            "in_corso": True,
+            "fase_corrente": "azione",
+            "messaggi": [],
+            "ordine_turni": ordine.to_dict(),
+        })
+
+    def tearDown(self):
+        CombattimentoState._instances_cache = {}
+
+    def test_turno_completo_in_un_lotto(self):
+        azioni = [
+            {"tipo": "attacco", "entita_id": "g1", "target_id": "m1"},
+            {"tipo_azione": "passa", "parametri": {"entita_id": "g1"}},
+        ]
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            risposta = esegui_lotto(self.world, azioni, esegui_ia=False)
+
+        self.assertTrue(risposta["successo"])
+        self.assertEqual(risposta["azioni_eseguite"], 2)
+        delta = risposta["delta"]
+        self.assertEqual(delta["stato"]["turno_di"], "m1")
+        self.assertEqual(delta["partecipanti"], {"m1": {"hp": self.orco.hp, "max_hp": 15}})
+        self.assertEqual(len(delta["messaggi"]), 2)
+        self.assertEqual(delta["azioni_disponibili"], {})
+        self.assertEqual(self.world.get_temporary_state("combattimento")["turno_corrente"], "m1")
+
+    def test_lotto_annullato_se_un_azione_fallisce(self):
+        salvato = copy.deepcopy(self.world.get_temporary_state("combattimento"))
+        azioni = [
+            {"tipo": "attacco", "entita_id": "g1", "target_id": "m1"},
+            {"tipo": "attacco", "entita_id": "m1", "target_id": "g1"},
+        ]
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            risposta = esegui_lotto(self.world, azioni)
+
+        self.assertFalse(risposta["successo"])
+        self.assertEqual(risposta["indice"], 1)
+        self.assertEqual(self.orco.hp, 15)
+        self.assertEqual(self.world.get_temporary_state("combattimento"), salvato)
+
+        # Il lotto successivo riparte dallo stato salvato, non dall'istanza annullata
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            risposta = esegui_lotto(self.world, azioni[:1], esegui_ia=False)
+        self.assertEqual(len(risposta["delta"]["messaggi"]), 1)
+        # I messaggi salvati sono quelli del registro, senza una copia nello stato
+        salvato = self.world.get_temporary_state("combattimento")
+        self.assertNotIn("messaggi", salvato)
+        registro = RegistroCombattimento.from_dict(salvato["registro"])
+        self.assertEqual(registro.messaggi({"g1": "Eroe", "m1": "Orco"}, tipi=TIPI_MESSAGGI), risposta["delta"]["messaggi"])
+
+    def test_handler_rilasciati_dopo_ogni_lotto(self):
+        subscribers = EventBus.get_instance().subscribers
+        prima = len(subscribers.get(Events.ENTITY_STATS_CHANGED, []))
+        azioni = [{"tipo": "attacco", "entita_id": "g1", "target_id": "m1"}]
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            esegui_lotto(self.world, azioni, esegui_ia=False)
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            # Lotto annullato: anche l'istanza scartata rilascia i suoi handler
+            esegui_lotto(self.world, azioni + [{"tipo": "attacco", "entita_id": "m1", "target_id": "g1"}])
+        self.assertEqual(len(subscribers.get(Events.ENTITY_STATS_CHANGED, [])), prima)
+
+    def test_fuga_riuscita_chiude_il_combattimento(self):
+        state = CombattimentoState.from_dict(self.world.get_temporary_state("combattimento"), self.world)
+        get_cache_statistiche(state)
+        subscribers = EventBus.get_instance().subscribers
+        prima = len(subscribers.get(Events.ENTITY_STATS_CHANGED, []))
+        gioco = SimpleNamespace(stato_corrente=lambda: None)
+        with patch("util.dado.Dado.tira", return_value=20):
+            risultato = state.azioni.tenta_fuga(gioco)
+        self.assertTrue(risultato["riuscita"])
+        self.assertFalse(state.in_corso)
+        self.assertIsNone(getattr(state, "cache_statistiche", None))
+        self.assertEqual(len(subscribers.get(Events.ENTITY_STATS_CHANGED, [])), prima - 1)
+
+    def test_turni_ia_e_proiezione(self):
+        azione_ia = {"tipo": "passa_turno", "entita_id": "m1"}
+        with patch("states.combattimento.azioni.AzioniCombattimento.determina_azione_ia", return_value=azione_ia):
+            risposta = esegui_lotto(self.world, [{"tipo": "passa_turno", "entita_id": "g1"}], ["stato"])
+
+        self.assertEqual([a["entita_id"] for a in risposta["azioni_ia"]], ["m1"])
+        self.assertEqual(risposta["delta"], {"stato": {"in_corso": True, "round": 2, "turno_di": "g1",
+                                                       "fase": "azione"}})
+
+    def test_azioni_solo_dei_giocatori(self):
+        salvato = copy.deepcopy(self.world.get_temporary_state("combattimento"))
+        azione_ia = {"tipo": "passa_turno", "entita_id": "m1"}
+        azioni = [
+            {"tipo": "passa_turno", "entita_id": "g1"},
+            {"tipo": "attacco", "entita_id": "m1", "target_id": "g1"},
+        ]
+        with patch("states.combattimento.azioni.AzioniCombattimento.determina_azione_ia", return_value=azione_ia):
+            risposta = esegui_lotto(self.world, azioni, esegui_ia=False)
+        self.assertFalse(risposta["successo"])
+        self.assertEqual(risposta["indice"], 1)
+        self.assertEqual(self.world.get_temporary_state("combattimento"), salvato)
+
+    def test_ia_gioca_fra_le_azioni_del_giocatore(self):
+        azione_ia = {"tipo": "passa_turno", "entita_id": "m1"}
+        azioni = [{"tipo": "passa_turno", "entita_id": "g1"}, {"tipo": "passa_turno", "entita_id": "g1"}]
+        with patch("states.combattimento.azioni.AzioniCombattimento.determina_azione_ia", return_value=azione_ia):
+            risposta = esegui_lotto(self.world, azioni, ["stato"])
+
+        self.assertEqual(risposta["azioni_eseguite"], 2)
+        self.assertEqual([a["entita_id"] for a in risposta["azioni_ia"]], ["m1", "m1"])
+        self.assertEqual(risposta["delta"]["stato"]["round"], 3)
+
+    def test_eventi_hp_solo_dopo_il_salvataggio(self):
+        goblin = _Entita("m2", "Goblin", 15, "nemico")
+        self.orco.hp = 5
+        self._avvia(self.eroe, self.orco, goblin)
+        bus = EventBus.get_instance()
+        morti = []
+        self.addCleanup(bus.on(Events.ENTITY_DIED, lambda entity_id=None, **kwargs: morti.append(entity_id)))
+
+        # L'orco muore ma il lotto viene annullato: nessun evento
+        azioni = [{"tipo": "attacco", "entita_id": "g1", "target_id": "m1"}, {"tipo": "vola", "entita_id": "g1"}]
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            self.assertFalse(esegui_lotto(self.world, azioni, esegui_ia=False)["successo"])
+        self.assertEqual((self.orco.hp, morti), (5, []))
+
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            self.assertTrue(esegui_lotto(self.world, azioni[:1], esegui_ia=False)["successo"])
+        self.assertEqual(morti, ["m1"])
+
+    def test_fine_combattimento(self):
+        self.orco.hp = 1
+        azioni = [
+            {"tipo": "attacco", "entita_id": "g1", "target_id": "m1"},
+            {"tipo": "passa_turno", "entita_id": "g1"},
+        ]
+        with patch("util.dado.Dado.tira", side_effect=[15, 6]):
+            risposta = esegui_lotto(self.world, azioni)
+
+        self.assertTrue(risposta["combattimento_terminato"])
+        self.assertEqual(risposta["vincitore"], "giocatore")
+        self.assertEqual(risposta["azioni_eseguite"], 1)
+        self.assertFalse(self.world.get_temporary_state("combattimento")["in_corso"])
+
+
+if __name__ == "__main__":
+    unittest.main()
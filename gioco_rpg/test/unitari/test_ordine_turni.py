@@ -0,0 +1,120 @@
+"""
+Test unitari per l'ordine dei turni su heap.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import core.events as Events
+from core.event_bus import EventBus
+from entities.entita import Entita, rinvia_eventi_hp
+from states.combattimento.ordine_turni import GIOCATORI, NEMICI, OrdineTurni
+
+
+class TestOrdineTurni(unittest.TestCase):
+    """Test per ordine, round, rinforzi, ritardi e fine del combattimento"""
+
+    def setUp(self):
+        self.ordine = OrdineTurni()
+        self.ordine.aggiungi("g1", 12, GIOCATORI)
+        self.ordine.aggiungi("m1", 18, NEMICI)
+        self.ordine.aggiungi("m2", 12, NEMICI)
+
+    def tearDown(self):
+        self.ordine.chiudi()
+
+    def _turni(self, numero):
+        return [self.ordine.prossimo() for _ in range(numero)]
+
+    def test_ordine_e_round(self):
+        # A parità di iniziativa agisce chi è stato aggiunto prima
+        self.assertEqual(self.ordine.ordine(), ["m1", "g1", "m2"])
+        self.assertEqual(self._turni(4), [("m1", False), ("g1", False), ("m2", False), ("m1", True)])
+
+    def test_morti_saltati_e_fine_combattimento(self):
+        self.ordine.prossimo()
+        self.ordine.segna_morto("g1")
+        self.assertEqual(self.ordine.prossimo(), ("m2", False))
+        self.assertTrue(self.ordine.combattimento_finito())
+        self.assertEqual(self.ordine.vincitore(), "nemico")
+
+    def test_rinforzi_e_ritardo(self):
+        self.ordine.prossimo()  # m1
+        # Un rinforzo con iniziativa più bassa del turno corrente agisce in questo round
+        self.ordine.aggiungi("m3", 5, NEMICI)
+        # Uno con iniziativa più alta entra dal round successivo
+        self.ordine.aggiungi("g2", 20, GIOCATORI)
+        self.assertEqual(self.ordine.prossimo(), ("g1", False))
+        # g1 ritarda dopo m3: agisce ancora in questo round
+        self.ordine.ritarda("g1", 1)
+        self.assertEqual(self._turni(4), [("m2", False), ("m3", False), ("g1", False), ("g2", True)])
+
+    def _entita(self, entita_id, hp):
+        entita = Entita(entita_id, id=entita_id)
+        entita.hp_max = entita.hp = hp
+        return entita
+
+    def test_morte_e_guarigione_dalle_entita(self):
+        self.ordine.attiva()
+        m1, m2 = self._entita("m1", 6), self._entita("m2", 6)
+        eventi = []
+        bus = EventBus.get_instance()
+        annulla = [bus.on(tipo, lambda tipo=tipo, **dati: eventi.append((tipo, dati["entity_id"])))
+                   for tipo in (Events.ENTITY_DIED, Events.ENTITY_HEALED)]
+        self.addCleanup(lambda: [a() for a in annulla])
+
+        self.ordine.prossimo()  # m1
+        m2.subisci_danno(10)
+        m1.hp = 0
+        self.assertTrue(self.ordine.combattimento_finito())
+        self.assertEqual(self.ordine.vincitore(), "giocatore")
+        self.assertEqual(eventi, [(Events.ENTITY_DIED, "m2"), (Events.ENTITY_DIED, "m1")])
+
+        # m2 viene rianimato prima del suo turno: agisce ancora in questo round
+        m2.cura(5)
+        self.assertFalse(self.ordine.combattimento_finito())
+        self.assertEqual(self._turni(2), [("g1", False), ("m2", False)])
+
+        # m1, il cui turno è già passato, torna dal round successivo
+        m1.cura(3)
+        self.assertEqual(self._turni(2), [("m1", True), ("g1", False)])
+
+    def test_eventi_rinviati(self):
+        self.ordine.attiva()
+        m1, m2 = self._entita("m1", 6), self._entita("m2", 6)
+        with patch.object(EventBus.get_instance(), "emit_immediate") as emit:
+            with rinvia_eventi_hp() as trattenuti:
+                m1.subisci_danno(10)
+                m2.subisci_danno(10)
+            # L'ordine è aggiornato subito, l'EventBus no
+            self.assertTrue(self.ordine.combattimento_finito())
+            emit.assert_not_called()
+        self.assertEqual([dati["entity_id"] for _, dati in trattenuti], ["m1", "m2"])
+
+    def test_caricamento_senza_eventi_hp(self):
+        """Ricaricare entità ferite o morte non pubblica morti né guarigioni"""
+        from entities.giocatore import Giocatore
+        from entities.npg import NPG
+
+        self.ordine.attiva()
+        with patch.object(EventBus.get_instance(), "emit_immediate") as emit:
+            giocatore = Giocatore("g1", "guerriero", id="g1")
+            npg = NPG("Durnan")
+            dati_giocatore, dati_npg = giocatore.to_dict(), npg.to_dict()
+            dati_giocatore["hp"], dati_npg["hp"] = 0, 1
+            self.assertEqual(Giocatore.from_dict(dati_giocatore).hp, 0)
+            self.assertEqual(NPG.from_dict(dati_npg).hp, 1)
+            emit.assert_not_called()
+        self.assertEqual(self.ordine.ordine(), ["m1", "g1", "m2"])
+
+    def test_serializzazione(self):
+        self.ordine.prossimo()
+        self.ordine.segna_morto("m2")
+        copia = OrdineTurni.from_dict(self.ordine.to_dict())
+        self.assertEqual(copia.ordine(), self.ordine.ordine())
+        self.assertEqual(copia.viventi, {"g1", "m1"})
+        self.assertEqual([copia.prossimo() for _ in range(3)], self._turni(3))
+
+
+if __name__ == "__main__":
+    unittest.main()
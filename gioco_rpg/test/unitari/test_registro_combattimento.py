@@ -0,0 +1,139 @@
+"""
+Test unitari per il registro binario degli eventi di combattimento.
+"""
+
+import base64
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from states.combattimento.azioni import AzioniCombattimento
+from states.combattimento.registro import (MAGIC, MAX_BLOCCHI, MessaggiCombattimento, RegistroCombattimento,
+                                           TipoEvento)
+
+
+class _Mondo:
+    def __init__(self, *entita):
+        self.entita = {e.id: e for e in entita}
+
+    def get_entity(self, entita_id):
+        return self.entita.get(entita_id)
+
+
+def _entita(entita_id, nome, hp):
+    return SimpleNamespace(id=entita_id, name=nome, hp=hp, hp_max=hp, forza=14, destrezza=10, armatura=None)
+
+
+class TestRegistroCombattimento(unittest.TestCase):
+    """Test per codifica, riproduzione e persistenza del registro"""
+
+    def setUp(self):
+        self.eroe = _entita("g1", "Eroe", 20)
+        self.orco = _entita("m1", "Orco", 15)
+
+    def test_codifica_e_decodifica(self):
+        registro = RegistroCombattimento()
+        registro.iniziativa(self.eroe, 17)
+        registro.turno(self.eroe, 1)
+        registro.attacco(self.eroe, self.orco, 18, True, danno=6, hp_dopo=9)
+        registro.attacco(self.orco, self.eroe, -1, False)
+        registro.stato(self.orco, "passa_turno")
+
+        self.assertTrue(registro.to_bytes().startswith(MAGIC))
+        tipi = [evento.tipo for evento in registro.eventi()]
+        self.assertEqual(tipi, [TipoEvento.PARTECIPANTE, TipoEvento.INIZIATIVA, TipoEvento.TURNO,
+                                TipoEvento.PARTECIPANTE, TipoEvento.ATTACCO, TipoEvento.ATTACCO,
+                                TipoEvento.STATO])
+        attacco = list(registro.eventi())[-2].campi
+        self.assertEqual((attacco["tiro"], attacco["danno"]), (-1, 0))
+
+        copia = RegistroCombattimento(registro.to_bytes())
+        self.assertEqual(copia.partecipanti, ["g1", "m1"])
+        self.assertEqual(list(copia.eventi()), list(registro.eventi()))
+
+    def test_messaggi_generati_su_richiesta(self):
+        registro = RegistroCombattimento()
+        registro.attacco(self.eroe, self.orco, 20, True, critico=True, danno=11, hp_dopo=4)
+        registro.cura(self.orco, self.orco, 3, 7)
+        registro.fine(forzato=True)
+        self.assertEqual(registro.messaggi({"g1": "Eroe", "m1": "Orco"}), [
+            "Eroe colpisce Orco con un colpo critico per 11 danni!",
+            "Orco usa cura_ferite e recupera 3 punti vita!",
+            "Combattimento terminato forzatamente",
+        ])
+
+    def test_riproduzione_combattimento(self):
+        state = SimpleNamespace(turno_corrente="g1", world=_Mondo(self.eroe, self.orco))
+        azioni = AzioniCombattimento(state)
+        with patch("util.dado.Dado.tira", side_effect=[15, 6, 20, 5, 4, 2]):
+            risultati = [azioni.esegui_attacco("g1", "m1") for _ in range(3)]
+
+        # I messaggi mostrati sono generati dal registro e coincidono con quelli delle azioni
+        attesi = [r["messaggio"] for r in risultati]
+        if self.orco.hp == 0:
+            attesi.insert(2, "Orco è stato sconfitto!")
+        self.assertEqual(list(MessaggiCombattimento(state)), attesi)
+        stato = state.registro.riproduci()
+        self.assertEqual(stato.hp, {"g1": 20, "m1": self.orco.hp})
+        self.assertEqual(stato.incoerenze, [])
+        self.assertEqual(state.registro.confronta(state.world), [])
+
+        self.orco.hp += 1
+        self.assertEqual(len(state.registro.confronta(state.world)), 1)
+        state.cache_statistiche.chiudi()
+
+    def test_salvataggio_incrementale_e_compressione(self):
+        registro = RegistroCombattimento()
+        registro.attacco(self.eroe, self.orco, 12, True, danno=5, hp_dopo=10)
+        file_salvataggio = registro.nuovi_byte()
+        for round_corrente in range(1, 50):
+            registro.turno(self.eroe, round_corrente)
+            registro.stato(self.eroe, "passa_turno")
+        file_salvataggio += registro.nuovi_byte()
+        self.assertEqual(registro.nuovi_byte(), b"")
+        self.assertEqual(file_salvataggio, registro.to_bytes())
+
+        self.assertLess(len(registro.comprimi()), len(registro))
+        copia = RegistroCombattimento.from_dict(registro.to_dict())
+        self.assertEqual(copia.to_bytes(), registro.to_bytes())
+        self.assertEqual(copia.riproduci().round_corrente, 49)
+
+    def test_to_dict_accoda_solo_i_byte_nuovi(self):
+        registro = RegistroCombattimento()
+        registro.attacco(self.eroe, self.orco, 12, True, danno=5, hp_dopo=10)
+        primo = registro.to_dict()
+        registro.stato(self.eroe, "passa_turno")
+        secondo = registro.to_dict()
+        self.assertEqual(secondo["blocchi"][:1], primo["blocchi"])
+        self.assertEqual(len(secondo["blocchi"]), 2)
+        self.assertEqual(registro.to_dict(), secondo)
+
+        # Oltre MAX_BLOCCHI il registro salvato viene ricompresso in un'unica base
+        copia = RegistroCombattimento.from_dict(secondo)
+        for round_corrente in range(MAX_BLOCCHI - 1):
+            copia.turno(self.eroe, round_corrente)
+            dati = copia.to_dict()
+        self.assertTrue(dati["base"])
+        self.assertEqual(dati["blocchi"], [])
+        self.assertEqual(RegistroCombattimento.from_dict(dati).to_bytes(), copia.to_bytes())
+
+        # Il formato compresso precedente resta leggibile
+        precedente = {"formato": "clg1+zlib", "dati": base64.b64encode(registro.comprimi()).decode("ascii")}
+        self.assertEqual(RegistroCombattimento.from_dict(precedente).to_bytes(), registro.to_bytes())
+
+    def test_note_e_record_silenziosi(self):
+        registro = RegistroCombattimento()
+        registro.cura(self.eroe, self.eroe, 10, 20, visibile=False)
+        registro.nota("Eroe beve Pozione e recupera 10 punti vita!")
+        registro.turno(self.orco, 1)
+        registro.danno(self.eroe, self.orco, 20, 0, visibile=False)
+        registro.stato(self.orco, "sconfitto")
+        self.assertEqual(registro.messaggi({"m1": "Orco"}, tipi={TipoEvento.NOTA, TipoEvento.STATO}), [
+            "Eroe beve Pozione e recupera 10 punti vita!",
+            "Orco è stato sconfitto!",
+        ])
+        self.assertEqual(registro.riproduci().hp, {"g1": 20, "m1": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Test unitari per il servizio di risoluzione delle prove di abilità.
+"""
+
+import random
+import unittest
+from types import SimpleNamespace
+
+import core.events as Events
+from core.event_bus import EventBus
+from entities.entita import Entita
+from states.prova_abilita.risoluzione import (ServizioProve, probabilita_confronto, probabilita_gruppo,
+                                              probabilita_successo)
+
+
+def _ladro(entita_id="l1", **kwargs):
+    valori = dict(id=entita_id, modificatore_forza=0, modificatore_destrezza=3, modificatore_costituzione=1,
+                  modificatore_intelligenza=1, modificatore_saggezza=2, modificatore_carisma=0,
+                  bonus_competenza=2, abilita_competenze={"furtività": True})
+    valori.update(kwargs)
+    return SimpleNamespace(**valori)
+
+
+class TestRisoluzioneProve(unittest.TestCase):
+    """Test per modificatori in cache, probabilità e prove di gruppo"""
+
+    def test_probabilita_esatte(self):
+        self.assertEqual(probabilita_successo(5, 15), 0.55)
+        self.assertEqual(probabilita_successo(0, 1), 1.0)
+        self.assertEqual(probabilita_successo(0, 25), 0.0)
+
+        # Confronto a parità di modificatore: 210 casi su 400 (la parità vince chi agisce)
+        self.assertEqual(probabilita_confronto(2, 2), 210 / 400)
+        self.assertEqual(probabilita_confronto(0, 30), 0.0)
+        esatta = sum(1 for a in range(1, 21) for b in range(1, 21) if a + 4 >= b + 1) / 400
+        self.assertEqual(probabilita_confronto(4, 1), esatta)
+
+        self.assertAlmostEqual(probabilita_gruppo([0.5, 0.5]), 0.75)
+        self.assertAlmostEqual(probabilita_gruppo([0.5, 0.5], minimo=2), 0.25)
+
+    def test_tabella_modificatori_e_invalidazione(self):
+        servizio = ServizioProve()
+        event_bus = EventBus.get_instance()
+        servizio.ascolta_eventi(event_bus)
+        ladro = _ladro()
+        self.assertEqual(servizio.modificatore(ladro, "furtività"), 5)
+        self.assertEqual(servizio.modificatore(ladro, "Percezione"), 2)
+        self.assertEqual(servizio.modificatore(ladro, "destrezza"), 3)
+
+        ladro.modificatore_destrezza = 4
+        self.assertEqual(servizio.modificatore(ladro, "furtività"), 5)
+        event_bus.emit_immediate(Events.ENTITY_STATS_CHANGED, entity_id="l1", motivo="effetto")
+        self.assertEqual(servizio.modificatore(ladro, "furtività"), 6)
+
+    def test_componenti_ecs(self):
+        bonus = {"atletica": 2}
+        componente = SimpleNamespace(get_bonus_abilita=lambda nome: bonus.get(nome, 0))
+        entita = SimpleNamespace(id="e1", get_all_components=lambda: [componente, componente])
+        servizio = ServizioProve()
+        self.assertEqual(servizio.modificatore(entita, "atletica"), 4)
+        # Il bonus di un componente cambia senza alcun evento
+        bonus["atletica"] = 3
+        self.assertEqual(servizio.modificatore(entita, "atletica"), 6)
+
+    def test_setter_e_ricaricamento_entita(self):
+        servizio = ServizioProve()
+        entita = Entita("Esploratore", id="esp")
+        self.assertEqual(servizio.modificatore(entita, "forza"), 0)
+        entita.forza = 3
+        self.assertEqual(servizio.modificatore(entita, "atletica"), 3)
+
+        # Un salvataggio ricaricato riusa l'ID ma non la tabella
+        ricaricata = Entita.from_dict(entita.to_dict())
+        ricaricata.modificatore_forza = 1
+        self.assertEqual(ricaricata.id, "esp")
+        self.assertEqual(servizio.modificatore(ricaricata, "forza"), 1)
+
+    def test_prove_di_gruppo(self):
+        servizio = ServizioProve()
+        gruppo = [_ladro("a"), _ladro("b", abilita_competenze={}), _ladro("c", modificatore_destrezza=-1,
+                                                                         abilita_competenze={})]
+        esito = servizio.prove_di_gruppo(gruppo, "furtività", 12, rng=random.Random(3))
+        tiri = random.Random(3).choices(range(1, 21), k=3)
+        self.assertEqual([e.tiro for e in esito["esiti"]], tiri)
+        self.assertEqual([e.modificatore for e in esito["esiti"]], [5, 3, -1])
+        self.assertEqual(esito["successi"], sum(t + m >= 12 for t, m in zip(tiri, [5, 3, -1])))
+        self.assertEqual(esito["successo"], esito["successi"] >= 2)
+        self.assertAlmostEqual(esito["probabilita"], probabilita_gruppo([0.7, 0.6, 0.4]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Test unitari per i flussi casuali deterministici per sessione.
+"""
+
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+from util.dado import Dado, compile_dice
+from util.rng import FlussiCasuali, attiva, flussi_attivi, generatore, seme_iniziale
+
+
+class TestFlussiCasuali(unittest.TestCase):
+    """Test per seme, indipendenza e persistenza dei flussi"""
+
+    def tearDown(self):
+        attiva(None)
+
+    def test_flussi_riproducibili_e_indipendenti(self):
+        a, b = FlussiCasuali(42), FlussiCasuali(42)
+        self.assertEqual(a.tira(20, 50), b.tira(20, 50))
+
+        # Consumare un altro flusso non sposta i tiri dei dadi
+        b.tira(6, 1000, nome="render")
+        self.assertEqual(a.tira(20, 10), b.tira(20, 10))
+        self.assertNotEqual(a.tira(20, 50, nome="combattimento"), FlussiCasuali(43).tira(20, 50, nome="combattimento"))
+
+    def test_persistenza_riprende_la_sequenza(self):
+        flussi = FlussiCasuali(7)
+        flussi.tira(20, 13)
+        flussi.interi(0, 100, 5, nome="mappa")
+        dati = json.loads(json.dumps(flussi.to_dict()))
+        attesi = (flussi.tira(20, 20), flussi.interi(0, 100, 5, nome="mappa"))
+
+        ripristinati = FlussiCasuali.from_dict(dati)
+        self.assertEqual((ripristinati.tira(20, 20), ripristinati.interi(0, 100, 5, nome="mappa")), attesi)
+
+    def test_dado_usa_la_sessione_attiva(self):
+        attiva(FlussiCasuali(99))
+        primi = [Dado(20).tira() for _ in range(10)] + compile_dice("4d6kh3").tira_molti(10)
+        attiva(FlussiCasuali(99))
+        secondi = [Dado(20).tira() for _ in range(10)] + compile_dice("4d6kh3").tira_molti(10)
+        self.assertEqual(primi, secondi)
+
+        attiva(None)
+        import random
+        self.assertIs(generatore(), random)
+
+    def test_flussi_rilasciati_a_fine_richiesta(self):
+        """Lo stream della sessione non resta attivo sul thread dopo la richiesta"""
+        from flask import Flask
+        from server.utils.session import rilascia_rng
+
+        app = Flask(__name__)
+        app.teardown_request(rilascia_rng)
+        flussi = FlussiCasuali(5)
+
+        @app.route("/tiro")
+        def tiro():
+            attiva(flussi)
+            return str(Dado(20).tira())
+
+        with app.test_client() as client:
+            client.get("/tiro")
+        self.assertIsNone(flussi_attivi())
+
+    def test_seme_da_ambiente(self):
+        with patch.dict(os.environ, {"GIOCO_RPG_SEED": "1234"}):
+            self.assertEqual(seme_iniziale(), 1234)
+            self.assertEqual(FlussiCasuali().seme, 1234)
+
+
+if __name__ == "__main__":
+    unittest.main()
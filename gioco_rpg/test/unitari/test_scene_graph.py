@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import patch
+
+from core.ecs.entity import Entity
+from core.ecs.component import AnimationComponent, InventoryComponent, PositionComponent, RenderableComponent
+from core.scene_graph import SceneGraph, get_scene_graph, rimuovi_scene_graph
+
+
+class _MondoFinto:
+    """Mondo minimale con la sola ricerca per componente"""
+
+    def __init__(self):
+        self.entities = {}
+
+    def aggiungi(self, entity_id, x=0, layer=0, tag=None):
+        entity = Entity(id=entity_id)
+        entity.add_component("position", PositionComponent(x=x, y=0, map_name="taverna"))
+        renderable = RenderableComponent(sprite="npc", layer=layer)
+        renderable.entity_id = entity_id
+        entity.add_component("renderable", renderable)
+        if tag:
+            entity.add_tag(tag)
+        self.entities[entity_id] = entity
+        return entity
+
+    def find_entities_with_component(self, component_type):
+        return [e for e in self.entities.values() if e.has_component(component_type)]
+
+
+class TestSceneGraph(unittest.TestCase):
+    """Test per lo scene graph retained"""
+
+    def setUp(self):
+        self.mondo = _MondoFinto()
+        self.grafo = SceneGraph()
+
+    def test_prima_sincronizzazione_completa(self):
+        """La prima sincronizzazione aggiunge tutti i nodi in ordine di disegno"""
+        self.mondo.aggiungi("ui1", tag="ui")
+        self.mondo.aggiungi("alto", layer=5)
+        self.mondo.aggiungi("basso", layer=1)
+        self.mondo.aggiungi("mappa", layer=9, tag="map")
+        diff = self.grafo.sincronizza(self.mondo, completo=True)
+        self.assertEqual(len(diff["added"]), 4)
+        self.assertEqual(diff["order"], ["map:mappa", "entity:basso", "entity:alto", "ui:ui1"])
+
+    def test_scena_invariata(self):
+        """Se nulla cambia non viene inviato alcun nodo"""
+        self.mondo.aggiungi("a")
+        self.grafo.sincronizza(self.mondo, completo=True)
+        diff = self.grafo.sincronizza(self.mondo)
+        self.assertEqual((diff["added"], diff["changed"], diff["removed"]), ([], [], []))
+        self.assertIsNone(diff["order"])
+
+    def test_solo_modifiche_e_rimozioni(self):
+        """Vengono inviati solo i nodi cambiati e quelli rimossi"""
+        self.mondo.aggiungi("a")
+        self.mondo.aggiungi("b")
+        self.grafo.sincronizza(self.mondo, completo=True)
+        self.mondo.entities["a"].get_component("position").x = 3
+        del self.mondo.entities["b"]
+        diff = self.grafo.sincronizza(self.mondo)
+        self.assertEqual([n["key"] for n in diff["changed"]], ["entity:a"])
+        self.assertEqual(diff["changed"][0]["data"]["x"], 3)
+        self.assertEqual(diff["removed"], ["entity:b"])
+
+    def test_cambio_layer_riordina(self):
+        """Un cambio di layer sposta il nodo senza riordinare l'intera scena"""
+        self.mondo.aggiungi("a", layer=1)
+        self.mondo.aggiungi("b", layer=2)
+        self.grafo.sincronizza(self.mondo, completo=True)
+        self.mondo.entities["a"].get_component("renderable").layer = 3
+        diff = self.grafo.sincronizza(self.mondo)
+        self.assertEqual(diff["order"], ["entity:b", "entity:a"])
+
+    def test_serializza_solo_nodi_sporchi(self):
+        """Solo i nodi con componente o posizione modificati vengono riserializzati"""
+        for i in range(10):
+            self.mondo.aggiungi(f"e{i}", x=i)
+        self.grafo.sincronizza(self.mondo, completo=True)
+        self.mondo.entities["e3"].get_component("position").x = 30
+        self.mondo.entities["e5"].get_component("renderable").sprite = "orco"
+        originale = RenderableComponent.to_dict
+        with patch.object(RenderableComponent, "to_dict", autospec=True, side_effect=originale) as to_dict:
+            diff = self.grafo.sincronizza(self.mondo)
+            self.assertEqual({c.args[0].entity_id for c in to_dict.call_args_list}, {"e3", "e5"})
+        self.assertEqual(sorted(n["key"] for n in diff["changed"]), ["entity:e3", "entity:e5"])
+        # Le modifiche in place vanno segnalate esplicitamente
+        renderable = self.mondo.entities["e1"].get_component("renderable")
+        object.__setattr__(renderable, "sprite", "drago")
+        self.assertEqual(self.grafo.sincronizza(self.mondo)["changed"], [])
+        renderable.segna_modificato()
+        diff = self.grafo.sincronizza(self.mondo)
+        self.assertEqual([n["data"]["sprite"] for n in diff["changed"]], ["drago"])
+
+    def test_modifiche_in_place_dei_componenti(self):
+        """I metodi che modificano liste e dizionari in place aggiornano la versione"""
+        inventario = InventoryComponent(capacity=2)
+        versione = inventario._versione
+        inventario.add_item({"id": "spada"})
+        self.assertGreater(inventario._versione, versione)
+        versione = inventario._versione
+        inventario.remove_item({"id": "spada"})
+        self.assertGreater(inventario._versione, versione)
+
+        animazione = AnimationComponent()
+        versione = animazione._versione
+        animazione.add_animation("corsa", ["f1", "f2"])
+        self.assertGreater(animazione._versione, versione)
+
+    def test_scene_graph_per_client(self):
+        """Ogni client della sessione ha il proprio scene graph"""
+        primo = get_scene_graph("sessione-test", "sid-1")
+        self.assertIsNot(primo, get_scene_graph("sessione-test", "sid-2"))
+        self.assertIs(primo, get_scene_graph("sessione-test", "sid-1"))
+        rimuovi_scene_graph("sessione-test", "sid-1")
+        self.assertIsNot(primo, get_scene_graph("sessione-test", "sid-1"))
+        secondo = get_scene_graph("sessione-test", "sid-2")
+        rimuovi_scene_graph("sessione-test")
+        self.assertIsNot(secondo, get_scene_graph("sessione-test", "sid-2"))
+        rimuovi_scene_graph("sessione-test")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Test unitari per i validatori JSON compilati.
+"""
+
+import unittest
+
+import pytest
+
+from util.schema_compiler import compile_schema, UnsupportedSchema
+from util.json_validator import get_validator, validate_data
+
+
+SCHEMA = {
+    "type": "object",
+    "required": ["nome", "livello"],
+    "properties": {
+        "nome": {"type": "string", "minLength": 1},
+        "livello": {"type": "integer", "minimum": 1, "maximum": 20},
+        "tipo": {"enum": ["umanoide", "bestia"]},
+        "posizione": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
+        "statistiche": {"$ref": "#/definitions/statistiche"}
+    },
+    "additionalProperties": False,
+    "definitions": {
+        "statistiche": {"type": "object", "additionalProperties": {"type": "integer"}}
+    }
+}
+
+
+class TestSchemaCompiler(unittest.TestCase):
+    """Test per la compilazione degli schemi in funzioni di validazione"""
+
+    def setUp(self):
+        self.validate = compile_schema(SCHEMA)
+
+    def test_dati_validi(self):
+        """Un elemento conforme non produce errori"""
+        valido = {"nome": "Goblin", "livello": 2, "tipo": "umanoide", "posizione": [3, 4],
+                  "statistiche": {"forza": 8}}
+        self.assertEqual(self.validate(valido), [])
+
+    def test_errori_con_percorso(self):
+        """Gli errori riportano il percorso del valore non valido"""
+        errori = self.validate({"nome": "", "livello": 30, "posizione": [1, "a", 3],
+                                "statistiche": {"forza": "alta"}, "extra": 1})
+        self.assertTrue(any("livello" in e and "massimo" in e for e in errori))
+        self.assertTrue(any(e.startswith("posizione/1:") for e in errori))
+        self.assertTrue(any(e.startswith("statistiche/forza:") for e in errori))
+        self.assertTrue(any("'extra'" in e for e in errori))
+        self.assertTrue(any(e.startswith("nome:") for e in errori))
+
+    def test_tipi_booleani_e_obbligatori(self):
+        """I booleani non sono interi e le chiavi mancanti vengono segnalate"""
+        errori = self.validate({"livello": True})
+        self.assertTrue(any("'nome'" in e and "obbligatoria" in e for e in errori))
+        self.assertTrue(any(e.startswith("livello:") for e in errori))
+
+    def test_parole_chiave_non_supportate(self):
+        """Gli schemi con parole chiave non gestite vengono rifiutati"""
+        with self.assertRaises(UnsupportedSchema):
+            compile_schema({"type": "string", "pattern": "^a"})
+
+    @pytest.mark.file_reali  # Legge gli schemi reali del gioco
+    def test_validatore_in_cache(self):
+        """Il validatore di uno schema del gioco viene compilato una sola volta"""
+        self.assertIs(get_validator("mappa"), get_validator("mappa"))
+        self.assertEqual(validate_data([{}], "mostro")[0].split(":")[0], "Errore nell'elemento 0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Test unitari per il simulatore Monte Carlo dei combattimenti.
+"""
+
+import unittest
+
+from util.simulatore_combattimento import (Combattente, combattente_da_classe, combattente_da_mostro,
+                                           distribuzione_danno, simula_matrice, simula_scontro)
+
+
+CLASSI = {
+    "guerriero": {"statistiche_base": {"forza": 15, "destrezza": 10, "costituzione": 14},
+                  "hp_base": 12, "equipaggiamento_iniziale": ["Spada corta", "Armatura di cuoio"],
+                  "progressione": {"hp_per_livello": 10}},
+}
+
+MOSTRI = {
+    "goblin": {"statistiche": {"hp": 10, "forza": 8, "destrezza": 14}, "armatura": "Cuoio",
+               "difficolta": "facile"},
+    "troll": {"statistiche": {"hp": 40, "forza": 18, "destrezza": 12}, "armatura": "Pelle",
+              "difficolta": "difficile"},
+}
+
+
+class TestSimulatoreCombattimento(unittest.TestCase):
+    """Test per regole, riproducibilità e matrice degli scontri"""
+
+    def test_parametri_da_dati(self):
+        guerriero = combattente_da_classe("guerriero", CLASSI["guerriero"])
+        self.assertEqual(guerriero, Combattente("guerriero", 14, 2, 12, 0))
+        self.assertEqual(combattente_da_classe("guerriero", CLASSI["guerriero"], livello=3).hp, 14 + 2 * 7)
+        self.assertEqual(combattente_da_mostro("goblin", MOSTRI["goblin"]), Combattente("goblin", 10, -1, 14, 2))
+
+    def test_distribuzione_danno(self):
+        attaccante = Combattente("a", 10, 2, 10, 0)
+        bersaglio = Combattente("b", 10, 0, 15, 0)
+        pesi = distribuzione_danno(attaccante, bersaglio)
+        self.assertEqual(sum(pesi.values()), 20 * 64)
+        # Colpisce con 13-19 (7 facce) e con il critico: manca con 12 facce su 20
+        self.assertEqual(pesi[0], 12 * 64)
+        self.assertEqual(max(pesi), 16 + 2)
+
+    def test_riproducibile_con_seed(self):
+        giocatore = combattente_da_classe("guerriero", CLASSI["guerriero"])
+        mostro = combattente_da_mostro("goblin", MOSTRI["goblin"])
+        primo = simula_scontro(giocatore, mostro, incontri=500, seed="x")
+        self.assertEqual(primo, simula_scontro(giocatore, mostro, incontri=500, seed="x"))
+        self.assertAlmostEqual(primo["vittorie"] + primo["sconfitte"] + primo["pareggi"], 1.0)
+        self.assertEqual(sum(primo["ttk"]["istogramma"].values()), 500)
+
+    def test_matrice(self):
+        risultati = simula_matrice(CLASSI, MOSTRI, incontri=1000, seed=1, processi=1)
+        per_mostro = {r["mostro"]: r for r in risultati}
+        self.assertEqual(per_mostro["troll"]["difficolta"], "difficile")
+        self.assertGreater(per_mostro["goblin"]["vittorie"], per_mostro["troll"]["vittorie"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Test unitari per la gestione delle pagine degli sprite sheet.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from util.sprite_sheet_manager import SpriteSheetManager
+
+
+class TestPagineSpriteSheet(unittest.TestCase):
+    """Test per la pulizia delle pagine quando uno sheet si riduce"""
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.manager = SpriteSheetManager(base_path=self.base)
+        self.pagine = [self._pagina(page_id) for page_id in ("eroi", "eroi-1", "eroi-2")]
+        self.manager.sprite_sheets["eroi"]["meta"] = {"pages": 3, "page_files": self.pagine}
+        # Sheet indipendenti i cui ID hanno la stessa forma delle pagine aggiuntive
+        self._pagina("eroi-3")
+        self._pagina("mostri-1")
+        self.manager.sprite_sheets["mostri"] = {"id": "mostri", "meta": {"pages": 1}}
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def _pagina(self, page_id):
+        Path(self.base, f"{page_id}.png").write_bytes(b"png")
+        Path(self.base, f"{page_id}.json").write_text("{}")
+        self.manager.sprite_sheets[page_id] = {"id": page_id, "meta": {}}
+        self.manager.sprite_to_sheet[f"sprite_{page_id}"] = {"sheet_id": page_id, "frame": {}}
+        return {"id": page_id, "image": f"{page_id}.png", "json": f"{page_id}.json"}
+
+    def _esiste(self, page_id):
+        return os.path.exists(os.path.join(self.base, f"{page_id}.png"))
+
+    def test_rimuove_solo_le_pagine_registrate(self):
+        """Le pagine in eccesso spariscono, gli sheet con nomi simili restano"""
+        precedenti = self.manager._pagine_registrate("eroi", os.path.join(self.base, "eroi.png"),
+                                                     os.path.join(self.base, "eroi.json"))
+        self.assertEqual(precedenti, self.pagine)
+        rimosse = self.manager._rimuovi_pagine_obsolete("eroi", precedenti, self.pagine[:2], self.base)
+
+        self.assertEqual(rimosse, ["eroi-2"])
+        self.assertFalse(self._esiste("eroi-2"))
+        self.assertFalse(os.path.exists(os.path.join(self.base, "eroi-2.json")))
+        for page_id in ("eroi", "eroi-1", "eroi-3", "mostri-1"):
+            self.assertTrue(self._esiste(page_id))
+        self.assertEqual(set(self.manager.sprite_sheets), {"eroi", "eroi-1", "eroi-3", "mostri", "mostri-1"})
+        self.assertIsNone(self.manager.get_sprite_info("sprite_eroi-2"))
+
+    def test_sheet_a_pagina_singola(self):
+        """Uno sheet di una pagina non considera sue le pagine "<id>-N" di altri sheet"""
+        precedenti = self.manager._pagine_registrate("mostri", os.path.join(self.base, "mostri.png"),
+                                                     os.path.join(self.base, "mostri.json"))
+        self.assertEqual([pagina["id"] for pagina in precedenti], ["mostri"])
+        self.assertEqual(self.manager._rimuovi_pagine_obsolete("mostri", precedenti, precedenti, self.base), [])
+        self.assertTrue(self._esiste("mostri-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Test unitari per il profiler dell'avvio del server.
+"""
+
+import time
+import unittest
+
+from server.utils.startup_profiler import StartupProfiler, format_import_tree, parse_importtime
+
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:      2300 |       2420 |   json
+import time:      9000 |       9000 |   util.pesante
+import time:      1500 |      12920 | server.app
+"""
+
+
+class TestStartupProfiler(unittest.TestCase):
+    """Test per le fasi di avvio e l'albero degli import"""
+
+    def test_fasi_misurate(self):
+        """Ogni fase viene registrata con la propria durata, anche se solleva"""
+        profiler = StartupProfiler()
+        with profiler.phase("create_app"):
+            time.sleep(0.01)
+        with self.assertRaises(ValueError):
+            with profiler.phase("socketio"):
+                raise ValueError()
+        nomi = [nome for nome, _ in profiler.phases]
+        self.assertEqual(nomi, ["create_app", "socketio"])
+        self.assertGreaterEqual(profiler.phases[0][1], 0.01)
+        self.assertGreaterEqual(profiler.as_dict()["total"], profiler.phases[0][1])
+
+    def test_albero_import(self):
+        """L'output di importtime diventa un albero dal modulo più esterno, con soglia"""
+        voci = parse_importtime(IMPORTTIME)
+        self.assertEqual(voci[0], (2, 120, 120, "_json"))
+        self.assertEqual(voci[-1], (0, 1500, 12920, "server.app"))
+
+        righe = format_import_tree(voci, soglia_ms=1.0)
+        moduli = [riga.split("ms")[-1].rstrip() for riga in righe]
+        self.assertEqual(moduli, ["  server.app", "    util.pesante", "    json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
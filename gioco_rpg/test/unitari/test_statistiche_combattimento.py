@@ -0,0 +1,88 @@
+"""
+Test unitari per le statistiche di combattimento derivate.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import core.events as Events
+from core.event_bus import EventBus
+from states.combattimento.azioni import AzioniCombattimento
+from states.combattimento.statistiche import CacheStatistiche, calcola_statistiche
+
+
+class _Mondo:
+    def __init__(self, *entita):
+        self.entita = {e.id: e for e in entita}
+
+    def get_entity(self, entita_id):
+        return self.entita.get(entita_id)
+
+
+def _guerriero(**kwargs):
+    valori = dict(id="g1", name="Eroe", modificatore_forza=3, modificatore_destrezza=1,
+                  modificatore_costituzione=2, modificatore_intelligenza=0, modificatore_saggezza=0,
+                  modificatore_carisma=-1, bonus_competenza=2, classe="guerriero", arma=None, armatura=None)
+    valori.update(kwargs)
+    return SimpleNamespace(**valori)
+
+
+class TestStatisticheCombattimento(unittest.TestCase):
+    """Test per il calcolo e l'invalidazione delle statistiche"""
+
+    def test_modificatori_e_punteggi(self):
+        statistiche = calcola_statistiche(_guerriero())
+        self.assertEqual(statistiche.bonus_attacco, 3)
+        self.assertEqual(statistiche.bonus_danno, 3)
+        self.assertEqual(statistiche.classe_armatura, 11)
+        self.assertEqual(statistiche.mod_iniziativa, 1)
+        self.assertEqual(statistiche.tiri_salvezza["forza"], 5)
+        self.assertEqual(statistiche.tiri_salvezza["destrezza"], 1)
+
+        # Entità ECS con punteggi grezzi e armatura descritta da una stringa
+        ecs = SimpleNamespace(id="e1", forza=8, destrezza=14, armatura="Cuoio")
+        statistiche = calcola_statistiche(ecs)
+        self.assertEqual((statistiche.bonus_attacco, statistiche.bonus_danno), (-1, 0))
+        self.assertEqual(statistiche.classe_armatura, 14)
+        self.assertEqual(statistiche.dado_danno, 8)
+
+    def test_equipaggiamento(self):
+        giocatore = _guerriero(arma={"danno_base": 10}, armatura={"valore_ca": 16})
+        giocatore.get_danno_arma = lambda: giocatore.arma["danno_base"]
+        giocatore.get_classe_armatura = lambda: giocatore.armatura["valore_ca"]
+        statistiche = calcola_statistiche(giocatore)
+        self.assertEqual(statistiche.dado_danno, 10)
+        self.assertEqual(statistiche.classe_armatura, 16)
+
+    def test_invalidazione_su_evento(self):
+        event_bus = EventBus.get_instance()
+        giocatore = _guerriero()
+        cache = CacheStatistiche()
+        cache.prepara(_Mondo(giocatore), ["g1"])
+        cache.ascolta_eventi(event_bus)
+        try:
+            self.assertIs(cache.get(giocatore), cache.get(giocatore))
+            giocatore.modificatore_forza = 4
+            self.assertEqual(cache.get(giocatore).bonus_attacco, 3)
+            event_bus.emit_immediate(Events.ENTITY_STATS_CHANGED, entity_id="g1", motivo="effetto")
+            self.assertEqual(cache.get(giocatore).bonus_attacco, 4)
+        finally:
+            cache.chiudi()
+
+    def test_attacco_usa_statistiche(self):
+        giocatore = _guerriero()
+        bersaglio = SimpleNamespace(id="m1", name="Orco", forza=16, destrezza=10, armatura="Scaglie", hp=20)
+        state = SimpleNamespace(turno_corrente="g1", world=_Mondo(giocatore, bersaglio), messaggi=[])
+        azioni = AzioniCombattimento(state)
+        # CA dell'orco 12: 9 + 3 colpisce, il danno è 5 (d8) + 3
+        with patch("util.dado.Dado.tira", side_effect=[9, 5]):
+            risultato = azioni.esegui_attacco("g1", "m1")
+        self.assertTrue(risultato["colpisce"])
+        self.assertEqual(risultato["danno"], 8)
+        self.assertEqual(bersaglio.hp, 12)
+        state.cache_statistiche.chiudi()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script di build che compila i file JSON di data/ (classi, oggetti, mostri,
+NPC e conversazioni, mappe) nell'archivio indicizzato letto dal DataManager
+tramite mmap (data/.compiled/game_data.store).
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# Aggiungi la directory principale al path di sistema per importare i moduli del gioco
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from util.data_store import compile_data_store, COMPILED_DIRECTORIES
+
+# Configura il logger
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('compila_dati')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila i dati di gioco in un archivio indicizzato")
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data')),
+        help="Directory dei dati (default: data/)"
+    )
+    parser.add_argument("--output", help="Percorso dell'archivio (default: data/.compiled/game_data.store)")
+    parser.add_argument(
+        "--dirs",
+        nargs="+",
+        default=list(COMPILED_DIRECTORIES),
+        help="Sottodirectory da includere"
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data_dir):
+        logger.error(f"Directory non trovata: {args.data_dir}")
+        return 1
+
+    compile_data_store(args.data_dir, args.output, args.dirs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
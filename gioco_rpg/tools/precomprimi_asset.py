@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script di build che genera le varianti precompresse (.gz e .br) dei file JSON
+degli asset (metadati degli sprite sheet, mappe, animazioni), servite dal
+server ai client che le accettano.
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# Aggiungi la directory principale al path di sistema per importare i moduli del gioco
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from util.asset_precompress import precompress_directory
+
+# Configura il logger
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('precomprimi_asset')
+
+
+def main():
+    radice = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    parser = argparse.ArgumentParser(description="Genera le varianti .gz/.br dei file JSON degli asset")
+    parser.add_argument(
+        "directory",
+        nargs="*",
+        default=[os.path.join(radice, 'assets'), os.path.join(radice, 'data', 'mappe')],
+        help="Directory da precomprimere (default: assets/ e data/mappe/)"
+    )
+    args = parser.parse_args()
+
+    esito = 0
+    for directory in args.directory:
+        if not os.path.isdir(directory):
+            logger.error(f"Directory non trovata: {directory}")
+            esito = 1
+            continue
+        precompress_directory(directory)
+    return esito
+
+if __name__ == "__main__":
+    sys.exit(main())
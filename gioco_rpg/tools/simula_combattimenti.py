@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Simula la matrice degli scontri classe × mostro per bilanciare la
+difficoltà dei mostri senza giocare.
+
+Per ogni coppia stampa la percentuale di vittorie del personaggio, la
+durata media dello scontro in round (TTK) e i danni subiti; con --json
+scrive i risultati completi, istogrammi compresi.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+# Aggiungi la directory principale al path di sistema per importare i moduli del gioco
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from util.simulatore_combattimento import DEFAULT_INCONTRI, carica_definizioni, simula_matrice
+
+# Configura il logger
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('simula_combattimenti')
+
+# Ordine di stampa delle difficoltà
+ORDINE_DIFFICOLTA = {"facile": 0, "medio": 1, "difficile": 2}
+
+
+def stampa_tabella(risultati):
+    """Stampa vittorie, TTK e danni subiti per mostro (righe) e classe (colonne)"""
+    classi = list(dict.fromkeys(r["classe"] for r in risultati))
+    per_mostro = {}
+    for risultato in risultati:
+        per_mostro.setdefault(risultato["mostro"], []).append(risultato)
+
+    print(f"{'mostro':<16}{'difficoltà':<12}" + "".join(f"{classe:>24}" for classe in classi))
+    print(f"{'':<28}" + "".join(f"{'vitt.  ttk  danni p90':>24}" for _ in classi))
+    mostri = sorted(per_mostro, key=lambda m: (ORDINE_DIFFICOLTA.get(per_mostro[m][0]["difficolta"], 9), m))
+    for mostro in mostri:
+        celle = {r["classe"]: r for r in per_mostro[mostro]}
+        riga = f"{mostro:<16}{str(per_mostro[mostro][0]['difficolta']):<12}"
+        for classe in classi:
+            r = celle[classe]
+            riga += f"{r['vittorie'] * 100:>10.1f}% {r['ttk']['media']:>5.1f} {r['danni_subiti']['p90']:>6}"
+        print(riga)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula gli scontri classe × mostro")
+    parser.add_argument("--incontri", type=int, default=DEFAULT_INCONTRI,
+                        help=f"Incontri simulati per scontro (default: {DEFAULT_INCONTRI})")
+    parser.add_argument("--livello", type=int, default=1, help="Livello dei personaggi (default: 1)")
+    parser.add_argument("--seed", help="Seme per risultati riproducibili")
+    parser.add_argument("--processi", type=int, help="Processi da usare (default: numero di CPU)")
+    parser.add_argument("--classi", nargs="+", help="Limita la simulazione a queste classi")
+    parser.add_argument("--mostri", nargs="+", help="Limita la simulazione a questi mostri")
+    parser.add_argument("--json", help="Scrive i risultati completi in questo file")
+    args = parser.parse_args()
+
+    classi, mostri = carica_definizioni()
+    if args.classi:
+        classi = {nome: classi[nome] for nome in args.classi if nome in classi}
+    if args.mostri:
+        mostri = {nome: mostri[nome] for nome in args.mostri if nome in mostri}
+    if not classi or not mostri:
+        logger.error("Nessuna classe o nessun mostro da simulare")
+        return 1
+
+    inizio = time.perf_counter()
+    risultati = simula_matrice(classi, mostri, incontri=args.incontri, seed=args.seed,
+                               livello=args.livello, processi=args.processi)
+    durata = time.perf_counter() - inizio
+
+    stampa_tabella(risultati)
+    print(f"\n{len(risultati)} scontri × {args.incontri} incontri in {durata:.2f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(risultati, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Comando validate-data: valida tutti i file di data/ con gli schemi JSON
+usando i validatori compilati.
+
+Con --benchmark confronta i tempi dei validatori compilati con quelli di
+jsonschema.validate (se installato); con --genera-schemi crea gli schemi
+mancanti a partire dai dati esistenti.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Aggiungi la directory principale al path di sistema per importare i moduli del gioco
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from util.data_manager import get_data_manager
+from util.json_validator import SCHEMAS_DIR, generate_schema_from_data, get_validator, load_schema
+
+# Configura il logger
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('valida_dati')
+
+
+def _campioni(data_manager):
+    """Restituisce le coppie (tipo di entità, elemento) di tutti i file di dati"""
+    campioni = []
+    for data_type, entity_type in data_manager._entity_mapping.items():
+        if not (SCHEMAS_DIR / f"{entity_type}_schema.json").exists():
+            continue
+        for file_name in data_manager.get_all_data_files(data_type):
+            data = data_manager.load_data(data_type, file_name, validate=False)
+            elementi = data if isinstance(data, list) else [data]
+            campioni.extend((entity_type, elemento) for elemento in elementi)
+    return campioni
+
+
+def genera_schemi_mancanti(data_manager):
+    """Genera gli schemi mancanti usando il primo elemento dei dati come esempio"""
+    generati = 0
+    for data_type, entity_type in data_manager._entity_mapping.items():
+        if (SCHEMAS_DIR / f"{entity_type}_schema.json").exists():
+            continue
+        for file_name in data_manager.get_all_data_files(data_type):
+            data = data_manager.load_data(data_type, file_name, validate=False)
+            if isinstance(data, dict) and data:
+                esempio = next(iter(data.values()))
+            elif isinstance(data, list) and data:
+                esempio = data[0]
+            else:
+                continue
+            if generate_schema_from_data(esempio, entity_type):
+                generati += 1
+            break
+    return generati
+
+
+def benchmark(data_manager, ripetizioni):
+    """Confronta i validatori compilati con jsonschema.validate sugli stessi dati"""
+    campioni = _campioni(data_manager)
+    if not campioni:
+        logger.warning("Nessun dato da validare per il benchmark")
+        return
+
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        for entity_type, elemento in campioni:
+            get_validator(entity_type)(elemento)
+    compilati = time.perf_counter() - inizio
+    logger.info(f"Validatori compilati: {len(campioni) * ripetizioni} validazioni in {compilati:.4f}s")
+
+    try:
+        import jsonschema
+    except ImportError:
+        logger.info("jsonschema non installato: confronto non disponibile")
+        return
+
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        for entity_type, elemento in campioni:
+            try:
+                jsonschema.validate(elemento, load_schema(entity_type))
+            except jsonschema.ValidationError:
+                pass
+    generici = time.perf_counter() - inizio
+    logger.info(f"jsonschema.validate: {len(campioni) * ripetizioni} validazioni in {generici:.4f}s")
+    logger.info(f"Speedup dei validatori compilati: {generici / max(compilati, 1e-9):.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida i dati di gioco con gli schemi JSON")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Confronta i validatori compilati con jsonschema")
+    parser.add_argument("--ripetizioni", type=int, default=100,
+                        help="Ripetizioni per il benchmark (default: 100)")
+    parser.add_argument("--genera-schemi", action="store_true",
+                        help="Genera gli schemi mancanti dai dati esistenti")
+    args = parser.parse_args()
+
+    data_manager = get_data_manager()
+
+    if args.genera_schemi:
+        logger.info(f"Schemi generati: {genera_schemi_mancanti(data_manager)}")
+
+    errori = data_manager.validate_all()
+    for file_name, messaggi in sorted(errori.items()):
+        for messaggio in messaggi:
+            logger.warning(f"{file_name}: {messaggio}")
+
+    if args.benchmark:
+        benchmark(data_manager, args.ripetizioni)
+
+    return 1 if errori else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
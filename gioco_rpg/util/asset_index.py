@@ -0,0 +1,232 @@
+"""
+Indice incrementale degli asset di gioco.
+
+Mantiene su disco, per ogni file di asset, dimensione, mtime e hash del
+contenuto, oltre all'mtime di ogni directory scansionata. Ad ogni avvio
+vengono rilette (listdir) solo le directory il cui mtime è cambiato e
+ricalcolato l'hash solo dei file la cui dimensione o mtime sono cambiati;
+gli hash vengono calcolati in parallelo con un pool di thread.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Versione del formato del file di indice
+INDEX_VERSION = 1
+
+# Dimensione dei blocchi letti durante il calcolo dell'hash
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """
+    Calcola l'hash del contenuto di un file.
+
+    Args:
+        path (str): Percorso assoluto del file
+
+    Returns:
+        str: Digest esadecimale (BLAKE2b a 128 bit)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AssetIndex:
+    """
+    Indice persistente (path, size, mtime, hash) dei file di asset.
+    """
+
+    def __init__(self, index_path, max_workers=None):
+        """
+        Args:
+            index_path (str): Percorso del file JSON dell'indice
+            max_workers (int, optional): Thread usati per il calcolo degli hash
+        """
+        self.index_path = index_path
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) + 2)
+        self.directories = {}  # percorso relativo -> mtime_ns
+        self.files = {}  # percorso relativo -> {"size", "mtime_ns", "hash"}
+        self.dirty = False
+
+    def load(self):
+        """
+        Carica l'indice da disco.
+
+        Returns:
+            bool: True se l'indice è stato caricato, False se assente o non valido
+        """
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                dati = json.load(f)
+            if dati.get("version") != INDEX_VERSION:
+                logger.info("Formato dell'indice degli asset obsoleto, verrà ricostruito")
+                return False
+            self.directories = dati.get("directories", {})
+            self.files = dati.get("files", {})
+            self.dirty = False
+            return True
+        except Exception as e:
+            logger.warning(f"Indice degli asset {self.index_path} non leggibile, verrà ricostruito: {e}")
+            self.directories = {}
+            self.files = {}
+            return False
+
+    def save(self):
+        """
+        Salva l'indice su disco se è stato modificato.
+
+        Returns:
+            bool: True se l'indice è stato scritto
+        """
+        if not self.dirty:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            temporaneo = f"{self.index_path}.tmp"
+            with open(temporaneo, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": INDEX_VERSION,
+                    "directories": self.directories,
+                    "files": self.files
+                }, f, separators=(",", ":"))
+            os.replace(temporaneo, self.index_path)
+            self.dirty = False
+            return True
+        except Exception as e:
+            logger.error(f"Errore nel salvataggio dell'indice degli asset: {e}")
+            return False
+
+    def update(self, base_path, directories):
+        """
+        Aggiorna l'indice per le directory indicate.
+
+        Args:
+            base_path (str): Directory base degli asset (i percorsi sono relativi ad essa)
+            directories (list): Directory assolute da indicizzare (non ricorsivo)
+
+        Returns:
+            dict: Per ogni directory assoluta, un dizionario con:
+                files: percorsi relativi dei file presenti
+                changed: percorsi relativi dei file nuovi o modificati
+                removed: percorsi relativi dei file rimossi
+        """
+        risultati = {}
+        da_calcolare = []
+
+        for directory in directories:
+            rel_dir = self._relativo(base_path, directory)
+            conosciuti = [p for p in self.files if os.path.dirname(p) == rel_dir]
+            risultato = {"files": [], "changed": [], "removed": []}
+            risultati[directory] = risultato
+
+            try:
+                mtime_dir = os.stat(directory).st_mtime_ns
+            except OSError:
+                # Directory sparita: tutti i file noti sono stati rimossi
+                risultato["removed"] = conosciuti
+                self._rimuovi(conosciuti)
+                if self.directories.pop(rel_dir, None) is not None:
+                    self.dirty = True
+                continue
+
+            if self.directories.get(rel_dir) == mtime_dir:
+                # Nessun file aggiunto/rimosso: basta verificare i file noti
+                candidati = conosciuti
+            else:
+                candidati = []
+                with os.scandir(directory) as voci:
+                    for voce in voci:
+                        if voce.is_file():
+                            candidati.append(self._relativo(base_path, voce.path))
+                self.directories[rel_dir] = mtime_dir
+                self.dirty = True
+
+            presenti = set()
+            for rel_path in sorted(candidati):
+                abs_path = os.path.join(base_path, rel_path)
+                try:
+                    stat = os.stat(abs_path)
+                except OSError:
+                    continue
+                presenti.add(rel_path)
+                voce = self.files.get(rel_path)
+                if voce is None or voce["size"] != stat.st_size or voce["mtime_ns"] != stat.st_mtime_ns:
+                    da_calcolare.append((rel_path, abs_path, stat, risultato))
+
+            risultato["files"] = sorted(presenti)
+            risultato["removed"] = [p for p in conosciuti if p not in presenti]
+            self._rimuovi(risultato["removed"])
+
+        if da_calcolare:
+            self._calcola_hash(da_calcolare)
+
+        return risultati
+
+    def get_hash(self, rel_path):
+        """
+        Restituisce l'hash indicizzato di un file.
+
+        Args:
+            rel_path (str): Percorso relativo alla directory base degli asset
+
+        Returns:
+            str: Hash del contenuto o None se il file non è indicizzato
+        """
+        voce = self.files.get(rel_path)
+        return voce["hash"] if voce else None
+
+    def _calcola_hash(self, da_calcolare):
+        """Calcola in parallelo gli hash dei file nuovi o modificati"""
+        percorsi = [abs_path for _, abs_path, _, _ in da_calcolare]
+        if len(percorsi) == 1:
+            digests = [self._hash_sicuro(percorsi[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                digests = list(executor.map(self._hash_sicuro, percorsi))
+
+        for (rel_path, _, stat, risultato), digest in zip(da_calcolare, digests):
+            if digest is None:
+                continue
+            precedente = self.files.get(rel_path)
+            self.files[rel_path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "hash": digest
+            }
+            self.dirty = True
+            # Un file "toccato" ma con lo stesso contenuto non è una modifica
+            if precedente is None or precedente["hash"] != digest:
+                risultato["changed"].append(rel_path)
+        logger.debug(f"Calcolati {len(percorsi)} hash di asset")
+
+    @staticmethod
+    def _hash_sicuro(path):
+        try:
+            return hash_file(path)
+        except OSError as e:
+            logger.warning(f"Impossibile leggere l'asset {path}: {e}")
+            return None
+
+    def _rimuovi(self, rel_paths):
+        for rel_path in rel_paths:
+            if self.files.pop(rel_path, None) is not None:
+                self.dirty = True
+
+    @staticmethod
+    def _relativo(base_path, path):
+        try:
+            return os.path.relpath(path, base_path).replace("\\", "/")
+        except ValueError:
+            # Percorsi su drive diversi: usa il percorso completo
+            return path.replace("\\", "/")
@@ -14,6 +14,7 @@ from typing import Dict, List, Optional, Tuple, Union, Any
 
 # Importa il gestore degli sprite sheet
 from util.sprite_sheet_manager import get_sprite_sheet_manager
+from util.asset_index import AssetIndex
 
 logger = logging.getLogger(__name__)
 
@@ -121,6 +122,12 @@ class AssetManager:
         # Percorso del manifest
         self.manifest_path = os.path.join(self.base_path, "manifest.json")
         
+        # Indice incrementale (size, mtime, hash) usato da update_all
+        self.asset_index = AssetIndex(os.path.join(self.base_path, ".asset_index.json"))
+        
+        # True se i registri sono cambiati dall'ultimo salvataggio del manifest
+        self._manifest_dirty = False
+        
         # Inizializza il manifest
         self.manifest = {
             "version": "1.0.0",
@@ -151,8 +158,9 @@ class AssetManager:
     def _cleanup(self):
         """Pulisce le risorse aperte."""
         try:
-            # Salva il manifest prima di chiudere
-            self.save_manifest()
+            # Salva il manifest prima di chiudere, solo se qualcosa è cambiato
+            if self._manifest_dirty:
+                self.save_manifest()
             
             # Rimuovi questo manager dal registro in modo sicuro
             if hasattr(AssetManager, '_open_managers'):
@@ -233,6 +241,7 @@ class AssetManager:
             with open(self.manifest_path, "w", encoding="utf-8") as f:
                 json.dump(self.manifest, f, indent=2, ensure_ascii=False)
                 
+            self._manifest_dirty = False
             logger.info(f"Manifest salvato con successo in {self.manifest_path}")
             return True
             
@@ -258,20 +267,8 @@ class AssetManager:
         """
         try:
             # Trova il registro appropriato
-            registry = None
-            if asset_type == "sprite":
-                registry = self.sprites
-            elif asset_type == "tile":
-                registry = self.tiles
-            elif asset_type == "ui":
-                registry = self.ui_elements
-            elif asset_type == "animation":
-                registry = self.animations
-            elif asset_type == "tileset":
-                registry = self.tilesets
-            elif asset_type == "background":
-                registry = self.backgrounds
-            else:
+            registry = self._get_registry(asset_type)
+            if registry is None:
                 logger.error(f"Tipo di asset non supportato: {asset_type}")
                 return False
             
@@ -324,6 +321,7 @@ class AssetManager:
             
             # Registra l'asset
             registry[asset_id] = asset_data
+            self._manifest_dirty = True
             
             logger.debug(f"{asset_type.capitalize()} registrato: {asset_id}")
             
@@ -334,6 +332,25 @@ class AssetManager:
             logger.debug(traceback.format_exc())
             return False
     
+    def _get_registry(self, asset_type):
+        """
+        Restituisce il registro corrispondente a un tipo di asset.
+        
+        Args:
+            asset_type (str): Tipo di asset (sprite, tile, ui, ecc.)
+            
+        Returns:
+            dict: Registro degli asset o None se il tipo non è supportato
+        """
+        return {
+            "sprite": self.sprites,
+            "tile": self.tiles,
+            "ui": self.ui_elements,
+            "animation": self.animations,
+            "tileset": self.tilesets,
+            "background": self.backgrounds
+        }.get(asset_type)
+    
     def register_sprite(self, sprite_id, name, file_path, dimensions=None, offset=None, tags=None):
         """
         Registra uno sprite nel registro degli asset.
@@ -544,24 +561,7 @@ class AssetManager:
                     # Se i percorsi sono su drive diversi, usa il percorso completo
                     relative_path = full_file_path.replace("\\", "/")
 
-                # Determina quale funzione di registrazione chiamare
-                registered_successfully = False
-                if asset_type == "sprite":
-                    registered_successfully = self.register_sprite(sprite_id=asset_id, name=name, file_path=relative_path)
-                elif asset_type == "tile":
-                    registered_successfully = self.register_tile(tile_id=asset_id, name=name, file_path=relative_path)
-                elif asset_type == "ui": # Assumendo che 'ui' sia il tipo corretto per ui_elements
-                    registered_successfully = self.register_ui_element(ui_id=asset_id, name=name, file_path=relative_path)
-                elif asset_type == "background":
-                    registered_successfully = self.register_background(background_id=asset_id, name=name, file_path=relative_path)
-                elif asset_type == "animation":
-                    # Assumiamo esista un metodo register_animation
-                    registered_successfully = self.register_animation(animation_id=asset_id, name=name, file_path=relative_path)
-                elif asset_type == "tileset":
-                    # Assumiamo esista un metodo register_tileset
-                    registered_successfully = self.register_tileset(tileset_id=asset_id, name=name, file_path=relative_path)
-                else:
-                    logger.warning(f"Tipo asset '{asset_type}' non gestito durante scansione specifica per file {filename}")
+                registered_successfully = self._register_scanned_asset(asset_type, asset_id, relative_path)
 
                 if registered_successfully:
                     assets_found[asset_id] = {"name": name, "path": relative_path}
@@ -570,46 +570,103 @@ class AssetManager:
 
         return assets_found
     
+    def _register_scanned_asset(self, asset_type, asset_id, relative_path):
+        """
+        Registra un file trovato durante una scansione con i metadati di default.
+        
+        Args:
+            asset_type (str): Tipo di asset ('sprite', 'tile', ecc.)
+            asset_id (str): ID dell'asset (nome del file senza estensione)
+            relative_path (str): Percorso relativo alla directory base degli asset
+            
+        Returns:
+            bool: True se l'asset è stato registrato con successo
+        """
+        name = asset_id # Default name è l'ID
+        if asset_type == "sprite":
+            return self.register_sprite(sprite_id=asset_id, name=name, file_path=relative_path)
+        elif asset_type == "tile":
+            return self.register_tile(tile_id=asset_id, name=name, file_path=relative_path)
+        elif asset_type == "ui": # Assumendo che 'ui' sia il tipo corretto per ui_elements
+            return self.register_ui_element(ui_id=asset_id, name=name, file_path=relative_path)
+        elif asset_type == "background":
+            return self.register_background(background_id=asset_id, name=name, file_path=relative_path)
+        elif asset_type == "animation":
+            return self.register_animation(animation_id=asset_id, name=name, file_path=relative_path)
+        elif asset_type == "tileset":
+            return self.register_tileset(tileset_id=asset_id, name=name, file_path=relative_path)
+        logger.warning(f"Tipo asset '{asset_type}' non gestito durante scansione specifica per file {relative_path}")
+        return False
+    
     def update_all(self):
         """
-        Scansiona tutte le directory degli asset e aggiorna il manifest.
+        Aggiorna i registri degli asset in modo incrementale e salva il manifest
+        solo se qualcosa è cambiato.
+        
+        L'indice persistente (size, mtime, hash) permette di rileggere solo le
+        directory modificate e di ricalcolare l'hash solo dei file cambiati:
+        senza modifiche l'avvio non legge il contenuto di alcun file.
+        
+        Returns:
+            bool: True se l'aggiornamento è stato completato
         """
-        logger.info(f"Avvio scansione di tutti gli asset da {self.base_path}")
-        all_assets_found = {}
-        has_changes = False
+        start_time = time.time()
+        logger.info(f"Avvio aggiornamento incrementale degli asset da {self.base_path}")
+        
+        if not self.asset_index.files:
+            self.asset_index.load()
         
-        # Scansiona le directory specifiche per ogni tipo di asset
-        asset_directories = {
-            "sprites": os.path.join(self.base_path, "sprites"),
-            "tiles": os.path.join(self.base_path, "tiles"),
-            "animations": os.path.join(self.base_path, "animations"),
-            "tilesets": os.path.join(self.base_path, "tilesets"),
-            "ui_elements": os.path.join(self.base_path, "ui"),
-            "backgrounds": os.path.join(self.base_path, "maps") # Sfondo mappe in /maps ? verificare
+        directories = {
+            os.path.join(self.base_path, asset_folder_name): asset_type
+            for asset_folder_name, asset_type in self.ASSET_TYPES.items()
         }
+        for directory, asset_type in directories.items():
+            if not os.path.isdir(directory):
+                logger.warning(f"Directory non trovata per tipo {asset_type}: {directory}")
         
-        for asset_folder_name, asset_type in self.ASSET_TYPES.items():
-             directory_to_scan = os.path.join(self.base_path, asset_folder_name)
-             if os.path.isdir(directory_to_scan):
-                 try:
-                     logger.debug(f"Scansione directory {directory_to_scan} per tipo {asset_type}")
-                     found_in_dir = self._scan_assets_in_directory(directory_to_scan, asset_type)
-                     # Unisci i risultati (questo sovrascriverà eventuali ID duplicati tra tipi diversi, 
-                     # ma gli ID dovrebbero essere univoci globalmente o per tipo a seconda del design)
-                     all_assets_found.update(found_in_dir) 
-                     # Verifica se ci sono stati cambiamenti reali (più complesso, per ora salva sempre)
-                     has_changes = True # Semplificato: assume sempre cambiamenti se la scansione avviene
-                 except Exception as e:
-                      logger.error(f"Errore durante la scansione di {directory_to_scan} per {asset_type}: {e}", exc_info=True)
-             else:
-                 logger.warning(f"Directory non trovata per tipo {asset_type}: {directory_to_scan}")
-
-        # Se sono stati trovati cambiamenti (semplificato a sempre vero se scansione eseguita)
-        if has_changes:
-             logger.info("Rilevati cambiamenti negli asset, salvataggio manifest...")
-             self.save_manifest()
+        try:
+            results = self.asset_index.update(self.base_path, list(directories))
+        except Exception as e:
+            logger.error(f"Errore durante l'indicizzazione degli asset: {e}", exc_info=True)
+            return False
+        
+        has_changes = False
+        for directory, asset_type in directories.items():
+            result = results[directory]
+            registry = self._get_registry(asset_type)
+            
+            # Rimuovi gli asset i cui file non esistono più
+            removed = set(result["removed"])
+            if removed:
+                for asset_id in [aid for aid, info in registry.items() if info.get("file") in removed]:
+                    del registry[asset_id]
+                    has_changes = True
+                logger.info(f"Rimossi {len(removed)} asset di tipo {asset_type} non più presenti")
+            
+            # Registra solo i file nuovi, modificati o mancanti dal manifest
+            changed = set(result["changed"])
+            for relative_path in result["files"]:
+                asset_id = Path(relative_path).stem # Usa nome file senza estensione come ID
+                content_hash = self.asset_index.get_hash(relative_path)
+                current = registry.get(asset_id)
+                if (relative_path not in changed and current is not None
+                        and current.get("file") == relative_path
+                        and current.get("hash") == content_hash):
+                    continue
+                if self._register_scanned_asset(asset_type, asset_id, relative_path):
+                    registry[asset_id]["hash"] = content_hash
+                    registry[asset_id]["size"] = self.asset_index.files[relative_path]["size"]
+                    has_changes = True
+        
+        self.asset_index.save()
+        
+        elapsed_ms = (time.time() - start_time) * 1000
+        if has_changes or self._manifest_dirty:
+            logger.info(f"Rilevati cambiamenti negli asset, salvataggio manifest ({elapsed_ms:.1f} ms)")
+            self.save_manifest()
         else:
-             logger.info("Nessun cambiamento rilevato negli asset.")
+            logger.info(f"Nessun cambiamento rilevato negli asset ({elapsed_ms:.1f} ms)")
+        return True
 
     def get_asset_info(self, asset_type: str, asset_id: str) -> Optional[Dict]:
         """
@@ -0,0 +1,97 @@
+"""
+Precompressione degli asset testuali.
+
+Genera accanto ai file JSON degli asset (metadati degli sprite sheet, mappe,
+animazioni) le varianti ".gz" e, se il modulo brotli è installato, ".br".
+Il server le invia direttamente ai client che le accettano, senza
+comprimere a ogni richiesta. Pensato per essere eseguito in fase di build
+(vedi tools/precomprimi_asset.py).
+"""
+
+import gzip
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Estensioni dei file per cui generare le varianti compresse
+PRECOMPRESS_EXTENSIONS = (".json",)
+
+# Sotto questa dimensione la compressione non porta benefici apprezzabili
+MIN_PRECOMPRESS_SIZE = 512
+
+try:
+    import brotli
+except ImportError:  # Dipendenza opzionale: senza brotli si generano solo le varianti gzip
+    brotli = None
+
+
+def _scrivi_se_obsoleto(destinazione, sorgente_mtime, comprimi, dati):
+    """Scrive la variante compressa solo se manca o è più vecchia del file originale"""
+    if os.path.exists(destinazione) and os.stat(destinazione).st_mtime_ns >= sorgente_mtime:
+        return False
+    compressi = comprimi(dati)
+    if len(compressi) >= len(dati):
+        # Variante inutile: rimuovi quella eventualmente rimasta da una build precedente
+        if os.path.exists(destinazione):
+            os.remove(destinazione)
+        return False
+    temporaneo = f"{destinazione}.tmp"
+    with open(temporaneo, "wb") as f:
+        f.write(compressi)
+    os.replace(temporaneo, destinazione)
+    return True
+
+
+def precompress_file(path):
+    """
+    Genera le varianti compresse di un singolo file.
+
+    Args:
+        path (str): Percorso del file da comprimere
+
+    Returns:
+        int: Numero di varianti scritte
+    """
+    stat = os.stat(path)
+    if stat.st_size < MIN_PRECOMPRESS_SIZE:
+        return 0
+    with open(path, "rb") as f:
+        dati = f.read()
+
+    scritte = 0
+    # mtime=0 rende l'output deterministico tra una build e l'altra
+    if _scrivi_se_obsoleto(f"{path}.gz", stat.st_mtime_ns,
+                           lambda d: gzip.compress(d, compresslevel=9, mtime=0), dati):
+        scritte += 1
+    if brotli is not None and _scrivi_se_obsoleto(f"{path}.br", stat.st_mtime_ns,
+                                                  lambda d: brotli.compress(d, quality=11), dati):
+        scritte += 1
+    return scritte
+
+
+def precompress_directory(directory, extensions=PRECOMPRESS_EXTENSIONS):
+    """
+    Genera le varianti compresse di tutti i file indicati in una directory (ricorsivo).
+
+    Args:
+        directory (str): Directory da elaborare
+        extensions (tuple): Estensioni dei file da comprimere
+
+    Returns:
+        int: Numero di varianti scritte
+    """
+    scritte = 0
+    for root, _, files in os.walk(directory):
+        for nome in files:
+            if not nome.lower().endswith(extensions):
+                continue
+            percorso = os.path.join(root, nome)
+            try:
+                scritte += precompress_file(percorso)
+            except OSError as e:
+                logger.error(f"Errore nella precompressione di {percorso}: {e}")
+    if brotli is None:
+        logger.info("Modulo brotli non installato: generate solo le varianti gzip")
+    logger.info(f"Precompressione di {directory} completata: {scritte} varianti scritte")
+    return scritte
@@ -0,0 +1,221 @@
+"""
+Atlas Packer
+Algoritmi per comporre gli sprite sheet: packing MaxRects su più pagine e
+decodifica/ritaglio degli sprite in parallelo.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Pixel di spazio lasciati tra uno sprite e l'altro per evitare il bleeding dei bordi
+ATLAS_PADDING = 1
+
+# Sotto questa soglia la decodifica in un pool di processi costa più di quanto faccia risparmiare
+MIN_SPRITES_FOR_POOL = 32
+
+
+class MaxRectsBin:
+    """
+    Pagina di un atlas gestita con l'algoritmo MaxRects (euristica Best Short Side Fit).
+
+    Mantiene la lista dei rettangoli liberi massimali: ogni inserimento sceglie
+    il rettangolo libero che lascia il lato residuo più corto, poi divide tutti
+    i rettangoli liberi che intersecano lo sprite posizionato.
+    """
+
+    def __init__(self, width, height):
+        """
+        Args:
+            width (int): Larghezza della pagina
+            height (int): Altezza della pagina
+        """
+        self.width = width
+        self.height = height
+        self.free_rects = [(0, 0, width, height)]
+        self.used_area = 0
+
+    def insert(self, width, height):
+        """
+        Posiziona un rettangolo nella pagina.
+
+        Args:
+            width (int): Larghezza del rettangolo
+            height (int): Altezza del rettangolo
+
+        Returns:
+            tuple: Coordinate (x, y) assegnate o None se non c'è spazio
+        """
+        best = None
+        best_score = None
+        for fx, fy, fw, fh in self.free_rects:
+            if width <= fw and height <= fh:
+                residuo_x = fw - width
+                residuo_y = fh - height
+                score = (min(residuo_x, residuo_y), max(residuo_x, residuo_y))
+                if best_score is None or score < best_score:
+                    best = (fx, fy)
+                    best_score = score
+        if best is None:
+            return None
+
+        self._place((best[0], best[1], width, height))
+        self.used_area += width * height
+        return best
+
+    def occupancy(self):
+        """Restituisce la frazione dell'area della pagina occupata"""
+        return self.used_area / float(self.width * self.height)
+
+    def _place(self, rect):
+        """Aggiorna i rettangoli liberi dopo il posizionamento di rect"""
+        rx, ry, rw, rh = rect
+        nuovi = []
+        for free in self.free_rects:
+            fx, fy, fw, fh = free
+            if rx >= fx + fw or rx + rw <= fx or ry >= fy + fh or ry + rh <= fy:
+                nuovi.append(free)
+                continue
+            # Dividi il rettangolo libero nelle (fino a) quattro parti non coperte
+            if rx > fx:
+                nuovi.append((fx, fy, rx - fx, fh))
+            if rx + rw < fx + fw:
+                nuovi.append((rx + rw, fy, fx + fw - rx - rw, fh))
+            if ry > fy:
+                nuovi.append((fx, fy, fw, ry - fy))
+            if ry + rh < fy + fh:
+                nuovi.append((fx, ry + rh, fw, fy + fh - ry - rh))
+        self.free_rects = self._rimuovi_contenuti(nuovi)
+
+    @staticmethod
+    def _rimuovi_contenuti(rects):
+        """Elimina i rettangoli liberi interamente contenuti in un altro"""
+        risultato = []
+        for i, (ax, ay, aw, ah) in enumerate(rects):
+            contenuto = False
+            for j, (bx, by, bw, bh) in enumerate(rects):
+                if i == j:
+                    continue
+                if ax >= bx and ay >= by and ax + aw <= bx + bw and ay + ah <= by + bh:
+                    # A parità di rettangolo ne teniamo solo uno (quello con indice minore)
+                    if (ax, ay, aw, ah) != (bx, by, bw, bh) or j < i:
+                        contenuto = True
+                        break
+            if not contenuto:
+                risultato.append((ax, ay, aw, ah))
+        return risultato
+
+
+def pack_rects(sizes, page_size, padding=ATLAS_PADDING):
+    """
+    Distribuisce dei rettangoli su una o più pagine di atlas.
+
+    I rettangoli vengono ordinati per altezza e area decrescenti; ognuno è
+    inserito nella prima pagina che ha spazio, aprendone una nuova quando
+    nessuna pagina esistente può contenerlo. Un rettangolo più grande della
+    pagina riceve una pagina dedicata delle sue dimensioni.
+
+    Args:
+        sizes (dict): Chiave -> (larghezza, altezza)
+        page_size (tuple): Dimensioni (larghezza, altezza) di una pagina
+        padding (int): Spazio tra i rettangoli
+
+    Returns:
+        list: Per ogni pagina un dizionario con "size" (w, h) e
+            "placements" {chiave: (x, y)}
+    """
+    ordine = sorted(sizes, key=lambda k: (sizes[k][1], sizes[k][0] * sizes[k][1]), reverse=True)
+    page_w, page_h = page_size
+    bins = []
+    pagine = []
+
+    for chiave in ordine:
+        w, h = sizes[chiave]
+        posizione = None
+        for indice, contenitore in enumerate(bins):
+            posizione = contenitore.insert(w + padding, h + padding)
+            if posizione is not None:
+                pagine[indice]["placements"][chiave] = posizione
+                break
+        if posizione is not None:
+            continue
+
+        contenitore = MaxRectsBin(max(page_w, w + padding), max(page_h, h + padding))
+        posizione = contenitore.insert(w + padding, h + padding)
+        bins.append(contenitore)
+        pagine.append({"size": (contenitore.width, contenitore.height), "placements": {chiave: posizione}})
+
+    for indice, contenitore in enumerate(bins):
+        logger.debug(f"Pagina atlas {indice}: {len(pagine[indice]['placements'])} sprite, "
+                     f"occupazione {contenitore.occupancy():.0%}")
+    return pagine
+
+
+def load_trimmed_sprite(path, trim=True):
+    """
+    Decodifica uno sprite e ne rimuove i bordi trasparenti.
+
+    Funzione di modulo (picklable) così da poter essere eseguita in un pool di processi.
+
+    Args:
+        path (str): Percorso dell'immagine
+        trim (bool): Se True ritaglia i bordi completamente trasparenti
+
+    Returns:
+        dict: Dati dello sprite (path, size, bbox, source_size, pixels RGBA)
+    """
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img = img.convert("RGBA")
+    source_w, source_h = img.size
+    bbox = (0, 0, source_w, source_h)
+    if trim:
+        bbox = img.getchannel("A").getbbox() or (0, 0, 1, 1)
+        if bbox != (0, 0, source_w, source_h):
+            img = img.crop(bbox)
+    return {
+        "path": path,
+        "size": img.size,
+        "bbox": bbox,
+        "source_size": (source_w, source_h),
+        "pixels": img.tobytes()
+    }
+
+
+def load_sprites(paths, trim=True, max_workers=None):
+    """
+    Decodifica e ritaglia un insieme di sprite, in parallelo quando conviene.
+
+    Args:
+        paths (list): Percorsi delle immagini
+        trim (bool): Se True ritaglia i bordi trasparenti
+        max_workers (int, optional): Processi del pool (default: numero di CPU)
+
+    Returns:
+        list: Dati degli sprite caricati (gli sprite illeggibili vengono scartati)
+    """
+    risultati = []
+    if len(paths) >= MIN_SPRITES_FOR_POOL and (max_workers is None or max_workers > 1):
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+                futures = [executor.submit(load_trimmed_sprite, path, trim) for path in paths]
+                for path, future in zip(paths, futures):
+                    try:
+                        risultati.append(future.result())
+                    except Exception as e:
+                        logger.error(f"Errore nel caricamento dello sprite {path}: {e}")
+            return risultati
+        except Exception as e:
+            # Pool non disponibile (es. ambiente senza fork): ripiega sul caricamento sequenziale
+            logger.warning(f"Pool di processi non disponibile per gli sprite, caricamento sequenziale: {e}")
+            risultati = []
+
+    for path in paths:
+        try:
+            risultati.append(load_trimmed_sprite(path, trim))
+        except Exception as e:
+            logger.error(f"Errore nel caricamento dello sprite {path}: {e}")
+    return risultati
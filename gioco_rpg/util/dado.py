@@ -1,67 +1,415 @@
+"""
+Dadi e formule di tiro in stile D&D.
+
+Oltre alla classe Dado, il modulo compila le formule dei dadi in
+espressioni riutilizzabili. Grammatica supportata (spazi ignorati,
+maiuscole indifferenti):
+
+    formula   := termine (("+" | "-") termine)*
+    termine   := intero | [N]d(F | "%") modificatori
+    modificatori:
+        khK / kK   tieni i K dadi più alti     (4d6kh3)
+        klK        tieni i K dadi più bassi    (2d20kl1)
+        dhK / dlK  scarta i K dadi più alti / più bassi
+        !          dado esplosivo: sul massimo si ritira e si somma
+        adv / dis  vantaggio / svantaggio      (d20adv = 2d20kh1)
+
+compile_dice() analizza una formula una sola volta (cache LRU) e
+restituisce un'EspressioneDadi con tiro singolo, tiro in blocco da un
+generatore inizializzabile (random.Random o un Generator NumPy) e la
+distribuzione di probabilità esatta calcolata per convoluzione, usata per
+valori attesi e probabilità di successo.
+
+Senza un generatore esplicito i tiri usano il flusso "dadi" della
+sessione attiva (util.rng), così le partite sono riproducibili dal seme.
+"""
+
 import random
+import re
+from fractions import Fraction
+from functools import lru_cache
+from itertools import accumulate
+
+from util.rng import generatore
+
+# Numero massimo di ritiri per un dado esplosivo (tiro e distribuzione usano lo stesso limite)
+MAX_ESPLOSIONI = 10
+
+# Numero massimo di stati intermedi nel calcolo di una distribuzione esatta
+MAX_STATI_DISTRIBUZIONE = 200000
+
+_TERMINE_RE = re.compile(r"([+-]?)([^+-]+)")
+_DADO_RE = re.compile(r"^(\d*)d(\d+|%)(.*)$")
+_MODIFICATORE_RE = re.compile(r"(kh|kl|dh|dl|k|!|adv|dis)(\d*)")
+
 
 class Dado:
     """
     Classe che rappresenta un dado a N facce utilizzabile per tiri in stile D&D.
     Supporta i tiri di dado singoli, multipli e con vantaggio/svantaggio.
     """
-    def __init__(self, facce):
-        """Inizializza un dado con il numero specificato di facce."""
+    def __init__(self, facce, rng=None):
+        """
+        Inizializza un dado con il numero specificato di facce.
+
+        Args:
+            facce (int): Numero di facce
+            rng (random.Random, optional): Generatore da usare (default: flusso della sessione attiva)
+        """
         self.facce = facce
-    
+        self.rng = rng
+
     def tira(self):
         """Esegue un singolo tiro di dado."""
-        return random.randint(1, self.facce)
-    
+        return (self.rng or generatore()).randint(1, self.facce)
+
     def tiri_multipli(self, numero_tiri):
         """Esegue più tiri di dado e restituisce una lista dei risultati."""
-        return [self.tira() for _ in range(numero_tiri)]
-    
+        return (self.rng or generatore()).choices(range(1, self.facce + 1), k=numero_tiri)
+
     def tira_con_vantaggio(self):
         """Esegue due tiri di dado e restituisce il risultato migliore (vantaggio in D&D)."""
         tiro1 = self.tira()
         tiro2 = self.tira()
         return max(tiro1, tiro2), tiro1, tiro2
-    
+
     def tira_con_svantaggio(self):
         """Esegue due tiri di dado e restituisce il risultato peggiore (svantaggio in D&D)."""
         tiro1 = self.tira()
         tiro2 = self.tira()
         return min(tiro1, tiro2), tiro1, tiro2
 
-def tira_dadi(formula):
+
+class TermineDadi:
+    """Un gruppo di dadi uguali di una formula (es. "-4d6kh3")"""
+
+    __slots__ = ("segno", "numero", "facce", "tieni", "esplosivo")
+
+    def __init__(self, segno, numero, facce, tieni=None, esplosivo=False):
+        """
+        Args:
+            segno (int): 1 o -1
+            numero (int): Numero di dadi
+            facce (int): Facce di ogni dado
+            tieni (tuple, optional): ("h" | "l", K) per tenere i K dadi più alti o più bassi
+            esplosivo (bool): Se True il massimo fa ritirare e sommare il dado
+        """
+        self.segno = segno
+        self.numero = numero
+        self.facce = facce
+        self.tieni = tieni
+        self.esplosivo = esplosivo
+
+    def tira(self, rng):
+        """Restituisce i valori dei dadi tenuti"""
+        valori = rng.choices(range(1, self.facce + 1), k=self.numero)
+        if self.esplosivo:
+            valori = [self._esplodi(valore, rng) for valore in valori]
+        if self.tieni is not None:
+            verso, quanti = self.tieni
+            valori = sorted(valori, reverse=(verso == "h"))[:quanti]
+        return valori
+
+    def _esplodi(self, valore, rng):
+        totale = valore
+        for _ in range(MAX_ESPLOSIONI):
+            if valore != self.facce:
+                break
+            valore = rng.randint(1, self.facce)
+            totale += valore
+        return totale
+
+    def distribuzione_dado(self):
+        """Pesi interi dei valori di un singolo dado: ({valore: peso}, totale dei pesi)"""
+        if not self.esplosivo:
+            return {valore: 1 for valore in range(1, self.facce + 1)}, self.facce
+        # Ogni percorso con j esplosioni ha probabilità (1/F)^(j+1): denominatore comune F^(MAX+1)
+        pesi = {}
+        for j in range(MAX_ESPLOSIONI + 1):
+            peso = self.facce ** (MAX_ESPLOSIONI - j)
+            base = self.facce * j
+            ultimo = self.facce if j == MAX_ESPLOSIONI else self.facce - 1
+            for valore in range(1, ultimo + 1):
+                pesi[base + valore] = pesi.get(base + valore, 0) + peso
+        return pesi, self.facce ** (MAX_ESPLOSIONI + 1)
+
+    def distribuzione(self):
+        """Pesi interi della somma dei dadi tenuti, con il segno del termine"""
+        pesi_dado, totale_dado = self.distribuzione_dado()
+        if self.tieni is None:
+            pesi, totale = {0: 1}, 1
+            for _ in range(self.numero):
+                pesi = _convoluzione(pesi, pesi_dado)
+                totale *= totale_dado
+        else:
+            pesi, totale = _distribuzione_tenuti(pesi_dado, totale_dado, self.numero, *self.tieni)
+        return {self.segno * valore: peso for valore, peso in pesi.items()}, totale
+
+    def __repr__(self):
+        testo = f"{'-' if self.segno < 0 else ''}{self.numero}d{self.facce}"
+        if self.esplosivo:
+            testo += "!"
+        if self.tieni is not None:
+            testo += f"k{self.tieni[0]}{self.tieni[1]}"
+        return testo
+
+
+def _convoluzione(pesi_a, pesi_b):
+    risultato = {}
+    for valore_a, peso_a in pesi_a.items():
+        for valore_b, peso_b in pesi_b.items():
+            somma = valore_a + valore_b
+            risultato[somma] = risultato.get(somma, 0) + peso_a * peso_b
+    return risultato
+
+
+def _distribuzione_tenuti(pesi_dado, totale_dado, numero, verso, quanti):
+    """
+    Distribuzione della somma dei K dadi più alti (o più bassi) su N.
+
+    Lo stato è la tupla ordinata dei migliori K valori visti finora: il
+    numero di stati dipende da facce e K, non da F^N.
+    """
+    stati = {(): 1}
+    totale = 1
+    for _ in range(numero):
+        nuovi = {}
+        for stato, peso in stati.items():
+            for valore, peso_dado in pesi_dado.items():
+                tenuti = sorted(stato + (valore,), reverse=(verso == "h"))[:quanti]
+                chiave = tuple(tenuti)
+                nuovi[chiave] = nuovi.get(chiave, 0) + peso * peso_dado
+        stati = nuovi
+        totale *= totale_dado
+        if len(stati) > MAX_STATI_DISTRIBUZIONE:
+            raise ValueError("Espressione troppo complessa per una distribuzione esatta")
+    pesi = {}
+    for stato, peso in stati.items():
+        pesi[sum(stato)] = pesi.get(sum(stato), 0) + peso
+    return pesi, totale
+
+
+class EspressioneDadi:
+    """
+    Formula di dadi compilata: tiri singoli, tiri in blocco e distribuzione esatta.
+    """
+
+    def __init__(self, formula, termini, modificatore):
+        """
+        Args:
+            formula (str): Formula originale
+            termini (list): Termini con dadi (TermineDadi)
+            modificatore (int): Somma dei termini costanti
+        """
+        self.formula = formula
+        self.termini = tuple(termini)
+        self.modificatore = modificatore
+        self._pesi = None
+        self._campionamento = None
+
+    def tira(self, rng=None):
+        """
+        Esegue un tiro.
+
+        Args:
+            rng (random.Random, optional): Generatore da usare (default: flusso della sessione attiva)
+
+        Returns:
+            tuple: (risultato_totale, lista_tiri, modificatore) come tira_dadi
+        """
+        rng = rng or generatore()
+        tiri = []
+        totale = self.modificatore
+        for termine in self.termini:
+            valori = termine.tira(rng)
+            tiri.extend(valori)
+            totale += termine.segno * sum(valori)
+        return totale, tiri, self.modificatore
+
+    def totale(self, rng=None):
+        """Esegue un tiro e restituisce solo il risultato totale"""
+        return self.tira(rng)[0]
+
+    def tira_molti(self, numero, rng=None):
+        """
+        Esegue molti tiri in blocco campionando dalla distribuzione esatta.
+
+        Args:
+            numero (int): Numero di tiri
+            rng: random.Random (o modulo random) oppure un Generator/RandomState NumPy
+
+        Returns:
+            list: Risultati totali (array NumPy se rng è un generatore NumPy)
+        """
+        rng = rng or generatore()
+        try:
+            valori, cumulati, probabilita = self._dati_campionamento()
+        except ValueError:
+            # Distribuzione troppo grande: tiri uno alla volta
+            return [self.totale(rng) for _ in range(numero)]
+        if rng is random or isinstance(rng, random.Random):
+            return rng.choices(valori, cum_weights=cumulati, k=numero)
+        return rng.choice(valori, size=numero, p=probabilita)
+
+    def distribuzione(self):
+        """
+        Distribuzione di probabilità esatta del risultato.
+
+        Returns:
+            dict: Valore -> probabilità (Fraction), ordinato per valore
+
+        Raises:
+            ValueError: Se l'espressione richiede troppi stati intermedi
+        """
+        pesi, totale = self._pesi_esatti()
+        return {valore: Fraction(peso, totale) for valore, peso in pesi.items()}
+
+    def media(self):
+        """Valore atteso del risultato"""
+        try:
+            pesi, totale = self._pesi_esatti()
+        except ValueError:
+            # Approssimazione per espressioni molto grandi: media dei dadi senza selezione
+            return self.modificatore + sum(t.segno * t.numero * (t.facce + 1) / 2 for t in self.termini)
+        return sum(valore * peso for valore, peso in pesi.items()) / totale
+
+    def probabilita_almeno(self, soglia):
+        """
+        Probabilità esatta che il risultato sia maggiore o uguale a una soglia.
+
+        Args:
+            soglia (int): Valore minimo richiesto (es. classe difficoltà)
+
+        Returns:
+            Fraction: Probabilità tra 0 e 1
+        """
+        pesi, totale = self._pesi_esatti()
+        return Fraction(sum(peso for valore, peso in pesi.items() if valore >= soglia), totale)
+
+    @property
+    def minimo(self):
+        return min(self._pesi_esatti()[0])
+
+    @property
+    def massimo(self):
+        return max(self._pesi_esatti()[0])
+
+    def _pesi_esatti(self):
+        if self._pesi is None:
+            pesi, totale = {self.modificatore: 1}, 1
+            for termine in self.termini:
+                pesi_termine, totale_termine = termine.distribuzione()
+                pesi = _convoluzione(pesi, pesi_termine)
+                totale *= totale_termine
+                if len(pesi) > MAX_STATI_DISTRIBUZIONE:
+                    raise ValueError("Espressione troppo complessa per una distribuzione esatta")
+            self._pesi = (dict(sorted(pesi.items())), totale)
+        return self._pesi
+
+    def _dati_campionamento(self):
+        if self._campionamento is None:
+            pesi, totale = self._pesi_esatti()
+            valori = list(pesi)
+            probabilita = [peso / totale for peso in pesi.values()]
+            self._campionamento = (valori, list(accumulate(probabilita)), probabilita)
+        return self._campionamento
+
+    def __repr__(self):
+        return f"EspressioneDadi({self.formula!r})"
+
+
+def _analizza_termine(segno, testo):
+    if testo.isdigit():
+        return None, segno * int(testo)
+
+    match = _DADO_RE.match(testo)
+    if not match:
+        raise ValueError(f"Termine non valido: {testo!r}")
+    numero = int(match.group(1)) if match.group(1) else 1
+    facce = 100 if match.group(2) == "%" else int(match.group(2))
+    if numero < 1 or facce < 1:
+        raise ValueError(f"Numero di dadi o di facce non valido: {testo!r}")
+
+    tieni = None
+    esplosivo = False
+    resto = match.group(3)
+    posizione = 0
+    for modificatore in _MODIFICATORE_RE.finditer(resto):
+        if modificatore.start() != posizione:
+            break
+        posizione = modificatore.end()
+        nome, valore = modificatore.group(1), modificatore.group(2)
+        quanti = int(valore) if valore else 1
+        if nome == "!":
+            esplosivo = True
+        elif nome in ("adv", "dis"):
+            # Vantaggio e svantaggio tirano almeno due dadi (1d20adv = 2d20kh1)
+            numero = max(numero, 2)
+            tieni = ("h" if nome == "adv" else "l", 1)
+        elif nome in ("kh", "k"):
+            tieni = ("h", quanti)
+        elif nome == "kl":
+            tieni = ("l", quanti)
+        elif nome == "dh":
+            tieni = ("l", numero - quanti)
+        else:  # dl
+            tieni = ("h", numero - quanti)
+    if posizione != len(resto):
+        raise ValueError(f"Modificatore non valido in {testo!r}")
+    if tieni is not None:
+        if not 0 <= tieni[1] <= numero:
+            raise ValueError(f"Numero di dadi da tenere non valido in {testo!r}")
+        if tieni[1] == numero:
+            tieni = None
+    return TermineDadi(segno, numero, facce, tieni, esplosivo), 0
+
+
+@lru_cache(maxsize=1024)
+def compile_dice(formula):
+    """
+    Compila una formula di dadi (es. "2d6+1d4+3", "4d6kh3", "d20adv", "1d6!").
+
+    Il risultato è in cache: chiamare compile_dice con la stessa formula non
+    ripete l'analisi.
+
+    Args:
+        formula (str): Formula del tiro
+
+    Returns:
+        EspressioneDadi: Espressione compilata
+
+    Raises:
+        ValueError: Se la formula non è valida
+    """
+    testo = formula.replace(" ", "").lower()
+    if not testo:
+        raise ValueError("Formula vuota")
+
+    termini = []
+    modificatore = 0
+    posizione = 0
+    for match in _TERMINE_RE.finditer(testo):
+        if match.start() != posizione or (posizione > 0 and not match.group(1)):
+            raise ValueError(f"Formula non valida: {formula!r}")
+        posizione = match.end()
+        termine, costante = _analizza_termine(-1 if match.group(1) == "-" else 1, match.group(2))
+        if termine is not None:
+            termini.append(termine)
+        modificatore += costante
+    if posizione != len(testo):
+        raise ValueError(f"Formula non valida: {formula!r}")
+    return EspressioneDadi(formula, termini, modificatore)
+
+
+def tira_dadi(formula, rng=None):
     """
     Esegue un tiro di dadi secondo una formula, ad esempio "2d6+3" o "1d20-1".
-    
+
     Args:
-        formula (str): La formula del tiro di dadi (es. "2d6+3")
-    
+        formula (str): La formula del tiro di dadi (es. "2d6+3", "2d6+1d4+3", "4d6kh3")
+        rng (random.Random, optional): Generatore da usare (default: flusso della sessione attiva)
+
     Returns:
         tuple: (risultato_totale, lista_tiri, modificatore)
     """
-    # Analizza la formula
-    if "+" in formula:
-        formula_dadi, mod_str = formula.split("+")
-        modificatore = int(mod_str)
-    elif "-" in formula:
-        formula_dadi, mod_str = formula.split("-")
-        modificatore = -int(mod_str)
-    else:
-        formula_dadi = formula
-        modificatore = 0
-    
-    # Estrai il numero e il tipo di dadi
-    if "d" in formula_dadi:
-        num_dadi, facce = formula_dadi.split("d")
-        num_dadi = int(num_dadi) if num_dadi else 1
-        facce = int(facce)
-    else:
-        # Se non c'è 'd', assumiamo sia solo un numero
-        return int(formula_dadi) + modificatore, [], modificatore
-    
-    # Esegui i tiri
-    dado = Dado(facce)
-    tiri = dado.tiri_multipli(num_dadi)
-    risultato_totale = sum(tiri) + modificatore
-    
-    return risultato_totale, tiri, modificatore
+    return compile_dice(formula).tira(rng)
@@ -4,10 +4,11 @@ import logging
 import time
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Union, Callable, Set
-import hashlib
 
 # Import dei nuovi moduli di validazione
-from util.json_validator import validate_data, generate_schema_from_data
+from util.json_validator import validate_data
+from util.asset_index import hash_file
+from util.data_store import open_data_store
 
 # Configura il logger
 logging.basicConfig(level=logging.INFO)
@@ -67,6 +68,8 @@ class DataManager:
     - Versionamento dei file dati
     - Sistema di hook per eventi pre/post caricamento/salvataggio
     - Validazione automatica tramite schemi JSON
+    - Archivio compilato mappato in memoria (tools/compila_dati.py) con accesso
+      ai singoli record per ID
     """
     
     _instance = None
@@ -153,6 +156,19 @@ class DataManager:
             # TTL per gli schemi
             "schemas": 3600,           # 1 ora
         }
+        
+        # Archivio compilato dei dati statici (None se non è stato generato)
+        self._store = open_data_store(str(DATA_DIR))
+        if self._store is not None:
+            logger.info(f"Archivio dati compilato caricato: {self._store.path}")
+        
+        # Se True le voci in cache restano valide finché non arriva una notifica
+        # di modifica (notify_file_changed) invece di essere verificate a ogni accesso
+        self._change_notifications = False
+        
+        # Coppie (entità, hash del sorgente) già validate: la validazione non si ripete
+        # finché il file non cambia
+        self._validated_hashes: Set[tuple] = set()
     
     def load_data(self, data_type: str, file_name: Optional[str] = None, 
                  reload: bool = False, validate: bool = True) -> Union[Dict, List]:
@@ -235,36 +251,44 @@ class DataManager:
             logger.error(f"File non trovato dopo tentativi alternativi: {file_path}")
             return {}
         
-        # Carica i dati dal file JSON
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                logger.info(f"Dati caricati da JSON: {file_path}")
-        except json.JSONDecodeError as e:
-            logger.error(f"Errore nella decodifica JSON del file {file_path}: {str(e)}")
-            return {}
-        except Exception as e:
-            logger.error(f"Errore nel caricamento del file JSON {file_path}: {str(e)}")
-            return {}
+        # Carica i dati dall'archivio compilato, se aggiornato, altrimenti dal file JSON
+        data = None
+        store_key = self._store_key(file_path)
+        if self._store is not None and store_key and self._store.has(store_key):
+            data = self._store.load(store_key)
+            logger.debug(f"Dati caricati dall'archivio compilato: {store_key}")
+        
+        if data is None:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    logger.info(f"Dati caricati da JSON: {file_path}")
+            except json.JSONDecodeError as e:
+                logger.error(f"Errore nella decodifica JSON del file {file_path}: {str(e)}")
+                return {}
+            except Exception as e:
+                logger.error(f"Errore nel caricamento del file JSON {file_path}: {str(e)}")
+                return {}
         
         # Gestione del versionamento
         data_version = self._get_data_version(data)
         if data_version is not None and data_version != CURRENT_DATA_VERSION:
             data = self._migrate_data(data, data_version, data_type)
         
-        # Validazione (se richiesta)
+        # Validazione (se richiesta e non già eseguita per questa versione del file):
+        # solo qui serve l'hash del contenuto, l'invalidazione usa mtime e dimensione
+        source_hash = None
         if validate and data_type in self._entity_mapping:
             entity_type = self._entity_mapping[data_type]
-            errors = validate_data(data, entity_type, file_name)
-            if errors:
+            source_hash = self._calculate_hash(file_path)
+            if (entity_type, source_hash) not in self._validated_hashes:
+                errors = validate_data(data, entity_type, file_name)
                 for error in errors:
                     logger.warning(f"Errore di validazione in {file_name}: {error}")
-                
-                # Genera schema automaticamente se non esiste
-                self._auto_generate_schema(data, entity_type)
+                self._validated_hashes.add((entity_type, source_hash))
         
         # Aggiorna la cache
-        self._update_cache(cache_key, data, file_path)
+        self._update_cache(cache_key, data, file_path, source_hash)
         
         # Esegui hooks post-caricamento
         if data_type in DataHooks.post_load:
@@ -313,26 +337,6 @@ class DataManager:
         
         return data
     
-    def _auto_generate_schema(self, data: Union[Dict, List], entity_type: str) -> None:
-        """Genera automaticamente uno schema se non esiste."""
-        try:
-            # Assicuriamoci che il percorso schemas sia sempre definito nel dizionario _data_paths
-            # Questa voce dovrebbe essere sempre presente dall'inizializzazione
-            schema_path = self._data_paths["schemas"] / f"{entity_type}_schema.json"
-            
-            if not schema_path.exists():
-                logger.info(f"Generazione automatica schema per {entity_type}")
-                if isinstance(data, dict) and len(data) > 0:
-                    # Prendi il primo elemento del dizionario come esempio
-                    sample = next(iter(data.values()))
-                    generate_schema_from_data(sample, entity_type)
-                elif isinstance(data, list) and len(data) > 0:
-                    # Usa il primo elemento della lista come esempio
-                    generate_schema_from_data(data[0], entity_type)
-        except Exception as e:
-            logger.error(f"Errore durante la generazione automatica dello schema per {entity_type}: {e}")
-            # Non solleviamo eccezioni per non bloccare il caricamento dei dati
-            
     def _is_cache_valid(self, cache_key: str) -> bool:
         """
         Verifica se i dati in cache sono ancora validi.
@@ -351,6 +355,10 @@ class DataManager:
         if cache_key not in self._cache_metadata:
             return False
             
+        # Con le notifiche di modifica attive la voce è valida finché non viene invalidata
+        if self._change_notifications:
+            return True
+            
         metadata = self._cache_metadata[cache_key]
         
         # Verifica TTL
@@ -360,12 +368,11 @@ class DataManager:
             logger.debug(f"Cache scaduta per {cache_key}")
             return False
             
-        # Verifica se il file è stato modificato
+        # Verifica se il file è stato modificato (stessa firma usata dall'archivio compilato)
         file_path = metadata.get("file_path")
-        if file_path and os.path.exists(file_path):
-            if os.path.getmtime(file_path) > metadata.get("timestamp", 0):
-                logger.debug(f"File modificato dopo l'ultimo caricamento: {file_path}")
-                return False
+        if file_path and self._source_signature(file_path) != metadata.get("signature"):
+            logger.debug(f"File modificato dopo l'ultimo caricamento: {file_path}")
+            return False
                 
         return True
     
@@ -378,7 +385,8 @@ class DataManager:
         # Usa il TTL specifico o quello predefinito
         return self._cache_ttl.get(data_type, self.DEFAULT_CACHE_TTL)
     
-    def _update_cache(self, cache_key: str, data: Union[Dict, List], file_path: Path) -> None:
+    def _update_cache(self, cache_key: str, data: Union[Dict, List], file_path: Path,
+                      source_hash: Optional[str] = None) -> None:
         """
         Aggiorna la cache con nuovi dati.
         
@@ -386,27 +394,132 @@ class DataManager:
             cache_key: Chiave della cache
             data: Dati da memorizzare
             file_path: Percorso del file di origine
+            source_hash: Hash del file di origine, se già calcolato per la validazione
         """
         # Aggiorna i dati in cache
         self._data_cache[cache_key] = data
         
-        # Aggiorna i metadati
+        # Aggiorna i metadati: la firma (mtime, dimensione) basta a rilevare le modifiche
         self._cache_metadata[cache_key] = {
             "timestamp": time.time(),
             "file_path": str(file_path),
-            "hash": self._calculate_hash(data),
+            "signature": self._source_signature(file_path),
+            "hash": source_hash,
         }
         
         logger.debug(f"Cache aggiornata per {cache_key}")
     
-    def _calculate_hash(self, data: Union[Dict, List]) -> str:
-        """Calcola un hash dei dati per rilevare cambiamenti."""
+    @staticmethod
+    def _source_signature(file_path) -> Optional[tuple]:
+        """Restituisce la firma (mtime_ns, dimensione) del file sorgente, come nell'indice dell'archivio."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _calculate_hash(self, file_path: Path) -> str:
+        """Calcola l'hash del file sorgente (dall'indice dell'archivio compilato se presente)."""
+        store_key = self._store_key(file_path)
+        info = self._store.file_info(store_key) if self._store is not None and store_key else None
+        if info:
+            return info["hash"]
         try:
-            data_str = json.dumps(data, sort_keys=True)
-            return hashlib.md5(data_str.encode()).hexdigest()
+            return hash_file(str(file_path))
         except Exception:
             return str(time.time())  # Fallback
     
+    def _store_key(self, file_path: Path) -> Optional[str]:
+        """Restituisce il percorso di un file relativo a DATA_DIR, usato come chiave dell'archivio."""
+        try:
+            return Path(os.path.abspath(file_path)).relative_to(os.path.abspath(DATA_DIR)).as_posix()
+        except ValueError:
+            return None
+    
+    def reload_data_store(self) -> bool:
+        """
+        Riapre l'archivio compilato (ad esempio dopo una nuova compilazione) e svuota la cache.
+        
+        Returns:
+            bool: True se è disponibile un archivio compilato
+        """
+        if self._store is not None:
+            self._store.close()
+        self._store = open_data_store(str(DATA_DIR))
+        self.invalidate_cache()
+        return self._store is not None
+    
+    def enable_change_notifications(self, enabled: bool = True) -> None:
+        """
+        Attiva l'invalidazione della cache guidata dalle notifiche di modifica dei file.
+        
+        Da chiamare solo quando un watcher dei file invoca notify_file_changed: le voci
+        in cache non vengono più verificate con TTL e stat ad ogni accesso.
+        
+        Args:
+            enabled: True per affidarsi alle notifiche, False per tornare a TTL e mtime
+        """
+        self._change_notifications = enabled
+    
+    def notify_file_changed(self, file_path: Union[str, Path]) -> None:
+        """
+        Invalida la cache e l'archivio compilato per un file di dati modificato.
+        
+        Args:
+            file_path: Percorso del file modificato, creato o rimosso
+        """
+        store_key = self._store_key(Path(file_path))
+        if not store_key:
+            return
+        if self._store is not None:
+            self._store.mark_stale(store_key)
+        
+        # Rimuovi le voci in cache lette da questo file
+        target = os.path.abspath(file_path)
+        keys_to_remove = [k for k, meta in self._cache_metadata.items()
+                          if os.path.abspath(meta.get("file_path", "")) == target]
+        for key in keys_to_remove:
+            self._data_cache.pop(key, None)
+            self._cache_metadata.pop(key, None)
+        if keys_to_remove:
+            logger.debug(f"Cache invalidata per modifica di {store_key}")
+    
+    def get_record(self, data_type: str, file_name: str, key: Any, default: Any = None) -> Any:
+        """
+        Ottieni un singolo record (per chiave o ID) di un file di dati.
+        
+        Se il file non è in cache e l'archivio compilato ne ha una versione aggiornata,
+        legge solo il record richiesto senza caricare l'intero file.
+        
+        Args:
+            data_type: Tipo di dati
+            file_name: Nome del file
+            key: Chiave del record (file dizionario) o ID (file lista)
+            default: Valore restituito se il record non esiste
+            
+        Returns:
+            Il record richiesto o default
+        """
+        cache_key = f"{data_type}/{file_name}"
+        path = self._data_paths.get(data_type)
+        store_key = self._store_key(path / file_name) if path is not None else None
+        
+        # La lettura diretta non applica migrazioni e hook: usala solo quando non servono
+        if (self._store is not None and store_key and self._store.has(store_key)
+                and not self._is_cache_valid(cache_key)
+                and data_type not in DataHooks.pre_load and data_type not in DataHooks.post_load
+                and self._store.file_info(store_key).get("version") in (None, CURRENT_DATA_VERSION)):
+            return self._store.get(store_key, key, default)
+        
+        data = self.load_data(data_type, file_name)
+        if isinstance(data, dict):
+            return data.get(key, default)
+        if isinstance(data, list):
+            for elemento in data:
+                if isinstance(elemento, dict) and key in (elemento.get("id"), elemento.get("nome")):
+                    return elemento
+        return default
+    
     def invalidate_cache(self, data_type: Optional[str] = None, file_name: Optional[str] = None) -> None:
         """
         Invalida la cache per uno specifico tipo di dati o file.
@@ -435,6 +548,38 @@ class DataManager:
             
         logger.debug(f"Cache invalidata per {key_prefix}")
     
+    def validate_all(self) -> Dict[str, List[str]]:
+        """
+        Valida tutti i file di dati con i rispettivi schemi.
+        
+        Pensata per l'avvio del server e per tools/valida_dati.py: i file validati
+        qui non vengono più rivalidati a ogni caricamento finché non cambiano.
+        
+        Returns:
+            dict: Percorso relativo del file -> lista degli errori (solo file con errori)
+        """
+        risultati = {}
+        visitati = set()
+        for data_type, entity_type in self._entity_mapping.items():
+            # Le entità senza schema si creano con tools/valida_dati.py --genera-schemi
+            if not (self._data_paths["schemas"] / f"{entity_type}_schema.json").exists():
+                continue
+            for file_name in sorted(self.get_all_data_files(data_type)):
+                file_path = self._data_paths[data_type] / file_name
+                if (entity_type, file_path) in visitati:
+                    continue
+                visitati.add((entity_type, file_path))
+                
+                data = self.load_data(data_type, file_name, validate=False)
+                errors = validate_data(data, entity_type, file_name)
+                self._validated_hashes.add((entity_type, self._calculate_hash(file_path)))
+                if errors:
+                    risultati[self._store_key(file_path) or str(file_path)] = errors
+        
+        logger.info(f"Validazione dei dati completata: {len(visitati)} file, "
+                    f"{len(risultati)} con errori")
+        return risultati
+    
     def get_all_data_files(self, data_type: str) -> List[str]:
         """
         Restituisce tutti i file di dati di un certo tipo.
@@ -695,10 +840,9 @@ class DataManager:
         Returns:
             dict: Dati dell'NPC o di tutti gli NPC
         """
-        npcs = self.load_data("npc", "npcs.json")
         if nome_npc:
-            return npcs.get(nome_npc, {})
-        return npcs
+            return self.get_record("npc", "npcs.json", nome_npc, {})
+        return self.load_data("npc", "npcs.json")
     
     def get_npc_conversation(self, nome_npc: str, stato: str = "inizio") -> Dict:
         """
@@ -859,10 +1003,9 @@ class DataManager:
         Returns:
             dict/list: Dati del mostro o di tutti i mostri
         """
-        monsters = self.load_data("mostri", "monsters.json")
         if monster_id:
-            return monsters.get(monster_id, {})
-        return monsters
+            return self.get_record("mostri", "monsters.json", monster_id, {})
+        return self.load_data("mostri", "monsters.json")
         
     def get_map_data(self, map_id: str) -> Dict:
         """
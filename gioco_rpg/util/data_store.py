@@ -0,0 +1,304 @@
+"""
+Archivio compilato in sola lettura dei dati statici di gioco.
+
+Lo step di compilazione (tools/compila_dati.py) converte i file JSON di
+data/ in un unico file binario indicizzato:
+
+    [header: magic, versione del formato, lunghezza L dell'indice]
+    [L byte: indice JSON]
+    [record JSON compatti concatenati]
+
+Per ogni file l'indice riporta dimensione, mtime e hash del sorgente e la
+posizione di ogni record: un record per chiave di primo livello (file
+dizionario) o per elemento (file lista, con la mappa id -> elemento quando
+gli elementi hanno un "id" o un "nome" univoco).
+
+A runtime l'archivio viene mappato in memoria (mmap in sola lettura), così
+i processi worker condividono le stesse pagine tramite la page cache del
+sistema operativo; un singolo record si legge in O(1) senza decodificare
+il resto del file.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Optional
+
+from util.asset_index import hash_file
+
+logger = logging.getLogger(__name__)
+
+# Identificativo e versione del formato
+STORE_MAGIC = b"GDST"
+STORE_FORMAT_VERSION = 1
+STORE_HEADER = struct.Struct(">4sHI")
+
+# Directory di data/ incluse nell'archivio (i dati mutabili come world_state restano fuori)
+COMPILED_DIRECTORIES = ("classes", "items", "monsters", "npc", "mappe", "tutorials", "achievements")
+
+# Nome del file compilato, relativo alla directory dei dati
+STORE_FILE_NAME = os.path.join(".compiled", "game_data.store")
+
+# Campi usati come ID degli elementi dei file lista
+_LIST_ID_FIELDS = ("id", "nome")
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _list_ids(items: List) -> Optional[Dict[str, int]]:
+    """Restituisce la mappa id -> indice se gli elementi hanno un campo ID univoco"""
+    for campo in _LIST_ID_FIELDS:
+        ids = {}
+        for indice, elemento in enumerate(items):
+            valore = elemento.get(campo) if isinstance(elemento, dict) else None
+            if not isinstance(valore, str) or valore in ids:
+                break
+            ids[valore] = indice
+        else:
+            if ids:
+                return ids
+    return None
+
+
+def compile_data_store(data_dir: str, output_path: Optional[str] = None,
+                       directories: Iterable[str] = COMPILED_DIRECTORIES) -> Dict[str, int]:
+    """
+    Compila i file JSON dei dati in un archivio indicizzato.
+
+    Il file viene sostituito atomicamente: i processi che hanno già mappato
+    la versione precedente continuano a leggerla finché non la riaprono.
+
+    Args:
+        data_dir: Directory base dei dati
+        output_path: Percorso dell'archivio (default: data/.compiled/game_data.store)
+        directories: Sottodirectory di data_dir da includere
+
+    Returns:
+        dict: Numero di file e di record compilati e dimensione dell'archivio
+    """
+    output_path = output_path or os.path.join(data_dir, STORE_FILE_NAME)
+    indice = {}
+    blocchi = []
+    offset = 0
+    records = 0
+
+    def aggiungi(valore):
+        nonlocal offset, records
+        dati = _encode(valore)
+        posizione = [offset, len(dati)]
+        blocchi.append(dati)
+        offset += len(dati)
+        records += 1
+        return posizione
+
+    for directory in directories:
+        percorso_dir = os.path.join(data_dir, directory)
+        if not os.path.isdir(percorso_dir):
+            continue
+        for nome in sorted(os.listdir(percorso_dir)):
+            if not nome.lower().endswith(".json"):
+                continue
+            percorso = os.path.join(percorso_dir, nome)
+            rel_path = f"{directory}/{nome}"
+            try:
+                stat = os.stat(percorso)
+                with open(percorso, "r", encoding="utf-8") as f:
+                    dati = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"File {rel_path} escluso dall'archivio compilato: {e}")
+                continue
+
+            voce = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": hash_file(percorso)}
+            if isinstance(dati, dict):
+                voce["kind"] = "dict"
+                voce["version"] = dati.get("_version")
+                voce["records"] = {chiave: aggiungi(valore) for chiave, valore in dati.items()}
+            elif isinstance(dati, list):
+                voce["kind"] = "list"
+                voce["records"] = [aggiungi(valore) for valore in dati]
+                voce["ids"] = _list_ids(dati)
+            else:
+                voce["kind"] = "value"
+                voce["record"] = aggiungi(dati)
+            indice[rel_path] = voce
+
+    indice_bytes = _encode({"files": indice})
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temporaneo = f"{output_path}.tmp"
+    with open(temporaneo, "wb") as f:
+        f.write(STORE_HEADER.pack(STORE_MAGIC, STORE_FORMAT_VERSION, len(indice_bytes)))
+        f.write(indice_bytes)
+        for blocco in blocchi:
+            f.write(blocco)
+    os.replace(temporaneo, output_path)
+
+    risultato = {"files": len(indice), "records": records,
+                 "bytes": STORE_HEADER.size + len(indice_bytes) + offset}
+    logger.info(f"Archivio dati compilato in {output_path}: {risultato['files']} file, "
+                f"{risultato['records']} record, {risultato['bytes']} byte")
+    return risultato
+
+
+class DataStore:
+    """
+    Archivio compilato mappato in memoria, in sola lettura.
+
+    I file il cui sorgente JSON è cambiato dopo la compilazione (verificato
+    all'apertura o segnalato con mark_stale) non vengono più serviti: il
+    chiamante ricade sulla lettura del JSON.
+    """
+
+    def __init__(self, path: str, data_dir: Optional[str] = None):
+        """
+        Args:
+            path: Percorso dell'archivio compilato
+            data_dir: Directory dei sorgenti JSON, usata per scartare i file
+                modificati dopo la compilazione (None per non verificare)
+
+        Raises:
+            OSError: Se l'archivio non può essere aperto
+            ValueError: Se l'archivio non è valido
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, versione, lunghezza = STORE_HEADER.unpack_from(self._mm, 0)
+            if magic != STORE_MAGIC or versione != STORE_FORMAT_VERSION:
+                raise ValueError(f"Formato dell'archivio non supportato: {path}")
+            inizio = STORE_HEADER.size
+            self._files = json.loads(self._mm[inizio:inizio + lunghezza].decode("utf-8"))["files"]
+            self._base = inizio + lunghezza
+        except Exception:
+            self.close()
+            raise
+        self._stale = set()
+        if data_dir is not None:
+            self._check_sources(data_dir)
+
+    def close(self) -> None:
+        """Rilascia la mappatura e il file"""
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def has(self, rel_path: str) -> bool:
+        """Indica se l'archivio contiene una versione aggiornata del file"""
+        return rel_path in self._files and rel_path not in self._stale
+
+    def mark_stale(self, rel_path: str) -> None:
+        """Segnala che il sorgente di un file è cambiato dopo la compilazione"""
+        if rel_path in self._files:
+            self._stale.add(rel_path)
+
+    def file_info(self, rel_path: str) -> Optional[Dict]:
+        """Restituisce i metadati (size, mtime_ns, hash, kind) di un file aggiornato"""
+        if not self.has(rel_path):
+            return None
+        voce = self._files[rel_path]
+        return {k: voce.get(k) for k in ("size", "mtime_ns", "hash", "kind", "version")}
+
+    def load(self, rel_path: str) -> Any:
+        """
+        Ricostruisce l'intero contenuto di un file.
+
+        Args:
+            rel_path: Percorso relativo alla directory dei dati (es. "npc/npcs.json")
+
+        Returns:
+            Contenuto del file o None se non presente o non aggiornato
+        """
+        if not self.has(rel_path):
+            return None
+        voce = self._files[rel_path]
+        if voce["kind"] == "dict":
+            return {chiave: self._read(pos) for chiave, pos in voce["records"].items()}
+        if voce["kind"] == "list":
+            return [self._read(pos) for pos in voce["records"]]
+        return self._read(voce["record"])
+
+    def get(self, rel_path: str, key: Any, default: Any = None) -> Any:
+        """
+        Legge un singolo record senza decodificare il resto del file.
+
+        Args:
+            rel_path: Percorso relativo del file
+            key: Chiave (file dizionario), ID o indice (file lista)
+            default: Valore restituito se il record non esiste
+
+        Returns:
+            Record decodificato o default
+        """
+        if not self.has(rel_path):
+            return default
+        voce = self._files[rel_path]
+        if voce["kind"] == "dict":
+            pos = voce["records"].get(key)
+        elif voce["kind"] == "list":
+            if isinstance(key, int):
+                pos = voce["records"][key] if 0 <= key < len(voce["records"]) else None
+            else:
+                indice = (voce.get("ids") or {}).get(key)
+                pos = voce["records"][indice] if indice is not None else None
+        else:
+            pos = None
+        return self._read(pos) if pos is not None else default
+
+    def keys(self, rel_path: str) -> List:
+        """Restituisce le chiavi (o gli ID) dei record di un file"""
+        if not self.has(rel_path):
+            return []
+        voce = self._files[rel_path]
+        if voce["kind"] == "dict":
+            return list(voce["records"])
+        if voce["kind"] == "list":
+            return list(voce.get("ids") or range(len(voce["records"])))
+        return []
+
+    def _read(self, pos):
+        offset, lunghezza = pos
+        inizio = self._base + offset
+        return json.loads(self._mm[inizio:inizio + lunghezza].decode("utf-8"))
+
+    def _check_sources(self, data_dir):
+        """Scarta i file i cui sorgenti sono cambiati o spariti dopo la compilazione"""
+        for rel_path, voce in self._files.items():
+            try:
+                stat = os.stat(os.path.join(data_dir, rel_path))
+            except OSError:
+                self._stale.add(rel_path)
+                continue
+            if stat.st_size != voce["size"] or stat.st_mtime_ns != voce["mtime_ns"]:
+                self._stale.add(rel_path)
+        if self._stale:
+            logger.info(f"Archivio dati compilato non aggiornato per {len(self._stale)} file, "
+                        f"verranno letti dal JSON: {sorted(self._stale)}")
+
+
+def open_data_store(data_dir: str, path: Optional[str] = None) -> Optional[DataStore]:
+    """
+    Apre l'archivio compilato, se presente.
+
+    Args:
+        data_dir: Directory dei dati
+        path: Percorso dell'archivio (default: data/.compiled/game_data.store)
+
+    Returns:
+        DataStore: Archivio aperto o None se assente o non valido
+    """
+    path = path or os.path.join(data_dir, STORE_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        return DataStore(path, data_dir)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Archivio dati compilato {path} non utilizzabile, uso dei file JSON: {e}")
+        return None
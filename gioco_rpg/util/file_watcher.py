@@ -0,0 +1,421 @@
+"""
+Servizio centrale di osservazione dei file di dati e asset.
+
+Su Linux usa inotify (tramite ctypes, senza dipendenze esterne); sugli altri
+sistemi, o se inotify non è disponibile, ricade su un polling periodico.
+Le modifiche vengono raggruppate per un breve intervallo (gli editor scrivono
+un file in più passaggi) e pubblicate sull'EventBus, così i consumatori
+(cache del DataManager, registro degli sprite sheet, cache HTTP degli asset)
+invalidano solo ciò che è cambiato invece di verificare i file a ogni accesso.
+
+Eventi pubblicati (argomenti: path, rel_path, change):
+    DATA_FILE_CHANGED  - file sotto data/
+    MAP_FILE_CHANGED   - file JSON delle mappe (data/mappe/)
+    ASSET_FILE_CHANGED - file sotto assets/
+
+Se la coda di inotify si riempie alcune modifiche vanno perse: viene allora
+pubblicato WATCHED_FILES_RESYNC (argomento: roots) e i consumatori
+ricaricano o invalidano tutto ciò che dipende dalle directory osservate.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+import core.events as Events
+from core.event_bus import EventBus
+
+logger = logging.getLogger(__name__)
+
+# Tipi di modifica riportati negli eventi
+CHANGE_CREATED = "created"
+CHANGE_MODIFIED = "modified"
+CHANGE_DELETED = "deleted"
+# Modifiche perse: le cache delle directory osservate vanno ricaricate per intero
+CHANGE_OVERFLOW = "overflow"
+
+# Secondi di quiete attesi prima di pubblicare un gruppo di modifiche
+DEBOUNCE_SECONDS = 0.2
+
+# Intervallo del polling di fallback
+POLL_INTERVAL = 2.0
+
+# File temporanei degli editor e artefatti generati che non vanno notificati
+IGNORED_SUFFIXES = (".tmp", ".swp", ".swx", "~", ".pyc")
+IGNORED_NAMES = (".asset_index.json", ".compiled", "__pycache__", ".git")
+
+# Costanti di inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def _ignorato(path):
+    nome = os.path.basename(path)
+    if nome.endswith(IGNORED_SUFFIXES) or nome.startswith(".#"):
+        return True
+    return any(parte in IGNORED_NAMES for parte in path.replace("\\", "/").split("/"))
+
+
+class _InotifyBackend:
+    """Backend basato su inotify: un watch per directory, aggiunto anche alle nuove sottodirectory"""
+
+    name = "inotify"
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fallita")
+        self._watches = {}  # wd -> directory
+
+    def add_tree(self, root):
+        """Aggiunge un watch a root e a tutte le sue sottodirectory"""
+        for directory, sottodirectory, _ in os.walk(root):
+            sottodirectory[:] = [d for d in sottodirectory if not _ignorato(os.path.join(directory, d))]
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                logger.warning(f"Impossibile osservare {directory}: errno {ctypes.get_errno()}")
+                continue
+            self._watches[wd] = directory
+
+    def wait(self, timeout):
+        """Attende eventi fino a timeout secondi e restituisce le coppie (percorso, modifica)"""
+        pronti, _, _ = select.select([self._fd], [], [], timeout)
+        if not pronti:
+            return []
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        modifiche = []
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(buffer):
+            wd, mask, _, lunghezza = _INOTIFY_EVENT.unpack_from(buffer, offset)
+            nome = buffer[offset + _INOTIFY_EVENT.size:offset + _INOTIFY_EVENT.size + lunghezza]
+            offset += _INOTIFY_EVENT.size + lunghezza
+
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("Coda inotify piena: alcune modifiche sono andate perse, verrà ricaricato tutto")
+                modifiche.append((None, CHANGE_OVERFLOW))
+                continue
+            directory = self._watches.get(wd)
+            if mask & IN_IGNORED or directory is None:
+                self._watches.pop(wd, None)
+                continue
+            if mask & IN_DELETE_SELF:
+                continue
+
+            path = os.path.join(directory, os.fsdecode(nome.rstrip(b"\0")))
+            if mask & IN_ISDIR:
+                # Nuova directory: osservala e notifica i file già presenti
+                if mask & (IN_CREATE | IN_MOVED_TO) and not _ignorato(path):
+                    self.add_tree(path)
+                    for cartella, _, files in os.walk(path):
+                        modifiche.extend((os.path.join(cartella, f), CHANGE_CREATED) for f in files)
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                modifiche.append((path, CHANGE_DELETED))
+            elif mask & IN_MOVED_TO:
+                modifiche.append((path, CHANGE_CREATED))
+            elif mask & IN_CREATE:
+                # Il contenuto arriva con IN_CLOSE_WRITE; la creazione serve a distinguere i file nuovi
+                modifiche.append((path, CHANGE_CREATED))
+            elif mask & IN_CLOSE_WRITE:
+                modifiche.append((path, CHANGE_MODIFIED))
+        return modifiche
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class _PollingBackend:
+    """Backend di fallback: confronta periodicamente dimensione e mtime dei file"""
+
+    name = "polling"
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self._roots = []
+        self._snapshot = {}
+
+    def add_tree(self, root):
+        self._roots.append(root)
+        self._snapshot.update(self._scan(root))
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        attuale = {}
+        for root in self._roots:
+            attuale.update(self._scan(root))
+
+        modifiche = []
+        for path, firma in attuale.items():
+            precedente = self._snapshot.get(path)
+            if precedente is None:
+                modifiche.append((path, CHANGE_CREATED))
+            elif precedente != firma:
+                modifiche.append((path, CHANGE_MODIFIED))
+        modifiche.extend((path, CHANGE_DELETED) for path in self._snapshot if path not in attuale)
+        self._snapshot = attuale
+        return modifiche
+
+    @staticmethod
+    def _scan(root):
+        firme = {}
+        for directory, sottodirectory, files in os.walk(root):
+            sottodirectory[:] = [d for d in sottodirectory if not _ignorato(os.path.join(directory, d))]
+            for nome in files:
+                path = os.path.join(directory, nome)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                firme[path] = (stat.st_size, stat.st_mtime_ns)
+        return firme
+
+    def close(self):
+        self._roots = []
+        self._snapshot = {}
+
+
+class FileWatcher:
+    """
+    Osserva le directory dei dati e degli asset e pubblica le modifiche sull'EventBus.
+    """
+
+    def __init__(self, data_dir=None, assets_dir=None, event_bus=None, use_inotify=True,
+                 debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL):
+        """
+        Args:
+            data_dir (str, optional): Directory dei dati di gioco
+            assets_dir (str, optional): Directory degli asset
+            event_bus (EventBus, optional): Bus su cui pubblicare (default: istanza globale)
+            use_inotify (bool): Se False usa sempre il polling
+            debounce (float): Secondi di quiete prima di pubblicare le modifiche
+            poll_interval (float): Intervallo del polling di fallback
+        """
+        self.roots = {}
+        if data_dir:
+            self.roots[os.path.abspath(data_dir)] = Events.DATA_FILE_CHANGED
+        if assets_dir:
+            self.roots[os.path.abspath(assets_dir)] = Events.ASSET_FILE_CHANGED
+        self.event_bus = event_bus or EventBus.get_instance()
+        self.use_inotify = use_inotify
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.backend = None
+        self._thread = None
+        self._running = threading.Event()
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def start(self):
+        """
+        Avvia l'osservazione in un thread in background.
+
+        Returns:
+            bool: True se il watcher è attivo
+        """
+        if self.running:
+            return True
+        self.backend = self._create_backend()
+        for root in self.roots:
+            if os.path.isdir(root):
+                self.backend.add_tree(root)
+            else:
+                logger.warning(f"Directory da osservare non trovata: {root}")
+
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="FileWatcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watcher dei file avviato ({self.backend.name}) su {list(self.roots)}")
+        return True
+
+    def stop(self):
+        """Ferma il watcher e rilascia le risorse"""
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.poll_interval, 1.0) + 1.0)
+            self._thread = None
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def _create_backend(self):
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                return _InotifyBackend()
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify non disponibile, uso del polling: {e}")
+        return _PollingBackend(self.poll_interval)
+
+    def _run(self):
+        in_attesa = {}  # percorso -> modifica
+        risincronizza = False
+        while self._running.is_set():
+            try:
+                timeout = self.debounce if in_attesa else 1.0
+                modifiche = self.backend.wait(timeout)
+            except Exception as e:
+                logger.error(f"Errore nel watcher dei file: {e}")
+                time.sleep(1.0)
+                continue
+
+            for path, modifica in modifiche:
+                if modifica == CHANGE_OVERFLOW:
+                    risincronizza = True
+                    continue
+                if _ignorato(path):
+                    continue
+                precedente = in_attesa.get(path)
+                # Un file creato e poi scritto resta "creato"; creato e rimosso si annulla
+                if precedente == CHANGE_CREATED and modifica == CHANGE_MODIFIED:
+                    continue
+                if precedente == CHANGE_CREATED and modifica == CHANGE_DELETED:
+                    in_attesa.pop(path)
+                    continue
+                in_attesa[path] = modifica
+
+            if (in_attesa or risincronizza) and not modifiche:
+                self._publish(in_attesa)
+                in_attesa = {}
+                if risincronizza:
+                    self.event_bus.emit_immediate(Events.WATCHED_FILES_RESYNC, roots=list(self.roots))
+                    risincronizza = False
+
+    def _publish(self, modifiche):
+        """Pubblica le modifiche raggruppate sull'EventBus"""
+        for path, modifica in sorted(modifiche.items()):
+            for root, evento in self.roots.items():
+                if not path.startswith(root + os.sep):
+                    continue
+                rel_path = os.path.relpath(path, root).replace("\\", "/")
+                logger.debug(f"File {modifica}: {path}")
+                self.event_bus.emit_immediate(evento, path=path, rel_path=rel_path, change=modifica)
+                if evento == Events.DATA_FILE_CHANGED and rel_path.startswith("mappe/") and rel_path.endswith(".json"):
+                    self.event_bus.emit_immediate(Events.MAP_FILE_CHANGED, path=path,
+                                                  map_id=os.path.splitext(os.path.basename(path))[0],
+                                                  change=modifica)
+                break
+
+
+# Istanza condivisa
+_file_watcher = None
+
+
+def get_file_watcher():
+    """
+    Restituisce il watcher condiviso, se avviato.
+
+    Returns:
+        FileWatcher: Istanza attiva o None
+    """
+    return _file_watcher
+
+
+def start_file_watcher(data_dir=None, assets_dir=None):
+    """
+    Avvia il watcher condiviso su dati e asset e collega i consumatori standard.
+
+    Args:
+        data_dir (str, optional): Directory dei dati (default: quella del DataManager)
+        assets_dir (str, optional): Directory degli asset (default: quella dell'AssetManager)
+
+    Returns:
+        FileWatcher: Istanza avviata o None in caso di errore
+    """
+    global _file_watcher
+    if _file_watcher is not None:
+        return _file_watcher
+    try:
+        from util.data_manager import DATA_DIR, get_data_manager
+        from util.asset_manager import get_asset_manager
+
+        data_dir = data_dir or str(DATA_DIR)
+        assets_dir = assets_dir or get_asset_manager().base_path
+        watcher = FileWatcher(data_dir, assets_dir)
+        _collega_consumatori(watcher.event_bus)
+        watcher.start()
+
+        # Da qui in poi le cache sono invalidate dalle notifiche, senza stat a ogni accesso
+        get_data_manager().enable_change_notifications(True)
+        from server.utils.asset_delivery import get_asset_delivery
+        get_asset_delivery().revalidate_interval = float("inf")
+        _file_watcher = watcher
+        return watcher
+    except Exception as e:
+        logger.error(f"Impossibile avviare il watcher dei file: {e}")
+        return None
+
+
+def stop_file_watcher():
+    """Ferma il watcher condiviso"""
+    global _file_watcher
+    if _file_watcher is None:
+        return
+    _file_watcher.stop()
+    _file_watcher = None
+    try:
+        from util.data_manager import get_data_manager
+        from server.utils.asset_delivery import get_asset_delivery, AssetDelivery
+        get_data_manager().enable_change_notifications(False)
+        get_asset_delivery().revalidate_interval = AssetDelivery().revalidate_interval
+    except Exception as e:
+        logger.error(f"Errore nel ripristino delle cache dopo l'arresto del watcher: {e}")
+
+
+def _collega_consumatori(event_bus):
+    """Sottoscrive i consumatori standard agli eventi di modifica dei file"""
+    from util.data_manager import get_data_manager
+    from util.sprite_sheet_manager import get_sprite_sheet_manager
+    from server.utils.asset_delivery import get_asset_delivery
+
+    data_manager = get_data_manager()
+    sprite_sheets = get_sprite_sheet_manager()
+    asset_delivery = get_asset_delivery()
+
+    def on_data_file_changed(path, **kwargs):
+        data_manager.notify_file_changed(path)
+        # I file delle mappe entrano nella versione dei bundle degli asset
+        asset_delivery.invalidate(path)
+
+    def on_asset_file_changed(path, change, **kwargs):
+        asset_delivery.invalidate(path)
+        if path.lower().endswith(".json") and path.startswith(sprite_sheets.base_path + os.sep):
+            sprite_sheets.reload_sprite_sheet(path, removed=change == CHANGE_DELETED)
+
+    def on_watched_files_resync(**kwargs):
+        # Modifiche perse: l'archivio compilato viene riverificato con gli mtime e le cache svuotate
+        data_manager.reload_data_store()
+        asset_delivery.clear()
+        sprite_sheets.sprite_sheets.clear()
+        sprite_sheets.sprite_to_sheet.clear()
+        sprite_sheets.clear_cache()
+        sprite_sheets.load_all_sprite_sheets()
+
+    event_bus.on(Events.DATA_FILE_CHANGED, on_data_file_changed)
+    event_bus.on(Events.ASSET_FILE_CHANGED, on_asset_file_changed)
+    event_bus.on(Events.WATCHED_FILES_RESYNC, on_watched_files_resync)
@@ -1,11 +1,16 @@
 import json
 import os
 import logging
-import jsonschema
-from typing import Dict, Any, List, Optional, Union, Set
-from jsonschema import validate, ValidationError, SchemaError
+from typing import Dict, Any, List, Optional, Union, Set, Callable
 from pathlib import Path
 
+from util.schema_compiler import compile_schema, UnsupportedSchema
+
+try:
+    import jsonschema
+except ImportError:  # Necessario solo per gli schemi non gestiti dal compilatore
+    jsonschema = None
+
 # Configura il logger
 logger = logging.getLogger(__name__)
 
@@ -15,6 +20,9 @@ SCHEMAS_DIR = Path(os.path.join(os.path.dirname(os.path.dirname(__file__)), "dat
 # Cache per gli schemi JSON
 _schema_cache: Dict[str, Dict] = {}
 
+# Cache dei validatori compilati (uno per schema)
+_validator_cache: Dict[str, Callable[[Any], List[str]]] = {}
+
 # Mapping di file specifici a schemi personalizzati
 FILE_TO_SCHEMA_MAPPING = {
     "mappe_npg.json": "mappa_npg",
@@ -53,6 +61,59 @@ def load_schema(entity_type: str) -> Dict:
         logger.error(f"Errore nel caricamento dello schema {schema_path}: {str(e)}")
         raise
 
+def clear_schema_cache(entity_type: Optional[str] = None) -> None:
+    """
+    Svuota la cache degli schemi e dei validatori compilati.
+    
+    Args:
+        entity_type: Tipo di entità da rimuovere (se None, svuota tutto)
+    """
+    if entity_type is None:
+        _schema_cache.clear()
+        _validator_cache.clear()
+    else:
+        _schema_cache.pop(entity_type, None)
+        _validator_cache.pop(entity_type, None)
+
+def _jsonschema_validator(schema: Dict) -> Callable[[Any], List[str]]:
+    """Crea un validatore generico con jsonschema (controllo dello schema eseguito una sola volta)."""
+    if jsonschema is None:
+        raise ImportError("Il modulo jsonschema è necessario per validare questo schema")
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+    
+    def validate(value):
+        return [error.message for error in validator.iter_errors(value)]
+    
+    return validate
+
+def get_validator(entity_type: str) -> Callable[[Any], List[str]]:
+    """
+    Restituisce il validatore compilato per un tipo di entità.
+    
+    Lo schema viene compilato una sola volta in una funzione Python specializzata;
+    se usa parole chiave non supportate dal compilatore si ricade su jsonschema.
+    
+    Args:
+        entity_type: Tipo di entità (nome dello schema)
+        
+    Returns:
+        Callable: Funzione che riceve un valore e restituisce la lista degli errori
+    """
+    validator = _validator_cache.get(entity_type)
+    if validator is not None:
+        return validator
+    
+    schema = load_schema(entity_type)
+    try:
+        validator = compile_schema(schema)
+    except UnsupportedSchema as e:
+        logger.info(f"Schema {entity_type} non compilabile ({e}), uso di jsonschema")
+        validator = _jsonschema_validator(schema)
+    _validator_cache[entity_type] = validator
+    return validator
+
 def validate_data(data: Union[Dict, List], entity_type: str, file_name: Optional[str] = None) -> List[str]:
     """
     Valida i dati contro uno schema JSON.
@@ -76,26 +137,20 @@ def validate_data(data: Union[Dict, List], entity_type: str, file_name: Optional
             schema_type = FILE_TO_SCHEMA_MAPPING[file_name]
             logger.debug(f"Utilizzo schema specifico '{schema_type}' per il file {file_name}")
         
-        schema = load_schema(schema_type)
+        validator = get_validator(schema_type)
         
         # Per le liste, valida ogni elemento
         if isinstance(data, list):
             for i, item in enumerate(data):
-                try:
-                    validate(item, schema)
-                except ValidationError as e:
-                    errors.append(f"Errore nell'elemento {i}: {e.message}")
+                for message in validator(item):
+                    errors.append(f"Errore nell'elemento {i}: {message}")
         else:
             # Per i dizionari, valida l'intero dizionario
-            try:
-                validate(data, schema)
-            except ValidationError as e:
-                errors.append(f"Errore di validazione: {e.message}")
+            for message in validator(data):
+                errors.append(f"Errore di validazione: {message}")
                 
     except FileNotFoundError as e:
         errors.append(str(e))
-    except SchemaError as e:
-        errors.append(f"Errore nello schema: {str(e)}")
     except Exception as e:
         errors.append(f"Errore imprevisto: {str(e)}")
         
@@ -213,7 +268,8 @@ def generate_schema_from_data(data: Dict, entity_type: str, overwrite: bool = Fa
         with open(schema_path, 'w', encoding='utf-8') as f:
             json.dump(schema, f, indent=2, ensure_ascii=False)
             logger.info(f"Schema generato con successo per {entity_type}: {schema_path}")
-            return True
+        clear_schema_cache(entity_type)
+        return True
     except Exception as e:
         logger.error(f"Errore durante la scrittura dello schema {schema_path}: {str(e)}")
         return False 
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+Flussi di numeri casuali deterministici per sessione.
+
+Ogni mondo (e quindi ogni sessione) possiede un FlussiCasuali con un seme
+proprio; da quel seme vengono derivati flussi indipendenti per nome
+("dadi", "combattimento", "render", "mappa", ...), così che un
+sottosistema che consuma più numeri non sposti i tiri degli altri. Lo
+stato dei flussi viene salvato nello snapshot della sessione e
+ripristinato al caricamento, quindi una partita ripresa continua con gli
+stessi tiri.
+
+Il codice che non riceve un generatore esplicito usa generatore(): il
+flusso della sessione attiva nel thread corrente (impostata da
+server.utils.session.get_session) o, senza sessione, il modulo random.
+
+Variabili d'ambiente:
+    GIOCO_RPG_SEED   seme di tutti i nuovi mondi (per benchmark e test riproducibili)
+"""
+
+import array
+import base64
+import hashlib
+import logging
+import os
+import random
+import secrets
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Flusso usato quando non viene indicato un nome
+FLUSSO_PREDEFINITO = "dadi"
+
+_locale = threading.local()
+
+
+def seme_iniziale():
+    """
+    Restituisce il seme di un nuovo mondo.
+
+    Returns:
+        int: GIOCO_RPG_SEED se impostata, altrimenti 64 bit casuali
+    """
+    valore = os.environ.get("GIOCO_RPG_SEED")
+    if valore:
+        try:
+            return int(valore)
+        except ValueError:
+            logger.warning(f"GIOCO_RPG_SEED non valido ({valore}), uso un seme casuale")
+    return secrets.randbits(64)
+
+
+def _deriva_seme(seme, nome):
+    digest = hashlib.sha256(f"{seme}:{nome}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _codifica_stato(stato):
+    versione, interni, gauss = stato
+    return {"versione": versione, "stato": base64.b64encode(array.array("I", interni).tobytes()).decode("ascii"),
+            "gauss": gauss}
+
+
+def _decodifica_stato(dati):
+    interni = array.array("I")
+    interni.frombytes(base64.b64decode(dati["stato"]))
+    return dati["versione"], tuple(interni), dati.get("gauss")
+
+
+class FlussiCasuali:
+    """
+    Insieme di flussi casuali indipendenti derivati da un unico seme.
+    """
+
+    def __init__(self, seme=None):
+        """
+        Args:
+            seme (int, optional): Seme della sessione (default: seme_iniziale())
+        """
+        self.seme = seme_iniziale() if seme is None else seme
+        self._flussi = {}
+        self._flussi_numpy = {}
+        self._lock = threading.Lock()
+
+    def flusso(self, nome=FLUSSO_PREDEFINITO):
+        """
+        Restituisce il flusso con il nome dato, creandolo se necessario.
+
+        Args:
+            nome (str): Nome del sottosistema
+
+        Returns:
+            random.Random: Generatore del flusso
+        """
+        flusso = self._flussi.get(nome)
+        if flusso is None:
+            with self._lock:
+                flusso = self._flussi.get(nome)
+                if flusso is None:
+                    flusso = self._flussi[nome] = random.Random(_deriva_seme(self.seme, nome))
+        return flusso
+
+    def numpy(self, nome=FLUSSO_PREDEFINITO):
+        """
+        Restituisce un Generator NumPy indipendente per estrazioni vettoriali.
+
+        Args:
+            nome (str): Nome del sottosistema
+
+        Returns:
+            numpy.random.Generator: Generatore del flusso
+
+        Raises:
+            ImportError: Se NumPy non è installato
+        """
+        import numpy as np
+        generatore = self._flussi_numpy.get(nome)
+        if generatore is None:
+            with self._lock:
+                generatore = self._flussi_numpy.get(nome)
+                if generatore is None:
+                    generatore = np.random.default_rng(_deriva_seme(self.seme, f"numpy:{nome}"))
+                    self._flussi_numpy[nome] = generatore
+        return generatore
+
+    def interi(self, minimo, massimo, numero, nome=FLUSSO_PREDEFINITO):
+        """
+        Estrae in blocco interi uniformi in [minimo, massimo].
+
+        Args:
+            minimo (int): Valore minimo
+            massimo (int): Valore massimo (incluso)
+            numero (int): Quanti valori estrarre
+            nome (str): Nome del flusso
+
+        Returns:
+            list: Valori estratti
+        """
+        return self.flusso(nome).choices(range(minimo, massimo + 1), k=numero)
+
+    def tira(self, facce, numero=1, nome=FLUSSO_PREDEFINITO):
+        """Tira in blocco numero dadi a facce facce"""
+        return self.interi(1, facce, numero, nome)
+
+    def to_dict(self):
+        """
+        Stato serializzabile in JSON: seme e posizione di ogni flusso usato.
+
+        Returns:
+            dict: Dati dei flussi
+        """
+        dati = {"seme": self.seme,
+                "flussi": {nome: _codifica_stato(flusso.getstate()) for nome, flusso in self._flussi.items()}}
+        if self._flussi_numpy:
+            dati["flussi_numpy"] = {nome: generatore.bit_generator.state
+                                    for nome, generatore in self._flussi_numpy.items()}
+        return dati
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Ripristina i flussi salvati con to_dict.
+
+        Args:
+            data (dict): Dati dei flussi
+
+        Returns:
+            FlussiCasuali: Flussi nella posizione in cui erano stati salvati
+        """
+        flussi = cls(data.get("seme"))
+        for nome, stato in data.get("flussi", {}).items():
+            try:
+                flussi.flusso(nome).setstate(_decodifica_stato(stato))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Stato del flusso casuale {nome} non valido ({e}), riparte dal seme")
+        for nome, stato in data.get("flussi_numpy", {}).items():
+            try:
+                flussi.numpy(nome).bit_generator.state = stato
+            except ImportError:
+                break
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Stato del flusso NumPy {nome} non valido ({e}), riparte dal seme")
+        return flussi
+
+
+def attiva(flussi):
+    """
+    Rende flussi quelli della sessione attiva nel thread corrente.
+
+    Args:
+        flussi (FlussiCasuali): Flussi da attivare (None per disattivare)
+
+    Returns:
+        FlussiCasuali: Flussi attivi in precedenza
+    """
+    precedenti = getattr(_locale, "flussi", None)
+    _locale.flussi = flussi
+    return precedenti
+
+
+def flussi_attivi():
+    """Restituisce i flussi della sessione attiva nel thread corrente (o None)"""
+    return getattr(_locale, "flussi", None)
+
+
+def generatore(nome=FLUSSO_PREDEFINITO):
+    """
+    Restituisce il generatore da usare quando non ne viene passato uno.
+
+    Args:
+        nome (str): Nome del flusso
+
+    Returns:
+        random.Random: Flusso della sessione attiva, oppure il modulo random
+    """
+    flussi = getattr(_locale, "flussi", None)
+    return flussi.flusso(nome) if flussi is not None else random
+
+
+def generatore_di(world, nome=FLUSSO_PREDEFINITO):
+    """
+    Restituisce il flusso di un mondo, o quello della sessione attiva.
+
+    Args:
+        world: Mondo ECS (può non avere flussi propri, es. nei test)
+        nome (str): Nome del flusso
+
+    Returns:
+        random.Random: Generatore da usare
+    """
+    flussi = getattr(world, "rng", None)
+    if isinstance(flussi, FlussiCasuali):
+        return flussi.flusso(nome)
+    return generatore(nome)
@@ -0,0 +1,242 @@
+"""
+Compilatore di schemi JSON in funzioni di validazione Python.
+
+Ogni schema viene tradotto una sola volta in codice Python specializzato
+(controlli di tipo, chiavi obbligatorie, proprietà aggiuntive, limiti
+numerici e di lunghezza, enum, riferimenti locali "#/definitions/...").
+La funzione risultante restituisce la lista degli errori trovati, senza
+interpretare lo schema a ogni chiamata.
+
+Sono supportate le parole chiave usate dagli schemi in data/schemas; uno
+schema che ne usa altre solleva UnsupportedSchema e il chiamante può
+ricadere su un validatore generico (jsonschema).
+"""
+
+import logging
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Parole chiave descrittive, ignorate durante la validazione
+ANNOTATION_KEYWORDS = {"$schema", "$id", "$comment", "title", "description", "definitions",
+                       "default", "examples"}
+
+# Parole chiave tradotte in codice
+SUPPORTED_KEYWORDS = {"type", "enum", "const", "properties", "required", "additionalProperties",
+                      "items", "additionalItems", "minItems", "maxItems", "minimum", "maximum",
+                      "minLength", "maxLength", "$ref"}
+
+# Condizioni Python per i tipi JSON (x è il valore validato)
+_TYPE_CHECKS = {
+    "object": "isinstance(x, dict)",
+    "array": "isinstance(x, list)",
+    "string": "isinstance(x, str)",
+    "boolean": "isinstance(x, bool)",
+    "null": "x is None",
+    "integer": "((isinstance(x, int) and not isinstance(x, bool)) or (isinstance(x, float) and x.is_integer()))",
+    "number": "(isinstance(x, (int, float)) and not isinstance(x, bool))",
+}
+
+_NUMBER = _TYPE_CHECKS["number"]
+
+
+class UnsupportedSchema(Exception):
+    """Lo schema usa parole chiave non gestite dal compilatore"""
+
+
+def _percorso(path):
+    """Formatta il percorso di un valore per i messaggi di errore"""
+    return "/".join(str(p) for p in path) if path else "<radice>"
+
+
+class _Compiler:
+    """Genera il sorgente delle funzioni di validazione di uno schema e dei suoi sottoschemi"""
+
+    def __init__(self, root):
+        self.root = root
+        self.functions = {}  # id(schema) -> nome della funzione
+        self.sources = []
+        self.constants = {}
+        self._pending = []
+
+    def compile(self):
+        entry = self.function_for(self.root)
+        while self._pending:
+            schema, name = self._pending.pop()
+            self.sources.append(self._function_source(schema, name))
+        return entry
+
+    def function_for(self, schema):
+        """Restituisce il nome della funzione per uno schema, generandola se necessario"""
+        if id(schema) not in self.functions:
+            name = f"_v{len(self.functions)}"
+            self.functions[id(schema)] = name
+            self._pending.append((schema, name))
+        return self.functions[id(schema)]
+
+    def constant(self, value):
+        name = f"_C{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def _resolve(self, ref):
+        if not ref.startswith("#"):
+            raise UnsupportedSchema(f"Riferimento non locale: {ref}")
+        target = self.root
+        for parte in [p for p in ref[1:].split("/") if p]:
+            parte = parte.replace("~1", "/").replace("~0", "~")
+            if isinstance(target, dict) and parte in target:
+                target = target[parte]
+            elif isinstance(target, list) and parte.isdigit() and int(parte) < len(target):
+                target = target[int(parte)]
+            else:
+                raise UnsupportedSchema(f"Riferimento non risolvibile: {ref}")
+        return target
+
+    def _function_source(self, schema, name):
+        lines = [f"def {name}(x, p, e):"]
+        body = self._body(schema)
+        lines.extend("    " + line for line in body or ["pass"])
+        return "\n".join(lines)
+
+    def _body(self, schema):
+        if schema is True or schema == {}:
+            return []
+        if schema is False:
+            return ["e.append(f'{_percorso(p)}: nessun valore ammesso')"]
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(f"Schema non valido: {schema!r}")
+
+        sconosciute = set(schema) - SUPPORTED_KEYWORDS - ANNOTATION_KEYWORDS
+        if sconosciute:
+            raise UnsupportedSchema(f"Parole chiave non supportate: {sorted(sconosciute)}")
+
+        out = []
+        if "$ref" in schema:
+            # In draft-07 le parole chiave accanto a $ref vengono ignorate
+            return [f"{self.function_for(self._resolve(schema['$ref']))}(x, p, e)"]
+
+        if "type" in schema:
+            tipi = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+            condizioni = []
+            for tipo in tipi:
+                if tipo not in _TYPE_CHECKS:
+                    raise UnsupportedSchema(f"Tipo sconosciuto: {tipo}")
+                condizioni.append(_TYPE_CHECKS[tipo])
+            atteso = self.constant(" o ".join(tipi))
+            out += [f"if not ({' or '.join(condizioni)}):",
+                    f"    e.append(f'{{_percorso(p)}}: {{x!r}} non è di tipo {{{atteso}}}')",
+                    "    return"]
+
+        if "enum" in schema:
+            valori = self.constant(schema["enum"])
+            out += [f"if x not in {valori}:",
+                    f"    e.append(f'{{_percorso(p)}}: {{x!r}} non è tra i valori ammessi {{{valori}}}')"]
+        if "const" in schema:
+            valore = self.constant(schema["const"])
+            out += [f"if x != {valore}:",
+                    f"    e.append(f'{{_percorso(p)}}: atteso {{{valore}!r}}')"]
+
+        out += self._object_checks(schema)
+        out += self._array_checks(schema)
+
+        numerici = []
+        if "minimum" in schema:
+            numerici += [f"if x < {schema['minimum']!r}:",
+                         f"    e.append(f'{{_percorso(p)}}: {{x!r}} è minore del minimo {schema['minimum']!r}')"]
+        if "maximum" in schema:
+            numerici += [f"if x > {schema['maximum']!r}:",
+                         f"    e.append(f'{{_percorso(p)}}: {{x!r}} è maggiore del massimo {schema['maximum']!r}')"]
+        if numerici:
+            out += [f"if {_NUMBER}:"] + ["    " + line for line in numerici]
+
+        stringhe = []
+        if "minLength" in schema:
+            stringhe += [f"if len(x) < {int(schema['minLength'])}:",
+                         f"    e.append(f'{{_percorso(p)}}: stringa più corta di {int(schema['minLength'])} caratteri')"]
+        if "maxLength" in schema:
+            stringhe += [f"if len(x) > {int(schema['maxLength'])}:",
+                         f"    e.append(f'{{_percorso(p)}}: stringa più lunga di {int(schema['maxLength'])} caratteri')"]
+        if stringhe:
+            out += ["if isinstance(x, str):"] + ["    " + line for line in stringhe]
+        return out
+
+    def _object_checks(self, schema):
+        checks = []
+        properties = schema.get("properties") or {}
+        for chiave in schema.get("required", []):
+            messaggio = self.constant(f": la proprietà {chiave!r} è obbligatoria")
+            checks += [f"if {chiave!r} not in x:",
+                       f"    e.append(_percorso(p) + {messaggio})"]
+        for chiave, sottoschema in properties.items():
+            checks += [f"if {chiave!r} in x:",
+                       f"    {self.function_for(sottoschema)}(x[{chiave!r}], p + ({chiave!r},), e)"]
+
+        aggiuntive = schema.get("additionalProperties", True)
+        if aggiuntive is not True:
+            noti = self.constant(frozenset(properties))
+            if aggiuntive is False:
+                azione = "e.append(f'{_percorso(p)}: proprietà non ammessa ' + repr(k))"
+            else:
+                azione = f"{self.function_for(aggiuntive)}(v, p + (k,), e)"
+            checks += ["for k, v in x.items():",
+                       f"    if k not in {noti}:",
+                       f"        {azione}"]
+        return ["if isinstance(x, dict):"] + ["    " + line for line in checks] if checks else []
+
+    def _array_checks(self, schema):
+        checks = []
+        if "minItems" in schema:
+            checks += [f"if len(x) < {int(schema['minItems'])}:",
+                       f"    e.append(f'{{_percorso(p)}}: meno di {int(schema['minItems'])} elementi')"]
+        if "maxItems" in schema:
+            checks += [f"if len(x) > {int(schema['maxItems'])}:",
+                       f"    e.append(f'{{_percorso(p)}}: più di {int(schema['maxItems'])} elementi')"]
+
+        items = schema.get("items", True)
+        if isinstance(items, list):
+            # Validazione posizionale (tupla)
+            for indice, sottoschema in enumerate(items):
+                checks += [f"if len(x) > {indice}:",
+                           f"    {self.function_for(sottoschema)}(x[{indice}], p + ({indice},), e)"]
+            aggiuntivi = schema.get("additionalItems", True)
+            if aggiuntivi is False:
+                checks += [f"if len(x) > {len(items)}:",
+                           "    e.append(f'{_percorso(p)}: elementi aggiuntivi non ammessi')"]
+            elif aggiuntivi is not True:
+                checks += [f"for i in range({len(items)}, len(x)):",
+                           f"    {self.function_for(aggiuntivi)}(x[i], p + (i,), e)"]
+        elif items is not True and items != {}:
+            checks += ["for i, v in enumerate(x):",
+                       f"    {self.function_for(items)}(v, p + (i,), e)"]
+        return ["if isinstance(x, list):"] + ["    " + line for line in checks] if checks else []
+
+
+def compile_schema(schema: Dict) -> Callable[[Any], List[str]]:
+    """
+    Compila uno schema JSON in una funzione di validazione.
+
+    Args:
+        schema: Schema JSON (draft-07, sottoinsieme usato dal gioco)
+
+    Returns:
+        Callable: Funzione che riceve un valore e restituisce la lista degli errori
+
+    Raises:
+        UnsupportedSchema: Se lo schema usa parole chiave non supportate
+    """
+    compiler = _Compiler(schema)
+    entry = compiler.compile()
+    sorgente = "\n\n".join(compiler.sources)
+    namespace = dict(compiler.constants, _percorso=_percorso)
+    exec(compile(sorgente, f"<schema {schema.get('title', '') if isinstance(schema, dict) else ''}>", "exec"),
+         namespace)
+    funzione = namespace[entry]
+
+    def validate(value):
+        errori = []
+        funzione(value, (), errori)
+        return errori
+
+    validate.source = sorgente
+    return validate
@@ -0,0 +1,271 @@
+"""
+Simulatore Monte Carlo dei combattimenti, senza stato di gioco né interfaccia.
+
+Applica le stesse regole di AzioniCombattimento.esegui_attacco e di
+GestoreTurni.calcola_iniziativa (d20 + modificatore per colpire contro
+CA 10 + destrezza + armatura, d8 + forza di danno, critico sul 20 con un
+d8 aggiuntivo, iniziativa d20 + destrezza) a un duello fra una classe di
+data/classes/classes.json e un mostro di data/monsters/monsters.json.
+
+Gli incontri di uno stesso scontro avanzano insieme round per round: la
+distribuzione esatta del danno di un attacco viene calcolata una volta e
+i danni di tutti gli incontri ancora in corso vengono estratti in blocco.
+Gli scontri della matrice classi × mostri sono distribuiti su più processi.
+"""
+
+import logging
+import os
+import random
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+from util.dado import compile_dice
+
+logger = logging.getLogger(__name__)
+
+# Numero di incontri simulati per ogni scontro
+DEFAULT_INCONTRI = 5000
+
+# Round oltre i quali un incontro viene considerato un pareggio
+MAX_ROUND = 100
+
+# Parametri di combattimento di un partecipante
+Combattente = namedtuple("Combattente", "nome hp bonus_attacco classe_armatura mod_iniziativa")
+
+
+def modificatore(punteggio):
+    """Modificatore di una caratteristica, come Entita.calcola_modificatore"""
+    return (punteggio - 10) // 2
+
+
+def _classe_armatura(destrezza, ha_armatura):
+    return 10 + modificatore(destrezza) + (2 if ha_armatura else 0)
+
+
+def combattente_da_classe(nome, definizione, livello=1):
+    """
+    Costruisce i parametri di combattimento di una classe personaggio.
+
+    Gli HP seguono Giocatore: hp_base + costituzione, più la media del dado
+    vita di progressione per ogni livello oltre il primo.
+
+    Args:
+        nome (str): Nome della classe
+        definizione (dict): Definizione da classes.json
+        livello (int): Livello del personaggio
+
+    Returns:
+        Combattente: Parametri del personaggio
+    """
+    statistiche = definizione.get("statistiche_base", {})
+    mod_costituzione = modificatore(statistiche.get("costituzione", 10))
+    hp = max(1, definizione.get("hp_base", 10) + mod_costituzione)
+    dado_vita = definizione.get("progressione", {}).get("hp_per_livello", 8)
+    hp += (livello - 1) * max(1, (dado_vita + 1) // 2 + mod_costituzione)
+
+    equipaggiamento = definizione.get("equipaggiamento_iniziale", [])
+    ha_armatura = any("armatura" in str(oggetto).lower() for oggetto in equipaggiamento)
+    return Combattente(nome, hp, modificatore(statistiche.get("forza", 10)),
+                       _classe_armatura(statistiche.get("destrezza", 10), ha_armatura),
+                       modificatore(statistiche.get("destrezza", 10)))
+
+
+def combattente_da_mostro(nome, definizione):
+    """
+    Costruisce i parametri di combattimento di un mostro.
+
+    Args:
+        nome (str): ID del mostro
+        definizione (dict): Definizione da monsters.json
+
+    Returns:
+        Combattente: Parametri del mostro
+    """
+    statistiche = definizione.get("statistiche", {})
+    return Combattente(nome, max(1, statistiche.get("hp", 10)), modificatore(statistiche.get("forza", 10)),
+                       _classe_armatura(statistiche.get("destrezza", 10), bool(definizione.get("armatura"))),
+                       modificatore(statistiche.get("destrezza", 10)))
+
+
+def distribuzione_danno(attaccante, bersaglio):
+    """
+    Distribuzione esatta del danno di un attacco, mancato compreso.
+
+    Args:
+        attaccante (Combattente): Chi attacca
+        bersaglio (Combattente): Chi subisce l'attacco
+
+    Returns:
+        dict: Danno -> peso intero (su 20 * 64 casi equiprobabili)
+    """
+    # Pesi su 64 casi: un d8 conta 8 volte, due d8 (critico) una volta sola
+    normale = {danno: int(p * 8) for danno, p in compile_dice("1d8").distribuzione().items()}
+    critico = {danno: int(p * 64) for danno, p in compile_dice("2d8").distribuzione().items()}
+    bonus_danno = max(0, attaccante.bonus_attacco)
+    pesi = Counter()
+    for tiro in range(1, 21):
+        if tiro == 20:
+            for danno, peso in critico.items():
+                pesi[danno + bonus_danno] += peso
+        elif tiro + attaccante.bonus_attacco >= bersaglio.classe_armatura:
+            for danno, peso in normale.items():
+                pesi[danno + bonus_danno] += peso * 8
+        else:
+            pesi[0] += 64
+    return dict(sorted(pesi.items()))
+
+
+def carica_definizioni():
+    """
+    Carica le definizioni di classi e mostri dai file di dati.
+
+    Returns:
+        tuple: (classi, mostri) come dizionari nome -> definizione
+    """
+    from util.data_manager import get_data_manager
+    data_manager = get_data_manager()
+    return data_manager.get_classes(), data_manager.load_data("mostri", "monsters.json", validate=False) or {}
+
+
+def _percentile(conteggi, frazione):
+    """Percentile di un istogramma {valore: conteggio}"""
+    valori = sorted(conteggi)
+    cumulati = list(accumulate(conteggi[valore] for valore in valori))
+    return valori[bisect_left(cumulati, frazione * cumulati[-1])]
+
+
+def _riepilogo(conteggi):
+    totale = sum(conteggi.values())
+    if not totale:
+        return {"media": 0.0, "p10": 0, "p50": 0, "p90": 0, "istogramma": {}}
+    return {
+        "media": sum(valore * numero for valore, numero in conteggi.items()) / totale,
+        "p10": _percentile(conteggi, 0.1),
+        "p50": _percentile(conteggi, 0.5),
+        "p90": _percentile(conteggi, 0.9),
+        "istogramma": dict(sorted(conteggi.items())),
+    }
+
+
+def simula_scontro(giocatore, mostro, incontri=DEFAULT_INCONTRI, seed=None, max_round=MAX_ROUND):
+    """
+    Simula molti duelli fra un personaggio e un mostro.
+
+    Args:
+        giocatore (Combattente): Personaggio
+        mostro (Combattente): Mostro
+        incontri (int): Numero di incontri
+        seed (optional): Seme del generatore, per risultati riproducibili
+        max_round (int): Round dopo i quali l'incontro finisce in pareggio
+
+    Returns:
+        dict: Percentuali di vittoria, durata (TTK in round) e danni
+    """
+    rng = random.Random(seed)
+    # (danni possibili, pesi cumulati) dell'attacco di ciascun lato
+    attacchi = []
+    for attaccante, bersaglio in ((giocatore, mostro), (mostro, giocatore)):
+        pesi = distribuzione_danno(attaccante, bersaglio)
+        attacchi.append((list(pesi), list(accumulate(pesi.values()))))
+
+    hp = [[giocatore.hp] * incontri, [mostro.hp] * incontri]
+    # Iniziativa: a parità agisce prima il giocatore, come nell'ordinamento stabile di GestoreTurni
+    iniziativa_g = rng.choices(range(1, 21), k=incontri)
+    iniziativa_m = rng.choices(range(1, 21), k=incontri)
+    primo = [0 if g + giocatore.mod_iniziativa >= m + mostro.mod_iniziativa else 1
+             for g, m in zip(iniziativa_g, iniziativa_m)]
+
+    vincitori = Counter()
+    durate = Counter()
+    danni_subiti = Counter()
+    attivi = list(range(incontri))
+    for round_corrente in range(1, max_round + 1):
+        for turno in (0, 1):
+            if not attivi:
+                break
+            # In ogni metà del round attacca il lato che ha vinto l'iniziativa (turno 0) o l'altro
+            attaccanti_mostro = sum(primo[indice] ^ turno for indice in attivi)
+            numero = {0: len(attivi) - attaccanti_mostro, 1: attaccanti_mostro}
+            danni = {lato: iter(rng.choices(attacchi[lato][0], cum_weights=attacchi[lato][1], k=numero[lato]))
+                     for lato in (0, 1)}
+            ancora_attivi = []
+            for indice in attivi:
+                lato = primo[indice] ^ turno
+                bersaglio = 1 - lato
+                hp[bersaglio][indice] = max(0, hp[bersaglio][indice] - next(danni[lato]))
+                if hp[bersaglio][indice] == 0:
+                    vincitori[lato] += 1
+                    durate[round_corrente] += 1
+                else:
+                    ancora_attivi.append(indice)
+            attivi = ancora_attivi
+        if not attivi:
+            break
+    for indice in attivi:
+        durate[max_round] += 1
+
+    for indice in range(incontri):
+        danni_subiti[giocatore.hp - hp[0][indice]] += 1
+
+    return {
+        "classe": giocatore.nome,
+        "mostro": mostro.nome,
+        "incontri": incontri,
+        "vittorie": vincitori[0] / incontri,
+        "sconfitte": vincitori[1] / incontri,
+        "pareggi": len(attivi) / incontri,
+        "ttk": _riepilogo(durate),
+        "danni_subiti": _riepilogo(danni_subiti),
+    }
+
+
+def _simula_da_argomenti(argomenti):
+    """Punto di ingresso per i processi del pool"""
+    return simula_scontro(*argomenti)
+
+
+def simula_matrice(classi=None, mostri=None, incontri=DEFAULT_INCONTRI, seed=None, livello=1,
+                   processi=None, max_round=MAX_ROUND):
+    """
+    Simula tutti gli scontri classe × mostro.
+
+    Args:
+        classi (dict, optional): Definizioni delle classi (default: classes.json)
+        mostri (dict, optional): Definizioni dei mostri (default: monsters.json)
+        incontri (int): Incontri per scontro
+        seed (optional): Seme base; ogni scontro usa un seme derivato dal proprio nome
+        livello (int): Livello dei personaggi
+        processi (int, optional): Processi da usare (default: numero di CPU, 1 = nel processo corrente)
+        max_round (int): Round dopo i quali un incontro finisce in pareggio
+
+    Returns:
+        list: Risultati di simula_scontro, con la difficoltà del mostro
+    """
+    if classi is None or mostri is None:
+        classi_dati, mostri_dati = carica_definizioni()
+        classi = classi if classi is not None else classi_dati
+        mostri = mostri if mostri is not None else mostri_dati
+
+    scontri = []
+    for nome_mostro, mostro in mostri.items():
+        for nome_classe, classe in classi.items():
+            seme = None if seed is None else f"{seed}:{nome_classe}:{nome_mostro}"
+            scontri.append((combattente_da_classe(nome_classe, classe, livello),
+                            combattente_da_mostro(nome_mostro, mostro), incontri, seme, max_round))
+
+    processi = processi or os.cpu_count() or 1
+    risultati = None
+    if processi > 1 and len(scontri) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(processi, len(scontri))) as executor:
+                risultati = list(executor.map(_simula_da_argomenti, scontri))
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Pool di processi non disponibile ({e}), simulazione nel processo corrente")
+    if risultati is None:
+        risultati = [_simula_da_argomenti(argomenti) for argomenti in scontri]
+
+    for risultato in risultati:
+        risultato["difficolta"] = mostri[risultato["mostro"]].get("difficolta")
+    return risultati
@@ -11,6 +11,8 @@ import weakref
 from typing import Dict, List, Optional, Tuple, Union, Any
 from functools import lru_cache
 
+from util.atlas_packer import load_sprites, pack_rects
+
 logger = logging.getLogger(__name__)
 
 class SpriteSheetManager:
@@ -118,7 +120,8 @@ class SpriteSheetManager:
                 "image": image_path,
                 "frames": metadata.get("frames", {}),
                 "animations": metadata.get("animations", {}),
-                "meta": metadata.get("meta", {})
+                "meta": metadata.get("meta", {}),
+                "metadata_path": str(metadata_path)
             }
             
             # Aggiorna la mappatura degli sprite
@@ -243,11 +246,16 @@ class SpriteSheetManager:
     
     def _pack_sprites_in_sheet(self, sprites, sheet_image, metadata, image_path, json_path):
         """
-        Posiziona gli sprite su uno sheet utilizzando un algoritmo di packing semplice.
+        Posiziona gli sprite su uno o più sheet con l'algoritmo MaxRects.
+        
+        Gli sprite vengono decodificati e ritagliati dei bordi trasparenti in
+        parallelo, ordinati per altezza/area e distribuiti sulle pagine: quando
+        una pagina è piena viene creato un ulteriore sheet ("<id>-1", "<id>-2", ...)
+        invece di scartare gli sprite.
         
         Args:
             sprites (list): Lista di percorsi agli sprite.
-            sheet_image (PIL.Image): Immagine dello sheet.
+            sheet_image (PIL.Image): Immagine dello sheet (prima pagina).
             metadata (dict): Metadati dello sheet.
             image_path (str): Percorso output immagine.
             json_path (str): Percorso output JSON.
@@ -258,88 +266,208 @@ class SpriteSheetManager:
         try:
             from PIL import Image
             
-            # Larghezza e altezza totali dello sheet
-            sheet_width, sheet_height = sheet_image.size
+            # Decodifica e ritaglio dei bordi trasparenti (in parallelo)
+            loaded = {}
+            for sprite in load_sprites(sprites):
+                sprite_name = os.path.splitext(os.path.basename(sprite["path"]))[0]
+                loaded[sprite_name] = sprite
             
-            # Posiziona gli sprite sull'immagine
-            x, y = 0, 0
-            max_height = 0
+            # Distribuisci gli sprite sulle pagine
+            pages = pack_rects({name: sprite["size"] for name, sprite in loaded.items()}, sheet_image.size)
+            if not pages:
+                pages = [{"size": sheet_image.size, "placements": {}}]
             
-            for sprite_path in sprites:
-                try:
-                    # Apri l'immagine dello sprite
-                    sprite_image = Image.open(sprite_path)
-                    sprite_width, sprite_height = sprite_image.size
-                    
-                    # Se l'immagine è troppo grande per la riga corrente, vai alla riga successiva
-                    if x + sprite_width > sheet_width:
-                        x = 0
-                        y += max_height
-                        max_height = 0
-                    
-                    # Se l'immagine è troppo grande per lo sheet, salta
-                    if y + sprite_height > sheet_height:
-                        logger.warning(f"Sprite {sprite_path} troppo grande per lo sheet, saltato.")
-                        continue
-                    
-                    # Incolla lo sprite nello sheet
-                    sheet_image.paste(sprite_image, (x, y))
-                    
-                    # Aggiorna l'altezza massima per questa riga
-                    max_height = max(max_height, sprite_height)
-                    
-                    # Aggiungi le informazioni dello sprite ai metadati
-                    sprite_name = os.path.splitext(os.path.basename(sprite_path))[0]
-                    frame_id = f"{sprite_name}"
+            sheet_id = metadata["id"]
+            output_base = image_path[:-len(".png")] if image_path.endswith(".png") else image_path
+            json_base = os.path.splitext(json_path)[0]
+            # File di tutte le pagine, registrati nei metadati della prima: alla prossima
+            # ricostruzione si eliminano esattamente questi, non file con nomi simili
+            page_files = [
+                {"id": sheet_id if indice == 0 else f"{sheet_id}-{indice}",
+                 "image": os.path.basename(image_path if indice == 0 else f"{output_base}-{indice}.png"),
+                 "json": os.path.basename(json_path if indice == 0 else f"{json_base}-{indice}.json")}
+                for indice in range(len(pages))
+            ]
+            # Le pagine della versione precedente vengono sostituite: niente frame obsoleti nel registro
+            precedenti = self._pagine_registrate(sheet_id, image_path, json_path)
+            self._rimuovi_dal_registro([pagina["id"] for pagina in precedenti])
+            for page_index, page in enumerate(pages):
+                # La prima pagina mantiene id e percorsi originali
+                if page_index == 0:
+                    page_id, page_image_path, page_json_path = sheet_id, image_path, json_path
+                    page_image = sheet_image
+                    if page["size"] != sheet_image.size:
+                        page_image = Image.new("RGBA", page["size"], (0, 0, 0, 0))
+                else:
+                    page_id = f"{sheet_id}-{page_index}"
+                    page_image_path = f"{output_base}-{page_index}.png"
+                    page_json_path = f"{json_base}-{page_index}.json"
+                    page_image = Image.new("RGBA", page["size"], (0, 0, 0, 0))
+                
+                page_metadata = dict(metadata)
+                page_metadata.update({
+                    "id": page_id,
+                    "image": os.path.basename(page_image_path),
+                    "frames": {},
+                    "meta": dict(metadata.get("meta", {}),
+                                 size={"w": page["size"][0], "h": page["size"][1]},
+                                 page=page_index,
+                                 pages=len(pages))
+                })
+                if page_index == 0:
+                    page_metadata["meta"]["page_files"] = page_files
+                
+                for frame_id, (x, y) in page["placements"].items():
+                    sprite = loaded[frame_id]
+                    sprite_width, sprite_height = sprite["size"]
+                    sprite_image = Image.frombytes("RGBA", sprite["size"], sprite["pixels"])
+                    page_image.paste(sprite_image, (x, y))
                     
-                    metadata["frames"][frame_id] = {
+                    bbox = sprite["bbox"]
+                    source_width, source_height = sprite["source_size"]
+                    page_metadata["frames"][frame_id] = {
                         "frame": {"x": x, "y": y, "w": sprite_width, "h": sprite_height},
-                        "spriteSourceSize": {"x": 0, "y": 0, "w": sprite_width, "h": sprite_height},
-                        "sourceSize": {"w": sprite_width, "h": sprite_height},
+                        "spriteSourceSize": {"x": bbox[0], "y": bbox[1], "w": sprite_width, "h": sprite_height},
+                        "sourceSize": {"w": source_width, "h": source_height},
                         "rotated": False,
-                        "trimmed": False
+                        "trimmed": (sprite_width, sprite_height) != (source_width, source_height)
                     }
-                    
-                    # Aggiorna la posizione per il prossimo sprite
-                    x += sprite_width
-                    
-                except Exception as e:
-                    logger.error(f"Errore nell'aggiunta dello sprite {sprite_path}: {e}")
-                    continue
-            
-            # Salva l'immagine dello sprite sheet
-            sheet_image.save(image_path, optimize=True)
-            
-            # Salva i metadati in formato JSON
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, indent=2)
-            
-            # Aggiorna il dizionario degli sprite sheet
-            sheet_id = metadata["id"]
-            self.sprite_sheets[sheet_id] = {
-                "id": sheet_id,
-                "image": image_path,
-                "frames": metadata["frames"],
-                "animations": metadata.get("animations", {}),
-                "meta": metadata.get("meta", {})
-            }
+                
+                self._save_sprite_sheet_page(page_image, page_metadata, page_image_path, page_json_path)
             
-            # Aggiorna la mappatura degli sprite
-            for frame_id, frame_data in metadata["frames"].items():
-                self.sprite_to_sheet[frame_id] = {
-                    "sheet_id": sheet_id,
-                    "frame": frame_data
-                }
+            # Se lo sheet si è ridotto elimina le pagine in eccesso della versione precedente
+            self._rimuovi_pagine_obsolete(sheet_id, precedenti, page_files, os.path.dirname(json_path))
             
             # Pulisci la cache lru
             self.get_sprite_info.cache_clear()
             
-            logger.info(f"Sprite sheet creato con successo: {sheet_id} ({len(metadata['frames'])} sprites)")
+            logger.info(f"Sprite sheet creato con successo: {sheet_id} ({len(loaded)} sprites su {len(pages)} pagine)")
             return True
         
         except Exception as e:
             logger.error(f"Errore nel packing degli sprite: {e}")
             return False
+    
+    def _save_sprite_sheet_page(self, page_image, metadata, image_path, json_path):
+        """
+        Salva una pagina di sprite sheet e la registra nel gestore.
+        
+        Args:
+            page_image (PIL.Image): Immagine della pagina.
+            metadata (dict): Metadati della pagina.
+            image_path (str): Percorso output immagine.
+            json_path (str): Percorso output JSON.
+        """
+        # Salva l'immagine dello sprite sheet
+        page_image.save(image_path, optimize=True)
+        
+        # Salva i metadati in formato JSON
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+        
+        # Aggiorna il dizionario degli sprite sheet
+        sheet_id = metadata["id"]
+        self.sprite_sheets[sheet_id] = {
+            "id": sheet_id,
+            "image": image_path,
+            "frames": metadata["frames"],
+            "animations": metadata.get("animations", {}),
+            "meta": metadata.get("meta", {}),
+            "metadata_path": json_path
+        }
+        
+        # Aggiorna la mappatura degli sprite
+        for frame_id, frame_data in metadata["frames"].items():
+            self.sprite_to_sheet[frame_id] = {
+                "sheet_id": sheet_id,
+                "frame": frame_data
+            }
+            
+    def _pagine_registrate(self, sheet_id, image_path, json_path):
+        """
+        Restituisce i file delle pagine di uno sprite sheet secondo i suoi metadati.
+        
+        Args:
+            sheet_id (str): ID dello sprite sheet.
+            image_path (str): Percorso dell'immagine della prima pagina.
+            json_path (str): Percorso dei metadati della prima pagina.
+            
+        Returns:
+            list: Voci {"id", "image", "json"} delle pagine (vuota se lo sheet non esiste).
+        """
+        info = self.sprite_sheets.get(sheet_id)
+        meta = info.get("meta") if info else None
+        if meta is None:
+            if not os.path.isfile(json_path):
+                return []
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f).get("meta")
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning(f"Metadati dello sprite sheet {sheet_id} illeggibili: {e}")
+                meta = None
+        meta = meta or {}
+        if meta.get("page_files"):
+            return list(meta["page_files"])
+        
+        # Metadati senza elenco dei file: le pagine seguono il numero registrato
+        image_base = os.path.splitext(os.path.basename(image_path))[0]
+        json_base = os.path.splitext(os.path.basename(json_path))[0]
+        return [
+            {"id": sheet_id if indice == 0 else f"{sheet_id}-{indice}",
+             "image": f"{image_base}.png" if indice == 0 else f"{image_base}-{indice}.png",
+             "json": f"{json_base}.json" if indice == 0 else f"{json_base}-{indice}.json"}
+            for indice in range(meta.get("pages") or 1)
+        ]
+    
+    def _rimuovi_dal_registro(self, sheet_ids):
+        """
+        Rimuove sprite sheet e relativi sprite dal registro.
+        
+        Args:
+            sheet_ids (list): ID degli sprite sheet da rimuovere.
+        """
+        sheet_ids = set(sheet_ids)
+        for sheet_id in sheet_ids:
+            self.sprite_sheets.pop(sheet_id, None)
+        self.sprite_to_sheet = {sprite_id: data for sprite_id, data in self.sprite_to_sheet.items()
+                                if data["sheet_id"] not in sheet_ids}
+        self.clear_cache()
+    
+    def _rimuovi_pagine_obsolete(self, sheet_id, precedenti, correnti, directory):
+        """
+        Elimina file e voci di registro delle pagine della versione precedente
+        che non fanno più parte dello sprite sheet.
+        
+        Args:
+            sheet_id (str): ID dello sprite sheet.
+            precedenti (list): Pagine della versione precedente (vedi _pagine_registrate).
+            correnti (list): Pagine dello sheet appena generato.
+            directory (str): Directory dei file delle pagine.
+            
+        Returns:
+            list: ID delle pagine rimosse.
+        """
+        file_correnti = {nome for pagina in correnti for nome in (pagina["image"], pagina["json"])}
+        id_correnti = {pagina["id"] for pagina in correnti}
+        obsolete = set()
+        for pagina in precedenti:
+            if pagina["id"] not in id_correnti:
+                obsolete.add(pagina["id"])
+            for nome in (pagina["image"], pagina["json"]):
+                if nome in file_correnti:
+                    continue
+                path = os.path.join(directory, nome)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Impossibile eliminare la pagina obsoleta {path}: {e}")
+        if obsolete:
+            self._rimuovi_dal_registro(obsolete)
+            logger.info(f"Rimosse {len(obsolete)} pagine obsolete dello sprite sheet {sheet_id}")
+        return sorted(obsolete)
             
     def generate_sprite_sheet_from_directory(self, directory, sheet_id=None, recursive=False):
         """
@@ -456,16 +584,41 @@ class SpriteSheetManager:
             sheet_info = self.get_or_load_sprite_sheet(sheet_id)
             
             if sheet_info:
+                frame_data = sprite_info["frame"]
                 return {
                     "type": "spritesheet",
                     "sheet_url": sheet_info["image"],
-                    "frame": sprite_info["frame"]["frame"]
+                    "frame": frame_data["frame"],
+                    # Offset del ritaglio dei bordi trasparenti rispetto all'immagine originale
+                    "spriteSourceSize": frame_data.get("spriteSourceSize"),
+                    "sourceSize": frame_data.get("sourceSize")
                 }
         
         # Sprite non trovato
         logger.warning(f"Sprite non trovato: {sprite_id}")
         return None
     
+    def reload_sprite_sheet(self, metadata_path, removed=False):
+        """
+        Ricarica (o rimuove) uno sprite sheet dopo una modifica del suo file di metadati.
+        
+        Args:
+            metadata_path (str): Percorso del file JSON dei metadati
+            removed (bool): True se il file è stato eliminato
+            
+        Returns:
+            bool: True se il registro è stato aggiornato
+        """
+        # Rimuovi gli sprite sheet definiti da questo file prima di ricaricarlo
+        metadata_path = os.path.normpath(str(metadata_path))
+        sheet_ids = [sheet_id for sheet_id, info in self.sprite_sheets.items()
+                     if os.path.normpath(info.get("metadata_path", "")) == metadata_path]
+        self._rimuovi_dal_registro(sheet_ids)
+        
+        if removed:
+            return bool(sheet_ids)
+        return self.load_sprite_sheet_metadata(metadata_path)
+    
     def clear_cache(self):
         """
         Pulisce la cache degli sprite sheet.
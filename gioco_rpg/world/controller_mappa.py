@@ -1,7 +1,7 @@
 from world.mappa import Mappa
 from world.gestore_mappe import GestitoreMappe
 from entities.giocatore import Giocatore
-import random
+from util.rng import generatore
 import logging
 from util.data_manager import get_data_manager
 
@@ -336,8 +336,8 @@ class ControllerMappa:
             if not posizionato:
                 tentativi = 0
                 while tentativi < 20:
-                    x = random.randint(1, mappa.larghezza - 2)
-                    y = random.randint(1, mappa.altezza - 2)
+                    x = generatore("mappa").randint(1, mappa.larghezza - 2)
+                    y = generatore("mappa").randint(1, mappa.altezza - 2)
                     
                     if mappa.is_posizione_valida(x, y) and (x, y) not in mappa.oggetti and (x, y) not in mappa.npg:
                         mappa.aggiungi_oggetto(oggetto, x, y)
@@ -384,8 +384,8 @@ class ControllerMappa:
             tentativi = 0
             
             while not posizionato and tentativi < 20:
-                x = random.randint(1, mappa.larghezza - 2)
-                y = random.randint(1, mappa.altezza - 2)
+                x = generatore("mappa").randint(1, mappa.larghezza - 2)
+                y = generatore("mappa").randint(1, mappa.altezza - 2)
                 
                 if mappa.is_posizione_valida(x, y) and (x, y) not in mappa.oggetti and (x, y) not in mappa.npg:
                     mappa.aggiungi_npg(npg, x, y)
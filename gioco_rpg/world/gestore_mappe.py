@@ -12,6 +12,7 @@ from world.managers.mappa_manager import MappaManager
 from world.managers.oggetti_manager import OggettiManager
 from world.managers.npg_manager import NPGManager
 from world.managers.loader_manager import LoaderManager
+from util.data_manager import get_data_manager
 from typing import Optional, TYPE_CHECKING
 
 # Forward reference per World per evitare importazioni circolari
@@ -64,12 +65,17 @@ class GestitoreMappe:
             logging.error("Nessuna mappa JSON trovata. Il gioco non può continuare senza mappe.")
             raise ValueError("Nessuna mappa JSON trovata. Controlla che i file JSON delle mappe esistano nelle directory supportate.")
             
+        # Le posizioni degli NPG di tutte le mappe vengono lette una sola volta;
+        # quelle degli oggetti sono già indicizzate in memoria dall'OggettiManager
+        mappe_npg = get_data_manager().load_data("npc", "mappe_npg.json") or {}
+        
         # Usa le mappe caricate da JSON
         for nome, mappa in mappe_json.items():
             self.mappa_manager.aggiungi_mappa(mappa)
             # Carica gli oggetti interattivi e NPG per questa mappa
             self.oggetti_manager.carica_oggetti_su_mappa(mappa, nome, self.world_context)
-            self.npg_manager.carica_npg_su_mappa(mappa, nome, self.world_context)
+            self.npg_manager.carica_npg_su_mappa(mappa, nome, self.world_context,
+                                                 npg_config=mappe_npg.get(nome, []))
         
         logging.info(f"Caricate {len(mappe_json)} mappe da file JSON")
         
@@ -101,20 +107,18 @@ class GestitoreMappe:
                 logging.error("Nessun file mappa JSON trovato nelle directory di ricerca")
                 return {}
                 
-            # Carica ogni mappa
-            for nome_file in file_mappe:
-                try:
-                    mappa = self.loader_manager.carica_mappa(nome_file)
-                    # Verifica che la mappa sia valida
-                    if self.mappa_manager._verifica_mappa_valida(mappa):
-                        mappe[mappa.nome] = mappa
-                        logging.info(f"Mappa caricata: {mappa.nome}")
-                    else:
-                        logging.error(f"Mappa {nome_file} non valida, ignorata")
-                except Exception as e:
-                    logging.error(f"Errore nel caricamento della mappa {nome_file}: {e}")
-                    import traceback
-                    logging.error(traceback.format_exc())
+            # Carica tutte le mappe in parallelo, poi verificale nell'ordine dei file
+            for nome_file, mappa, errore in self.loader_manager.carica_mappe(file_mappe):
+                if errore is not None:
+                    # L'eccezione arriva dal thread di caricamento: ne registra il traceback
+                    logging.error(f"Errore nel caricamento della mappa {nome_file}: {errore}", exc_info=errore)
+                    continue
+                # Verifica che la mappa sia valida
+                if self.mappa_manager._verifica_mappa_valida(mappa):
+                    mappe[mappa.nome] = mappa
+                    logging.info(f"Mappa caricata: {mappa.nome}")
+                else:
+                    logging.error(f"Mappa {nome_file} non valida, ignorata")
             
             return mappe
         except Exception as e:
@@ -0,0 +1,431 @@
+"""
+Indice spaziale a griglia uniforme per le ricerche di prossimità.
+
+Le ricerche "chi è vicino a (x, y)?" (nemici che possono attaccare, NPG e
+oggetti con cui interagire, bersagli di una prova) scorrevano tutte le
+entità del mondo o tutte le celle del quadrato di ricerca. IndiceSpaziale
+divide il piano in celle di DIMENSIONE_CELLA caselle e tiene per ogni
+cella le voci che contiene: inserimenti e spostamenti costano O(1), una
+ricerca visita solo le celle che intersecano il raggio richiesto.
+
+Ogni Mappa ha un indice su NPG e oggetti, aggiornato da aggiungi_*,
+sposta_npg e rimuovi_*. Per il mondo ECS get_indici_spaziali(world)
+costruisce un indice per mappa sulle entità con componente posizione,
+aggiornato quando le entità vengono aggiunte o rimosse dal mondo e quando
+cambiano le coordinate del loro PositionComponent.
+"""
+
+import logging
+import math
+import weakref
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Lato di una cella della griglia (in caselle della mappa)
+DIMENSIONE_CELLA = 8
+
+# Metriche di distanza supportate
+CHEBYSHEV = "chebyshev"  # Quadrato di lato 2 * raggio + 1 (come ottieni_npg_vicini)
+EUCLIDEA = "euclidea"
+MANHATTAN = "manhattan"
+
+# Categorie delle entità ECS
+NEMICI = "nemici"
+NPG = "npg"
+OGGETTI = "oggetti"
+
+Vicino = namedtuple("Vicino", "distanza chiave x y valore")
+
+
+def distanza(dx, dy, metrica=CHEBYSHEV):
+    """
+    Distanza fra due punti dati gli scarti sugli assi.
+
+    Args:
+        dx, dy: Differenze delle coordinate
+        metrica (str): CHEBYSHEV, EUCLIDEA o MANHATTAN
+
+    Returns:
+        float: Distanza
+    """
+    if metrica == EUCLIDEA:
+        return math.hypot(dx, dy)
+    if metrica == MANHATTAN:
+        return abs(dx) + abs(dy)
+    return max(abs(dx), abs(dy))
+
+
+def linea_di_vista(griglia, x0, y0, x1, y1):
+    """
+    Verifica che fra due caselle non ci siano muri (algoritmo di Bresenham).
+
+    Args:
+        griglia (list): Griglia della mappa (righe di celle, 1 = muro)
+        x0, y0: Casella di partenza
+        x1, y1: Casella di arrivo
+
+    Returns:
+        bool: True se nessuna casella intermedia è un muro
+    """
+    x0, y0, x1, y1 = int(x0), int(y0), int(x1), int(y1)
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    errore = dx + dy
+    x, y = x0, y0
+    while (x, y) != (x1, y1):
+        doppio = 2 * errore
+        if doppio >= dy:
+            errore += dy
+            x += sx
+        if doppio <= dx:
+            errore += dx
+            y += sy
+        if (x, y) == (x1, y1):
+            break
+        if 0 <= y < len(griglia) and 0 <= x < len(griglia[y]) and griglia[y][x] == 1:
+            return False
+    return True
+
+
+class IndiceSpaziale:
+    """
+    Griglia uniforme di voci (chiave, posizione, categoria, valore).
+    """
+
+    def __init__(self, dimensione_cella=DIMENSIONE_CELLA):
+        """
+        Args:
+            dimensione_cella (int): Lato di una cella in caselle
+        """
+        self.dimensione_cella = dimensione_cella
+        self._celle = {}  # (cx, cy) -> set di chiavi
+        self._voci = {}  # chiave -> [x, y, categoria, valore]
+        self._limiti = None  # [cx_min, cy_min, cx_max, cy_max] delle celle mai occupate
+
+    def __len__(self):
+        return len(self._voci)
+
+    def __contains__(self, chiave):
+        return chiave in self._voci
+
+    def _cella(self, x, y):
+        return (math.floor(x / self.dimensione_cella), math.floor(y / self.dimensione_cella))
+
+    def _aggiungi_a_cella(self, chiave, cella):
+        self._celle.setdefault(cella, set()).add(chiave)
+        if self._limiti is None:
+            self._limiti = [cella[0], cella[1], cella[0], cella[1]]
+        else:
+            limiti = self._limiti
+            limiti[0], limiti[1] = min(limiti[0], cella[0]), min(limiti[1], cella[1])
+            limiti[2], limiti[3] = max(limiti[2], cella[0]), max(limiti[3], cella[1])
+
+    def _togli_da_cella(self, chiave, cella):
+        chiavi = self._celle.get(cella)
+        if chiavi is not None:
+            chiavi.discard(chiave)
+            if not chiavi:
+                del self._celle[cella]
+
+    def inserisci(self, chiave, x, y, valore=None, categoria=None):
+        """
+        Inserisce una voce o, se la chiave esiste già, la sposta e la aggiorna.
+
+        Args:
+            chiave: Identificativo univoco della voce
+            x, y: Posizione
+            valore: Oggetto associato (restituito dalle ricerche)
+            categoria (str, optional): Categoria per filtrare le ricerche
+        """
+        if chiave in self._voci:
+            self.rimuovi(chiave)
+        self._voci[chiave] = [x, y, categoria, valore]
+        self._aggiungi_a_cella(chiave, self._cella(x, y))
+
+    def sposta(self, chiave, x, y):
+        """
+        Aggiorna la posizione di una voce.
+
+        Args:
+            chiave: Identificativo della voce
+            x, y: Nuova posizione
+
+        Returns:
+            bool: False se la chiave non è nell'indice
+        """
+        voce = self._voci.get(chiave)
+        if voce is None:
+            return False
+        vecchia, nuova = self._cella(voce[0], voce[1]), self._cella(x, y)
+        voce[0], voce[1] = x, y
+        if vecchia != nuova:
+            self._togli_da_cella(chiave, vecchia)
+            self._aggiungi_a_cella(chiave, nuova)
+        return True
+
+    def rimuovi(self, chiave):
+        """
+        Rimuove una voce.
+
+        Returns:
+            bool: False se la chiave non era nell'indice
+        """
+        voce = self._voci.pop(chiave, None)
+        if voce is None:
+            return False
+        self._togli_da_cella(chiave, self._cella(voce[0], voce[1]))
+        return True
+
+    def posizione(self, chiave):
+        """Restituisce la posizione (x, y) di una voce o None"""
+        voce = self._voci.get(chiave)
+        return (voce[0], voce[1]) if voce is not None else None
+
+    def svuota(self):
+        """Rimuove tutte le voci"""
+        self._celle.clear()
+        self._voci.clear()
+        self._limiti = None
+
+    def _accetta(self, voce, categorie, filtro):
+        if categorie is not None and voce[2] not in categorie:
+            return False
+        return filtro is None or filtro(voce[3])
+
+    def _celle_nel_riquadro(self, x, y, raggio):
+        cx0, cy0 = self._cella(x - raggio, y - raggio)
+        cx1, cy1 = self._cella(x + raggio, y + raggio)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._celle):
+            # Raggio più grande dell'area occupata: si visitano solo le celle non vuote
+            return [c for c in self._celle if cx0 <= c[0] <= cx1 and cy0 <= c[1] <= cy1]
+        return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1) if (cx, cy) in self._celle]
+
+    def entro_raggio(self, x, y, raggio, categorie=None, metrica=CHEBYSHEV, griglia=None, filtro=None):
+        """
+        Restituisce le voci entro un raggio, dalla più vicina.
+
+        Args:
+            x, y: Centro della ricerca
+            raggio: Distanza massima (inclusa)
+            categorie (iterable, optional): Categorie ammesse (default: tutte)
+            metrica (str): CHEBYSHEV, EUCLIDEA o MANHATTAN
+            griglia (list, optional): Griglia della mappa; se indicata restano solo le
+                voci in linea di vista da (x, y)
+            filtro (callable, optional): Funzione valore -> bool per scartare altre voci
+
+        Returns:
+            list: Vicino(distanza, chiave, x, y, valore) ordinati per distanza
+        """
+        if categorie is not None and not isinstance(categorie, (set, frozenset)):
+            categorie = {categorie} if isinstance(categorie, str) else set(categorie)
+        risultati = []
+        for cella in self._celle_nel_riquadro(x, y, raggio):
+            for chiave in self._celle[cella]:
+                voce = self._voci[chiave]
+                d = distanza(voce[0] - x, voce[1] - y, metrica)
+                if d <= raggio and self._accetta(voce, categorie, filtro):
+                    if griglia is None or linea_di_vista(griglia, x, y, voce[0], voce[1]):
+                        risultati.append(Vicino(d, chiave, voce[0], voce[1], voce[3]))
+        risultati.sort(key=lambda v: v.distanza)
+        return risultati
+
+    def piu_vicini(self, x, y, k=1, categorie=None, raggio_max=None, metrica=CHEBYSHEV, griglia=None,
+                   filtro=None):
+        """
+        Restituisce le k voci più vicine, visitando le celle ad anelli crescenti.
+
+        Args:
+            x, y: Centro della ricerca
+            k (int): Numero massimo di risultati
+            categorie (iterable, optional): Categorie ammesse
+            raggio_max (optional): Distanza oltre la quale non cercare
+            metrica (str): CHEBYSHEV, EUCLIDEA o MANHATTAN
+            griglia (list, optional): Griglia per il filtro sulla linea di vista
+            filtro (callable, optional): Funzione valore -> bool
+
+        Returns:
+            list: Al più k Vicino ordinati per distanza
+        """
+        if k <= 0 or not self._voci:
+            return []
+        if categorie is not None and not isinstance(categorie, (set, frozenset)):
+            categorie = {categorie} if isinstance(categorie, str) else set(categorie)
+        cx, cy = self._cella(x, y)
+        cx_min, cy_min, cx_max, cy_max = self._limiti
+        anello_max = max(cx - cx_min, cx_max - cx, cy - cy_min, cy_max - cy, 0)
+        trovati = []
+        for anello in range(anello_max + 1):
+            # Nessuna voce di questo anello o dei successivi può essere più vicina di questo limite
+            minimo = max(0, (anello - 1) * self.dimensione_cella)
+            if raggio_max is not None and minimo > raggio_max:
+                break
+            if len(trovati) >= k and trovati[k - 1].distanza <= minimo:
+                break
+            for cella in self._anello(cx, cy, anello):
+                for chiave in self._celle.get(cella, ()):
+                    voce = self._voci[chiave]
+                    d = distanza(voce[0] - x, voce[1] - y, metrica)
+                    if raggio_max is not None and d > raggio_max:
+                        continue
+                    if self._accetta(voce, categorie, filtro) and (
+                            griglia is None or linea_di_vista(griglia, x, y, voce[0], voce[1])):
+                        trovati.append(Vicino(d, chiave, voce[0], voce[1], voce[3]))
+            trovati.sort(key=lambda v: v.distanza)
+        return trovati[:k]
+
+    @staticmethod
+    def _anello(cx, cy, anello):
+        if anello == 0:
+            return [(cx, cy)]
+        celle = [(cx + d, cy - anello) for d in range(-anello, anello + 1)]
+        celle += [(cx + d, cy + anello) for d in range(-anello, anello + 1)]
+        celle += [(cx - anello, cy + d) for d in range(-anello + 1, anello)]
+        celle += [(cx + anello, cy + d) for d in range(-anello + 1, anello)]
+        return celle
+
+
+def appartiene(entita, categoria):
+    """
+    Verifica se un'entità ECS rientra in una categoria delle ricerche di prossimità.
+
+    Le categorie non sono esclusive (un NPG ostile è sia NPG sia nemico),
+    come nelle ricerche che scorrevano tutte le entità.
+
+    Args:
+        entita: Entità del mondo
+        categoria (str): NEMICI, NPG, OGGETTI o None (tutte tranne il giocatore)
+
+    Returns:
+        bool: True se l'entità appartiene alla categoria
+    """
+    if categoria == NEMICI:
+        return entita.has_tag("nemico") or entita.has_tag("ostile")
+    if categoria == NPG:
+        return entita.has_tag("npc")
+    if categoria == OGGETTI:
+        return entita.has_component("interactable")
+    return not entita.has_tag("player")
+
+
+# Entità ECS -> IndiciMondo che le contiene (per gli aggiornamenti da PositionComponent)
+_indici_per_entita = weakref.WeakKeyDictionary()
+
+
+class IndiciMondo:
+    """
+    Indici spaziali delle entità ECS di un mondo, uno per mappa.
+
+    Le categorie vengono lette dai tag al momento della ricerca, così un tag
+    aggiunto dopo il posizionamento non richiede di aggiornare l'indice.
+    """
+
+    def __init__(self, dimensione_cella=DIMENSIONE_CELLA):
+        self.dimensione_cella = dimensione_cella
+        self.mappe = {}  # nome mappa -> IndiceSpaziale
+        self._mappa_di = {}  # ID entità -> nome mappa in cui è indicizzata
+
+    def aggiorna(self, entita, posizione=None):
+        """
+        Inserisce, sposta o rimuove un'entità in base alla sua posizione attuale.
+
+        Args:
+            entita: Entità del mondo
+            posizione (optional): Componente posizione (default: quello dell'entità)
+        """
+        _indici_per_entita[entita] = self
+        if posizione is None and hasattr(entita, "get_component"):
+            posizione = entita.get_component("position")
+        x, y = getattr(posizione, "x", None), getattr(posizione, "y", None)
+        nome_mappa = getattr(posizione, "map_name", None)
+        if x is None or y is None or nome_mappa is None:
+            self.rimuovi(entita.id)
+            return
+        precedente = self._mappa_di.get(entita.id)
+        if precedente == nome_mappa:
+            self.mappe[nome_mappa].sposta(entita.id, x, y)
+            return
+        if precedente is not None:
+            self.mappe[precedente].rimuovi(entita.id)
+        indice = self.mappe.get(nome_mappa)
+        if indice is None:
+            indice = self.mappe[nome_mappa] = IndiceSpaziale(self.dimensione_cella)
+        indice.inserisci(entita.id, x, y, entita)
+        self._mappa_di[entita.id] = nome_mappa
+
+    def rimuovi(self, entita_id):
+        """Toglie un'entità dagli indici (es. rimossa dal mondo)"""
+        nome_mappa = self._mappa_di.pop(entita_id, None)
+        if nome_mappa is not None:
+            self.mappe[nome_mappa].rimuovi(entita_id)
+
+    def cerca(self, nome_mappa, x, y, raggio, categoria=None, metrica=EUCLIDEA, griglia=None):
+        """
+        Entità di una mappa entro un raggio.
+
+        Args:
+            nome_mappa (str): Mappa in cui cercare
+            x, y: Centro della ricerca
+            raggio: Distanza massima
+            categoria (str, optional): NEMICI, NPG o OGGETTI (default: tutte tranne il giocatore)
+            metrica (str): Metrica di distanza (default: euclidea, come le route)
+            griglia (list, optional): Griglia della mappa per il filtro sulla linea di vista
+
+        Returns:
+            list: Vicino(distanza, id, x, y, entità) ordinati per distanza
+        """
+        indice = self.mappe.get(nome_mappa)
+        if indice is None:
+            return []
+        return indice.entro_raggio(x, y, raggio, metrica=metrica, griglia=griglia,
+                                   filtro=self._filtro_categoria(categoria))
+
+    def piu_vicini(self, nome_mappa, x, y, k=1, categoria=None, raggio_max=None, metrica=EUCLIDEA, griglia=None):
+        """
+        Le k entità più vicine di una mappa (vedi IndiceSpaziale.piu_vicini).
+
+        Returns:
+            list: Vicino(distanza, id, x, y, entità) ordinati per distanza
+        """
+        indice = self.mappe.get(nome_mappa)
+        if indice is None:
+            return []
+        return indice.piu_vicini(x, y, k, raggio_max=raggio_max, metrica=metrica, griglia=griglia,
+                                 filtro=self._filtro_categoria(categoria))
+
+    @staticmethod
+    def _filtro_categoria(categoria):
+        return lambda entita: appartiene(entita, categoria)
+
+
+def _su_spostamento(componente):
+    """Richiamata da PositionComponent quando cambiano coordinate, mappa o entità"""
+    entita = getattr(componente, "entity", None)
+    if entita is None:
+        return
+    indici = _indici_per_entita.get(entita)
+    if indici is not None:
+        # Il componente può non essere ancora registrato nell'entità (add_component)
+        indici.aggiorna(entita, componente)
+
+
+def get_indici_spaziali(world):
+    """
+    Restituisce gli indici spaziali di un mondo ECS, costruendoli alla prima richiesta.
+
+    Args:
+        world: Mondo ECS
+
+    Returns:
+        IndiciMondo: Indici associati al mondo
+    """
+    indici = getattr(world, "indici_spaziali", None)
+    if indici is None:
+        from core.ecs.component import PositionComponent
+        PositionComponent.osservatore = staticmethod(_su_spostamento)
+        indici = IndiciMondo()
+        for entita in list(world.entities.values()):
+            indici.aggiorna(entita)
+        world.indici_spaziali = indici
+    return indici
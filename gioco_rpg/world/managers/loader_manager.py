@@ -6,12 +6,63 @@ import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from world.mappa import Mappa
 
 # Definizione del logger
 logger = logging.getLogger(__name__)
 
+# Numero massimo di thread usati per leggere e decodificare i file in parallelo
+MAX_THREAD_CARICAMENTO = 8
+
+def esegui_in_parallelo(funzione, elementi, max_workers=MAX_THREAD_CARICAMENTO):
+    """
+    Applica una funzione a più elementi in un pool di thread.
+    
+    Le eccezioni non interrompono gli altri caricamenti: vengono restituite
+    al posto del risultato dell'elemento che le ha sollevate.
+    
+    Args:
+        funzione: Funzione da applicare a ogni elemento
+        elementi: Elementi da elaborare
+        max_workers: Numero massimo di thread
+        
+    Returns:
+        list: Coppie (risultato, eccezione) nello stesso ordine degli elementi
+    """
+    def esegui(elemento):
+        try:
+            return funzione(elemento), None
+        except Exception as e:
+            return None, e
+    
+    elementi = list(elementi)
+    if len(elementi) <= 1:
+        return [esegui(elemento) for elemento in elementi]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(elementi)),
+                            thread_name_prefix="caricamento") as executor:
+        return list(executor.map(esegui, elementi))
+
+def leggi_json_in_parallelo(percorsi, max_workers=MAX_THREAD_CARICAMENTO):
+    """
+    Legge e decodifica più file JSON contemporaneamente.
+    
+    Args:
+        percorsi: Percorsi dei file
+        max_workers: Numero massimo di thread
+        
+    Returns:
+        list: Triple (percorso, dati, eccezione) nello stesso ordine dei percorsi
+    """
+    def leggi(percorso):
+        with open(percorso, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    percorsi = list(percorsi)
+    risultati = esegui_in_parallelo(leggi, percorsi, max_workers)
+    return [(percorso, dati, errore) for percorso, (dati, errore) in zip(percorsi, risultati)]
+
 class LoaderManager:
     """
     Classe responsabile del caricamento e salvataggio delle mappe da e verso file.
@@ -128,6 +179,23 @@ class LoaderManager:
         logger.error(f"Percorsi controllati: {', '.join(str(p.absolute()) for p in percorsi_unici)}")
         raise FileNotFoundError(error_msg)
             
+    def carica_mappe(self, nomi_file, max_workers=MAX_THREAD_CARICAMENTO):
+        """
+        Carica più mappe in parallelo: lettura, decodifica JSON e costruzione
+        degli oggetti Mappa avvengono nei thread del pool, così il tempo totale
+        dipende dal file più lento invece che dalla somma dei file.
+        
+        Args:
+            nomi_file: Nomi dei file JSON (senza percorso)
+            max_workers: Numero massimo di thread
+            
+        Returns:
+            list: Triple (nome file, Mappa o None, eccezione o None) nell'ordine dei nomi
+        """
+        nomi_file = list(nomi_file)
+        risultati = esegui_in_parallelo(self.carica_mappa, nomi_file, max_workers)
+        return [(nome_file, mappa, errore) for nome_file, (mappa, errore) in zip(nomi_file, risultati)]
+    
     def salva_mappa(self, mappa, nome_file=None):
         """
         Salva una mappa su un file JSON.
@@ -279,7 +279,8 @@ class NPGManager:
         logging.info(f"NPC {npg.nome} posizionato in ({x}, {y}) su mappa {mappa.nome}")
         return True
     
-    def carica_npg_su_mappa(self, mappa, nome_mappa, world_context: Optional['World'] = None):
+    def carica_npg_su_mappa(self, mappa, nome_mappa, world_context: Optional['World'] = None,
+                            npg_config=None):
         """
         Carica gli NPC per una mappa dalle configurazioni JSON.
         
@@ -287,18 +288,19 @@ class NPGManager:
             mappa (Mappa): Oggetto mappa in cui posizionare gli NPC
             nome_mappa (str): Nome della mappa
             world_context: Contest del mondo, se necessario
+            npg_config (list, optional): Voci di mappe_npg.json per questa mappa, se già
+                lette dal chiamante
             
         Returns:
             bool: True se l'operazione è riuscita, False in caso di errori gravi
         """
         try:
             # Prima carica le configurazioni per questa mappa specifica
-            npg_config = []
-            
-            # Carica da mappe_npg.json usando DataManager
-            data_manager = get_data_manager()
-            mappe_npg = data_manager.load_data("npc", "mappe_npg.json") or {}
-            npg_config = mappe_npg.get(nome_mappa, [])
+            if npg_config is None:
+                # Carica da mappe_npg.json usando DataManager
+                data_manager = get_data_manager()
+                mappe_npg = data_manager.load_data("npc", "mappe_npg.json") or {}
+                npg_config = mappe_npg.get(nome_mappa, [])
                 
             if not npg_config:
                 logging.info(f"Nessuna configurazione di NPG trovata per la mappa {nome_mappa}")
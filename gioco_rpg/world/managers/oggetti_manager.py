@@ -3,13 +3,13 @@ Manager per la gestione degli oggetti interattivi nelle mappe.
 """
 
 import logging
-import json
 import os
 from pathlib import Path
 from items.oggetto_interattivo import OggettoInterattivo, Porta, Baule, Leva, Trappola
 from util.data_manager import get_data_manager
 from util.safe_loader import SafeLoader
 from util.validators import valida_oggetto, trova_posizione_valida, verifica_coordinate_valide
+from world.managers.loader_manager import leggi_json_in_parallelo
 from typing import TYPE_CHECKING, Optional
 
 # Importa World per il type hinting del contesto, se necessario
@@ -79,11 +79,12 @@ class OggettiManager:
             return configurazioni
             
         try:
-            for file_path in self.percorso_oggetti.glob("*.json"):
+            # Leggi tutti i file in parallelo, poi indicizzali nell'ordine di elenco
+            for file_path, data, errore in leggi_json_in_parallelo(self.percorso_oggetti.glob("*.json")):
                 logging.info(f"Caricamento configurazione oggetto da {file_path}")
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
+                    if errore is not None:
+                        raise errore
                     
                     # Gestisci sia i formati di array che di oggetti
                     if isinstance(data, list):
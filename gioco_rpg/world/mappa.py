@@ -7,6 +7,9 @@ import json
 import logging
 from pathlib import Path
 import os
+from world.indice_spaziale import IndiceSpaziale, NPG as CATEGORIA_NPG, OGGETTI as CATEGORIA_OGGETTI
+
+logger = logging.getLogger(__name__)
 
 class Mappa:
     def __init__(self, nome, larghezza, altezza, tipo="interno", descrizione=""):
@@ -34,6 +37,9 @@ class Mappa:
         self.npg = {}      # (x, y) -> NPG
         self.porte = {}    # (x, y) -> (mappa_dest, x_dest, y_dest)
         
+        # Indice spaziale di NPG e oggetti per le ricerche di prossimità
+        self.indice = IndiceSpaziale()
+        
         # Posizione iniziale del giocatore
         self._pos_iniziale_giocatore = (1, 1)  # Default, può essere cambiata
         
@@ -58,19 +64,64 @@ class Mappa:
     def aggiungi_oggetto(self, oggetto, x, y):
         """Aggiunge un oggetto alla mappa in una posizione specifica"""
         self.oggetti[(x, y)] = oggetto
+        self.indice.inserisci((CATEGORIA_OGGETTI, (x, y)), x, y, oggetto, CATEGORIA_OGGETTI)
         oggetto.posizione = (x, y, self.nome)  # Aggiorna la posizione dell'oggetto
         
     def aggiungi_npg(self, npg, x, y):
         """Aggiunge un NPG alla mappa in una posizione specifica"""
         self.npg[(x, y)] = npg
+        self.indice.inserisci((CATEGORIA_NPG, (x, y)), x, y, npg, CATEGORIA_NPG)
         npg.imposta_posizione(x, y)  # Utilizza il metodo esistente in NPG
         
     def aggiungi_porta(self, porta, x, y, mappa_dest, x_dest, y_dest):
         """Collega una porta a un'altra mappa e posizione"""
         self.oggetti[(x, y)] = porta
+        self.indice.inserisci((CATEGORIA_OGGETTI, (x, y)), x, y, porta, CATEGORIA_OGGETTI)
         porta.posizione = (x, y, self.nome)
         self.porte[(x, y)] = (mappa_dest, x_dest, y_dest)
         
+    def sposta_npg(self, npg, x, y):
+        """
+        Sposta un NPG già presente sulla mappa, aggiornando posizioni e indice.
+        
+        Args:
+            npg: NPG da spostare
+            x, y: Nuova posizione
+            
+        Returns:
+            bool: False se l'NPG non è sulla mappa
+        """
+        vecchia = (getattr(npg, "x", None), getattr(npg, "y", None))
+        if self.npg.get(vecchia) is not npg:
+            # Posizione dell'NPG non allineata alla mappa: si cerca la sua chiave
+            vecchia = next((pos for pos, n in self.npg.items() if n is npg), None)
+            if vecchia is None:
+                return False
+        if vecchia != (x, y):
+            del self.npg[vecchia]
+            self.indice.rimuovi((CATEGORIA_NPG, vecchia))
+            self.npg[(x, y)] = npg
+            self.indice.inserisci((CATEGORIA_NPG, (x, y)), x, y, npg, CATEGORIA_NPG)
+        return True
+        
+    def rimuovi_npg(self, x, y):
+        """Rimuove e restituisce l'NPG alla posizione specificata (o None)"""
+        self.indice.rimuovi((CATEGORIA_NPG, (x, y)))
+        return self.npg.pop((x, y), None)
+        
+    def rimuovi_oggetto(self, x, y):
+        """Rimuove e restituisce l'oggetto alla posizione specificata (o None)"""
+        self.indice.rimuovi((CATEGORIA_OGGETTI, (x, y)))
+        self.porte.pop((x, y), None)
+        return self.oggetti.pop((x, y), None)
+        
+    def ricostruisci_indice(self):
+        """Ricostruisce l'indice spaziale da self.npg e self.oggetti"""
+        self.indice.svuota()
+        for categoria, elementi in ((CATEGORIA_NPG, self.npg), (CATEGORIA_OGGETTI, self.oggetti)):
+            for (x, y), valore in elementi.items():
+                self.indice.inserisci((categoria, (x, y)), x, y, valore, categoria)
+        
     def imposta_muro(self, x, y):
         """Marca una cella come muro"""
         if 0 <= x < self.larghezza and 0 <= y < self.altezza:
@@ -272,13 +323,7 @@ class Mappa:
         Returns:
             dict: Dizionario di posizioni e oggetti
         """
-        oggetti_vicini = {}
-        for dx in range(-raggio, raggio + 1):
-            for dy in range(-raggio, raggio + 1):
-                pos = (x + dx, y + dy)
-                if pos in self.oggetti:
-                    oggetti_vicini[pos] = self.oggetti[pos]
-        return oggetti_vicini
+        return {(v.x, v.y): v.valore for v in self.indice.entro_raggio(x, y, raggio, CATEGORIA_OGGETTI)}
     
     def ottieni_npg_vicini(self, x, y, raggio=1):
         """
@@ -291,13 +336,28 @@ class Mappa:
         Returns:
             dict: Dizionario di posizioni e NPG
         """
-        npg_vicini = {}
-        for dx in range(-raggio, raggio + 1):
-            for dy in range(-raggio, raggio + 1):
-                pos = (x + dx, y + dy)
-                if pos in self.npg:
-                    npg_vicini[pos] = self.npg[pos]
-        return npg_vicini
+        return {(v.x, v.y): v.valore for v in self.indice.entro_raggio(x, y, raggio, CATEGORIA_NPG)}
+    
+    def entita_vicine(self, x, y, raggio=None, categoria=None, k=None, linea_di_vista=False):
+        """
+        Ricerca di NPG e oggetti per raggio, per numero o entrambi.
+        
+        Args:
+            x, y: Coordinate centrali
+            raggio (optional): Distanza massima in celle (Chebyshev)
+            categoria (str, optional): "npg" o "oggetti" (default: entrambe)
+            k (int, optional): Numero massimo di risultati, dai più vicini
+            linea_di_vista (bool): Se escludere ciò che è dietro un muro
+            
+        Returns:
+            list: Vicino(distanza, chiave, x, y, valore) ordinati per distanza
+        """
+        griglia = self.griglia if linea_di_vista else None
+        if k is None:
+            if raggio is None:
+                raise ValueError("Specificare raggio o k")
+            return self.indice.entro_raggio(x, y, raggio, categoria, griglia=griglia)
+        return self.indice.piu_vicini(x, y, k, categoria, raggio_max=raggio, griglia=griglia)
     
     def carica_layout_da_stringa(self, layout_str):
         """
@@ -568,6 +628,7 @@ class Mappa:
             except Exception as e:
                 print(f"Errore durante il caricamento della porta in {key}: {str(e)}")
                 
+        mappa.ricostruisci_indice()
         return mappa
 
 class MappaComponente: